@@ -66,6 +66,7 @@ class BGPAgent(service.Service, periodic_task.PeriodicTasks,
 
     def stop(self, graceful=False):
         LOG.info("Service '%s' stopping", self.__class__.__name__)
+        self.agent_driver.stop()
         super(BGPAgent, self).stop(graceful)
 
 
@@ -45,6 +45,15 @@ agent_opts = [
                help='The connection string for the native OVSDB backend.\n'
                     'Use tcp:IP:PORT for TCP connection.\n'
                     'Use unix:FILE for unix domain socket connection.'),
+    cfg.StrOpt('ovn_nb_connection',
+               default='unix:/usr/local/var/run/ovn/ovnnb_db.sock',
+               help='The connection string for the OVN NB DB, where the '
+                    'routes received from zebra through FPM are added.\n'
+                    'Use tcp:IP:PORT or ssl:IP:PORT for TCP or SSL '
+                    'connections, or unix:FILE for a unix domain socket.\n'
+                    'A comma separated list of them, e.g., the members of '
+                    'the NB cluster or its relays, can be given to fail '
+                    'over to another one when the connection is lost.'),
     cfg.StrOpt('ovn_nb_private_key',
                default='/etc/pki/tls/private/ovn_controller.key',
                help='The PEM file with private key for SSL connection to '
@@ -93,6 +102,31 @@ agent_opts = [
                 default=4789,
                 help='The UDP port used for EVPN VXLAN communication. By '
                      'default 4789 is being used.'),
+    cfg.BoolOpt('evpn_single_vxlan',
+                default=False,
+                help='Use a single VXLAN device with VNI filtering, '
+                     'attached to a VLAN aware bridge, for all the EVPN '
+                     'tenants instead of creating a VXLAN device and a '
+                     'bridge per VNI. Each VNI is then mapped to a VLAN on '
+                     'that bridge. It requires Linux kernel and iproute2 '
+                     '5.18 or newer.'),
+    cfg.IntOpt('evpn_device_pool_size',
+               default=0,
+               min=0,
+               help='Number of EVPN devices of each type (dummy devices, '
+                    'veth pairs and, unless evpn_single_vxlan is enabled, '
+                    'bridges) kept pre-created on the chassis, so that they '
+                    'are just renamed when exposing a router gateway port '
+                    'through EVPN. The pool is refilled on every sync. '
+                    'By default no devices are pre-created.'),
+    cfg.BoolOpt('evpn_prebuild_standby',
+                default=False,
+                help='Pre-build the EVPN devices and the FRR VRF '
+                     'configuration of the router gateway ports this '
+                     'chassis is a backup gateway for, so that only the '
+                     'connection to OVN and the exposure of the IPs are '
+                     'left for the failover. It requires the ports to use '
+                     'HA Chassis Groups.'),
     cfg.BoolOpt('clear_vrf_routes_on_startup',
                 help='If enabled, all routes are removed from the VRF table'
                      '(specified by bgp_vrf_table_id option) at startup.',
@@ -110,6 +144,131 @@ agent_opts = [
                help='The Routing Table ID that the VRF (bgp_vrf option) '
                     'should use. If it does not exist, this table will be '
                     'created.'),
+    cfg.StrOpt('bgp_advertisement_mode',
+               default='address',
+               choices=('address', 'route'),
+               help='How the BGP driver exposes the IPs to FRR. With '
+                    '"address" each IP is added to the bgp_nic device and '
+                    'advertised through "redistribute connected". With '
+                    '"route" a host route through the bgp_nic device is '
+                    'added to the VRF routing table (bgp_vrf_table_id) '
+                    'instead, and advertised through "redistribute '
+                    'kernel".'),
+    cfg.BoolOpt('bgp_prefix_aggregation',
+                default=False,
+                help='Only used with the "route" bgp_advertisement_mode. '
+                     'When all the addresses of a prefix are exposed on the '
+                     'node, advertise a route to the minimal covering '
+                     'prefix instead of a host route per address. The '
+                     'aggregated routes are split back into more specific '
+                     'ones when the addresses are withdrawn.'),
+    cfg.BoolOpt('compact_ip_rules',
+                default=False,
+                help='Instead of an ip rule per IP exposed on the provider '
+                     'networks, pointing to the provider bridge routing '
+                     'table, use the minimal set of prefix rules that '
+                     'covers exactly the same IPs. This reduces the number '
+                     'of ip rules the kernel has to evaluate per packet '
+                     'when many contiguous IPs are exposed on the node.'),
+    cfg.BoolOpt('use_nexthop_objects',
+                default=False,
+                help='Make the routes on the provider bridges routing tables '
+                     'reference kernel nexthop objects, shared among all the '
+                     'routes through the same device and gateway, instead '
+                     'of embedding the device and gateway on each route. '
+                     'Requires kernel >= 5.3.'),
+    cfg.FloatOpt('frr_reconfigure_interval',
+                 default=0,
+                 help='Time (in seconds) to accumulate the EVPN VRF changes '
+                      'before applying them to FRR in a single '
+                      'configuration reload. If set to 0 the changes are '
+                      'applied immediately, except during the sync, where '
+                      'they are always applied together.'),
+    cfg.FloatOpt('fpm_nb_batch_interval',
+                 default=0.5,
+                 min=0,
+                 help='Time (in seconds) to accumulate the route changes '
+                      'received from zebra through FPM before committing '
+                      'them to the OVN NB DB in a single transaction. If '
+                      'set to 0 the changes are committed as soon as each '
+                      'FPM message is processed.'),
+    cfg.IntOpt('fpm_nb_batch_size',
+               default=1000,
+               min=1,
+               help='Maximum number of route changes received from zebra '
+                    'through FPM to accumulate before committing them to '
+                    'the OVN NB DB, regardless of fpm_nb_batch_interval.'),
+    cfg.FloatOpt('fpm_replay_idle_time',
+                 default=2.0,
+                 min=0,
+                 help='When zebra connects to the FPM server it replays its '
+                      'whole routing table. The replay is considered '
+                      'complete once no message is received for this time '
+                      '(in seconds), and then the BGP routes on the OVN NB '
+                      'DB are reconciled with the replayed ones, removing '
+                      'the stale ones.'),
+    cfg.FloatOpt('fpm_replay_max_time',
+                 default=60.0,
+                 min=0,
+                 help='Maximum time (in seconds) a zebra replay can last, '
+                      'in case the routes keep changing and '
+                      'fpm_replay_idle_time is never reached. Once elapsed, '
+                      'the routes received so far are reconciled with the '
+                      'OVN NB DB. If set to 0 the replay is not limited.'),
+    cfg.IntOpt('fpm_nb_commit_queue_size',
+               default=16,
+               min=1,
+               help='Maximum number of batches of route changes received '
+                    'from zebra through FPM waiting to be committed to each '
+                    'OVN Logical Router. Once reached, the FPM messages are '
+                    'not read until a batch of that router is committed.'),
+    cfg.StrOpt('fpm_default_lrouter',
+               default='lr0',
+               help='OVN Logical Router where the BGP routes received from '
+                    'zebra through FPM are added, unless their kernel table '
+                    'is mapped to another one by fpm_table_lrouters.'),
+    cfg.DictOpt('fpm_table_lrouters',
+                default={},
+                help='Mapping of kernel routing table ids (the table of the '
+                     'VRF for the VRF routes) to the OVN Logical Router '
+                     'where the BGP routes of that table, received from '
+                     'zebra through FPM, are added, e.g., '
+                     '"1001:lr-vrf1,1002:lr-vrf2". The route changes of '
+                     'each router are batched and committed separately.'),
+    cfg.BoolOpt('fpm_dampening',
+                default=False,
+                help='Dampen the BGP routes received from zebra through FPM '
+                     'that flap, as described in RFC 2439. The withdrawals '
+                     'are always applied to the OVN NB DB, but the new next '
+                     'hops of a suppressed route are held, and only its last '
+                     'state is applied once it is stable again.'),
+    cfg.FloatOpt('fpm_dampening_half_life',
+                 default=900.0,
+                 min=1,
+                 help='Time (in seconds) after which the penalty of a '
+                      'dampened route is reduced by half.'),
+    cfg.IntOpt('fpm_dampening_penalty',
+               default=1000,
+               min=1,
+               help='Penalty added to a dampened route each time it is '
+                    'withdrawn. Half of it is added when its next hops '
+                    'change.'),
+    cfg.IntOpt('fpm_dampening_suppress_threshold',
+               default=2000,
+               min=1,
+               help='Penalty above which the changes of a dampened route '
+                    'are suppressed.'),
+    cfg.IntOpt('fpm_dampening_reuse_threshold',
+               default=750,
+               min=1,
+               help='Penalty below which a suppressed route is applied to '
+                    'the OVN NB DB again. It must be lower than '
+                    'fpm_dampening_suppress_threshold.'),
+    cfg.FloatOpt('fpm_dampening_max_suppress_time',
+                 default=3600.0,
+                 min=1,
+                 help='Maximum time (in seconds) the changes of a route can '
+                      'be suppressed.'),
     cfg.ListOpt('address_scopes',
                 default=None,
                 help='Allows to filter on the address scope. Only networks'
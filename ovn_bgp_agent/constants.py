@@ -33,6 +33,9 @@ IP_VERSION_4 = 4
 BGP_MODE = 'BGP'
 EVPN_MODE = 'EVPN'
 
+ADVERTISEMENT_MODE_ADDRESS = 'address'
+ADVERTISEMENT_MODE_ROUTE = 'route'
+
 OVN_EVPN_VNI_EXT_ID_KEY = 'neutron_bgpvpn:vni'
 OVN_EVPN_AS_EXT_ID_KEY = 'neutron_bgpvpn:as'
 OVN_EVPN_VRF_PREFIX = "vrf-"
@@ -42,12 +45,23 @@ OVN_EVPN_VLAN_PREFIX = "vlan-"
 OVN_EVPN_LO_PREFIX = "lo-"
 OVN_EVPN_VETH_VRF_PREFIX = "veth-vrf-"
 OVN_EVPN_VETH_OVS_PREFIX = "veth-ovs-"
+OVN_EVPN_SVI_PREFIX = "svi-"
+OVN_EVPN_POOL_PREFIX = "ovnpool-"
+# shared devices of the single VXLAN device mode (evpn_single_vxlan)
+OVN_EVPN_SINGLE_BRIDGE = "br-evpn"
+OVN_EVPN_SINGLE_VXLAN = "vxlan-evpn"
+EVPN_VLAN_MIN = 1
+EVPN_VLAN_MAX = 4094
 OVN_INTEGRATION_BRIDGE = 'br-int'
 OVN_LRP_PORT_NAME_PREFIX = 'lrp-'
 OVN_CRLRP_PORT_NAME_PREFIX = 'cr-lrp-'
 
 OVS_PATCH_PROVNET_PORT_PREFIX = 'patch-provnet-'
 
+# Routing protocol id of the nexthop objects created by the agent, not
+# assigned to any other protocol on /etc/iproute2/rt_protos
+NEXTHOP_PROTO = 98
+
 LINK_UP = "up"
 LINK_DOWN = "down"
 
@@ -31,6 +31,9 @@ class AgentDriverBase(object, metaclass=abc.ABCMeta):
 
         return agent_driver
 
+    def stop(self):
+        pass
+
     @abc.abstractmethod
     def expose_ip(self, ip_address):
         raise NotImplementedError()
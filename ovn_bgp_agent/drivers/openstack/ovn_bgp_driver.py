@@ -13,10 +13,13 @@
 # limitations under the License.
 
 import collections
+import contextlib
 import ipaddress
 import pyroute2
 import threading
-import asyncore
+
+from socket import AF_INET
+from socket import AF_INET6
 
 from oslo_concurrency import lockutils
 from oslo_config import cfg
@@ -24,6 +27,8 @@ from oslo_log import log as logging
 
 from ovn_bgp_agent import constants
 from ovn_bgp_agent.drivers import driver_api
+from ovn_bgp_agent.drivers.openstack.utils import aggregation
+from ovn_bgp_agent.drivers.openstack.utils import cr_lrp_store
 from ovn_bgp_agent.drivers.openstack.utils import driver_utils
 from ovn_bgp_agent.drivers.openstack.utils import frr
 from ovn_bgp_agent.drivers.openstack.utils import ovn
@@ -32,6 +37,7 @@ from ovn_bgp_agent.drivers.openstack.utils import enable_fdp
 from ovn_bgp_agent.drivers.openstack.watchers import bgp_watcher as watcher
 from ovn_bgp_agent import exceptions as agent_exc
 from ovn_bgp_agent.utils import linux_net
+from ovn_bgp_agent.utils import prefix_tree
 
 
 CONF = cfg.CONF
@@ -42,22 +48,59 @@ LOG = logging.getLogger(__name__)
 OVN_SB_TABLES = ["Port_Binding", "Chassis", "Datapath_Binding", "Load_Balancer"]
 OVN_NB_TABLES = ["Logical_Router_Static_Route", "Logical_Router"]
 
+
+def _get_ip_rule_dst(dst):
+    """Return the destination network of an ip rule, None if invalid"""
+    try:
+        return ipaddress.ip_network(dst, strict=False)
+    except ValueError:
+        return None
+
+
 class OVNBGPDriver(driver_api.AgentDriverBase):
 
     def __init__(self):
         self._expose_tenant_networks = (CONF.expose_tenant_networks or
                                         CONF.expose_ipv6_gua_tenant_networks)
+        self._route_advertisement = (CONF.bgp_advertisement_mode ==
+                                     constants.ADVERTISEMENT_MODE_ROUTE)
+        self._route_aggregator = None
+        if CONF.bgp_prefix_aggregation:
+            if self._route_advertisement:
+                self._route_aggregator = aggregation.RouteAggregator()
+            else:
+                LOG.warning("Prefix aggregation is only supported with the "
+                            "route advertisement mode, ignoring it.")
+        self._compact_ip_rules = CONF.compact_ip_rules
+        # {'br-ex': RouteAggregator}, with the IPs exposed through the bridge
+        # routing table when the ip rules are compacted
+        self._ip_rule_aggregators = collections.defaultdict(
+            aggregation.RouteAggregator)
+        # {ip: ip} of the IPs advertised without prefix aggregation, to get
+        # the ones on a network without dumping the device IPs or routes
+        self._advertised_ips = prefix_tree.PrefixMap()
+        # Set during the sync to only recalculate the aggregated prefixes,
+        # which are reconciled with the routing table at the end of it
+        self._defer_advertisement = False
         self.ovn_routing_tables = {}  # {'br-ex': 200}
         self.ovn_bridge_mappings = {}  # {'public': 'br-ex'}
-        self.ovn_local_cr_lrps = {}
+        self.ovn_local_cr_lrps = cr_lrp_store.CRLRPStore()
         self.ovn_local_lrps = {}
         # {'br-ex': [route1, route2]}
         self.ovn_routing_tables_routes = collections.defaultdict()
+        # {(family, 'br-ex', gateway): {'id': 1, 'routes': {route_key}}}
+        self.ovn_nexthops = {} if CONF.use_nexthop_objects else None
+        # routes using nexthop objects to be replaced at the end of the
+        # current batch, see _batch_ip_routes
+        self._nexthop_routes = None
+        # cr-lrps exposed before the sync in progress, if any
+        self._previous_cr_lrps = {}
         # {ovn_lb: VIP1, VIP2}
         self.ovn_lb_vips = collections.defaultdict()
 
         self._sb_idl = None
         self._post_fork_event = threading.Event()
+        self.fpm_server = None
 
     @property
     def sb_idl(self):
@@ -74,7 +117,6 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
         self.ovs_idl.start(CONF.ovsdb_connection)
         self.chassis = self.ovs_idl.get_own_chassis_name()
         self.ovn_remote = self.ovs_idl.get_ovn_remote()
-        self.nb_db_sock = "unix:/usr/local/var/run/ovn/ovnnb_db.sock"
 
         LOG.info("Loaded chassis %s.", self.chassis)
 
@@ -85,7 +127,11 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
         # Ensure FRR is configure to leak the routes
         # NOTE: If we want to recheck this every X time, we should move it
         # inside the sync function instead
-        frr.vrf_leak(CONF.bgp_vrf, CONF.bgp_AS, CONF.bgp_router_id)
+        if self._route_advertisement:
+            frr.vrf_leak(CONF.bgp_vrf, CONF.bgp_AS, CONF.bgp_router_id,
+                         template=frr.LEAK_VRF_KERNEL_TEMPLATE)
+        else:
+            frr.vrf_leak(CONF.bgp_vrf, CONF.bgp_AS, CONF.bgp_router_id)
 
         # Create OVN dummy device
         linux_net.ensure_ovn_device(CONF.bgp_nic, CONF.bgp_vrf)
@@ -126,17 +172,28 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
                 tables=OVN_SB_TABLES,
                 events=events).start()
 
+        # NOTE: only the rows the FPM server writes are monitored, so that
+        # the agents do not keep a replica of the whole NB DB
         self.nb_idl = ovn.OvnNbIdl(
-                self.nb_db_sock,
-                tables=OVN_NB_TABLES,
-                events=None).start()
+            CONF.ovn_nb_connection,
+            tables=OVN_NB_TABLES,
+            events=None,
+            lrouters=enable_fdp.get_lrouters(),
+            route_external_ids=enable_fdp.get_owner_external_ids(
+                self.chassis)).start()
 
         # Now IDL connections can be safely used
         self._post_fork_event.set()
 
-        LOG.info("Start thread to read routes from Zebra and add them to OVN NB DB")
-        self.fdp = threading.Thread(target=enable_fdp.run, args=(self.nb_idl,))
-        self.fdp.start()
+        LOG.info("Start FPM server to read routes from Zebra and add them "
+                 "to OVN NB DB")
+        self.fpm_server = enable_fdp.FpmServer(self.nb_idl,
+                                               owner=self.chassis)
+        self.fpm_server.start()
+
+    def stop(self):
+        if self.fpm_server:
+            self.fpm_server.stop()
 
     def _get_events(self):
         events = set(["PortBindingChassisCreatedEvent",
@@ -157,10 +214,17 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
     def sync(self):
         self._expose_tenant_networks = (CONF.expose_tenant_networks or
                                         CONF.expose_ipv6_gua_tenant_networks)
-        self.ovn_local_cr_lrps = {}
+        self._previous_cr_lrps = self.ovn_local_cr_lrps
+        self.ovn_local_cr_lrps = cr_lrp_store.CRLRPStore()
         self.ovn_local_lrps = {}
         self.ovn_routing_tables_routes = collections.defaultdict()
         self.ovn_lb_vips = collections.defaultdict()
+        if self._route_aggregator is not None:
+            self._route_aggregator = aggregation.RouteAggregator()
+        self._ip_rule_aggregators = collections.defaultdict(
+            aggregation.RouteAggregator)
+        if self.ovn_nexthops is not None:
+            self.ovn_nexthops = linux_net.get_nexthops()
 
         LOG.debug("Ensuring VRF configuration for advertising routes")
         # Create VRF
@@ -211,69 +275,105 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
         ovs.remove_extra_ovs_flows(flows_info, constants.OVS_RULE_COOKIE)
 
         LOG.debug("Syncing current routes.")
-        exposed_ips = linux_net.get_exposed_ips(CONF.bgp_nic)
+        exposed_ips = self._get_advertised_ips()
+        if self._route_aggregator is None:
+            self._advertised_ips = prefix_tree.PrefixMap()
+            self._track_advertised_ips(exposed_ips)
         # get the rules pointing to ovn bridges
         ovn_ip_rules = linux_net.get_ovn_ip_rules(
             self.ovn_routing_tables.values())
+        # the IPs and ip rules destinations found to be exposed during the
+        # sync, the rest of the current ones are leftovers
+        seen_ips = set()
+        seen_ip_rules = set()
 
-        # add missing routes/ips for IPs on provider network
-        ports = self.sb_idl.get_ports_on_chassis(self.chassis)
-        for port in ports:
-            self._ensure_port_exposed(port, exposed_ips, ovn_ip_rules)
-
-        # this information is only available when there are cr-lrps add
-        # missing routes/ips for FIPs associated to VMs/LBs on the chassis
-        cr_lrp_ports = self.sb_idl.get_cr_lrp_ports_on_chassis(
-            self.chassis)
-        for cr_lrp_port in cr_lrp_ports:
-            self._ensure_cr_lrp_associated_ports_exposed(
-                cr_lrp_port, exposed_ips, ovn_ip_rules)
-
-        for cr_lrp_port, cr_lrp_info in self.ovn_local_cr_lrps.items():
-            lrp_ports = self.sb_idl.get_lrp_ports_for_router(
-                cr_lrp_info['router_datapath'])
-            for lrp in lrp_ports:
-                self._process_lrp_port(lrp, cr_lrp_port, exposed_ips,
-                                       ovn_ip_rules)
-
-            # add missing routes/ips related to ovn-octavia loadbalancers
-            # on the provider networks
-            ovn_lbs = self.sb_idl.get_ovn_lb_on_provider_datapath(
-                cr_lrp_info['provider_datapath'])
-            for ovn_lb in ovn_lbs:
-                self._process_ovn_lb(ovn_lb, cr_lrp_port, exposed_ips,
-                                     ovn_ip_rules)
+        self._defer_advertisement = self._route_aggregator is not None
+        try:
+            with self._batch_ip_routes():
+                # add missing routes/ips for IPs on provider network
+                ports = self.sb_idl.get_ports_on_chassis(self.chassis)
+                for port in ports:
+                    self._ensure_port_exposed(port, seen_ips, seen_ip_rules)
+
+                # this information is only available when there are cr-lrps
+                # add missing routes/ips for FIPs associated to VMs/LBs on
+                # the chassis
+                cr_lrp_ports = self.sb_idl.get_cr_lrp_ports_on_chassis(
+                    self.chassis)
+                for cr_lrp_port in cr_lrp_ports:
+                    self._ensure_cr_lrp_associated_ports_exposed(
+                        cr_lrp_port, seen_ips, seen_ip_rules)
+
+                for cr_lrp_port, cr_lrp_info in (
+                        self.ovn_local_cr_lrps.items()):
+                    lrp_ports = self.sb_idl.get_lrp_ports_for_router(
+                        cr_lrp_info.router_datapath)
+                    for lrp in lrp_ports:
+                        self._process_lrp_port(lrp, cr_lrp_port, seen_ips,
+                                               seen_ip_rules)
+
+                    # add missing routes/ips related to ovn-octavia
+                    # loadbalancers on the provider networks
+                    ovn_lbs = self.sb_idl.get_ovn_lb_on_provider_datapath(
+                        cr_lrp_info.provider_datapath)
+                    for ovn_lb in ovn_lbs:
+                        self._process_ovn_lb(ovn_lb, cr_lrp_port, seen_ips,
+                                             seen_ip_rules)
+        finally:
+            self._defer_advertisement = False
+            self._previous_cr_lrps = {}
 
         # remove extra routes/ips
         # remove all the leftovers on the list of current ips on dev OVN
-        linux_net.delete_exposed_ips(exposed_ips, CONF.bgp_nic)
+        self._sync_advertised_ips(exposed_ips, seen_ips)
+        if self._compact_ip_rules:
+            # the compacted rules do not match the exposed IPs, remove them
+            # from the leftovers
+            for bridge, aggregator in self._ip_rule_aggregators.items():
+                prefixes = aggregator.get_prefixes()
+                seen_ip_rules.update(
+                    _get_ip_rule_dst(prefix) for prefix in prefixes)
+                LOG.info("Exposing %s IPs through bridge %s with %s ip "
+                         "rules", len(aggregator), bridge, len(prefixes))
         # remove all the leftovers on the list of current ip rules for ovn
         # bridges
-        linux_net.delete_ip_rules(ovn_ip_rules)
+        linux_net.delete_ip_rules({
+            dst: rule_info for dst, rule_info in ovn_ip_rules.items()
+            if _get_ip_rule_dst(dst) not in seen_ip_rules})
 
         # remove all the extra rules not needed
-        linux_net.delete_bridge_ip_routes(self.ovn_routing_tables,
-                                          self.ovn_routing_tables_routes,
-                                          extra_routes)
+        if self.ovn_nexthops is not None:
+            linux_net.delete_bridge_ip_routes(self.ovn_routing_tables,
+                                              self.ovn_routing_tables_routes,
+                                              extra_routes,
+                                              nexthops=self.ovn_nexthops)
+            # and the nexthop objects not used by any route
+            linux_net.delete_unused_nexthops(self.ovn_nexthops)
+        else:
+            linux_net.delete_bridge_ip_routes(self.ovn_routing_tables,
+                                              self.ovn_routing_tables_routes,
+                                              extra_routes)
+
+    @staticmethod
+    def _mark_ips_seen(ips, seen_ips, seen_ip_rules):
+        """Record the IPs exposed during a sync and their host ip rules"""
+        if seen_ips is None:
+            return
+        for ip in ips:
+            ip = ipaddress.ip_address(ip.split('/')[0])
+            seen_ips.add(ip)
+            seen_ip_rules.add(ipaddress.ip_network(ip))
 
     def _ensure_cr_lrp_associated_ports_exposed(self, cr_lrp_port,
-                                                exposed_ips, ovn_ip_rules):
+                                                seen_ips, seen_ip_rules):
         ips, patch_port_row = self.sb_idl.get_cr_lrp_nat_addresses_info(
             cr_lrp_port, self.chassis, self.sb_idl)
         if not ips:
             return
         self._expose_ip(ips, patch_port_row, associated_port=cr_lrp_port)
-        for ip in ips:
-            ip_version = linux_net.get_ip_version(ip)
-            if ip_version == constants.IP_VERSION_6:
-                ip_dst = "{}/128".format(ip)
-            else:
-                ip_dst = "{}/32".format(ip)
-            if ip in exposed_ips:
-                exposed_ips.remove(ip)
-            ovn_ip_rules.pop(ip_dst, None)
+        self._mark_ips_seen(ips, seen_ips, seen_ip_rules)
 
-    def _ensure_port_exposed(self, port, exposed_ips, ovn_ip_rules):
+    def _ensure_port_exposed(self, port, seen_ips, seen_ip_rules):
         if port.type not in constants.OVN_VIF_PORT_TYPES or not port.mac:
             return
 
@@ -292,59 +392,51 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
             port_ips = port.mac[0].split(' ')[1:]
 
         ips_adv = self._expose_ip(port_ips, port)
-
-        for port_ip in ips_adv:
-            ip_address = port_ip.split("/")[0]
-            ip_version = linux_net.get_ip_version(port_ip)
-            if ip_version == constants.IP_VERSION_6:
-                ip_dst = "{}/128".format(ip_address)
-            else:
-                ip_dst = "{}/32".format(ip_address)
-            if ip_address in exposed_ips:
-                # remove each ip to add from the list of current ips on dev OVN
-                exposed_ips.remove(ip_address)
-            ovn_ip_rules.pop(ip_dst, None)
+        self._mark_ips_seen(ips_adv, seen_ips, seen_ip_rules)
 
     def _expose_provider_port(self, port_ips, provider_datapath,
                               bridge_device=None, bridge_vlan=None,
                               lladdr=None):
-        linux_net.add_ips_to_dev(CONF.bgp_nic, port_ips)
+        self._advertise_ips(port_ips)
 
         if not bridge_device and not bridge_vlan:
             bridge_device, bridge_vlan = self._get_bridge_for_datapath(
                 provider_datapath)
-        for ip in port_ips:
-            try:
-                if lladdr:
-                    linux_net.add_ip_rule(
-                        ip, self.ovn_routing_tables[bridge_device],
-                        bridge_device, lladdr=lladdr)
-                else:
-                    linux_net.add_ip_rule(
-                        ip, self.ovn_routing_tables[bridge_device],
-                        bridge_device)
-            except agent_exc.InvalidPortIP:
-                LOG.exception("Invalid IP to create a rule for port"
-                              " on the provider network: %s", ip)
-                return []
-            linux_net.add_ip_route(
-                self.ovn_routing_tables_routes, ip,
-                self.ovn_routing_tables[bridge_device], bridge_device,
-                vlan=bridge_vlan)
-
-    def _expose_tenant_port(self, port, ip_version, exposed_ips=[],
-                            ovn_ip_rules={}):
+        with self._batch_ip_routes():
+            for ip in port_ips:
+                try:
+                    if self._compact_ip_rules:
+                        self._add_compacted_ip_rule(ip, bridge_device,
+                                                    lladdr=lladdr)
+                    elif lladdr:
+                        linux_net.add_ip_rule(
+                            ip, self.ovn_routing_tables[bridge_device],
+                            bridge_device, lladdr=lladdr)
+                    else:
+                        linux_net.add_ip_rule(
+                            ip, self.ovn_routing_tables[bridge_device],
+                            bridge_device)
+                except agent_exc.InvalidPortIP:
+                    LOG.exception("Invalid IP to create a rule for port"
+                                  " on the provider network: %s", ip)
+                    return []
+                self._add_ip_route(
+                    ip, self.ovn_routing_tables[bridge_device],
+                    bridge_device, vlan=bridge_vlan)
+
+    def _expose_tenant_port(self, port, ip_version, seen_ips=None,
+                            seen_ip_rules=None):
         # specific case for ovn-lb vips on tenant networks
         if not port.mac and not port.chassis and not port.up[0]:
             ext_n_cidr = port.external_ids.get(
                 constants.OVN_CIDRS_EXT_ID_KEY)
             if ext_n_cidr:
                 ovn_lb_ip = ext_n_cidr.split(" ")[0].split("/")[0]
-                linux_net.add_ips_to_dev(
-                    CONF.bgp_nic, [ovn_lb_ip])
-                if ovn_lb_ip in exposed_ips:
-                    exposed_ips.remove(ovn_lb_ip)
-                ovn_ip_rules.pop(ext_n_cidr.split(" ")[0], None)
+                self._advertise_ips([ovn_lb_ip])
+                if seen_ips is not None:
+                    seen_ips.add(ipaddress.ip_address(ovn_lb_ip))
+                    seen_ip_rules.add(
+                        _get_ip_rule_dst(ext_n_cidr.split(" ")[0]))
             return
         elif (not port.mac or
                 port.type not in (
@@ -370,27 +462,22 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
             # IP version
             port_ip_version = linux_net.get_ip_version(port_ip)
             if port_ip_version == ip_version:
-                linux_net.add_ips_to_dev(
-                    CONF.bgp_nic, [port_ip])
-                if port_ip in exposed_ips:
-                    exposed_ips.remove(port_ip)
-                if port_ip_version == constants.IP_VERSION_6:
-                    ip_dst = "{}/128".format(port_ip)
-                else:
-                    ip_dst = "{}/32".format(port_ip)
-                ovn_ip_rules.pop(ip_dst, None)
+                self._advertise_ips([port_ip])
+                self._mark_ips_seen([port_ip], seen_ips, seen_ip_rules)
 
     def _withdraw_provider_port(self, port_ips, provider_datapath,
                                 bridge_device=None, bridge_vlan=None,
                                 lladdr=None):
-        linux_net.del_ips_from_dev(CONF.bgp_nic, port_ips)
+        self._withdraw_advertised_ips(port_ips)
 
         # assuming either you pass both or none
         if not bridge_device and not bridge_vlan:
             bridge_device, bridge_vlan = self._get_bridge_for_datapath(
                 provider_datapath)
         for ip in port_ips:
-            if lladdr:
+            if self._compact_ip_rules:
+                self._del_compacted_ip_rule(ip, bridge_device, lladdr=lladdr)
+            elif lladdr:
                 if linux_net.get_ip_version(ip) == constants.IP_VERSION_6:
                     cr_lrp_ip = '{}/128'.format(ip)
                 else:
@@ -401,11 +488,190 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
             else:
                 linux_net.del_ip_rule(
                     ip, self.ovn_routing_tables[bridge_device], bridge_device)
-            linux_net.del_ip_route(
-                self.ovn_routing_tables_routes, ip,
-                self.ovn_routing_tables[bridge_device], bridge_device,
+            self._del_ip_route(
+                ip, self.ovn_routing_tables[bridge_device], bridge_device,
                 vlan=bridge_vlan)
 
+    @contextlib.contextmanager
+    def _batch_ip_routes(self):
+        """Replace the routes added within the block in one go
+
+        Only the routes using nexthop objects are batched, and nested
+        blocks are replaced when the outermost one exits.
+        """
+        if self.ovn_nexthops is None or self._nexthop_routes is not None:
+            yield
+            return
+        self._nexthop_routes = []
+        try:
+            yield
+        finally:
+            self._flush_ip_routes()
+            self._nexthop_routes = None
+
+    def _flush_ip_routes(self):
+        routes = self._nexthop_routes
+        self._nexthop_routes = []
+        linux_net.replace_ip_routes_with_nexthop(routes)
+
+    def _add_ip_route(self, ip, route_table, dev, **kwargs):
+        if self.ovn_nexthops is not None:
+            kwargs['nexthops'] = self.ovn_nexthops
+            if self._nexthop_routes is not None:
+                kwargs['batch'] = self._nexthop_routes
+        linux_net.add_ip_route(self.ovn_routing_tables_routes, ip,
+                               route_table, dev, **kwargs)
+
+    def _del_ip_route(self, ip, route_table, dev, **kwargs):
+        if self.ovn_nexthops is not None:
+            kwargs['nexthops'] = self.ovn_nexthops
+            if self._nexthop_routes:
+                # the route to delete may be waiting to be added
+                self._flush_ip_routes()
+        linux_net.del_ip_route(self.ovn_routing_tables_routes, ip,
+                               route_table, dev, **kwargs)
+
+    def _add_compacted_ip_rule(self, ip, bridge_device, lladdr=None):
+        table = self.ovn_routing_tables[bridge_device]
+        try:
+            rules_to_add, rules_to_del = self._ip_rule_aggregators[
+                bridge_device].add(ip)
+        except ValueError:
+            raise agent_exc.InvalidPortIP(ip=ip)
+        # add the new rules before removing the old ones, so that the
+        # IPs are always covered by some rule
+        for rule in rules_to_add:
+            linux_net.add_ip_rule(rule, table)
+        for rule in rules_to_del:
+            linux_net.del_ip_rule(rule, table)
+        if lladdr:
+            linux_net.add_ip_nei(ip, lladdr, bridge_device)
+
+    def _del_compacted_ip_rule(self, ip, bridge_device, lladdr=None):
+        table = self.ovn_routing_tables[bridge_device]
+        try:
+            rules_to_add, rules_to_del = self._ip_rule_aggregators[
+                bridge_device].remove(ip)
+        except ValueError:
+            LOG.error("Invalid ip: %s", ip)
+            return
+        for rule in rules_to_add:
+            linux_net.add_ip_rule(rule, table)
+        for rule in rules_to_del:
+            linux_net.del_ip_rule(rule, table)
+        if lladdr:
+            linux_net.del_ip_nei(ip, lladdr, bridge_device)
+
+    def _track_advertised_ips(self, ips):
+        for ip in ips:
+            try:
+                self._advertised_ips[ip.split('/')[0]] = ip
+            except ValueError:
+                LOG.debug("Not tracking invalid advertised IP %s", ip)
+
+    def _untrack_advertised_ips(self, ips):
+        for ip in ips:
+            self._advertised_ips.pop(ip.split('/')[0], None)
+
+    def _advertise_ips(self, ips):
+        if self._route_aggregator is not None:
+            self._update_aggregated_routes(ips, self._route_aggregator.add)
+            return
+        if self._route_advertisement:
+            linux_net.add_ip_host_routes(CONF.bgp_nic, ips,
+                                         CONF.bgp_vrf_table_id)
+        else:
+            linux_net.add_ips_to_dev(CONF.bgp_nic, ips)
+        self._track_advertised_ips(ips)
+
+    def _withdraw_advertised_ips(self, ips):
+        if self._route_aggregator is not None:
+            self._update_aggregated_routes(ips, self._route_aggregator.remove)
+            return
+        if self._route_advertisement:
+            linux_net.del_ip_host_routes(CONF.bgp_nic, ips,
+                                         CONF.bgp_vrf_table_id)
+        else:
+            linux_net.del_ips_from_dev(CONF.bgp_nic, ips)
+        self._untrack_advertised_ips(ips)
+
+    def _update_aggregated_routes(self, ips, update):
+        prefixes_to_add = set()
+        prefixes_to_del = set()
+        for ip in ips:
+            added, removed = update(ip.split('/')[0])
+            # an aggregate created and split again within the same batch
+            # does not need to touch the routing table
+            for prefix in added:
+                if prefix in prefixes_to_del:
+                    prefixes_to_del.remove(prefix)
+                else:
+                    prefixes_to_add.add(prefix)
+            for prefix in removed:
+                if prefix in prefixes_to_add:
+                    prefixes_to_add.remove(prefix)
+                else:
+                    prefixes_to_del.add(prefix)
+        if self._defer_advertisement:
+            return
+        # add the new routes before removing the old ones, so that the
+        # IPs are always covered by some advertised prefix
+        linux_net.add_ip_host_routes(CONF.bgp_nic, sorted(prefixes_to_add),
+                                     CONF.bgp_vrf_table_id)
+        linux_net.del_ip_host_routes(CONF.bgp_nic, sorted(prefixes_to_del),
+                                     CONF.bgp_vrf_table_id)
+
+    def _get_advertised_ips(self):
+        if self._route_aggregator is not None:
+            return linux_net.get_exposed_route_prefixes(
+                CONF.bgp_nic, CONF.bgp_vrf_table_id)
+        if self._route_advertisement:
+            return linux_net.get_exposed_host_routes(CONF.bgp_nic,
+                                                     CONF.bgp_vrf_table_id)
+        return linux_net.get_exposed_ips(CONF.bgp_nic)
+
+    def _get_advertised_ips_on_network(self, network):
+        if self._route_aggregator is not None:
+            return self._route_aggregator.get_ips_on_network(network)
+        return [ip for _, ip in self._advertised_ips.get_within(network)]
+
+    def _delete_advertised_ips(self, ips):
+        if self._route_aggregator is not None:
+            self._withdraw_advertised_ips(ips)
+            return
+        if self._route_advertisement:
+            linux_net.del_ip_host_routes(CONF.bgp_nic, ips,
+                                         CONF.bgp_vrf_table_id)
+        else:
+            linux_net.delete_exposed_ips(ips, CONF.bgp_nic)
+        self._untrack_advertised_ips(ips)
+
+    def _sync_advertised_ips(self, exposed_ips, seen_ips=frozenset()):
+        if self._route_advertisement or self._route_aggregator is not None:
+            # the IPs exposed on the device while running in address mode
+            # are still advertised, remove them
+            leftover_ips = linux_net.get_exposed_ips(CONF.bgp_nic)
+            if leftover_ips:
+                LOG.info("Removing %d IPs exposed on %s in address mode",
+                         len(leftover_ips), CONF.bgp_nic)
+                linux_net.delete_exposed_ips(leftover_ips, CONF.bgp_nic)
+        if self._route_aggregator is None:
+            self._delete_advertised_ips([
+                ip for ip in exposed_ips
+                if ipaddress.ip_address(ip) not in seen_ips])
+            return
+        # NOTE: with prefix aggregation exposed_ips has the prefixes of the
+        # routes on the routing table, and the changes were not applied
+        # during the sync, so reconcile them with the aggregated prefixes
+        prefixes = self._route_aggregator.get_prefixes()
+        current_prefixes = set(exposed_ips)
+        linux_net.add_ip_host_routes(
+            CONF.bgp_nic, sorted(prefixes - current_prefixes),
+            CONF.bgp_vrf_table_id)
+        linux_net.del_ip_host_routes(
+            CONF.bgp_nic, sorted(current_prefixes - prefixes),
+            CONF.bgp_vrf_table_id)
+
     def _get_bridge_for_datapath(self, datapath):
         network_name, network_tag = self.sb_idl.get_network_name_and_tag(
             datapath, self.ovn_bridge_mappings.keys())
@@ -420,10 +686,10 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
         self._expose_ovn_lb_on_provider(ovn_lb, ip, cr_lrp)
 
     def _expose_ovn_lb_on_provider(self, ovn_lb, ip, cr_lrp):
-        self.ovn_local_cr_lrps[cr_lrp]['ovn_lbs'].append(ovn_lb)
+        self.ovn_local_cr_lrps.add_ovn_lb(cr_lrp, ovn_lb)
         self.ovn_lb_vips.setdefault(ovn_lb, []).append(ip)
-        bridge_device = self.ovn_local_cr_lrps[cr_lrp]['bridge_device']
-        bridge_vlan = self.ovn_local_cr_lrps[cr_lrp]['bridge_vlan']
+        bridge_device = self.ovn_local_cr_lrps[cr_lrp].bridge_device
+        bridge_vlan = self.ovn_local_cr_lrps[cr_lrp].bridge_vlan
 
         LOG.debug("Adding BGP route for loadbalancer VIP %s", ip)
         self._expose_provider_port([ip], None, bridge_device=bridge_device,
@@ -432,8 +698,8 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
 
     @lockutils.synchronized('bgp')
     def withdraw_ovn_lb_on_provider(self, ovn_lb, cr_lrp):
-        bridge_device = self.ovn_local_cr_lrps[cr_lrp]['bridge_device']
-        bridge_vlan = self.ovn_local_cr_lrps[cr_lrp]['bridge_vlan']
+        bridge_device = self.ovn_local_cr_lrps[cr_lrp].bridge_device
+        bridge_vlan = self.ovn_local_cr_lrps[cr_lrp].bridge_vlan
 
         for ip in self.ovn_lb_vips[ovn_lb].copy():
             LOG.debug("Deleting BGP route for loadbalancer VIP %s", ip)
@@ -443,8 +709,7 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
             if ip in self.ovn_lb_vips[ovn_lb]:
                 self.ovn_lb_vips[ovn_lb].remove(ip)
             LOG.debug("Deleted BGP route for loadbalancer VIP %s", ip)
-        if ovn_lb in self.ovn_local_cr_lrps[cr_lrp]['ovn_lbs']:
-            self.ovn_local_cr_lrps[cr_lrp]['ovn_lbs'].remove(ovn_lb)
+        self.ovn_local_cr_lrps.remove_ovn_lb(cr_lrp, ovn_lb)
 
     @lockutils.synchronized('bgp')
     def expose_ip(self, ips, row, associated_port=None):
@@ -521,19 +786,18 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
             bridge_device, bridge_vlan = self._get_bridge_for_datapath(
                 cr_lrp_datapath)
             mac = row.mac[0].split(' ')[0]
+            previous_cr_lrp_info = (
+                self.ovn_local_cr_lrps.get(row.logical_port) or
+                self._previous_cr_lrps.get(row.logical_port))
+            if previous_cr_lrp_info:
+                self._replace_cr_lrp_nexthops(previous_cr_lrp_info, ips,
+                                              bridge_device, bridge_vlan)
             # Keeping information about the associated network for
             # tenant network advertisement
-            self.ovn_local_cr_lrps[row.logical_port] = {
-                'router_datapath': row.datapath,
-                'provider_datapath': cr_lrp_datapath,
-                'ips': ips,
-                'mac': mac,
-                'subnets_datapath': {},
-                'subnets_cidr': [],
-                'ovn_lbs': [],
-                'bridge_vlan': bridge_vlan,
-                'bridge_device': bridge_device
-            }
+            self.ovn_local_cr_lrps[row.logical_port] = (
+                cr_lrp_store.CRLRPInfo(
+                    row.datapath, cr_lrp_datapath, ips, mac,
+                    bridge_device=bridge_device, bridge_vlan=bridge_vlan))
 
             self._expose_cr_lrp_port(ips, mac, bridge_device, bridge_vlan,
                                      router_datapath=row.datapath,
@@ -571,9 +835,9 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
                     self.sb_idl.get_virtual_ports_on_datapath_by_chassis(
                         row.datapath, self.chassis))
                 if not virtual_provider_ports:
-                    cr_lrps_on_same_provider = [
-                        p for p in self.ovn_local_cr_lrps.values()
-                        if p['provider_datapath'] == row.datapath]
+                    cr_lrps_on_same_provider = (
+                        self.ovn_local_cr_lrps.get_by_provider_datapath(
+                            row.datapath))
                     if not cr_lrps_on_same_provider:
                         bridge_device, bridge_vlan = (
                             self._get_bridge_for_datapath(row.datapath))
@@ -613,19 +877,15 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
         # CR-LRP Port
         elif (row.type == constants.OVN_CHASSISREDIRECT_VIF_PORT_TYPE and
               row.logical_port.startswith('cr-')):
-            cr_lrp_datapath = self.ovn_local_cr_lrps.get(
-                row.logical_port, {}).get('provider_datapath')
-            if not cr_lrp_datapath:
+            cr_lrp_info = self.ovn_local_cr_lrps.get(row.logical_port)
+            if not cr_lrp_info or not cr_lrp_info.provider_datapath:
                 return
 
-            bridge_vlan = self.ovn_local_cr_lrps[row.logical_port].get(
-                'bridge_vlan')
-            bridge_device = self.ovn_local_cr_lrps[row.logical_port].get(
-                'bridge_device')
             mac = row.mac[0].split(' ')[0]
-            self._withdraw_cr_lrp_port(ips, mac, bridge_device, bridge_vlan,
-                                       provider_datapath=cr_lrp_datapath,
-                                       cr_lrp_port=row.logical_port)
+            self._withdraw_cr_lrp_port(
+                ips, mac, cr_lrp_info.bridge_device, cr_lrp_info.bridge_vlan,
+                provider_datapath=cr_lrp_info.provider_datapath,
+                cr_lrp_port=row.logical_port)
 
     @lockutils.synchronized('bgp')
     def expose_remote_ip(self, ips, row):
@@ -645,7 +905,7 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
         if port_lrp in self.ovn_local_lrps.keys():
             LOG.debug("Adding BGP route for tenant IP %s on chassis %s",
                       ips, self.chassis)
-            linux_net.add_ips_to_dev(CONF.bgp_nic, ips)
+            self._advertise_ips(ips)
             LOG.debug("Added BGP route for tenant IP %s on chassis %s",
                       ips, self.chassis)
 
@@ -667,7 +927,7 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
         if port_lrp in self.ovn_local_lrps.keys():
             LOG.debug("Deleting BGP route for tenant IP %s on chassis %s",
                       ips, self.chassis)
-            linux_net.del_ips_from_dev(CONF.bgp_nic, ips)
+            self._withdraw_advertised_ips(ips)
             LOG.debug("Deleted BGP route for tenant IP %s on chassis %s",
                       ips, self.chassis)
 
@@ -677,17 +937,9 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
         bridge_device, bridge_vlan = self._get_bridge_for_datapath(
             provider_datapath)
         mac = router_port.mac[0].split(' ')[0]
-        self.ovn_local_cr_lrps[cr_lrp_port_name] = {
-            'router_datapath': router_port.datapath,
-            'provider_datapath': provider_datapath,
-            'ips': ips,
-            'mac': mac,
-            'subnets_datapath': {},
-            'subnets_cidr': [],
-            'ovn_lbs': [],
-            'bridge_vlan': bridge_vlan,
-            'bridge_device': bridge_device
-        }
+        self.ovn_local_cr_lrps[cr_lrp_port_name] = cr_lrp_store.CRLRPInfo(
+            router_port.datapath, provider_datapath, ips, mac,
+            bridge_device=bridge_device, bridge_vlan=bridge_vlan)
         # NOTE: This is like if it was the cr-lrp action on expose_ip
         return self._expose_cr_lrp_port(
             ips, mac, bridge_device, bridge_vlan,
@@ -695,8 +947,8 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
             provider_datapath=provider_datapath,
             cr_lrp_port=cr_lrp_port_name)
 
-    def _process_lrp_port(self, lrp, associated_cr_lrp, exposed_ips=[],
-                          ovn_ip_rules={}):
+    def _process_lrp_port(self, lrp, associated_cr_lrp, seen_ips=None,
+                          seen_ip_rules=None):
         if (lrp.chassis or
                 not lrp.logical_port.startswith('lrp-') or
                 "chassis-redirect-port" in lrp.options.keys() or
@@ -714,18 +966,18 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
                 lrp.options['peer'])
             self._expose_lrp_port(lrp_ip, lrp.logical_port,
                                   associated_cr_lrp, subnet_datapath,
-                                  exposed_ips=exposed_ips,
-                                  ovn_ip_rules=ovn_ip_rules)
+                                  seen_ips=seen_ips,
+                                  seen_ip_rules=seen_ip_rules)
 
-    def _process_ovn_lb(self, ovn_lb, cr_lrp_port, exposed_ips=[],
-                        ovn_ip_rules={}):
+    def _process_ovn_lb(self, ovn_lb, cr_lrp_port, seen_ips=None,
+                        seen_ip_rules=None):
         if hasattr(ovn_lb, 'datapath_group'):
             ovn_lb_datapaths = ovn_lb.datapath_group[0].datapaths
         else:
             ovn_lb_datapaths = ovn_lb.datapaths
         for ovn_dp in ovn_lb_datapaths:
-            if ovn_dp in self.ovn_local_cr_lrps[
-                    cr_lrp_port]['subnets_datapath'].values():
+            if cr_lrp_port in self.ovn_local_cr_lrps.get_by_subnet_datapath(
+                    ovn_dp):
                 break
         else:
             return
@@ -733,39 +985,62 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
         for vip in ovn_lb.vips.keys():
             ip = driver_utils.parse_vip_from_lb_table(vip)
             self._expose_ovn_lb_on_provider(ovn_lb.name, ip, cr_lrp_port)
-            if exposed_ips and ip in exposed_ips:
-                exposed_ips.remove(ip)
-            if ovn_ip_rules:
-                ip_version = linux_net.get_ip_version(ip)
-                if ip_version == constants.IP_VERSION_6:
-                    ip_dst = "{}/128".format(ip)
-                else:
-                    ip_dst = "{}/32".format(ip)
-                ovn_ip_rules.pop(ip_dst, None)
+            self._mark_ips_seen([ip], seen_ips, seen_ip_rules)
+
+    def _replace_cr_lrp_nexthops(self, cr_lrp_info, ips, bridge_device,
+                                 bridge_vlan):
+        """Move the routes via a cr-lrp to its new IPs or VLAN device
+
+        The tenant networks routes via the cr-lrp IPs are moved by updating
+        their nexthop objects, instead of deleting and adding each route.
+        """
+        if (self.ovn_nexthops is None or
+                cr_lrp_info.bridge_device != bridge_device):
+            # NOTE: the routes are on the bridge routing table, a change of
+            # bridge needs them to be added to the new table
+            return
+        previous_vlan = cr_lrp_info.bridge_vlan
+        for previous_ip in cr_lrp_info.ips:
+            previous_ip = previous_ip.split('/')[0]
+            ip_version = linux_net.get_ip_version(previous_ip)
+            cr_lrp_ip = next((ip.split('/')[0] for ip in ips
+                              if linux_net.get_ip_version(ip) == ip_version),
+                             None)
+            if not cr_lrp_ip or (previous_ip, previous_vlan) == (
+                    cr_lrp_ip, bridge_vlan):
+                continue
+            family = (AF_INET6 if ip_version == constants.IP_VERSION_6
+                      else AF_INET)
+            linux_net.replace_nexthop(
+                self.ovn_routing_tables_routes, self.ovn_nexthops, family,
+                bridge_device, vlan=previous_vlan, new_vlan=bridge_vlan,
+                via=previous_ip, new_via=cr_lrp_ip)
 
     def _expose_cr_lrp_port(self, ips, mac, bridge_device, bridge_vlan,
                             router_datapath, provider_datapath, cr_lrp_port):
-        LOG.debug("Adding BGP route for CR-LRP Port %s", ips)
-        ips_without_mask = [ip.split("/")[0] for ip in ips]
-        self._expose_provider_port(ips_without_mask, provider_datapath,
-                                   bridge_device, bridge_vlan,
-                                   lladdr=mac)
-        # add proxy ndp config for ipv6
-        for ip in ips:
-            if linux_net.get_ip_version(ip) == constants.IP_VERSION_6:
-                linux_net.add_ndp_proxy(ip, bridge_device, bridge_vlan)
-        LOG.debug("Added BGP route for CR-LRP Port %s", ips)
-
-        # Check if there are networks attached to the router,
-        # and if so, add the needed routes/rules
-        lrp_ports = self.sb_idl.get_lrp_ports_for_router(router_datapath)
-        for lrp in lrp_ports:
-            self._process_lrp_port(lrp, cr_lrp_port)
+        # the routes to the cr-lrp and to its subnets are added together
+        with self._batch_ip_routes():
+            LOG.debug("Adding BGP route for CR-LRP Port %s", ips)
+            ips_without_mask = [ip.split("/")[0] for ip in ips]
+            self._expose_provider_port(ips_without_mask, provider_datapath,
+                                       bridge_device, bridge_vlan,
+                                       lladdr=mac)
+            # add proxy ndp config for ipv6
+            linux_net.add_ndp_proxies([
+                (ip, bridge_device, bridge_vlan) for ip in ips
+                if linux_net.get_ip_version(ip) == constants.IP_VERSION_6])
+            LOG.debug("Added BGP route for CR-LRP Port %s", ips)
+
+            # Check if there are networks attached to the router,
+            # and if so, add the needed routes/rules
+            lrp_ports = self.sb_idl.get_lrp_ports_for_router(router_datapath)
+            for lrp in lrp_ports:
+                self._process_lrp_port(lrp, cr_lrp_port)
 
-        ovn_lbs = self.sb_idl.get_ovn_lb_on_provider_datapath(
-            provider_datapath)
-        for ovn_lb in ovn_lbs:
-            self._process_ovn_lb(ovn_lb, cr_lrp_port)
+            ovn_lbs = self.sb_idl.get_ovn_lb_on_provider_datapath(
+                provider_datapath)
+            for ovn_lb in ovn_lbs:
+                self._process_ovn_lb(ovn_lb, cr_lrp_port)
 
     def _withdraw_cr_lrp_port(self, ips, mac, bridge_device, bridge_vlan,
                               provider_datapath, cr_lrp_port):
@@ -778,29 +1053,27 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
                                      bridge_vlan=bridge_vlan,
                                      lladdr=mac)
         # del proxy ndp config for ipv6
-        for ip in ips_without_mask:
-            if linux_net.get_ip_version(ip) == constants.IP_VERSION_6:
-                cr_lrps_on_same_provider = [
-                    p for p in self.ovn_local_cr_lrps.values()
-                    if p['provider_datapath'] == provider_datapath]
-                # if no other cr-lrp port on the same provider
-                # delete the ndp proxy
-                if (len(cr_lrps_on_same_provider) <= 1):
-                    linux_net.del_ndp_proxy(ip, bridge_device, bridge_vlan)
+        cr_lrps_on_same_provider = (
+            self.ovn_local_cr_lrps.get_by_provider_datapath(
+                provider_datapath))
+        # if no other cr-lrp port on the same provider
+        # delete the ndp proxy
+        if (len(cr_lrps_on_same_provider) <= 1):
+            linux_net.del_ndp_proxies([
+                (ip, bridge_device, bridge_vlan) for ip in ips_without_mask
+                if linux_net.get_ip_version(ip) == constants.IP_VERSION_6])
         LOG.debug("Deleted BGP route for CR-LRP Port %s", ips)
 
         # Check if there are networks attached to the router,
         # and if so delete the needed routes/rules
         local_cr_lrp_info = self.ovn_local_cr_lrps.get(cr_lrp_port)
-        for subnet_cidr in local_cr_lrp_info['subnets_cidr']:
+        for subnet_cidr in local_cr_lrp_info.subnets_cidr:
             self._withdraw_lrp_port(subnet_cidr, None, cr_lrp_port)
 
         # check if there are loadbalancers associated to the router,
         # and if so delete the needed routes/rules
-        ovn_lbs = self.ovn_local_cr_lrps[cr_lrp_port]['ovn_lbs'].copy()
-        for ovn_lb in ovn_lbs:
+        for ovn_lb in list(local_cr_lrp_info.ovn_lbs):
             self.withdraw_ovn_lb_on_provider(ovn_lb, cr_lrp_port)
-            self.ovn_local_cr_lrps[cr_lrp_port]['ovn_lbs'].remove(ovn_lb)
         try:
             del self.ovn_local_cr_lrps[cr_lrp_port]
         except KeyError:
@@ -808,32 +1081,32 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
                       cr_lrp_port)
 
     def _expose_lrp_port(self, ip, lrp, associated_cr_lrp, subnet_datapath,
-                         exposed_ips=[], ovn_ip_rules={}):
+                         seen_ips=None, seen_ip_rules=None):
         if not self._expose_tenant_networks:
             return
         if not CONF.expose_tenant_networks:
             # This means CONF.expose_ipv6_gua_tenant_networks is enabled
             if not driver_utils.is_ipv6_gua(ip):
                 return
-        cr_lrp_info = self.ovn_local_cr_lrps.get(associated_cr_lrp, {})
+        cr_lrp_info = self.ovn_local_cr_lrps.get(associated_cr_lrp)
+        if not cr_lrp_info:
+            return
         cr_lrp_ips = [ip_address.split('/')[0]
-                      for ip_address in cr_lrp_info.get('ips', [])]
+                      for ip_address in cr_lrp_info.ips]
 
         # this is the router gateway port
         if ip.split('/')[0] in cr_lrp_ips:
             return
 
-        cr_lrp_datapath = cr_lrp_info.get('provider_datapath')
-        if not cr_lrp_datapath:
+        if not cr_lrp_info.provider_datapath:
             return
 
-        bridge_device = cr_lrp_info.get('bridge_device')
-        bridge_vlan = cr_lrp_info.get('bridge_vlan')
+        bridge_device = cr_lrp_info.bridge_device
+        bridge_vlan = cr_lrp_info.bridge_vlan
 
         # update information needed for the loadbalancers
-        self.ovn_local_cr_lrps[associated_cr_lrp]['subnets_datapath'].update(
-            {lrp: subnet_datapath})
-        self.ovn_local_cr_lrps[associated_cr_lrp]['subnets_cidr'].append(ip)
+        self.ovn_local_cr_lrps.add_subnet(associated_cr_lrp, lrp,
+                                          subnet_datapath, ip)
         self.ovn_local_lrps.update({lrp: associated_cr_lrp})
 
         LOG.debug("Adding IP Rules for network %s on chassis %s", ip,
@@ -847,8 +1120,8 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
             return
         LOG.debug("Added IP Rules for network %s on chassis %s", ip,
                   self.chassis)
-        if ovn_ip_rules:
-            ovn_ip_rules.pop(ip, None)
+        if seen_ip_rules is not None:
+            seen_ip_rules.add(_get_ip_rule_dst(ip))
 
         LOG.debug("Adding IP Routes for network %s on chassis %s", ip,
                   self.chassis)
@@ -857,8 +1130,7 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
         ip_version = linux_net.get_ip_version(ip)
         for cr_lrp_ip in cr_lrp_ips:
             if linux_net.get_ip_version(cr_lrp_ip) == ip_version:
-                linux_net.add_ip_route(
-                    self.ovn_routing_tables_routes,
+                self._add_ip_route(
                     ip.split("/")[0],
                     self.ovn_routing_tables[bridge_device],
                     bridge_device,
@@ -874,8 +1146,8 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
         ports = self.sb_idl.get_ports_on_datapath(subnet_datapath)
         for port in ports:
             self._expose_tenant_port(port, ip_version=ip_version,
-                                     exposed_ips=exposed_ips,
-                                     ovn_ip_rules=ovn_ip_rules)
+                                     seen_ips=seen_ips,
+                                     seen_ip_rules=seen_ip_rules)
 
     def _withdraw_lrp_port(self, ip, lrp, associated_cr_lrp):
         if not self._expose_tenant_networks:
@@ -884,7 +1156,7 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
             # This means CONF.expose_ipv6_gua_tenant_networks is enabled
             if not driver_utils.is_ipv6_gua(ip):
                 return
-        cr_lrp_info = self.ovn_local_cr_lrps.get(associated_cr_lrp, {})
+        cr_lrp_info = self.ovn_local_cr_lrps[associated_cr_lrp]
 
         LOG.debug("Deleting IP Rules for network %s on chassis %s", ip,
                   self.chassis)
@@ -892,19 +1164,16 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
             if lrp in self.ovn_local_lrps.keys():
                 self.ovn_local_lrps.pop(lrp)
         else:
-            for subnet_lp in cr_lrp_info['subnets_datapath'].keys():
+            for subnet_lp in cr_lrp_info.subnets_datapath.keys():
                 if subnet_lp in self.ovn_local_lrps.keys():
                     self.ovn_local_lrps.pop(subnet_lp)
                     break
-        self.ovn_local_cr_lrps[associated_cr_lrp]['subnets_datapath'].pop(
-            lrp, None)
+        self.ovn_local_cr_lrps.remove_subnet(associated_cr_lrp, lrp)
 
         cr_lrp_ips = [ip_address.split('/')[0]
-                      for ip_address in cr_lrp_info.get('ips', [])]
-        bridge_device = self.ovn_local_cr_lrps[associated_cr_lrp].get(
-            'bridge_device')
-        bridge_vlan = self.ovn_local_cr_lrps[associated_cr_lrp].get(
-            'bridge_vlan')
+                      for ip_address in cr_lrp_info.ips]
+        bridge_device = cr_lrp_info.bridge_device
+        bridge_vlan = cr_lrp_info.bridge_vlan
 
         linux_net.del_ip_rule(ip, self.ovn_routing_tables[bridge_device],
                               bridge_device)
@@ -916,8 +1185,7 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
         ip_version = linux_net.get_ip_version(ip)
         for cr_lrp_ip in cr_lrp_ips:
             if linux_net.get_ip_version(cr_lrp_ip) == ip_version:
-                linux_net.del_ip_route(
-                    self.ovn_routing_tables_routes,
+                self._del_ip_route(
                     ip.split("/")[0],
                     self.ovn_routing_tables[bridge_device],
                     bridge_device,
@@ -936,9 +1204,8 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
         # Check if there are VMs on the network
         # and if so withdraw the routes
         if net:
-            vms_on_net = linux_net.get_exposed_ips_on_network(
-                CONF.bgp_nic, net)
-            linux_net.delete_exposed_ips(vms_on_net, CONF.bgp_nic)
+            vms_on_net = self._get_advertised_ips_on_network(net)
+            self._delete_advertised_ips(vms_on_net)
 
     @lockutils.synchronized('bgp')
     def expose_subnet(self, ip, row):
@@ -968,12 +1235,9 @@ class OVNBGPDriver(driver_api.AgentDriverBase):
                       "not exists any more. Checking if port %s belongs "
                       "to chassis redirect and skip in that case.",
                       row.logical_port)
-            cr_lrp = [cr_lrp_name
-                      for cr_lrp_name in self.ovn_local_cr_lrps.keys()
-                      if row.logical_port in cr_lrp_name]
             # if cr_lrp exists, this means the lrp port is for the router
             # gateway, so there is no need to proceed
-            if cr_lrp:
+            if 'cr-' + row.logical_port in self.ovn_local_cr_lrps:
                 LOG.debug("Port %s is related to chassis redirect, so "
                           "there is no need to do further actions for "
                           "subnet withdrawal, as this port was not "
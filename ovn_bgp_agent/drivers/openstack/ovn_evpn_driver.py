@@ -14,7 +14,9 @@
 
 import collections
 import ipaddress
+import itertools
 import threading
+import time
 
 from oslo_concurrency import lockutils
 from oslo_config import cfg
@@ -22,12 +24,16 @@ from oslo_log import log as logging
 
 from ovn_bgp_agent import constants
 from ovn_bgp_agent.drivers import driver_api
+from ovn_bgp_agent.drivers.openstack.utils import cr_lrp_store
+from ovn_bgp_agent.drivers.openstack.utils import evpn_context
+from ovn_bgp_agent.drivers.openstack.utils import evpn_pool
 from ovn_bgp_agent.drivers.openstack.utils import frr
 from ovn_bgp_agent.drivers.openstack.utils import ovn
 from ovn_bgp_agent.drivers.openstack.utils import ovs
 from ovn_bgp_agent.drivers.openstack.watchers import evpn_watcher as \
     watcher
 from ovn_bgp_agent.utils import linux_net
+from ovn_bgp_agent.utils import prefix_tree
 
 
 CONF = cfg.CONF
@@ -36,20 +42,44 @@ LOG = logging.getLogger(__name__)
 # logging.basicConfig(level=logging.DEBUG)
 
 OVN_TABLES = ["Port_Binding", "Chassis", "Datapath_Binding"]
+OVN_HA_TABLES = ["HA_Chassis_Group", "HA_Chassis"]
+# {name prefix: kind} of the devices created by the driver, None if they
+# are OVS internal ports
+EVPN_DEVICE_KINDS = {
+    constants.OVN_EVPN_VRF_PREFIX: 'vrf',
+    constants.OVN_EVPN_LO_PREFIX: 'dummy',
+    constants.OVN_EVPN_BRIDGE_PREFIX: 'bridge',
+    constants.OVN_EVPN_VXLAN_PREFIX: 'vxlan',
+    constants.OVN_EVPN_VETH_VRF_PREFIX: 'veth',
+    constants.OVN_EVPN_VLAN_PREFIX: None,
+    constants.OVN_EVPN_SVI_PREFIX: 'vlan',
+}
 EVPN_INFO = collections.namedtuple(
     'EVPNInfo', ['vrf_name', 'lo_name', 'bridge_name', 'vxlan_name',
-                 'veth_vrf', 'veth_ovs', 'vlan_name'])
+                 'veth_vrf', 'veth_ovs', 'vlan_name', 'svi_name'],
+    defaults=(None,) * 8)
 
 
 class OVNEVPNDriver(driver_api.AgentDriverBase):
 
     def __init__(self):
         self.ovn_bridge_mappings = {}  # {'public': 'br-ex'}
-        self.ovn_local_cr_lrps = {}
+        self.ovn_local_cr_lrps = cr_lrp_store.CRLRPStore()
         self.ovn_local_lrps = {}
         # {'br-ex': [route1, route2]}
         self._ovn_routing_tables_routes = collections.defaultdict()
+        # {'lo-1001': PrefixMap({ip: ip})}
         self._ovn_exposed_evpn_ips = collections.defaultdict()
+        # {vni: vlan} on the single VXLAN device bridge, loaded on first use
+        self._evpn_vlans = None
+        # {vni: EVPNContext} and VXLAN local IP cache
+        self._evpn_contexts = evpn_context.EVPNContextManager()
+        # cr-lrps this chassis is a backup gateway for, with their devices
+        self._ovn_standby_cr_lrps = {}
+        self.stats = collections.Counter()
+        self._device_pool = evpn_pool.EVPNDevicePool(
+            CONF.evpn_device_pool_size, bridges=not CONF.evpn_single_vxlan,
+            stats=self.stats)
 
         self._sb_idl = None
         self._post_fork_event = threading.Event()
@@ -70,12 +100,17 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
         self.chassis = self.ovs_idl.get_own_chassis_name()
         self.ovn_remote = self.ovs_idl.get_ovn_remote()
         LOG.debug("Loaded chassis %s.", self.chassis)
+        self._evpn_contexts.start()
 
         events = ()
         for event in self._get_events():
             event_class = getattr(watcher, event)
             events += (event_class(self),)
 
+        tables = OVN_TABLES
+        if CONF.evpn_prebuild_standby:
+            tables = tables + OVN_HA_TABLES
+
         self._post_fork_event.clear()
         # TODO(lucasagomes): The OVN package in the ubuntu LTS is old
         # and does not support Chassis_Private. Once the package is updated
@@ -84,18 +119,23 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
             self.sb_idl = ovn.OvnSbIdl(
                 self.ovn_remote,
                 chassis=self.chassis,
-                tables=OVN_TABLES + ["Chassis_Private"],
+                tables=tables + ["Chassis_Private"],
                 events=events).start()
         except AssertionError:
             self.sb_idl = ovn.OvnSbIdl(
                 self.ovn_remote,
                 chassis=self.chassis,
-                tables=OVN_TABLES,
+                tables=tables,
                 events=events).start()
 
         # Now IDL connections can be safely used
         self._post_fork_event.set()
 
+    def stop(self):
+        # apply the VRF changes still waiting for the reconfigure interval
+        frr.flush_config()
+        self._evpn_contexts.stop()
+
     def _get_events(self):
         events = set(["PortBindingChassisCreatedEvent",
                       "PortBindingChassisDeletedEvent",
@@ -108,7 +148,7 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
 
     @lockutils.synchronized('evpn')
     def sync(self):
-        self.ovn_local_cr_lrps = {}
+        self.ovn_local_cr_lrps = cr_lrp_store.CRLRPStore()
         self.ovn_local_lrps = {}
         self._ovn_routing_tables_routes = collections.defaultdict()
         self._ovn_exposed_evpn_ips = collections.defaultdict()
@@ -126,15 +166,24 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
         # TO DO
         # add missing routes/ips for fips/provider VMs
         ports = self.sb_idl.get_ports_on_chassis(self.chassis)
-        for port in ports:
-            if port.type != constants.OVN_CHASSISREDIRECT_VIF_PORT_TYPE:
-                continue
-            self._expose_ip(port, cr_lrp=True)
-
-        self._remove_extra_exposed_ips()
-        self._remove_extra_routes()
-        self._remove_extra_ovs_flows()
-        self._remove_extra_vrfs()
+        # apply all the VRF changes in a single FRR reload
+        with frr.batch_config():
+            for port in ports:
+                if port.type != constants.OVN_CHASSISREDIRECT_VIF_PORT_TYPE:
+                    continue
+                self._expose_ip(port, cr_lrp=True)
+            if CONF.evpn_prebuild_standby:
+                self._prebuild_standby_cr_lrps()
+
+            self._remove_extra_exposed_ips()
+            # single snapshot of the links and the VRF routes for the cleanup
+            links, routes = linux_net.get_links_and_routes(
+                set(self._get_table_ids()))
+            self._evpn_contexts.update_ifindexes(links)
+            self._remove_extra_routes(links, routes)
+            self._remove_extra_ovs_flows()
+            self._remove_extra_vrfs(links)
+        self._device_pool.refill()
 
     def _ensure_network_exposed(self, router_port, gateway):
         evpn_info = self.sb_idl.get_evpn_info_from_port_name(
@@ -144,7 +193,7 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
                       "Not exposing it.", router_port)
             return
 
-        gateway_ips = [ip.split('/')[0] for ip in gateway['ips']]
+        gateway_ips = [ip.split('/')[0] for ip in gateway.ips]
         try:
             router_port_ip = router_port.mac[0].split(' ')[1]
         except IndexError:
@@ -154,10 +203,12 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
             return
         self.ovn_local_lrps[router_port.logical_port] = {
             'datapath': router_port.datapath,
-            'ip': router_port_ip
+            'ip': router_port_ip,
+            'vni': int(evpn_info['vni']),
+            'bgp_as': evpn_info['bgp_as']
             }
         datapath_bridge, vlan_tag = self._get_bridge_for_datapath(
-            gateway['provider_datapath'])
+            gateway.provider_datapath)
 
         network_datapath = self.sb_idl.get_port_datapath(
             router_port.options['peer'])
@@ -187,6 +238,7 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
         self._expose_ip(row, cr_lrp)
 
     def _expose_ip(self, row, cr_lrp=False):
+        start = time.monotonic()
         if cr_lrp:
             cr_lrp_port_name = row.logical_port
             cr_lrp_port = row
@@ -222,27 +274,19 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
 
         LOG.info("Adding BGP route for CR-LRP Port %s on AS %s and "
                  "VNI %s", ips, evpn_info['bgp_as'], evpn_info['vni'])
+        self._evpn_contexts.get(evpn_info['vni'], bgp_as=evpn_info['bgp_as'])
         evpn_devices = self._ensure_evpn_devices(datapath_bridge,
                                                  evpn_info['vni'],
                                                  vlan_tag)
         if not evpn_devices.vrf_name or not evpn_devices.lo_name:
             return
 
-        self.ovn_local_cr_lrps[cr_lrp_port_name] = {
-            'router_datapath': cr_lrp_port.datapath,
-            'provider_datapath': cr_lrp_datapath,
-            'ips': ips,
-            'mac': cr_lrp_port.mac[0].split(' ')[0],
-            'vni': int(evpn_info['vni']),
-            'bgp_as': evpn_info['bgp_as'],
-            'lo': evpn_devices.lo_name,
-            'bridge': evpn_devices.bridge_name,
-            'vxlan': evpn_devices.vxlan_name,
-            'vrf': evpn_devices.vrf_name,
-            'veth_vrf': evpn_devices.veth_vrf,
-            'veth_ovs': evpn_devices.veth_ovs,
-            'vlan': evpn_devices.vlan_name
-        }
+        self.ovn_local_cr_lrps[cr_lrp_port_name] = (
+            cr_lrp_store.EVPNCRLRPInfo(
+                cr_lrp_port.datapath, cr_lrp_datapath, ips,
+                cr_lrp_port.mac[0].split(' ')[0], int(evpn_info['vni']),
+                evpn_info['bgp_as'],
+                **self._get_evpn_devices_info(evpn_devices)))
 
         frr.vrf_reconfigure(evpn_info, action="add-vrf")
 
@@ -255,7 +299,7 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
         nei_dev = evpn_devices.vlan_name if vlan_tag else evpn_devices.veth_vrf
         for ip in ips_without_mask:
             linux_net.add_ip_nei(
-                ip, self.ovn_local_cr_lrps[cr_lrp_port_name]['mac'], nei_dev)
+                ip, self.ovn_local_cr_lrps[cr_lrp_port_name].mac, nei_dev)
 
         # Check if there are networks attached to the router,
         # and if so, add the needed routes/rules
@@ -267,6 +311,73 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
             self._ensure_network_exposed(
                 lrp, self.ovn_local_cr_lrps[cr_lrp_port_name])
 
+        latency = int((time.monotonic() - start) * 1000)
+        self.stats['evpn_cr_lrp_exposed'] += 1
+        self.stats['evpn_cr_lrp_expose_time_ms'] += latency
+        self.stats['evpn_cr_lrp_expose_latency_ms'] = latency
+        prebuilt = cr_lrp_port_name in self._ovn_standby_cr_lrps
+        if prebuilt:
+            self.stats['evpn_cr_lrp_exposed_prebuilt'] += 1
+        LOG.info("CR-LRP Port %s exposed through EVPN in %d ms (prebuilt: "
+                 "%s)", cr_lrp_port_name, latency, prebuilt)
+
+    @staticmethod
+    def _get_evpn_devices_info(evpn_devices):
+        return {
+            'lo': evpn_devices.lo_name,
+            'bridge': evpn_devices.bridge_name,
+            'vxlan': evpn_devices.vxlan_name,
+            'vrf': evpn_devices.vrf_name,
+            'veth_vrf': evpn_devices.veth_vrf,
+            'veth_ovs': evpn_devices.veth_ovs,
+            'vlan': evpn_devices.vlan_name,
+            'svi': evpn_devices.svi_name
+        }
+
+    def _prebuild_standby_cr_lrps(self):
+        '''Pre-build the EVPN devices of the standby cr-lrp ports
+
+        The devices and the FRR VRF configuration of the cr-lrp ports this
+        chassis is a backup gateway for are created in advance, so that
+        only connecting them to OVN and exposing the IPs is left when they
+        fail over to this chassis.
+        '''
+        standby_cr_lrps = {}
+        for port in self.sb_idl.get_cr_lrp_ports_standby_on_chassis(
+                self.chassis):
+            evpn_info = self.sb_idl.get_evpn_info_from_port_name(
+                port.logical_port)
+            if not evpn_info:
+                continue
+            _, provider_datapath = self.sb_idl.get_fip_associated(
+                port.logical_port)
+            if not provider_datapath:
+                continue
+            datapath_bridge, vlan_tag = self._get_bridge_for_datapath(
+                provider_datapath)
+            self._evpn_contexts.get(evpn_info['vni'],
+                                    bgp_as=evpn_info['bgp_as'])
+            evpn_devices = self._ensure_evpn_devices(
+                datapath_bridge, evpn_info['vni'], vlan_tag)
+            if not evpn_devices.vrf_name or not evpn_devices.lo_name:
+                continue
+            frr.vrf_reconfigure(evpn_info, action="add-vrf")
+            # only the VNI and devices are known until it is active
+            standby_cr_lrps[port.logical_port] = cr_lrp_store.EVPNCRLRPInfo(
+                port.datapath, provider_datapath, [], None,
+                int(evpn_info['vni']), evpn_info['bgp_as'],
+                **self._get_evpn_devices_info(evpn_devices))
+
+        # the devices are removed by _remove_extra_vrfs
+        vnis = set(self._get_table_ids()).union(
+            cr_lrp_info.vni for cr_lrp_info in standby_cr_lrps.values())
+        for cr_lrp_info in self._ovn_standby_cr_lrps.values():
+            if cr_lrp_info.vni not in vnis:
+                frr.vrf_reconfigure(
+                    {'vni': cr_lrp_info.vni,
+                     'bgp_as': cr_lrp_info.bgp_as}, action="del-vrf")
+        self._ovn_standby_cr_lrps = standby_cr_lrps
+
     @lockutils.synchronized('evpn')
     def withdraw_ip(self, row, cr_lrp=False):
         '''Withdraw BGP route through EVPN.
@@ -282,16 +393,16 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
         else:
             cr_lrp_port_name = 'cr-lrp-' + row.logical_port
 
-        cr_lrp_info = self.ovn_local_cr_lrps.get(cr_lrp_port_name, {})
+        cr_lrp_info = self.ovn_local_cr_lrps.get(cr_lrp_port_name)
         if not cr_lrp_info:
             # This means it is in a different chassis
             return
-        cr_lrp_datapath = cr_lrp_info.get('provider_datapath')
+        cr_lrp_datapath = cr_lrp_info.provider_datapath
         if not cr_lrp_datapath:
             return
 
-        ips = cr_lrp_info.get('ips')
-        evpn_vni = cr_lrp_info.get('vni')
+        ips = cr_lrp_info.ips
+        evpn_vni = cr_lrp_info.vni
         if not evpn_vni:
             LOG.debug("No EVPN information for CR-LRP Port with IPs %s. "
                       "No need to withdraw it.", ips)
@@ -306,9 +417,9 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
             self._disconnect_evpn_from_ovn(evpn_vni, datapath_bridge, ips,
                                            vlan_tag=vlan_tag)
         else:
-            cr_lrps_on_same_provider = [
-                p for p in self.ovn_local_cr_lrps.values()
-                if p['provider_datapath'] == cr_lrp_datapath]
+            cr_lrps_on_same_provider = (
+                self.ovn_local_cr_lrps.get_by_provider_datapath(
+                    cr_lrp_datapath))
             if (len(cr_lrps_on_same_provider) > 1):
                 # NOTE: no need to remove the NDP proxy if there are other
                 # cr-lrp ports on the same chassis connected to the same
@@ -318,16 +429,16 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
             else:
                 self._disconnect_evpn_from_ovn(evpn_vni, datapath_bridge, ips)
 
-        nei_dev = cr_lrp_info['vlan'] if vlan_tag else cr_lrp_info['veth_vrf']
+        nei_dev = cr_lrp_info.vlan if vlan_tag else cr_lrp_info.veth_vrf
         for ip in ips:
-            linux_net.del_ip_nei(ip, cr_lrp_info['mac'], nei_dev)
+            linux_net.del_ip_nei(ip, cr_lrp_info.mac, nei_dev)
 
         self._remove_evpn_devices(evpn_vni)
         ovs.remove_evpn_router_ovs_flows(datapath_bridge,
                                          constants.OVS_VRF_RULE_COOKIE,
-                                         cr_lrp_info.get('mac'))
+                                         cr_lrp_info.mac)
 
-        evpn_info = {'vni': evpn_vni, 'bgp_as': cr_lrp_info.get('bgp_as')}
+        evpn_info = {'vni': evpn_vni, 'bgp_as': cr_lrp_info.bgp_as}
         frr.vrf_reconfigure(evpn_info, action="del-vrf")
 
         try:
@@ -342,18 +453,18 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
             return
         port_lrp = self.sb_idl.get_lrp_port_for_datapath(row.datapath)
         if port_lrp in self.ovn_local_lrps.keys():
-            evpn_info = self.sb_idl.get_evpn_info_from_port_name(port_lrp)
-            if not evpn_info:
+            evpn_vni = self.ovn_local_lrps[port_lrp].get('vni')
+            if not evpn_vni:
                 LOG.debug("No EVPN information for LRP Port %s. "
                           "Not exposing IPs: %s.", port_lrp, ips)
                 return
             LOG.info("Add BGP route for tenant IP %s on chassis %s",
                      ips, self.chassis)
-            lo_name = constants.OVN_EVPN_LO_PREFIX + str(evpn_info['vni'])
+            context = self._evpn_contexts.get(evpn_vni)
+            lo_name = context.lo_name
             linux_net.add_ips_to_dev(
-                lo_name, ips, clear_local_route_at_table=evpn_info['vni'])
-            self._ovn_exposed_evpn_ips.setdefault(
-                lo_name, []).extend(ips)
+                lo_name, ips, clear_local_route_at_table=context.table)
+            self._track_exposed_evpn_ips(lo_name, ips)
 
     @lockutils.synchronized('evpn')
     def withdraw_remote_ip(self, ips, row):
@@ -361,15 +472,29 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
             return
         port_lrp = self.sb_idl.get_lrp_port_for_datapath(row.datapath)
         if port_lrp in self.ovn_local_lrps.keys():
-            evpn_info = self.sb_idl.get_evpn_info_from_port_name(port_lrp)
-            if not evpn_info:
+            evpn_vni = self.ovn_local_lrps[port_lrp].get('vni')
+            if not evpn_vni:
                 LOG.debug("No EVPN information for LRP Port %s. "
                           "Not withdrawing IPs: %s.", port_lrp, ips)
                 return
             LOG.info("Delete BGP route for tenant IP %s on chassis %s",
                      ips, self.chassis)
-            lo_name = constants.OVN_EVPN_LO_PREFIX + str(evpn_info['vni'])
+            lo_name = self._evpn_contexts.get(evpn_vni).lo_name
             linux_net.del_ips_from_dev(lo_name, ips)
+            self._untrack_exposed_evpn_ips(lo_name, ips)
+
+    def _track_exposed_evpn_ips(self, lo_name, ips):
+        exposed_ips = self._ovn_exposed_evpn_ips.setdefault(
+            lo_name, prefix_tree.PrefixMap())
+        for ip in ips:
+            exposed_ips[ip.split('/')[0]] = ip
+
+    def _untrack_exposed_evpn_ips(self, lo_name, ips):
+        exposed_ips = self._ovn_exposed_evpn_ips.get(lo_name)
+        if exposed_ips is None:
+            return
+        for ip in ips:
+            exposed_ips.pop(ip.split('/')[0], None)
 
     @lockutils.synchronized('evpn')
     def expose_subnet(self, row):
@@ -392,27 +517,28 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
                  self.chassis)
         self.ovn_local_lrps[lrp_logical_port] = {
             'datapath': lrp_datapath,
-            'ip': ip
+            'ip': ip,
+            'vni': int(evpn_info['vni']),
+            'bgp_as': evpn_info['bgp_as']
             }
 
-        cr_lrp_info = self.ovn_local_cr_lrps.get(cr_lrp, {})
-        cr_lrp_datapath = cr_lrp_info.get('provider_datapath')
-        if not cr_lrp_datapath:
+        cr_lrp_info = self.ovn_local_cr_lrps.get(cr_lrp)
+        if not cr_lrp_info or not cr_lrp_info.provider_datapath:
             LOG.info("Subnet not connected to the provider network. "
                      "No need to expose it through EVPN")
             return
-        if (evpn_info['bgp_as'] != cr_lrp_info.get('bgp_as') or
-                evpn_info['vni'] != cr_lrp_info.get('vni')):
+        if (evpn_info['bgp_as'] != cr_lrp_info.bgp_as or
+                evpn_info['vni'] != cr_lrp_info.vni):
             LOG.error("EVPN information at router port (vni: %s, as: %s) does"
                       " not match with information at subnet gateway port:"
-                      " %s", cr_lrp_info.get('vni'),
-                      cr_lrp_info.get('bgp_as'), evpn_info)
+                      " %s", cr_lrp_info.vni,
+                      cr_lrp_info.bgp_as, evpn_info)
             return
 
         cr_lrp_ips = [ip_address.split('/')[0]
-                      for ip_address in cr_lrp_info.get('ips', [])]
+                      for ip_address in cr_lrp_info.ips]
         datapath_bridge, vlan_tag = self._get_bridge_for_datapath(
-            cr_lrp_datapath)
+            cr_lrp_info.provider_datapath)
 
         self._expose_subnet(ip, cr_lrp_ips, cr_lrp_info, datapath_bridge,
                             vlan_tag, row.datapath)
@@ -422,24 +548,26 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
         router_interface_ip_version = linux_net.get_ip_version(
             router_interface)
         if vlan_tag:
-            dev = cr_lrp_info['vlan']
+            dev = cr_lrp_info.vlan
             dev_ovs = dev
             strip_vlan = True
         else:
-            dev = cr_lrp_info['veth_vrf']
-            dev_ovs = cr_lrp_info['veth_ovs']
+            dev = cr_lrp_info.veth_vrf
+            dev_ovs = cr_lrp_info.veth_ovs
             strip_vlan = False
 
+        ifindexes = self._evpn_contexts.get(cr_lrp_info.vni).ifindexes
         for cr_lrp_ip in cr_lrp_ips:
             if (linux_net.get_ip_version(cr_lrp_ip) ==
                     router_interface_ip_version):
                 linux_net.add_ip_route(
                     self._ovn_routing_tables_routes,
                     router_interface.split("/")[0],
-                    cr_lrp_info['vni'],
+                    cr_lrp_info.vni,
                     dev,
                     mask=router_interface.split("/")[1],
-                    via=cr_lrp_ip)
+                    via=cr_lrp_ip,
+                    oif=ifindexes.get(dev))
                 break
 
         if router_interface_ip_version == constants.IP_VERSION_6:
@@ -457,7 +585,7 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
         # the provider vlan id being used)
         ovs.ensure_evpn_ovs_flow(datapath_bridge,
                                  constants.OVS_VRF_RULE_COOKIE,
-                                 cr_lrp_info['mac'],
+                                 cr_lrp_info.mac,
                                  dev_ovs,
                                  dev,
                                  net_ip,
@@ -486,10 +614,10 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
                 port_ip_version = linux_net.get_ip_version(port_ip)
                 if port_ip_version == router_interface_ip_version:
                     linux_net.add_ips_to_dev(
-                        cr_lrp_info['lo'], [port_ip],
-                        clear_local_route_at_table=cr_lrp_info['vni'])
-                    self._ovn_exposed_evpn_ips.setdefault(
-                        cr_lrp_info['lo'], []).extend([port_ip])
+                        cr_lrp_info.lo, [port_ip],
+                        clear_local_route_at_table=cr_lrp_info.vni)
+                    self._track_exposed_evpn_ips(cr_lrp_info.lo,
+                                                 [port_ip])
 
     @lockutils.synchronized('evpn')
     def withdraw_subnet(self, row):
@@ -508,21 +636,20 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
         LOG.info("Delete IP Routes for network %s on chassis %s", ip,
                  self.chassis)
 
-        cr_lrp_info = self.ovn_local_cr_lrps.get(cr_lrp, {})
-        cr_lrp_datapath = cr_lrp_info.get('provider_datapath')
-        if not cr_lrp_datapath:
+        cr_lrp_info = self.ovn_local_cr_lrps.get(cr_lrp)
+        if not cr_lrp_info or not cr_lrp_info.provider_datapath:
             LOG.info("Subnet not connected to the provider network. "
                      "No need to withdraw it from EVPN")
             return
         cr_lrp_ips = [ip_address.split('/')[0]
-                      for ip_address in cr_lrp_info.get('ips', [])]
+                      for ip_address in cr_lrp_info.ips]
         datapath_bridge, vlan_tag = self._get_bridge_for_datapath(
-            cr_lrp_datapath)
+            cr_lrp_info.provider_datapath)
 
         if vlan_tag:
-            dev = cr_lrp_info['vlan']
+            dev = cr_lrp_info.vlan
         else:
-            dev = cr_lrp_info['veth_vrf']
+            dev = cr_lrp_info.veth_vrf
 
         ip_version = linux_net.get_ip_version(ip)
         for cr_lrp_ip in cr_lrp_ips:
@@ -530,7 +657,7 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
                 linux_net.del_ip_route(
                     self._ovn_routing_tables_routes,
                     ip.split("/")[0],
-                    cr_lrp_info['vni'],
+                    cr_lrp_info.vni,
                     dev,
                     mask=ip.split("/")[1],
                     via=cr_lrp_ip)
@@ -543,15 +670,16 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
 
         ovs.remove_evpn_network_ovs_flow(datapath_bridge,
                                          constants.OVS_VRF_RULE_COOKIE,
-                                         cr_lrp_info['mac'],
+                                         cr_lrp_info.mac,
                                          '{}'.format(net))
 
         # Check if there are VMs on the network
         # and if so withdraw the routes
-        vms_on_net = linux_net.get_exposed_ips_on_network(
-            cr_lrp_info['lo'], net)
-        linux_net.delete_exposed_ips(vms_on_net,
-                                     cr_lrp_info['lo'])
+        exposed_ips = self._ovn_exposed_evpn_ips.get(cr_lrp_info.lo)
+        if exposed_ips:
+            vms_on_net = [ip for _, ip in exposed_ips.get_within(net)]
+            linux_net.delete_exposed_ips(vms_on_net, cr_lrp_info.lo)
+            self._untrack_exposed_evpn_ips(cr_lrp_info.lo, vms_on_net)
 
         try:
             del self.ovn_local_lrps[lrp_logical_port]
@@ -571,54 +699,63 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
         - If vlan_tag, create vlan device on OVS bridge, associated to the VRF
         - If no vlan_tag, create veth pair, one end associated to the VRF
 
+        If evpn_single_vxlan is enabled, the bridge and VXLAN devices are
+        shared by all the VNIs. Instead, the VNI is mapped to a VLAN of the
+        bridge, and the VLAN device on top of the bridge (SVI) is
+        associated to the VRF.
+
         param datapath_bridge: OVS bridge to connect the vlan device
         param vni: VNI number to use for vxlan tunnel ids and vrf routing table
         param vlan_tag: vlan id to use for connectivity
 
         return: a namedtuple with the name of the devices created: vrf_name,
-        lo_name, bridge_name, vxlan_name, veth_vrf, veth_ovs, and vlan_name.
+        lo_name, bridge_name, vxlan_name, veth_vrf, veth_ovs, vlan_name and
+        svi_name.
         '''
+        context = self._evpn_contexts.get(vni)
         # ensure vrf device.
         # NOTE: It uses vni id as table number
-        vrf_name = constants.OVN_EVPN_VRF_PREFIX + str(vni)
-        linux_net.ensure_vrf(vrf_name, vni)
-
-        # ensure bridge device
-        bridge_name = constants.OVN_EVPN_BRIDGE_PREFIX + str(vni)
-        linux_net.ensure_bridge(bridge_name)
-        # connect bridge to vrf
-        linux_net.set_master_for_device(bridge_name, vrf_name)
-
-        # ensure vxlan device
-        vxlan_name = constants.OVN_EVPN_VXLAN_PREFIX + str(vni)
-
-        local_ip = CONF.evpn_local_ip
-        if not local_ip:
-            local_nic = 'lo'
-            prefixlen_filter = 32  # assuming IPv4
-            if CONF.evpn_nic:
-                local_nic = CONF.evpn_nic
-                prefixlen_filter = False
-            # NOTE(ltomasbo): assuming only 1 IP on the device with /32 prefix
-            local_ip = linux_net.get_nic_ip(local_nic, prefixlen_filter)[0]
+        vrf_name = context.vrf_name
+        linux_net.ensure_vrf(vrf_name, context.table)
 
+        # NOTE: the VXLAN local ip is cached until the address of the
+        # device changes
+        local_ip = self._evpn_contexts.get_vtep_ip()
         if not local_ip:
             LOG.error("EVPN device must have an IP associated for the "
                       "VXLAN local ip")
-            return None, None
-        linux_net.ensure_vxlan(vxlan_name, vni, local_ip,
-                               CONF.evpn_udp_dstport)
-        # connect vxlan to bridge
-        linux_net.set_master_for_device(vxlan_name, bridge_name)
+            return EVPN_INFO()
+        context.vtep_ip = local_ip
+
+        bridge_name = context.bridge_name
+        vxlan_name = context.vxlan_name
+        svi_name = None
+        if CONF.evpn_single_vxlan:
+            svi_name = self._ensure_evpn_vni_vlan(vni, vrf_name, local_ip)
+            if not svi_name:
+                return EVPN_INFO()
+        else:
+            # ensure bridge device
+            self._device_pool.take(evpn_pool.BRIDGE, bridge_name)
+            linux_net.ensure_bridge(bridge_name)
+            # connect bridge to vrf
+            linux_net.set_master_for_device(bridge_name, vrf_name)
+
+            # ensure vxlan device
+            linux_net.ensure_vxlan(vxlan_name, vni, local_ip,
+                                   CONF.evpn_udp_dstport)
+            # connect vxlan to bridge
+            linux_net.set_master_for_device(vxlan_name, bridge_name)
 
         # ensure dummy lo interface
-        lo_name = constants.OVN_EVPN_LO_PREFIX + str(vni)
+        lo_name = context.lo_name
+        self._device_pool.take(evpn_pool.DUMMY, lo_name)
         linux_net.ensure_dummy_device(lo_name)
         # connect dummy to vrf
         linux_net.set_master_for_device(lo_name, vrf_name)
 
         if vlan_tag:
-            vlan_name = constants.OVN_EVPN_VLAN_PREFIX + str(vni)
+            vlan_name = context.vlan_name
             # add vlan port to OVS bridge
             ovs.add_vlan_port_to_ovs_bridge(datapath_bridge, vlan_name,
                                             vlan_tag)
@@ -629,32 +766,88 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
             linux_net.enable_proxy_ndp(vlan_name)
 
             return EVPN_INFO(vrf_name, lo_name, bridge_name, vxlan_name, None,
-                             None, vlan_name)
+                             None, vlan_name, svi_name)
         else:
             # ensure veth-pair interfaces
-            veth_vrf = constants.OVN_EVPN_VETH_VRF_PREFIX + str(vni)
-            veth_ovs = constants.OVN_EVPN_VETH_OVS_PREFIX + str(vni)
+            veth_vrf = context.veth_vrf
+            veth_ovs = context.veth_ovs
+            self._device_pool.take(evpn_pool.VETH, veth_vrf, peer=veth_ovs)
             linux_net.ensure_veth(veth_vrf, veth_ovs)
             # connect veth to vrf
             linux_net.set_master_for_device(veth_vrf, vrf_name)
 
             return EVPN_INFO(vrf_name, lo_name, bridge_name, vxlan_name,
-                             veth_vrf, veth_ovs, None)
+                             veth_vrf, veth_ovs, None, svi_name)
+
+    def _ensure_evpn_vni_vlan(self, vni, vrf_name, local_ip):
+        '''Map the VNI to a VLAN of the single VXLAN device bridge
+
+        return: the name of the VLAN device on the bridge (SVI), associated
+        to the VRF, or None if there are no free VLANs left.
+        '''
+        bridge_name = constants.OVN_EVPN_SINGLE_BRIDGE
+        vxlan_name = constants.OVN_EVPN_SINGLE_VXLAN
+        linux_net.ensure_vlan_bridge(bridge_name)
+        linux_net.ensure_vxlan_vnifilter(vxlan_name, local_ip,
+                                         CONF.evpn_udp_dstport, bridge_name)
+
+        vlan = self._get_evpn_vlan(vni)
+        if not vlan:
+            LOG.error("No free VLAN left on bridge %s to map VNI %s",
+                      bridge_name, vni)
+            return None
+        linux_net.add_vni_vlan_mapping(vxlan_name, bridge_name, vni, vlan)
+
+        svi_name = self._evpn_contexts.get(vni).svi_name
+        linux_net.ensure_vlan_device(svi_name, bridge_name, vlan)
+        linux_net.set_master_for_device(svi_name, vrf_name)
+        return svi_name
+
+    def _get_evpn_vlans(self):
+        if self._evpn_vlans is None:
+            # recover the mappings done before the agent restart
+            self._evpn_vlans = linux_net.get_vni_vlan_mappings(
+                constants.OVN_EVPN_SINGLE_VXLAN)
+        return self._evpn_vlans
+
+    def _get_evpn_vlan(self, vni):
+        evpn_vlans = self._get_evpn_vlans()
+        vni = int(vni)
+        if vni in evpn_vlans:
+            return evpn_vlans[vni]
+        used_vlans = set(evpn_vlans.values())
+        for vlan in range(constants.EVPN_VLAN_MIN,
+                          constants.EVPN_VLAN_MAX + 1):
+            if vlan not in used_vlans:
+                evpn_vlans[vni] = vlan
+                return vlan
+        return None
+
+    def _remove_evpn_vni_vlan(self, vni):
+        vlan = self._get_evpn_vlans().pop(int(vni), None)
+        if vlan:
+            linux_net.del_vni_vlan_mapping(constants.OVN_EVPN_SINGLE_VXLAN,
+                                           constants.OVN_EVPN_SINGLE_BRIDGE,
+                                           vni, vlan)
 
     def _remove_evpn_devices(self, vni):
-        vrf_name = constants.OVN_EVPN_VRF_PREFIX + str(vni)
-        bridge_name = constants.OVN_EVPN_BRIDGE_PREFIX + str(vni)
-        vxlan_name = constants.OVN_EVPN_VXLAN_PREFIX + str(vni)
-        lo_name = constants.OVN_EVPN_LO_PREFIX + str(vni)
-        veth_name = constants.OVN_EVPN_VETH_VRF_PREFIX + str(vni)
-        vlan_name = constants.OVN_EVPN_VLAN_PREFIX + str(vni)
-
-        for device in [lo_name, vrf_name, bridge_name, vxlan_name, veth_name,
-                       vlan_name]:
+        context = self._evpn_contexts.remove(vni)
+        if context is None:
+            context = evpn_context.EVPNContext(
+                vni, single_vxlan=CONF.evpn_single_vxlan)
+
+        if CONF.evpn_single_vxlan:
+            # the bridge and the VXLAN device are shared with other VNIs
+            self._remove_evpn_vni_vlan(vni)
+        devices = context.devices
+        for device in devices:
             linux_net.delete_device(device)
+        self._ovn_exposed_evpn_ips.pop(context.lo_name, None)
+        self._device_pool.forget(devices + [context.veth_ovs])
 
     def _connect_evpn_to_ovn(self, vrf, veth_vrf, veth_ovs, ips,
                              datapath_bridge, vni, vlan, vlan_tag):
+        ifindexes = self._evpn_contexts.get(vni).ifindexes
         # NOTE(ltomasbo): vlan device is already attached to ovs bridge
         # when created
         if not vlan_tag:
@@ -662,111 +855,133 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
             ovs.add_device_to_ovs_bridge(veth_ovs, datapath_bridge)
 
         # add route for ip to ovs provider bridge (at the vrf routing table)
+        ndp_proxies = []
         for ip in ips:
             ip_without_mask = ip.split("/")[0]
             if vlan_tag:
                 # ip route add GW_PORT_IP dev VLAN_DEVICE table VRF_TABLE_ID
                 linux_net.add_ip_route(
                     self._ovn_routing_tables_routes, ip_without_mask,
-                    vni, vlan)
+                    vni, vlan, oif=ifindexes.get(vlan))
                 # add proxy ndp config for ipv6
                 if (linux_net.get_ip_version(ip_without_mask) ==
                         constants.IP_VERSION_6):
-                    linux_net.add_ndp_proxy(ip, vlan)
+                    ndp_proxies.append((ip, vlan, None))
             else:
                 linux_net.add_ip_route(
                     self._ovn_routing_tables_routes, ip_without_mask,
-                    vni, veth_vrf)
+                    vni, veth_vrf, oif=ifindexes.get(veth_vrf))
                 # add proxy ndp config for ipv6
                 if (linux_net.get_ip_version(ip_without_mask) ==
                         constants.IP_VERSION_6):
-                    linux_net.add_ndp_proxy(ip, datapath_bridge)
+                    ndp_proxies.append((ip, datapath_bridge, None))
+        linux_net.add_ndp_proxies(ndp_proxies)
 
         # add unreachable route to vrf
         linux_net.add_unreachable_route(vrf)
 
     def _disconnect_evpn_from_ovn(self, vni, datapath_bridge, ips,
                                   vlan_tag=None, cleanup_ndp_proxy=True):
+        context = self._evpn_contexts.get(vni)
         if vlan_tag:
             # remove vlan from ovs bridge
-            device = constants.OVN_EVPN_VLAN_PREFIX + str(vni)
+            device = context.vlan_name
         else:
             # remove veth from ovs bridge
-            device = constants.OVN_EVPN_VETH_OVS_PREFIX + str(vni)
+            device = context.veth_ovs
         ovs.del_device_from_ovs_bridge(device, datapath_bridge)
 
         linux_net.delete_routes_from_table(vni)
 
         if cleanup_ndp_proxy:
-            for ip in ips:
-                if linux_net.get_ip_version(ip) == constants.IP_VERSION_6:
-                    linux_net.del_ndp_proxy(ip, datapath_bridge)
-
-    def _remove_extra_vrfs(self):
-        vrfs, los, bridges, vxlans, veths, vlans = ([], [], [], [], [], [])
-        for cr_lrp_info in self.ovn_local_cr_lrps.values():
-            vrfs.append(cr_lrp_info['vrf'])
-            los.append(cr_lrp_info['lo'])
-            bridges.append(cr_lrp_info['bridge'])
-            vxlans.append(cr_lrp_info['vxlan'])
-            veths.append(cr_lrp_info['veth_vrf'])
-            vlans.append(cr_lrp_info['vlan'])
-
-        filter_out = ["{}.{}".format(key, value[0]['vlan'])
-                      for key, value in self._ovn_routing_tables_routes.items()
-                      if value[0]['vlan']]
-
-        interfaces = linux_net.get_interfaces(filter_out)
-        for interface in interfaces:
-            if (interface.startswith(constants.OVN_EVPN_VRF_PREFIX) and
-                    interface not in vrfs):
-                linux_net.delete_device(interface)
-            elif (interface.startswith(constants.OVN_EVPN_LO_PREFIX) and
-                    interface not in los):
-                linux_net.delete_device(interface)
-            elif (interface.startswith(constants.OVN_EVPN_BRIDGE_PREFIX) and
-                    (interface not in bridges and
-                     interface != constants.OVN_INTEGRATION_BRIDGE and
-                     interface not in set(self.ovn_bridge_mappings.values()))):
-                linux_net.delete_device(interface)
-            elif (interface.startswith(constants.OVN_EVPN_VXLAN_PREFIX) and
-                    interface not in vxlans):
-                linux_net.delete_device(interface)
-            elif (interface.startswith(constants.OVN_EVPN_VETH_VRF_PREFIX) and
-                    interface not in veths):
-                linux_net.delete_device(interface)
-                ovs.del_device_from_ovs_bridge(interface)
-            elif (interface.startswith(constants.OVN_EVPN_VLAN_PREFIX) and
-                    interface not in vlans):
-                ovs.del_device_from_ovs_bridge(interface)
-
-    def _remove_extra_routes(self):
-        table_ids = self._get_table_ids()
-        vrf_routes = linux_net.get_routes_on_tables(table_ids)
+            linux_net.del_ndp_proxies([
+                (ip, datapath_bridge, None) for ip in ips
+                if linux_net.get_ip_version(ip) == constants.IP_VERSION_6])
+
+    def _remove_extra_vrfs(self, links=None):
+        if links is None:
+            links, _ = linux_net.get_links_and_routes([])
+
+        # keep the devices pre-built for the standby cr-lrps too
+        keep = set()
+        for cr_lrp_info in itertools.chain(
+                self.ovn_local_cr_lrps.values(),
+                self._ovn_standby_cr_lrps.values()):
+            keep.update(cr_lrp_info.devices)
+        keep.add(constants.OVN_INTEGRATION_BRIDGE)
+        keep.update(self.ovn_bridge_mappings.values())
+        keep.update("{}.{}".format(device, route.vlan)
+                    for device, routes in
+                    self._ovn_routing_tables_routes.items()
+                    for route in routes if route.vlan)
+
+        vnis = set(self._get_table_ids()).union(
+            cr_lrp_info.vni
+            for cr_lrp_info in self._ovn_standby_cr_lrps.values())
+        for context in self._evpn_contexts.values():
+            if context.vni not in vnis:
+                self._evpn_contexts.remove(context.vni)
+        if CONF.evpn_single_vxlan:
+            # keep the shared devices, but remove the stale VNI mappings
+            keep.add(constants.OVN_EVPN_SINGLE_BRIDGE)
+            keep.add(constants.OVN_EVPN_SINGLE_VXLAN)
+            for vni in set(self._get_evpn_vlans()) - vnis:
+                self._remove_evpn_vni_vlan(vni)
+
+        devices, ovs_ports = [], []
+        for interface in set(links) - keep:
+            prefix = next((p for p in EVPN_DEVICE_KINDS
+                           if interface.startswith(p)), None)
+            if not prefix:
+                continue
+            kind = EVPN_DEVICE_KINDS[prefix]
+            if kind and links[interface]['kind'] != kind:
+                # not created by the agent
+                continue
+            if prefix == constants.OVN_EVPN_VLAN_PREFIX:
+                # OVS internal port
+                ovs_ports.append(interface)
+                continue
+            devices.append(interface)
+            if prefix == constants.OVN_EVPN_VETH_VRF_PREFIX:
+                ovs_ports.append(constants.OVN_EVPN_VETH_OVS_PREFIX +
+                                 interface[len(prefix):])
+
+        if devices:
+            LOG.debug("Removing extra EVPN devices: %s", devices)
+            linux_net.delete_devices(devices)
+            self._device_pool.forget(devices)
+        if ovs_ports:
+            ovs.del_devices_from_ovs_bridges(ovs_ports)
+
+    def _remove_extra_routes(self, links=None, routes=None):
+        table_ids = set(self._get_table_ids())
+        if links is None or routes is None:
+            links, routes = linux_net.get_links_and_routes(table_ids)
+        vrf_routes = [r for table in table_ids for r in routes.get(table, [])]
         if not vrf_routes:
             return
-        # remove from vrf_routes the routes that should be kept
+
+        # routes that should be kept, subnet routes are matched by gateway
+        # and cr-lrp ones by output interface
+        keep = set()
         for device, routes_info in self._ovn_routing_tables_routes.items():
-            for route_info in routes_info:
-                oif = linux_net.get_interface_index(device)
-                if 'gateway' in route_info['route'].keys():  # subnet route
-                    possible_matchings = [
-                        r for r in vrf_routes
-                        if (r['dst'] == route_info['route']['dst'] and
-                            r['dst_len'] == route_info['route']['dst_len'] and
-                            r['gateway'] == route_info['route']['gateway'] and
-                            r['table'] == route_info['route']['table'])]
+            oif = links.get(device, {}).get('index')
+            for route in routes_info:
+                if route.gateway:  # subnet route
+                    keep.add((route.dst, route.dst_len, route.table,
+                              'gateway', route.gateway))
                 else:  # cr-lrp
-                    possible_matchings = [
-                        r for r in vrf_routes
-                        if (r['dst'] == route_info['route']['dst'] and
-                            r['dst_len'] == route_info['route']['dst_len'] and
-                            r['oif'] == oif and
-                            r['table'] == route_info['route']['table'])]
-                for r in possible_matchings:
-                    vrf_routes.remove(r)
+                    keep.add((route.dst, route.dst_len, route.table,
+                              'oif', oif))
 
-        linux_net.delete_ip_routes(vrf_routes)
+        extra_routes = [
+            r for r in vrf_routes
+            if ((r['dst'], r['dst_len'], r['table'], 'gateway',
+                 r['gateway']) not in keep and
+                (r['dst'], r['dst_len'], r['table'], 'oif',
+                 r['oif']) not in keep)]
+        linux_net.delete_ip_routes(extra_routes)
 
     def _remove_extra_ovs_flows(self):
         cr_lrp_mac_mappings = self._get_cr_lrp_mac_mapping()
@@ -809,11 +1024,9 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
                             nw_src_mask = int(
                                 flow_info['ipv6_src'].split('/')[1])
 
-                        for route_info in self._ovn_routing_tables_routes[
-                                dev]:
-                            if (route_info['route']['dst'] == nw_src_ip and
-                                    route_info['route'][
-                                        'dst_len'] == nw_src_mask):
+                        for route in self._ovn_routing_tables_routes[dev]:
+                            if (route.dst == nw_src_ip and
+                                    route.dst_len == nw_src_mask):
                                 matching_dst = True
                         if not matching_dst:
                             ovs.del_flow(flow, bridge,
@@ -829,14 +1042,14 @@ class OVNEVPNDriver(driver_api.AgentDriverBase):
     def _get_table_ids(self):
         table_ids = []
         for cr_lrp_info in self.ovn_local_cr_lrps.values():
-            table_ids.append(cr_lrp_info['vni'])
+            table_ids.append(cr_lrp_info.vni)
         return table_ids
 
     def _get_cr_lrp_mac_mapping(self):
         mac_mappings = {}
         for cr_lrp_info in self.ovn_local_cr_lrps.values():
-            mac_mappings[cr_lrp_info['mac']] = {
-                'veth_vrf': cr_lrp_info['veth_vrf'],
-                'veth_ovs': cr_lrp_info['veth_ovs'],
-                'vlan': cr_lrp_info['vlan']}
+            mac_mappings[cr_lrp_info.mac] = {
+                'veth_vrf': cr_lrp_info.veth_vrf,
+                'veth_ovs': cr_lrp_info.veth_ovs,
+                'vlan': cr_lrp_info.vlan}
         return mac_mappings
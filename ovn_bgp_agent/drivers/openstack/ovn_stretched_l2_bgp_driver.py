@@ -28,6 +28,7 @@ from ovn_bgp_agent.drivers.openstack.utils import ovn
 from ovn_bgp_agent.drivers.openstack.utils import ovs
 from ovn_bgp_agent.drivers.openstack.watchers import bgp_watcher as watcher
 from ovn_bgp_agent.utils import linux_net
+from ovn_bgp_agent.utils import prefix_tree
 
 
 CONF = cfg.CONF
@@ -47,6 +48,8 @@ class OVNBGPStretchedL2Driver(driver_api.AgentDriverBase):
     def __init__(self):
         self.ovn_local_cr_lrps = {}
         self.vrf_routes = set()
+        # {gateway ip: set(HashedRoute)} of the vrf_routes with a gateway
+        self._vrf_routes_by_gateway = prefix_tree.PrefixMap()
         self.ovn_routing_tables_routes = collections.defaultdict()
         self.allowed_address_scopes = set(CONF.address_scopes or [])
         self.propagated_lrp_ports = {}
@@ -137,6 +140,7 @@ class OVNBGPStretchedL2Driver(driver_api.AgentDriverBase):
         self.ovn_local_cr_lrps = {}
         self.ovn_routing_tables_routes = collections.defaultdict()
         self.vrf_routes = set()
+        self._vrf_routes_by_gateway = prefix_tree.PrefixMap()
         self.propagated_lrp_ports = {}
 
         LOG.debug("Syncing current routes.")
@@ -179,6 +183,8 @@ class OVNBGPStretchedL2Driver(driver_api.AgentDriverBase):
             prefix_len=prefix_len,
             dst=dst)
         self.vrf_routes.add(r)
+        if dst:
+            self._vrf_routes_by_gateway.setdefault(dst, set()).add(r)
 
         LOG.debug("Added BGP route for Network %s/%d via %s",
                   network, prefix_len, dst)
@@ -201,6 +207,12 @@ class OVNBGPStretchedL2Driver(driver_api.AgentDriverBase):
             dst=dst)
         if r in self.vrf_routes:
             self.vrf_routes.remove(r)
+        if dst:
+            routes = self._vrf_routes_by_gateway.get(dst)
+            if routes is not None:
+                routes.discard(r)
+                if not routes:
+                    del self._vrf_routes_by_gateway[dst]
 
         LOG.debug("Deleted BGP route for Network %s/%d via %s",
                   network, prefix_len, dst)
@@ -294,8 +306,7 @@ class OVNBGPStretchedL2Driver(driver_api.AgentDriverBase):
                     dst=str(gateway_ip.ip))
 
             # Check if can delete the link-local route
-            exposed_routes = linux_net.get_exposed_routes_on_network(
-                [CONF.bgp_vrf_table_id],
+            exposed_routes = self._vrf_routes_by_gateway.get_within(
                 gateway_ip.network)
 
             if not exposed_routes:
@@ -457,10 +468,8 @@ class OVNBGPStretchedL2Driver(driver_api.AgentDriverBase):
             # a tenant network
             if ips_to_delete:
                 # Check if can delete the link-local route
-                exposed_routes = linux_net.get_exposed_routes_on_network(
-                    [CONF.bgp_vrf_table_id],
-                    gateway_ip.network
-                )
+                exposed_routes = self._vrf_routes_by_gateway.get_within(
+                    gateway_ip.network)
 
                 if not exposed_routes:
                     self._del_route(
@@ -0,0 +1,96 @@
+# Copyright 2022 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import ipaddress
+
+from oslo_log import log as logging
+
+from ovn_bgp_agent.utils import prefix_tree
+
+LOG = logging.getLogger(__name__)
+
+
+def _get_split_prefixes(address, prefix):
+    # Return the prefixes resulting of removing address from prefix, i.e.,
+    # the sibling of each prefix in the path from prefix down to address
+    max_prefixlen = address.max_prefixlen
+    value = int(address)
+    split = []
+    for prefixlen in range(prefix.prefixlen + 1, max_prefixlen + 1):
+        shift = max_prefixlen - prefixlen
+        sibling = ((value >> shift) ^ 1) << shift
+        split.append(ipaddress.ip_network(
+            (address.__class__(sibling), prefixlen)))
+    return split
+
+
+class RouteAggregator(object):
+    """Keeps track of the minimal set of prefixes covering the exposed IPs
+
+    The exposed IPs are stored in a radix tree. Every time an IP is added or
+    removed, only the prefix containing it is recalculated and the changes
+    to apply on the advertised routes are returned, so that fully exposed
+    blocks are advertised as a single route and split back into more
+    specific routes when some of their IPs are withdrawn.
+    """
+
+    def __init__(self):
+        self._exposed_ips = prefix_tree.PrefixTree()
+
+    def __contains__(self, ip):
+        return ip in self._exposed_ips
+
+    def __len__(self):
+        return len(self._exposed_ips)
+
+    def add(self, ip):
+        """Add an exposed IP.
+
+        :returns: a tuple with the lists of prefixes to advertise and to
+                  withdraw, in that order.
+        """
+        address = ipaddress.ip_address(ip)
+        if not self._exposed_ips.add(address):
+            return [], []
+        prefix = self._exposed_ips.get_full_prefix(address)
+        if prefix.prefixlen != address.max_prefixlen:
+            LOG.debug("IP %s completes prefix %s, aggregating its routes",
+                      ip, prefix)
+        return [str(prefix)], [
+            str(p) for p in _get_split_prefixes(address, prefix)]
+
+    def remove(self, ip):
+        """Remove an exposed IP.
+
+        :returns: a tuple with the lists of prefixes to advertise and to
+                  withdraw, in that order.
+        """
+        address = ipaddress.ip_address(ip)
+        prefix = self._exposed_ips.get_full_prefix(address)
+        if prefix is None:
+            return [], []
+        self._exposed_ips.remove(address)
+        if prefix.prefixlen != address.max_prefixlen:
+            LOG.debug("IP %s removed from prefix %s, splitting its route",
+                      ip, prefix)
+        return [str(p) for p in _get_split_prefixes(address, prefix)], [
+            str(prefix)]
+
+    def get_ips_on_network(self, network):
+        return [str(ip) for ip in
+                self._exposed_ips.get_addresses_on_network(network)]
+
+    def get_prefixes(self):
+        """Return the prefixes that need to be advertised."""
+        return set(str(p) for p in self._exposed_ips.get_full_prefixes())
@@ -0,0 +1,193 @@
+# Copyright 2022 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+
+
+class CRLRPInfo(object):
+    """Information of a cr-lrp (router gateway port) exposed on the chassis
+
+    The subnets and load balancers of the cr-lrp are to be updated through
+    the CRLRPStore holding it, so that its reverse indexes are kept in sync.
+    """
+
+    __slots__ = ('router_datapath', 'provider_datapath', 'ips', 'mac',
+                 'bridge_device', 'bridge_vlan', 'subnets_datapath',
+                 'subnets_cidr', 'ovn_lbs')
+
+    def __init__(self, router_datapath, provider_datapath, ips, mac,
+                 bridge_device=None, bridge_vlan=None):
+        self.router_datapath = router_datapath
+        self.provider_datapath = provider_datapath
+        self.ips = ips
+        self.mac = mac
+        self.bridge_device = bridge_device
+        self.bridge_vlan = bridge_vlan
+        # {lrp: subnet datapath} of the router interfaces
+        self.subnets_datapath = {}
+        self.subnets_cidr = []
+        self.ovn_lbs = set()
+
+    def __repr__(self):
+        return "<{} router_datapath={} provider_datapath={} ips={}>".format(
+            self.__class__.__name__, self.router_datapath,
+            self.provider_datapath, self.ips)
+
+
+class EVPNCRLRPInfo(CRLRPInfo):
+    """CRLRPInfo with the EVPN information and devices of the cr-lrp"""
+
+    __slots__ = ('vni', 'bgp_as', 'vrf', 'lo', 'bridge', 'vxlan', 'veth_vrf',
+                 'veth_ovs', 'vlan', 'svi')
+
+    def __init__(self, router_datapath, provider_datapath, ips, mac, vni,
+                 bgp_as, vrf=None, lo=None, bridge=None, vxlan=None,
+                 veth_vrf=None, veth_ovs=None, vlan=None, svi=None):
+        super(EVPNCRLRPInfo, self).__init__(router_datapath,
+                                            provider_datapath, ips, mac)
+        self.vni = vni
+        self.bgp_as = bgp_as
+        self.vrf = vrf
+        self.lo = lo
+        self.bridge = bridge
+        self.vxlan = vxlan
+        self.veth_vrf = veth_vrf
+        self.veth_ovs = veth_ovs
+        self.vlan = vlan
+        self.svi = svi
+
+    @property
+    def devices(self):
+        return [self.vrf, self.lo, self.bridge, self.vxlan, self.veth_vrf,
+                self.vlan, self.svi]
+
+
+class CRLRPStore(object):
+    """The cr-lrps exposed on the chassis, by name
+
+    Besides the cr-lrps, the store keeps the reverse indexes to get the
+    cr-lrps by provider datapath, subnet datapath and load balancer without
+    going through all of them.
+    """
+
+    def __init__(self):
+        # {cr-lrp name: CRLRPInfo}
+        self._cr_lrps = {}
+        # {provider datapath: set(cr-lrp names)}
+        self._by_provider_datapath = collections.defaultdict(set)
+        # {subnet datapath: set(cr-lrp names)}
+        self._by_subnet_datapath = collections.defaultdict(set)
+        # {load balancer name: cr-lrp name}
+        self._by_ovn_lb = {}
+
+    def __len__(self):
+        return len(self._cr_lrps)
+
+    def __contains__(self, name):
+        return name in self._cr_lrps
+
+    def __iter__(self):
+        return iter(self._cr_lrps)
+
+    def __getitem__(self, name):
+        return self._cr_lrps[name]
+
+    def __setitem__(self, name, cr_lrp_info):
+        if name in self._cr_lrps:
+            self._unindex(name, self._cr_lrps[name])
+        self._cr_lrps[name] = cr_lrp_info
+        self._by_provider_datapath[cr_lrp_info.provider_datapath].add(name)
+        for subnet_datapath in cr_lrp_info.subnets_datapath.values():
+            self._by_subnet_datapath[subnet_datapath].add(name)
+        for ovn_lb in cr_lrp_info.ovn_lbs:
+            self._by_ovn_lb[ovn_lb] = name
+
+    def __delitem__(self, name):
+        self._unindex(name, self._cr_lrps.pop(name))
+
+    def get(self, name, default=None):
+        return self._cr_lrps.get(name, default)
+
+    def pop(self, name, *default):
+        if name not in self._cr_lrps and default:
+            return default[0]
+        cr_lrp_info = self._cr_lrps[name]
+        del self[name]
+        return cr_lrp_info
+
+    def keys(self):
+        return self._cr_lrps.keys()
+
+    def values(self):
+        return self._cr_lrps.values()
+
+    def items(self):
+        return self._cr_lrps.items()
+
+    @staticmethod
+    def _discard(index, key, name):
+        names = index.get(key)
+        if names is None:
+            return
+        names.discard(name)
+        if not names:
+            del index[key]
+
+    def _unindex(self, name, cr_lrp_info):
+        self._discard(self._by_provider_datapath,
+                      cr_lrp_info.provider_datapath, name)
+        for subnet_datapath in cr_lrp_info.subnets_datapath.values():
+            self._discard(self._by_subnet_datapath, subnet_datapath, name)
+        for ovn_lb in cr_lrp_info.ovn_lbs:
+            if self._by_ovn_lb.get(ovn_lb) == name:
+                del self._by_ovn_lb[ovn_lb]
+
+    def add_subnet(self, name, lrp, subnet_datapath, cidr):
+        cr_lrp_info = self._cr_lrps[name]
+        previous = cr_lrp_info.subnets_datapath.get(lrp)
+        if previous is not None and previous != subnet_datapath:
+            self.remove_subnet(name, lrp)
+        cr_lrp_info.subnets_datapath[lrp] = subnet_datapath
+        cr_lrp_info.subnets_cidr.append(cidr)
+        self._by_subnet_datapath[subnet_datapath].add(name)
+
+    def remove_subnet(self, name, lrp):
+        cr_lrp_info = self._cr_lrps[name]
+        subnet_datapath = cr_lrp_info.subnets_datapath.pop(lrp, None)
+        if subnet_datapath is None:
+            return
+        if subnet_datapath not in cr_lrp_info.subnets_datapath.values():
+            self._discard(self._by_subnet_datapath, subnet_datapath, name)
+
+    def add_ovn_lb(self, name, ovn_lb):
+        self._cr_lrps[name].ovn_lbs.add(ovn_lb)
+        self._by_ovn_lb[ovn_lb] = name
+
+    def remove_ovn_lb(self, name, ovn_lb):
+        self._cr_lrps[name].ovn_lbs.discard(ovn_lb)
+        if self._by_ovn_lb.get(ovn_lb) == name:
+            del self._by_ovn_lb[ovn_lb]
+
+    def get_by_provider_datapath(self, provider_datapath):
+        """Return the names of the cr-lrps on the provider datapath"""
+        return frozenset(self._by_provider_datapath.get(provider_datapath,
+                                                        ()))
+
+    def get_by_subnet_datapath(self, subnet_datapath):
+        """Return the names of the cr-lrps connected to the subnet"""
+        return frozenset(self._by_subnet_datapath.get(subnet_datapath, ()))
+
+    def get_by_ovn_lb(self, ovn_lb):
+        """Return the name of the cr-lrp exposing the load balancer"""
+        return self._by_ovn_lb.get(ovn_lb)
@@ -0,0 +1,140 @@
+# Copyright 2022 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import math
+import time
+
+from neutron_lib._i18n import _
+from oslo_config import cfg
+from oslo_log import log as logging
+
+CONF = cfg.CONF
+LOG = logging.getLogger(__name__)
+
+
+class _Penalty(object):
+    __slots__ = ('value', 'updated_at', 'suppressed')
+
+    def __init__(self, now):
+        self.value = 0.0
+        self.updated_at = now
+        self.suppressed = False
+
+
+class RouteDampening(object):
+    """Route flap dampening, as described in RFC 2439.
+
+    Each flap of a route adds a penalty to it, which decays exponentially
+    with the given half life. Once the penalty exceeds the suppress
+    threshold the route is suppressed, and its changes must be held until
+    the penalty decays below the reuse threshold. The penalty is capped so
+    that a route is not suppressed for longer than max_suppress_time.
+    """
+
+    def __init__(self, half_life, penalty, suppress_threshold,
+                 reuse_threshold, max_suppress_time, stats=None,
+                 clock=time.monotonic):
+        if reuse_threshold >= suppress_threshold:
+            raise ValueError(_("The dampening reuse threshold (%(reuse)s) "
+                               "must be lower than the suppress threshold "
+                               "(%(suppress)s)") %
+                             {'reuse': reuse_threshold,
+                              'suppress': suppress_threshold})
+        self.penalty = penalty
+        self.suppress_threshold = suppress_threshold
+        self.reuse_threshold = reuse_threshold
+        self.max_penalty = reuse_threshold * 2 ** (
+            max_suppress_time / half_life)
+        self.stats = stats if stats is not None else collections.Counter()
+        self._decay_rate = math.log(2) / half_life
+        self._clock = clock
+        self._penalties = {}
+
+    @classmethod
+    def from_config(cls, stats=None):
+        return cls(CONF.fpm_dampening_half_life,
+                   CONF.fpm_dampening_penalty,
+                   CONF.fpm_dampening_suppress_threshold,
+                   CONF.fpm_dampening_reuse_threshold,
+                   CONF.fpm_dampening_max_suppress_time,
+                   stats=stats)
+
+    def __len__(self):
+        return len(self._penalties)
+
+    @property
+    def suppressed(self):
+        return [key for key, penalty in self._penalties.items()
+                if penalty.suppressed]
+
+    def _decay(self, penalty, now):
+        penalty.value *= math.exp(
+            -self._decay_rate * (now - penalty.updated_at))
+        penalty.updated_at = now
+
+    def flap(self, key, weight=1.0):
+        """Penalize a route change.
+
+        :param weight: fraction of the penalty to add, e.g., RFC 2439
+                       recommends a lower penalty for attribute changes
+                       than for withdrawals.
+        :returns: True if the route is suppressed.
+        """
+        now = self._clock()
+        penalty = self._penalties.get(key)
+        if penalty is None:
+            penalty = self._penalties[key] = _Penalty(now)
+        else:
+            self._decay(penalty, now)
+        penalty.value = min(penalty.value + self.penalty * weight,
+                            self.max_penalty)
+        self.stats['fpm_dampening_flaps'] += 1
+        if not penalty.suppressed and penalty.value > self.suppress_threshold:
+            LOG.info("Route %s is flapping, suppressing its changes (penalty "
+                     "%d)", key, penalty.value)
+            penalty.suppressed = True
+            self.stats['fpm_dampening_suppressions'] += 1
+            self.stats['fpm_dampening_suppressed'] += 1
+        return penalty.suppressed
+
+    def is_suppressed(self, key):
+        penalty = self._penalties.get(key)
+        return penalty is not None and penalty.suppressed
+
+    def get_reusable(self):
+        """Return the suppressed routes that can be used again.
+
+        The routes are no longer suppressed after this call. The penalties
+        that decayed enough are also forgotten.
+        """
+        now = self._clock()
+        reusable = []
+        for key, penalty in list(self._penalties.items()):
+            self._decay(penalty, now)
+            if penalty.suppressed and penalty.value < self.reuse_threshold:
+                LOG.info("Route %s is stable again (penalty %d), reusing it",
+                         key, penalty.value)
+                penalty.suppressed = False
+                self.stats['fpm_dampening_suppressed'] -= 1
+                self.stats['fpm_dampening_reused'] += 1
+                reusable.append(key)
+            if not penalty.suppressed and (
+                    penalty.value < self.reuse_threshold / 2):
+                del self._penalties[key]
+        return reusable
+
+    def clear(self):
+        self.stats['fpm_dampening_suppressed'] -= len(self.suppressed)
+        self._penalties.clear()
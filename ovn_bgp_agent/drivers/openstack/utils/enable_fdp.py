@@ -1,121 +1,892 @@
-import os
+# Copyright 2022 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import collections
 import socket
 import struct
-import sys
-import asyncore
-import pyroute2
-import netifaces
+import threading
+import time
 
-from enum import IntEnum
+from neutron_lib._i18n import _
+from oslo_config import cfg
 from oslo_log import log as logging
 from pyroute2 import IPRoute
-from pyroute2.netlink.rtnl.rtmsg import rtmsg
-from pyroute2.netlink.rtnl import (RTM_NEWROUTE as RTNL_NEWROUTE,
-                                   RTM_DELROUTE as RTNL_DELROUTE)
-from pyroute2.netlink.rtnl import rt_proto as proto
+from pyroute2.netlink.rtnl.ifaddrmsg import IFA_F_SECONDARY
+from pyroute2.netlink.rtnl import RTMGRP_IPV4_IFADDR
+from pyroute2.netlink.rtnl import RTMGRP_IPV6_IFADDR
+from pyroute2.netlink.rtnl import RTMGRP_LINK
 
-RTPROT_BGP = 186
+from ovn_bgp_agent.drivers.openstack.utils import dampening
+from ovn_bgp_agent.drivers.openstack.utils import fpm
+from ovn_bgp_agent import exceptions
+
+CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
+
 # To enable FPM module with netlink, the following option in
 # /etc/frr/daemons needs to be added for zebra
 # zebra_options="  -A 127.0.0.1 -s 90000000  -M fpm:netlink"
+FPM_ADDRESS = '127.0.0.1'
+FPM_PORT = 2620
+
+RTPROT_BGP = 186
+
+ROUTING_PROTO_BGP = 'bgp'
+# external_ids key identifying the agent that added a route, so that each
+# agent only reconciles its own routes when several share the NB DB
+ROUTE_OWNER_EXT_ID_KEY = 'ovn-bgp-agent:owner'
+
+ROUTE_ADD = 'add'
+ROUTE_DEL = 'del'
+
+# FPM frame header: version (1 byte), message type (1 byte) and the total
+# length of the frame, header included (2 bytes), in network order
+FPM_HEADER = struct.Struct('!BBH')
+FPM_PROTO_VERSION = 1
+FPM_MSG_TYPE_NETLINK = 1
+FPM_MSG_TYPE_PROTOBUF = 2
+
+# how often (in seconds) the suppressed routes are checked for reuse
+DAMPENING_REUSE_INTERVAL = 10
+
+
+def get_table_lrouters():
+    """Return the Logical Router of each kernel table id, if mapped"""
+    table_lrouters = {}
+    for table, lrouter in CONF.fpm_table_lrouters.items():
+        try:
+            table_lrouters[int(table)] = lrouter
+        except ValueError:
+            raise ValueError(_("Invalid kernel table id %s in "
+                               "fpm_table_lrouters") % table)
+    return table_lrouters
+
+
+def get_lrouters():
+    """Return the Logical Routers where the FPM routes are added"""
+    return set(get_table_lrouters().values()) | {CONF.fpm_default_lrouter}
+
+
+def get_owner_external_ids(owner):
+    """Return the external_ids tagging the routes added by owner"""
+    return {ROUTE_OWNER_EXT_ID_KEY: owner}
+
+
+def _get_primary_address(family, ifindex):
+    with IPRoute() as ipr:
+        addresses = ipr.get_addr(family=family, index=ifindex)
+    for address in addresses:
+        if not address['flags'] & IFA_F_SECONDARY:
+            return address.get_attr('IFA_ADDRESS')
+    return None
+
+
+class InterfaceAddressCache(object):
+    """Primary address of the interfaces, by family and ifindex
+
+    The address of an interface is dumped from the kernel the first time
+    it is needed and then served from memory. The entries are invalidated
+    by the RTM_NEWADDR, RTM_DELADDR and RTM_DELLINK notifications received
+    by the monitor thread, so nothing is cached while it is not running.
+    """
+
+    def __init__(self):
+        # (family, ifindex) -> address
+        self._addresses = {}
+        self._lock = threading.Lock()
+        # increased on every invalidation, to not cache a dump that raced
+        # with a notification
+        self._generation = 0
+        self._monitor = None
+        self._thread = None
+        self._started = threading.Event()
+        self._stopping = False
+
+    def start(self):
+        self._stopping = False
+        self._started.clear()
+        self._thread = threading.Thread(target=self._monitor_addresses,
+                                        name='fpm-address-monitor',
+                                        daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+    def stop(self, timeout=None):
+        self._stopping = True
+        monitor = self._monitor
+        if monitor is not None:
+            # unblocks the monitor thread
+            monitor.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _monitor_addresses(self):
+        try:
+            ipr = IPRoute()
+            ipr.bind(groups=(RTMGRP_IPV4_IFADDR | RTMGRP_IPV6_IFADDR |
+                             RTMGRP_LINK))
+            self._monitor = ipr
+            self._started.set()
+            while not self._stopping:
+                for msg in ipr.get():
+                    self.handle_notification(msg)
+        except OSError:
+            if not self._stopping:
+                LOG.exception("Interface address monitor failed, the FPM "
+                              "interface addresses will not be cached")
+        finally:
+            with self._lock:
+                self._monitor = None
+                self._generation += 1
+                self._addresses.clear()
+            self._started.set()
 
-class FpmServerConnect(asyncore.dispatcher):
-    def __init__(self, FPM_PORT, nb_idl):
-        asyncore.dispatcher.__init__(self)
-        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.set_reuse_addr()
-        self.bind(('localhost', FPM_PORT))
-        self.listen(1)
+    def handle_notification(self, msg):
+        event = msg.get('event')
+        if event in ('RTM_NEWADDR', 'RTM_DELADDR'):
+            keys = [(msg['family'], msg['index'])]
+        elif event == 'RTM_DELLINK':
+            keys = [(family, msg['index'])
+                    for family in (socket.AF_INET, socket.AF_INET6)]
+        else:
+            return
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._addresses.pop(key, None)
+
+    def get(self, family, ifindex):
+        key = (family, ifindex)
+        with self._lock:
+            try:
+                return self._addresses[key]
+            except KeyError:
+                generation = self._generation
+        address = _get_primary_address(family, ifindex)
+        with self._lock:
+            if (self._monitor is not None and
+                    generation == self._generation):
+                self._addresses[key] = address
+        return address
+
+
+def _get_route_external_ids(proto, owner=None):
+    external_ids = {'routing_proto': proto}
+    if owner:
+        external_ids.update(get_owner_external_ids(owner))
+    return external_ids
+
+
+def commit_routes(nb_idl, lrouter_name, pending, owner=None):
+    """Commit a batch of route changes in a single NB transaction
+
+    :param owner: if given, the routes added are tagged with it.
+    :returns: True if the transaction succeeded.
+    """
+    routes_to_add = []
+    routes_to_del = []
+    for (dst, next_hop), (operation, prefix_len, proto) in pending.items():
+        if operation == ROUTE_ADD:
+            routes_to_add.append({
+                'ip_prefix': dst, 'nexthop': next_hop,
+                'external_ids': _get_route_external_ids(proto, owner)})
+        else:
+            routes_to_del.append((dst, next_hop))
+    try:
+        with nb_idl.transaction(check_error=True) as txn:
+            if routes_to_add:
+                txn.add(nb_idl.add_static_routes(lrouter_name,
+                                                 routes_to_add))
+            if routes_to_del:
+                txn.add(nb_idl.delete_static_routes(
+                    lrouter_name, routes_to_del, if_exists=True))
+    except Exception:
+        LOG.exception("Failed to commit %s route changes of the Logical "
+                      "Router %s to the OVN NB DB", len(pending), lrouter_name)
+        return False
+    LOG.info("Committed route changes of the Logical Router %s to the OVN NB "
+             "DB: %s added, %s deleted", lrouter_name, len(routes_to_add),
+             len(routes_to_del))
+    return True
+
+
+class CommitWorker(object):
+    """Commits the route changes to the OVN NB DB out of the FPM reader
+
+    The batches of route changes are queued by put(), which only blocks
+    while max_queued batches of the same Logical Router are waiting. Each
+    router has its own queue, committed in order by its own thread, so a
+    router with many changes does not delay the commits of the others.
+    ovsdbapp runs the transactions of a connection one at a time, so this
+    does not make the NB commits faster, but the FPM socket keeps being
+    read while they are in progress.
+    """
+
+    def __init__(self, nb_idl, max_queued=None, stats=None, owner=None):
         self.nb_idl = nb_idl
+        self.owner = owner
+        self.max_queued = max_queued or CONF.fpm_nb_commit_queue_size
+        self.stats = stats if stats is not None else collections.Counter()
+        # lrouter -> (pending, on_failure) of the batches waiting to be
+        # committed
+        self._queues = {}
+        # lrouters with a batch being committed
+        self._committing = set()
+        self._cond = threading.Condition()
+        self._threads = {}
+        self._running = False
+        self._stopping = False
+
+    def start(self):
+        with self._cond:
+            self._running = True
+            self._stopping = False
+            for lrouter in self._queues:
+                self._start_thread(lrouter)
+
+    def _start_thread(self, lrouter):
+        thread = threading.Thread(target=self._run, args=(lrouter,),
+                                  daemon=True,
+                                  name='fpm-nb-commit-%s' % lrouter)
+        self._threads[lrouter] = thread
+        thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the threads once the queued batches are committed"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            threads = list(self._threads.values())
+        for thread in threads:
+            thread.join(timeout)
+        with self._cond:
+            self._running = False
+            self._threads = {}
+
+    def put(self, lrouter, pending, on_failure=None):
+        """Queue a batch of route changes to be committed
+
+        :param on_failure: called with lrouter and pending if the
+                           transaction fails.
+        """
+        with self._cond:
+            queue = self._queues.get(lrouter)
+            if queue is None:
+                queue = self._queues[lrouter] = collections.deque()
+                if self._running:
+                    self._start_thread(lrouter)
+            if len(queue) >= self.max_queued:
+                self.stats['fpm_nb_commit_queue_full'] += 1
+                LOG.debug("The OVN NB commit queue of the Logical Router %s "
+                          "is full, waiting", lrouter)
+                while len(queue) >= self.max_queued:
+                    self._cond.wait()
+            queue.append((pending, on_failure))
+            self._update_queue_depth()
+            self._cond.notify_all()
+
+    def wait(self, timeout=None):
+        """Wait until all the queued batches are committed"""
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not self._committing and not any(
+                    self._queues.values()), timeout)
+
+    def _update_queue_depth(self):
+        self.stats['fpm_nb_commit_queue_depth'] = sum(
+            len(queue) for queue in self._queues.values())
+
+    def _run(self, lrouter):
+        queue = self._queues[lrouter]
+        while True:
+            with self._cond:
+                while not queue:
+                    if self._stopping:
+                        return
+                    self._cond.wait()
+                pending, on_failure = queue.popleft()
+                self._committing.add(lrouter)
+                self._update_queue_depth()
+                self._cond.notify_all()
+            start = time.monotonic()
+            if (not commit_routes(self.nb_idl, lrouter, pending,
+                                  owner=self.owner) and
+                    on_failure is not None):
+                on_failure(lrouter, pending)
+            latency = int((time.monotonic() - start) * 1000)
+            with self._cond:
+                self._committing.discard(lrouter)
+                self.stats['fpm_nb_commits'] += 1
+                self.stats['fpm_nb_commit_time_ms'] += latency
+                self.stats['fpm_nb_commit_latency_ms'] = latency
+                self._cond.notify_all()
+
+
+class UpdateRoutes(object):
+    """Applies the routes received from zebra to the OVN NB DB
+
+    The routes are added to the Logical Router their kernel table is
+    mapped to by table_lrouters, or to fpm_default_lrouter. The route
+    changes of each router are accumulated and committed in a single NB
+    transaction by flush(), either when the owner decides to (e.g., after
+    some time) or when max_pending changes are waiting for that router.
+    Only the last change received for a route is kept, so a route added
+    and then deleted (or viceversa) before a flush results in a single
+    operation.
 
-    def handle_accept(self):
-        pair = self.accept()
-        if pair is not None:
-            conn, client_addr = pair
-            UpdateRoutes(conn, self.nb_idl)
+    While replaying, the routes received are only collected, and then
+    reconcile() applies the differences with the NB DB at once.
 
-class UpdateRoutes(asyncore.dispatcher):
-    def __init__(self, conn, nb_idl):
-        asyncore.dispatcher.__init__(self, conn)
+    If a RouteDampening is given, the routes that flap are suppressed: their
+    changes are not applied until reuse_routes() finds them stable again.
+
+    If a CommitWorker is given, the batches are handed over to it instead
+    of being committed by the caller of flush().
+    """
+
+    def __init__(self, nb_idl, max_pending=None, address_cache=None,
+                 generation=0, stats=None, dampening=None,
+                 table_lrouters=None, commit_worker=None, owner=None):
         self.nb_idl = nb_idl
         self.proto = 'static'
+        self.address_cache = address_cache or InterfaceAddressCache()
+        self.max_pending = max_pending or CONF.fpm_nb_batch_size
+        # identifies the zebra connection the routes are received from
+        self.generation = generation
+        self.stats = stats if stats is not None else collections.Counter()
+        self.replaying = False
+        self.dampening = dampening
+        self.commit_worker = commit_worker
+        # tags the routes added, e.g., with the chassis name
+        self.owner = owner
+        self.default_lrouter = CONF.fpm_default_lrouter
+        self.table_lrouters = (table_lrouters if table_lrouters is not None
+                               else get_table_lrouters())
+        # (lrouter, dst, prefix_len) -> next hops of the BGP routes received
+        self._routes = {}
+        # (lrouter, dst, prefix_len) -> next hops applied to the NB DB,
+        # which differ from the received ones while the route is suppressed
+        self._applied = {}
+        self._routes_lock = threading.Lock()
+        # lrouter -> {(dst, next_hop) -> (operation, prefix_len, proto)}
+        self._pending = {}
+        # (lrouter, pending) of the batches that failed to be committed,
+        # rolled back from _applied by the next update
+        self._failed = []
+        self._failed_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        # lrouter -> lock keeping the batches of the router in order
+        self._flush_locks = {}
+
+    @property
+    def pending(self):
+        with self._pending_lock:
+            return sum(len(pending) for pending in self._pending.values())
+
+    def get_lrouter(self, table):
+        return self.table_lrouters.get(table, self.default_lrouter)
+
+    def add_route_NBDB(self, dst, prefix_len, next_hop, lrouter=None):
+        LOG.debug("Queuing route addition: dst=%s/%s, next_hop=%s", dst,
+                  prefix_len, next_hop)
+        self._queue_route(lrouter or self.default_lrouter, dst, next_hop,
+                          ROUTE_ADD, prefix_len)
+
+    def del_route_NBDB(self, dst, prefix_len=0, next_hop='', lrouter=None):
+        LOG.debug("Queuing route deletion: dst=%s/%s, next_hop=%s", dst,
+                  prefix_len, next_hop)
+        self._queue_route(lrouter or self.default_lrouter, dst, next_hop,
+                          ROUTE_DEL, prefix_len)
+
+    def _queue_route(self, lrouter, dst, next_hop, operation, prefix_len):
+        key = (dst, next_hop)
+        with self._pending_lock:
+            pending = self._pending.setdefault(lrouter, {})
+            # re-insert to keep the changes in arrival order
+            pending.pop(key, None)
+            pending[key] = (operation, prefix_len, self.proto)
+            full = len(pending) >= self.max_pending
+        if full:
+            self.flush(lrouter)
+
+    def flush(self, lrouter=None):
+        """Commit the pending route changes of each Logical Router
+
+        The changes of each router are committed in a single NB
+        transaction. If lrouter is given, only its changes are committed.
+        """
+        with self._pending_lock:
+            lrouters = list(self._pending) if lrouter is None else [lrouter]
+        for lrouter_name in lrouters:
+            with self._get_flush_lock(lrouter_name):
+                with self._pending_lock:
+                    pending = self._pending.pop(lrouter_name, None)
+                if pending:
+                    self._submit(lrouter_name, pending)
+
+    def _get_flush_lock(self, lrouter):
+        with self._pending_lock:
+            return self._flush_locks.setdefault(lrouter, threading.Lock())
+
+    def _submit(self, lrouter_name, pending):
+        if self.commit_worker is not None:
+            self.commit_worker.put(lrouter_name, pending,
+                                   on_failure=self._commit_failed)
+        elif not commit_routes(self.nb_idl, lrouter_name, pending,
+                               owner=self.owner):
+            self._commit_failed(lrouter_name, pending)
+
+    def _commit_failed(self, lrouter_name, pending):
+        # NOTE: this can run while the routes lock is held, e.g., when
+        # flushing a full queue, so the rollback is deferred
+        self.stats['fpm_nb_commit_failures'] += 1
+        with self._failed_lock:
+            self._failed.append((lrouter_name, pending))
 
-    def add_route_NBDB(self, dst, prefix_len, next_hop):
-        # TODO(spk): What if there is a route to be added/deleted
-        # with dst and prefix_len same as a route which is
-        # already added/deleted but next hop is different, use --ecmp
-        columns = {'external_ids': {'routing_proto': self.proto}}
-        lrouter_name = 'lr0'
-        with self.nb_idl.transaction(check_error=True) as txn:
-            LOG.info(f"Adding route: dst={dst}/{prefix_len}, next_hop={next_hop}")
-            txn.add(self.nb_idl.add_static_route(lrouter_name,
-                ip_prefix=dst, nexthop=next_hop, **columns))
-
-    def del_route_NBDB(self, dst, prefix_len=0, next_hop=''):
-        lrouter_name = 'lr0'
-        with self.nb_idl.transaction(check_error=True) as txn:
-            LOG.info(f"Deleting route: dst={dst}/{prefix_len} next_hop={next_hop}")
-            txn.add(self.nb_idl.delete_static_route(lrouter_name,
-                ip_prefix=dst, nexthop=next_hop, if_exists=True))
+    def _rollback_failed(self):
+        """Forget the route changes that failed to be committed
+
+        The next hops of the failed changes are rolled back on _applied and
+        applied again, so that they are retried with the current state of
+        the routes.
+        """
+        with self._failed_lock:
+            failed, self._failed = self._failed, []
+        keys = set()
+        for lrouter, pending in failed:
+            for (dst, next_hop), (operation, prefix_len,
+                                  _proto) in pending.items():
+                if prefix_len is None:
+                    # a stale route found by reconcile(), not tracked
+                    continue
+                key = (lrouter, dst, prefix_len)
+                applied_next_hops = self._applied.pop(key, set())
+                if operation == ROUTE_ADD:
+                    applied_next_hops = applied_next_hops - {next_hop}
+                else:
+                    applied_next_hops = applied_next_hops | {next_hop}
+                if applied_next_hops:
+                    self._applied[key] = applied_next_hops
+                keys.add(key)
+        if self.replaying:
+            return
+        for key in keys:
+            self._apply_route(key, add=not (
+                self.dampening is not None and
+                self.dampening.is_suppressed(key)))
+
+    def start_replay(self):
+        with self._routes_lock:
+            self.replaying = True
+
+    def end_replay(self):
+        with self._routes_lock:
+            self.replaying = False
+
+    def reconcile(self):
+        """Apply the replayed routing table to the NB DB
+
+        The BGP routes on the NB DB added by this owner are compared with
+        the ones replayed by zebra, and only the differences are committed,
+        in a single transaction per Logical Router, removing the routes
+        withdrawn while zebra was not connected.
+        """
+        if self.commit_worker is not None:
+            # the changes of the previous connections must be on the NB DB
+            # before it is compared with the replayed routes
+            self.commit_worker.wait()
+        with self._routes_lock:
+            self.replaying = False
+            # the failed changes are superseded by the reconciliation
+            with self._failed_lock:
+                self._failed = []
+            # lrouter -> {(dst, next_hop) -> prefix_len}
+            replayed = collections.defaultdict(dict)
+            for (lrouter, dst, prefix_len), next_hops in self._routes.items():
+                for next_hop in next_hops:
+                    replayed[lrouter][(dst, next_hop)] = prefix_len
+            lrouters = (set(replayed) | set(self.table_lrouters.values()) |
+                        {self.default_lrouter})
+            pending = {}
+            missing = stale = 0
+            for lrouter in lrouters:
+                existing = set(
+                    (route.ip_prefix, route.nexthop)
+                    for route in self.nb_idl.get_lrouter_static_routes(
+                        lrouter, external_ids=_get_route_external_ids(
+                            ROUTING_PROTO_BGP, self.owner)))
+                lrouter_missing = replayed[lrouter].keys() - existing
+                lrouter_stale = existing - replayed[lrouter].keys()
+                missing += len(lrouter_missing)
+                stale += len(lrouter_stale)
+                lrouter_pending = {}
+                for key in lrouter_missing:
+                    lrouter_pending[key] = (ROUTE_ADD, replayed[lrouter][key],
+                                            ROUTING_PROTO_BGP)
+                for key in lrouter_stale:
+                    lrouter_pending[key] = (ROUTE_DEL, None,
+                                            ROUTING_PROTO_BGP)
+                if lrouter_pending:
+                    pending[lrouter] = lrouter_pending
+            self._applied = dict(self._routes)
+
+            self.stats['fpm_reconciliations'] += 1
+            self.stats['fpm_stale_routes_removed'] += stale
+            LOG.info("Reconciling the %s routes replayed by zebra "
+                     "(generation %s) with the OVN NB DB: %s missing, %s "
+                     "stale", sum(len(routes) for routes in replayed.values()),
+                     self.generation, missing, stale)
+            # submitted before releasing the routes lock, so that the
+            # changes received afterwards are committed after these ones
+            for lrouter, lrouter_pending in pending.items():
+                with self._get_flush_lock(lrouter):
+                    self._submit(lrouter, lrouter_pending)
 
     def update_FRR_route_to_NBDB(self, payload):
-        offset = 0
-        while offset < len(payload):
-            msg = rtmsg(payload[offset:])
-            msg.decode()
-            offset += msg['header']['length']
-            next_hop = ""
-            if msg['proto'] == RTPROT_BGP:
-                self.proto = "bgp"
-            prefix_len = 0
-            prefix_len = msg['dst_len']
+        with self._routes_lock:
+            self._rollback_failed()
+            self._update_routes(payload)
+
+    def _update_routes(self, payload):
+        for route in fpm.decode_routes(payload):
+            prefix_len = route.dst_len
             if prefix_len == 0:
-                if msg['family'] == socket.AF_INET:
+                if route.family == socket.AF_INET:
                     prefix_len = 32
-                elif msg['family'] == socket.AF_INET6:
+                elif route.family == socket.AF_INET6:
                     prefix_len = 64
-            for a in msg['attrs']:
-                if a[0] == 'RTA_DST':
-                    dst = (a[1])
-                elif a[0] == 'RTA_GATEWAY':
-                    next_hop = (a[1])
-                elif a[0] == 'RTA_OIF':
-                    inf_id = a[1]
-                    ip = IPRoute()
-                    if msg['family'] == socket.AF_INET:
-                        next_hop = ip.get_addr(family=socket.AF_INET, index=inf_id)[0].get_attr('IFA_ADDRESS')
-                    elif msg['family'] == socket.AF_INET6:
-                        next_hop = ip.get_addr(family=socket.AF_INET6, index=inf_id)[0].get_attr('IFA_ADDRESS')
-            LOG.debug(f"Route from FRR: {dst}/{prefix_len} {next_hop}")
-            if ((msg['header']['type'] == RTNL_NEWROUTE) and
-                    (msg['proto'] == RTPROT_BGP)):
-                self.add_route_NBDB(dst, prefix_len, next_hop)
-            if msg['header']['type'] == RTNL_DELROUTE:
-                self.del_route_NBDB(dst, prefix_len, next_hop)
-
-    def handle_read(self):
-        data = self.recv(4)
-        version,msg_type,length = struct.unpack('!BBH', data)
-        payload = self.recv(length-4)
-        if msg_type == 2:
-            LOG.error("Unexpected Protobuf message")
-            self.handle_error()
+            route_next_hops = self._get_next_hops(route)
+            LOG.debug("Route from FRR: %s/%s %s", route.dst, prefix_len,
+                      route_next_hops)
+            key = (self.get_lrouter(route.table), route.dst, prefix_len)
+            if route.msg_type == fpm.RTM_DELROUTE:
+                # only the next hops added by the agent are deleted, the
+                # route may have never been a BGP one
+                self._update_route(key, set())
+            elif route.proto == RTPROT_BGP:
+                self.proto = ROUTING_PROTO_BGP
+                self._update_route(key, route_next_hops)
+            else:
+                # the route is no longer a BGP one: only the next hops added
+                # by the agent are deleted, not the ones of the new route
+                self._update_route(key, set())
+
+    def _get_next_hops(self, route):
+        next_hops = set()
+        for nexthop in route.nexthops:
+            if nexthop.gateway:
+                next_hops.add(nexthop.gateway)
+            elif nexthop.ifindex:
+                address = self.address_cache.get(route.family,
+                                                 nexthop.ifindex)
+                if address:
+                    next_hops.add(address)
+        return next_hops
+
+    def _update_route(self, key, next_hops):
+        current_next_hops = self._routes.pop(key, set())
+        if next_hops:
+            self._routes[key] = next_hops
+        if self.replaying:
+            # the NB DB is updated by reconcile() once the replay finishes
+            return
+        if self.dampening is not None and self._is_suppressed(
+                key, current_next_hops, next_hops):
+            # as in RFC 2439 only the re-advertisements are suppressed: the
+            # next hops removed are deleted right away, not to blackhole
+            # the traffic, and the new ones are held until reused
+            if self._apply_route(key, add=False):
+                LOG.debug("Holding the new next hops of the suppressed "
+                          "route %s/%s of the Logical Router %s", key[1],
+                          key[2], key[0])
+                self.stats['fpm_dampening_held_updates'] += 1
+            return
+        self._apply_route(key)
+
+    def _is_suppressed(self, key, current_next_hops, next_hops):
+        if current_next_hops and not next_hops:
+            return self.dampening.flap(key)
+        if current_next_hops and next_hops != current_next_hops:
+            # RFC 2439 penalizes attribute changes less than withdrawals
+            return self.dampening.flap(key, weight=0.5)
+        return self.dampening.is_suppressed(key)
+
+    def _apply_route(self, key, add=True):
+        """Apply the next hops received for a route to the NB DB
+
+        A new route message replaces all the nexthops of the route, so
+        only the nexthops that changed are added or deleted. Only the
+        nexthops applied by the agent are deleted. If add is False, the new
+        nexthops are not added.
+
+        :returns: the nexthops not added.
+        """
+        lrouter, dst, prefix_len = key
+        next_hops = self._routes.get(key, set())
+        applied_next_hops = self._applied.pop(key, set())
+        new_applied_next_hops = (next_hops if add
+                                 else applied_next_hops & next_hops)
+        if new_applied_next_hops:
+            self._applied[key] = new_applied_next_hops
+        for next_hop in new_applied_next_hops - applied_next_hops:
+            self.add_route_NBDB(dst, prefix_len, next_hop, lrouter=lrouter)
+        for next_hop in applied_next_hops - new_applied_next_hops:
+            self.del_route_NBDB(dst, prefix_len, next_hop, lrouter=lrouter)
+        return next_hops - new_applied_next_hops
+
+    def reuse_routes(self):
+        """Apply the last state of the suppressed routes now stable"""
+        if self.dampening is None:
             return
-        self.update_FRR_route_to_NBDB(payload)
-        self.loop_control = True
+        with self._routes_lock:
+            if self.replaying:
+                return
+            self._rollback_failed()
+            for key in self.dampening.get_reusable():
+                self._apply_route(key)
+
 
-    def handle_error(self):
-        self.close()
-        raise asyncore.ExitNow("Shutting down FPM server")
+async def read_fpm_message(reader):
+    """Read a complete FPM frame from the stream
 
-def run(nb_idl):
-    fpm = FpmServerConnect(FPM_PORT=2620, nb_idl=nb_idl)
-    fpm.loop_control = False
+    :returns: the netlink payload of the frame, or None if the connection
+              was closed between frames.
+    :raises InvalidFPMMessage: if the frame is not a netlink FPM message.
+    """
     try:
+        header = await reader.readexactly(FPM_HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise exceptions.InvalidFPMMessage(
+                reason="connection closed within a frame header")
+        return None
+    version, msg_type, length = FPM_HEADER.unpack(header)
+    if version != FPM_PROTO_VERSION:
+        raise exceptions.InvalidFPMMessage(
+            reason="unsupported FPM version %s" % version)
+    if msg_type == FPM_MSG_TYPE_PROTOBUF:
+        raise exceptions.InvalidFPMMessage(
+            reason="unexpected Protobuf message")
+    if msg_type != FPM_MSG_TYPE_NETLINK:
+        raise exceptions.InvalidFPMMessage(
+            reason="unknown FPM message type %s" % msg_type)
+    if length < FPM_HEADER.size:
+        raise exceptions.InvalidFPMMessage(
+            reason="invalid FPM frame length %s" % length)
+    try:
+        return await reader.readexactly(length - FPM_HEADER.size)
+    except asyncio.IncompleteReadError:
+        raise exceptions.InvalidFPMMessage(
+            reason="connection closed within a frame")
+
+
+class FpmServer(object):
+    """Zebra FPM listener
+
+    Runs an asyncio event loop in its own thread, accepting any number of
+    zebra connections. Each connection gets a new generation number. The
+    routing table replayed by zebra when it connects is reconciled with
+    the OVN NB DB once the replay finishes, and afterwards the routes
+    received are batched by UpdateRoutes, per Logical Router, and committed
+    to the OVN NB DB every fpm_nb_batch_interval seconds. If fpm_dampening
+    is enabled, the routes flapping on a connection are dampened.
+    """
+
+    def __init__(self, nb_idl, address=FPM_ADDRESS, port=FPM_PORT,
+                 owner=None):
+        self.nb_idl = nb_idl
+        self.owner = owner
+        self.address = address
+        self.port = port
+        self._loop = None
+        self._thread = None
+        self._stop_event = None
+        self._connections = set()
+        self._started = threading.Event()
+        self._address_cache = InterfaceAddressCache()
+        self._table_lrouters = get_table_lrouters()
+        self._generation = 0
+        self.stats = collections.Counter()
+        # the route changes of all the connections are committed by the
+        # same worker, so that they are applied in order
+        self._commit_worker = CommitWorker(nb_idl, stats=self.stats,
+                                           owner=owner)
+
+    def start(self):
+        if CONF.fpm_dampening:
+            # fail early if the dampening thresholds are wrong
+            dampening.RouteDampening.from_config()
+        self._address_cache.start()
+        self._commit_worker.start()
+        self._thread = threading.Thread(target=self.run,
+                                        name='fpm-server', daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+    def stop(self, timeout=None):
+        self._address_cache.stop(timeout)
+        if self._loop is not None and self._thread is not None:
+            LOG.info("Stopping FPM server")
+            try:
+                self._loop.call_soon_threadsafe(self._stop_event.set)
+            except RuntimeError:
+                # the loop is already closed
+                pass
+            self._thread.join(timeout)
+        self._commit_worker.stop(timeout)
+
+    def run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._serve())
+        except Exception:
+            LOG.exception("FPM server failed")
+        finally:
+            self._started.set()
+            self._loop.close()
+
+    async def _serve(self):
+        self._stop_event = asyncio.Event()
+        server = await asyncio.start_server(
+            self._on_connection, self.address, self.port,
+            reuse_address=True)
+        # get the bound port in case an ephemeral one was requested
+        self.port = server.sockets[0].getsockname()[1]
+        LOG.info("FPM server listening on %s:%s", self.address, self.port)
+        self._started.set()
+        try:
+            await self._stop_event.wait()
+        finally:
+            server.close()
+            await server.wait_closed()
+            for task in list(self._connections):
+                task.cancel()
+            if self._connections:
+                await asyncio.gather(*self._connections,
+                                     return_exceptions=True)
+            LOG.info("FPM server stopped")
+
+    def _on_connection(self, reader, writer):
+        self._generation += 1
+        task = self._loop.create_task(
+            self._handle_connection(reader, writer, self._generation))
+        self._connections.add(task)
+        task.add_done_callback(self._connections.discard)
+
+    async def _handle_connection(self, reader, writer, generation):
+        peer = writer.get_extra_info('peername')
+        LOG.info("Zebra connected to the FPM server from %s, generation %s",
+                 peer, generation)
+        route_dampening = None
+        if CONF.fpm_dampening:
+            route_dampening = dampening.RouteDampening.from_config(
+                stats=self.stats)
+        route_updater = UpdateRoutes(self.nb_idl,
+                                     address_cache=self._address_cache,
+                                     generation=generation, stats=self.stats,
+                                     dampening=route_dampening,
+                                     table_lrouters=self._table_lrouters,
+                                     commit_worker=self._commit_worker,
+                                     owner=self.owner)
+        route_updater.start_replay()
+        loop = asyncio.get_event_loop()
+        received = asyncio.Event()
+        replay = loop.create_task(self._end_replay(route_updater, received))
+        flush_needed = asyncio.Event()
+        flusher = loop.create_task(
+            self._flush_routes(route_updater, flush_needed))
+        tasks = [replay, flusher]
+        if route_dampening is not None:
+            tasks.append(loop.create_task(
+                self._reuse_routes(route_updater, flush_needed)))
+        try:
+            while True:
+                payload = await read_fpm_message(reader)
+                if payload is None:
+                    break
+                # NOTE: the NB transactions are blocking, run them out of
+                # the loop so that other connections are still served
+                await loop.run_in_executor(
+                    None, route_updater.update_FRR_route_to_NBDB, payload)
+                received.set()
+                if route_updater.pending:
+                    flush_needed.set()
+        except exceptions.InvalidFPMMessage as e:
+            LOG.error("Closing FPM connection from %s: %s", peer, e)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            LOG.exception("Unexpected error processing FPM message from %s",
+                          peer)
+        finally:
+            LOG.info("Zebra FPM connection from %s closed", peer)
+            writer.close()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if route_dampening is not None:
+                route_dampening.clear()
+            # commit what was already received from this connection
+            await loop.run_in_executor(None, route_updater.flush)
+
+    async def _end_replay(self, route_updater, received):
+        # zebra does not signal the end of the replay, wait until it stops
+        # sending routes, or for fpm_replay_max_time under steady churn
+        loop = asyncio.get_event_loop()
+        deadline = None
+        if CONF.fpm_replay_max_time:
+            deadline = loop.time() + CONF.fpm_replay_max_time
+        while True:
+            received.clear()
+            timeout = CONF.fpm_replay_idle_time
+            if deadline is not None:
+                timeout = min(timeout, deadline - loop.time())
+            try:
+                await asyncio.wait_for(received.wait(), max(timeout, 0))
+            except asyncio.TimeoutError:
+                break
+            if deadline is not None and loop.time() >= deadline:
+                LOG.warning("The zebra replay of the FPM generation %s did "
+                            "not finish in %s seconds, reconciling the "
+                            "routes received so far",
+                            route_updater.generation,
+                            CONF.fpm_replay_max_time)
+                break
+        if route_updater.generation != self._generation:
+            # a newer zebra connection will reconcile its own table
+            LOG.info("Skipping the reconciliation of the FPM generation %s, "
+                     "superseded by generation %s",
+                     route_updater.generation, self._generation)
+            route_updater.end_replay()
+            return
+        await loop.run_in_executor(None, route_updater.reconcile)
+
+    async def _flush_routes(self, route_updater, flush_needed):
+        loop = asyncio.get_event_loop()
+        while True:
+            await flush_needed.wait()
+            # give some time for more route changes to be batched together
+            await asyncio.sleep(CONF.fpm_nb_batch_interval)
+            flush_needed.clear()
+            await loop.run_in_executor(None, route_updater.flush)
+
+    async def _reuse_routes(self, route_updater, flush_needed):
+        loop = asyncio.get_event_loop()
         while True:
-            asyncore.loop(count=1)
-            if fpm.loop_control:
-                handler.loop_control = False
-    except:
-        self.handle_error()
+            await asyncio.sleep(DAMPENING_REUSE_INTERVAL)
+            await loop.run_in_executor(None, route_updater.reuse_routes)
+            if route_updater.pending:
+                flush_needed.set()
@@ -0,0 +1,238 @@
+# Copyright 2022 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+from oslo_config import cfg
+from oslo_log import log as logging
+from pyroute2 import IPRoute
+from pyroute2.netlink.rtnl import RTMGRP_IPV4_IFADDR
+from pyroute2.netlink.rtnl import RTMGRP_IPV6_IFADDR
+from pyroute2.netlink.rtnl import RTMGRP_LINK
+
+from ovn_bgp_agent import constants
+from ovn_bgp_agent.utils import linux_net
+
+CONF = cfg.CONF
+LOG = logging.getLogger(__name__)
+
+
+class EVPNContext(object):
+    """Devices and routing information of an EVPN VNI
+
+    The names of the devices are derived from the VNI once, when the
+    context is created, and the VNI is also used as the VRF routing table.
+    """
+
+    def __init__(self, vni, bgp_as=None, single_vxlan=False):
+        self.vni = int(vni)
+        self.bgp_as = bgp_as
+        self.table = self.vni
+        # VXLAN local IP the devices were created with
+        self.vtep_ip = None
+        suffix = str(self.vni)
+        self.vrf_name = constants.OVN_EVPN_VRF_PREFIX + suffix
+        self.lo_name = constants.OVN_EVPN_LO_PREFIX + suffix
+        if single_vxlan:
+            self.bridge_name = constants.OVN_EVPN_SINGLE_BRIDGE
+            self.vxlan_name = constants.OVN_EVPN_SINGLE_VXLAN
+            self.svi_name = constants.OVN_EVPN_SVI_PREFIX + suffix
+        else:
+            self.bridge_name = constants.OVN_EVPN_BRIDGE_PREFIX + suffix
+            self.vxlan_name = constants.OVN_EVPN_VXLAN_PREFIX + suffix
+            self.svi_name = None
+        self.single_vxlan = single_vxlan
+        self.veth_vrf = constants.OVN_EVPN_VETH_VRF_PREFIX + suffix
+        self.veth_ovs = constants.OVN_EVPN_VETH_OVS_PREFIX + suffix
+        self.vlan_name = constants.OVN_EVPN_VLAN_PREFIX + suffix
+        # {device name: ifindex}
+        self.ifindexes = {}
+
+    def __repr__(self):
+        return "<EVPNContext vni={} bgp_as={} vtep_ip={}>".format(
+            self.vni, self.bgp_as, self.vtep_ip)
+
+    @property
+    def devices(self):
+        """Kernel devices of the VNI, not shared with other VNIs"""
+        if self.single_vxlan:
+            devices = [self.lo_name, self.vrf_name, self.svi_name]
+        else:
+            devices = [self.lo_name, self.vrf_name, self.bridge_name,
+                       self.vxlan_name]
+        return devices + [self.veth_vrf, self.vlan_name]
+
+    def update_ifindexes(self, links):
+        """Update the ifindexes from a {ifname: {'index': index}} dict"""
+        self.ifindexes = {
+            device: links[device]['index']
+            for device in self.devices + [self.veth_ovs] if device in links}
+
+
+class EVPNContextManager(object):
+    """EVPN contexts of the VNIs and VXLAN local IP (VTEP) cache
+
+    The VTEP IP is resolved the first time it is needed and then served
+    from memory, and the ifindexes of the contexts devices are kept up to
+    date, by the RTM_NEWADDR, RTM_DELADDR, RTM_NEWLINK and RTM_DELLINK
+    notifications received by the monitor thread. As in the
+    InterfaceAddressCache of the FPM driver, nothing is cached while the
+    monitor is not running.
+    """
+
+    def __init__(self):
+        # {vni: EVPNContext}
+        self._contexts = {}
+        self._vtep_ip = None
+        self._vtep_ifindex = None
+        self._lock = threading.Lock()
+        # increased on every invalidation, to not cache a dump that raced
+        # with a notification
+        self._generation = 0
+        self._monitor = None
+        self._thread = None
+        self._started = threading.Event()
+        self._stopping = False
+
+    def __len__(self):
+        return len(self._contexts)
+
+    def __contains__(self, vni):
+        return int(vni) in self._contexts
+
+    def get(self, vni, bgp_as=None):
+        """Return the context of the VNI, creating it if needed"""
+        vni = int(vni)
+        with self._lock:
+            context = self._contexts.get(vni)
+            if context is None:
+                context = EVPNContext(vni, bgp_as=bgp_as,
+                                      single_vxlan=CONF.evpn_single_vxlan)
+                self._contexts[vni] = context
+            elif bgp_as is not None:
+                context.bgp_as = bgp_as
+            return context
+
+    def find(self, vni):
+        """Return the context of the VNI, or None if there is none"""
+        with self._lock:
+            return self._contexts.get(int(vni))
+
+    def remove(self, vni):
+        with self._lock:
+            return self._contexts.pop(int(vni), None)
+
+    def values(self):
+        with self._lock:
+            return list(self._contexts.values())
+
+    def update_ifindexes(self, links):
+        for context in self.values():
+            context.update_ifindexes(links)
+
+    def get_vtep_ip(self):
+        """Return the VXLAN local IP, or None if it cannot be found"""
+        if CONF.evpn_local_ip:
+            return str(CONF.evpn_local_ip)
+        with self._lock:
+            if self._vtep_ip:
+                return self._vtep_ip
+            generation = self._generation
+
+        local_nic = 'lo'
+        prefixlen_filter = 32  # assuming IPv4
+        if CONF.evpn_nic:
+            local_nic = CONF.evpn_nic
+            prefixlen_filter = False
+        try:
+            # NOTE(ltomasbo): assuming only 1 IP on the device with /32
+            # prefix
+            vtep_ip = linux_net.get_nic_ip(local_nic, prefixlen_filter)[0]
+            # only needed to match the notifications
+            ifindex = (linux_net.get_interface_index(local_nic)
+                       if self._monitor is not None else None)
+        except (KeyError, IndexError):
+            LOG.debug("No VXLAN local IP found on device %s", local_nic)
+            return None
+
+        with self._lock:
+            if (self._monitor is not None and
+                    generation == self._generation):
+                self._vtep_ip = vtep_ip
+                self._vtep_ifindex = ifindex
+        return vtep_ip
+
+    def start(self):
+        self._stopping = False
+        self._started.clear()
+        self._thread = threading.Thread(target=self._monitor_links,
+                                        name='evpn-link-monitor',
+                                        daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+    def stop(self, timeout=None):
+        self._stopping = True
+        monitor = self._monitor
+        if monitor is not None:
+            # unblocks the monitor thread
+            monitor.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _monitor_links(self):
+        try:
+            ipr = IPRoute()
+            ipr.bind(groups=(RTMGRP_IPV4_IFADDR | RTMGRP_IPV6_IFADDR |
+                             RTMGRP_LINK))
+            self._monitor = ipr
+            self._started.set()
+            while not self._stopping:
+                for msg in ipr.get():
+                    self.handle_notification(msg)
+        except OSError:
+            if not self._stopping:
+                LOG.exception("EVPN link monitor failed, the VXLAN local IP "
+                              "will not be cached")
+        finally:
+            with self._lock:
+                self._monitor = None
+                self._generation += 1
+                self._vtep_ip = None
+                self._vtep_ifindex = None
+            self._started.set()
+
+    def handle_notification(self, msg):
+        event = msg.get('event')
+        if event in ('RTM_NEWADDR', 'RTM_DELADDR'):
+            with self._lock:
+                if msg['index'] == self._vtep_ifindex:
+                    self._invalidate_vtep_ip()
+        elif event in ('RTM_NEWLINK', 'RTM_DELLINK'):
+            ifname = msg.get_attr('IFLA_IFNAME')
+            with self._lock:
+                if msg['index'] == self._vtep_ifindex:
+                    self._invalidate_vtep_ip()
+                for context in self._contexts.values():
+                    if event == 'RTM_DELLINK':
+                        if context.ifindexes.get(ifname) == msg['index']:
+                            del context.ifindexes[ifname]
+                    elif ifname in context.devices or (
+                            ifname == context.veth_ovs):
+                        context.ifindexes[ifname] = msg['index']
+
+    def _invalidate_vtep_ip(self):
+        self._generation += 1
+        self._vtep_ip = None
+        self._vtep_ifindex = None
@@ -0,0 +1,138 @@
+# Copyright 2022 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+
+from oslo_log import log as logging
+
+from ovn_bgp_agent import constants
+from ovn_bgp_agent.utils import linux_net
+
+LOG = logging.getLogger(__name__)
+
+DUMMY = 'dummy'
+BRIDGE = 'bridge'
+VETH = 'veth'
+
+# {kind: (pooled device name prefix, veth peer name prefix)}
+_POOL_NAMES = {
+    DUMMY: (constants.OVN_EVPN_POOL_PREFIX + 'lo-', None),
+    BRIDGE: (constants.OVN_EVPN_POOL_PREFIX + 'br-', None),
+    VETH: (constants.OVN_EVPN_POOL_PREFIX + 'vrf-',
+           constants.OVN_EVPN_POOL_PREFIX + 'ovs-'),
+}
+
+
+def _get_pool_names(kind, index):
+    prefix, peer_prefix = _POOL_NAMES[kind]
+    peer = peer_prefix + str(index) if peer_prefix else None
+    return prefix + str(index), peer
+
+
+def _is_pool_name(name):
+    """Return True if the device name is the one of a pooled device"""
+    for kind, prefixes in _POOL_NAMES.items():
+        for prefix in prefixes:
+            if not prefix or not name.startswith(prefix):
+                continue
+            index = name[len(prefix):]
+            if index.isdigit() and name in _get_pool_names(kind, int(index)):
+                return True
+    return False
+
+
+class EVPNDevicePool(object):
+    """Pool of pre-created EVPN devices
+
+    The pooled devices are created down and detached, with a pool name, and
+    they are renamed to the name of the VNI device when it is needed, so
+    that creating the devices is not in the critical path of exposing a
+    cr-lrp, e.g., upon a gateway failover. The pool is refilled on sync.
+    """
+
+    def __init__(self, size, bridges=True, stats=None):
+        self.size = size
+        self.kinds = (DUMMY, BRIDGE, VETH) if bridges else (DUMMY, VETH)
+        self.stats = stats if stats is not None else collections.Counter()
+        # {kind: [(pooled device name, veth peer name)]}
+        self._free = {kind: [] for kind in self.kinds}
+        # device names known to exist, as of the last refill
+        self._known = set()
+
+    def __len__(self):
+        return sum(len(free) for free in self._free.values())
+
+    def refill(self):
+        """Create the missing pooled devices and remove the extra ones."""
+        if self.size <= 0:
+            return
+        interfaces = set(linux_net.get_interfaces())
+        wanted = set()
+        for kind in self.kinds:
+            free = []
+            for index in range(self.size):
+                name, peer = _get_pool_names(kind, index)
+                wanted.update((name, peer))
+                if name not in interfaces:
+                    attrs = {}
+                    if kind == VETH:
+                        attrs['peer'] = peer
+                    elif kind == BRIDGE:
+                        attrs['br_stp_state'] = 0
+                    try:
+                        linux_net.create_device(name, kind, **attrs)
+                    except Exception:
+                        LOG.exception("Unable to create the pooled EVPN "
+                                      "device %s", name)
+                        continue
+                free.append((name, peer))
+            self._free[kind] = free
+
+        extra = set(i for i in interfaces - wanted if _is_pool_name(i))
+        for interface in extra:
+            linux_net.delete_device(interface)
+        self._known = interfaces - wanted - extra
+        self.stats['evpn_pool_free_devices'] = len(self)
+
+    def take(self, kind, name, peer=None):
+        """Rename a pooled device (and its veth peer) to the given name(s)
+
+        Nothing is done if the device already exists or the pool is empty.
+
+        :returns: True if a pooled device was used, False otherwise.
+        """
+        free = self._free.get(kind)
+        if not free or name in self._known:
+            return False
+        pooled, pooled_peer = free[-1]
+        try:
+            if not linux_net.rename_device(pooled, name):
+                # the device was created meanwhile
+                self._known.add(name)
+                return False
+            if peer:
+                linux_net.rename_device(pooled_peer, peer)
+        except KeyError:
+            LOG.debug("Pooled EVPN device %s no longer exists", pooled)
+            free.pop()
+            return False
+        free.pop()
+        self._known.update(d for d in (name, peer) if d)
+        self.stats['evpn_pool_devices_used'] += 1
+        self.stats['evpn_pool_free_devices'] = len(self)
+        return True
+
+    def forget(self, devices):
+        """Stop considering the given devices as existing."""
+        self._known.difference_update(devices)
@@ -0,0 +1,148 @@
+# Copyright 2022 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import socket
+import struct
+
+from ovn_bgp_agent import exceptions
+
+RTM_NEWROUTE = 24
+RTM_DELROUTE = 25
+
+RTA_DST = 1
+RTA_OIF = 4
+RTA_GATEWAY = 5
+RTA_MULTIPATH = 9
+RTA_TABLE = 15
+
+# struct nlmsghdr: length, type, flags, sequence number and port id
+NLMSG_HEADER = struct.Struct('=IHHII')
+# struct rtmsg: family, dst_len, src_len, tos, table, protocol, scope, type
+# and flags
+RTMSG = struct.Struct('=BBBBBBBBI')
+# struct rtattr: length and type
+RTATTR = struct.Struct('=HH')
+# struct rtnexthop: length, flags, hops and ifindex
+RTNEXTHOP = struct.Struct('=HBBi')
+U32 = struct.Struct('=I')
+
+NLA_TYPE_MASK = 0x3fff
+
+_ADDRESS_LEN = {socket.AF_INET: 4, socket.AF_INET6: 16}
+_DEFAULT_DST = {socket.AF_INET: '0.0.0.0', socket.AF_INET6: '::'}
+
+Nexthop = collections.namedtuple('Nexthop', ['gateway', 'ifindex'])
+Route = collections.namedtuple(
+    'Route', ['msg_type', 'family', 'table', 'proto', 'dst', 'dst_len',
+              'nexthops'])
+
+
+def _align(length):
+    return (length + 3) & ~3
+
+
+def _iter_attrs(view, offset, end):
+    while offset + RTATTR.size <= end:
+        length, attr_type = RTATTR.unpack_from(view, offset)
+        if length < RTATTR.size or offset + length > end:
+            raise exceptions.InvalidFPMMessage(
+                reason="invalid route attribute length %s" % length)
+        yield attr_type & NLA_TYPE_MASK, offset + RTATTR.size, offset + length
+        offset += _align(length)
+
+
+def _decode_address(family, view, start, end):
+    if end - start != _ADDRESS_LEN.get(family):
+        raise exceptions.InvalidFPMMessage(
+            reason="invalid address length %s" % (end - start))
+    return socket.inet_ntop(family, view[start:end])
+
+
+def _decode_u32(view, start, end):
+    if end - start != U32.size:
+        raise exceptions.InvalidFPMMessage(
+            reason="invalid attribute length %s" % (end - start))
+    return U32.unpack_from(view, start)[0]
+
+
+def _decode_multipath(family, view, offset, end):
+    nexthops = []
+    while offset + RTNEXTHOP.size <= end:
+        length, _flags, _hops, ifindex = RTNEXTHOP.unpack_from(view, offset)
+        if length < RTNEXTHOP.size or offset + length > end:
+            raise exceptions.InvalidFPMMessage(
+                reason="invalid nexthop length %s" % length)
+        gateway = None
+        for attr_type, start, attr_end in _iter_attrs(
+                view, offset + RTNEXTHOP.size, offset + length):
+            if attr_type == RTA_GATEWAY:
+                gateway = _decode_address(family, view, start, attr_end)
+        nexthops.append(Nexthop(gateway, ifindex or None))
+        offset += _align(length)
+    return nexthops
+
+
+def _decode_route(msg_type, view, offset, end):
+    if offset + RTMSG.size > end:
+        raise exceptions.InvalidFPMMessage(reason="truncated route message")
+    (family, dst_len, _src_len, _tos, table, proto, _scope, _type,
+     _flags) = RTMSG.unpack_from(view, offset)
+    dst = _DEFAULT_DST.get(family)
+    gateway = ifindex = None
+    nexthops = []
+    for attr_type, start, attr_end in _iter_attrs(view, offset + RTMSG.size,
+                                                  end):
+        if attr_type == RTA_DST:
+            dst = _decode_address(family, view, start, attr_end)
+        elif attr_type == RTA_GATEWAY:
+            gateway = _decode_address(family, view, start, attr_end)
+        elif attr_type == RTA_OIF:
+            ifindex = _decode_u32(view, start, attr_end)
+        elif attr_type == RTA_TABLE:
+            table = _decode_u32(view, start, attr_end)
+        elif attr_type == RTA_MULTIPATH:
+            nexthops = _decode_multipath(family, view, start, attr_end)
+    if not nexthops and (gateway or ifindex):
+        nexthops = [Nexthop(gateway, ifindex)]
+    return Route(msg_type, family, table, proto, dst, dst_len,
+                 tuple(nexthops))
+
+
+def decode_routes(payload):
+    """Decode the route messages of a netlink FPM payload.
+
+    Only the fields needed to import the routes are decoded, reading the
+    headers in place instead of building a full pyroute2 message per
+    route. The payload is not copied, so any object supporting the buffer
+    protocol (e.g., a bytearray reused to receive the messages) can be
+    passed. Other netlink messages are skipped.
+
+    :returns: a generator of Route records, with all the nexthops of the
+              route, including the ones of RTA_MULTIPATH.
+    :raises InvalidFPMMessage: if the payload is malformed.
+    """
+    view = memoryview(payload)
+    size = len(view)
+    offset = 0
+    while offset + NLMSG_HEADER.size <= size:
+        length, msg_type, _flags, _seq, _pid = NLMSG_HEADER.unpack_from(
+            view, offset)
+        if length < NLMSG_HEADER.size or offset + length > size:
+            raise exceptions.InvalidFPMMessage(
+                reason="invalid netlink message length %s" % length)
+        if msg_type in (RTM_NEWROUTE, RTM_DELROUTE):
+            yield _decode_route(msg_type, view, offset + NLMSG_HEADER.size,
+                                offset + length)
+        offset += _align(length)
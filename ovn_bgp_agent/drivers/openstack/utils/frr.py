@@ -12,17 +12,26 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
+import functools
 import json
 import tempfile
+import threading
 
 from jinja2 import Template
+from oslo_config import cfg
 from oslo_log import log as logging
 
 from ovn_bgp_agent import constants
 import ovn_bgp_agent.privileged.vtysh
 
+CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
 
+_config_manager = None
+# seconds to wait before retrying a failed flush, if no flush interval is set
+FLUSH_RETRY_INTERVAL = 5
+
 ADD_VRF_TEMPLATE = '''
 vrf {{ vrf_name }}
   vni {{ vni }}
@@ -93,6 +102,63 @@ router bgp {{ bgp_as }} vrf {{ vrf_name }}
 '''
 
 
+@functools.lru_cache(maxsize=None)
+def _get_template(template):
+    return Template(template)
+
+
+def _render(template, **kwargs):
+    return _get_template(template).render(**kwargs)
+
+
+def _parse_config(config):
+    """Return the set of (stanza, line) entries of an FRR configuration.
+
+    The stanza is a tuple with the enclosing blocks (e.g., the router bgp
+    and address-family lines), so that the same line under different
+    blocks is considered different. Indentation, comments and block
+    terminators are ignored, which allows to compare rendered templates
+    with the output of 'show running-config'.
+    """
+    entries = set()
+    stanza = ()
+    for raw_line in config.splitlines():
+        line = raw_line.strip()
+        if not line or line.startswith('!'):
+            continue
+        if line in ('exit', 'exit-vrf', 'end'):
+            stanza = ()
+            continue
+        if line == 'exit-address-family':
+            stanza = stanza[:1]
+            continue
+        top_level = not raw_line[0].isspace()
+        if top_level:
+            stanza = ()
+        entries.add((stanza, line))
+        if top_level:
+            stanza = (line,)
+        elif line.startswith('address-family'):
+            stanza = stanza[:1] + (line,)
+    return entries
+
+
+def _get_running_config():
+    try:
+        output = ovn_bgp_agent.privileged.vtysh.run_vtysh_command(
+            command='show running-config')
+    except Exception:
+        LOG.warning("Unable to retrieve the FRR running configuration")
+        return None
+    if not isinstance(output, str):
+        return None
+    return _parse_config(output)
+
+
+def _is_configured(config, running_config):
+    return _parse_config(config).issubset(running_config)
+
+
 def _get_router_id():
     output = ovn_bgp_agent.privileged.vtysh.run_vtysh_command(
         command='show ip bgp summary json')
@@ -126,29 +192,192 @@ def vrf_leak(vrf, bgp_as, bgp_router_id=None, template=LEAK_VRF_TEMPLATE):
             LOG.error("Unknown router-id, needed for route leaking")
             return
 
-    vrf_template = Template(template)
-    vrf_config = vrf_template.render(vrf_name=vrf, bgp_as=bgp_as,
-                                     bgp_router_id=bgp_router_id)
+    vrf_config = _render(template, vrf_name=vrf, bgp_as=bgp_as,
+                         bgp_router_id=bgp_router_id)
+    running_config = _get_running_config()
+    if running_config and _is_configured(vrf_config, running_config):
+        LOG.debug("VRF leak for VRF %s already configured", vrf)
+        return
     _run_vtysh_config_with_tempfile(vrf_config)
 
 
+class FrrConfigManager(object):
+    """Keep track of the EVPN VRFs configuration on FRR.
+
+    Requests to add or delete VRFs are applied right away, unless a flush
+    interval is set or they are issued within a batch() block, in which
+    case they are queued and applied together as a single FRR
+    configuration reload. Before applying them they are compared with the
+    FRR running configuration (or the last applied one if it cannot be
+    retrieved), so that only the missing changes are pushed.
+    """
+
+    def __init__(self, flush_interval=0):
+        self.flush_interval = flush_interval
+        # {vrf_name: evpn_info}
+        self._configured = {}
+        # {vrf_name: (action, evpn_info)}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._timer = None
+        self._batching = 0
+
+    def add_vrf(self, evpn_info):
+        self._queue("add-vrf", evpn_info)
+
+    def del_vrf(self, evpn_info):
+        self._queue("del-vrf", evpn_info)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Queue the VRF changes done within the block and apply them once.
+
+        Nested blocks are applied when the outermost one exits. If the
+        changes cannot be applied they are retried later, and the error is
+        only raised if the block itself did not fail, not to hide its
+        exception.
+        """
+        with self._lock:
+            self._batching += 1
+        failed = True
+        try:
+            yield self
+            failed = False
+        finally:
+            with self._lock:
+                self._batching -= 1
+                if not self._batching:
+                    self._flush_or_retry(reraise=not failed)
+
+    def _queue(self, action, evpn_info):
+        vrf_name = "{}{}".format(constants.OVN_EVPN_VRF_PREFIX,
+                                 evpn_info['vni'])
+        with self._lock:
+            # a newer action on the same VRF supersedes the pending one
+            self._pending[vrf_name] = (action, evpn_info)
+            if self._batching:
+                return
+            if self.flush_interval <= 0:
+                self._flush()
+            else:
+                self._schedule()
+
+    def _schedule(self, interval=None):
+        if not self._timer:
+            self._timer = threading.Timer(interval or self.flush_interval,
+                                          self._flush_scheduled)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_scheduled(self):
+        # exceptions are not propagated out of the timer thread, so the
+        # failed changes are retried on the next interval instead
+        with self._lock:
+            self._timer = None
+            self._flush_or_retry(reraise=False)
+
+    def _flush_or_retry(self, reraise=True):
+        try:
+            self._flush()
+        except Exception:
+            retry_interval = self.flush_interval or FLUSH_RETRY_INTERVAL
+            LOG.exception("Failed to apply the FRR configuration for VRFs "
+                          "%s, retrying in %s seconds",
+                          list(self._pending.keys()), retry_interval)
+            self._schedule(retry_interval)
+            if reraise:
+                raise
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        pending = self._pending
+        self._pending = {}
+
+        try:
+            self._apply(pending)
+        except Exception:
+            # keep the changes that were not superseded meanwhile so that
+            # they are retried on the next flush
+            for vrf_name, change in pending.items():
+                self._pending.setdefault(vrf_name, change)
+            raise
+
+    def _apply(self, pending):
+        running_config = _get_running_config()
+        configs = []
+        # {vrf_name: evpn_info or None if removed}, only recorded once
+        # FRR accepted the new configuration
+        updates = {}
+        for vrf_name, (action, evpn_info) in pending.items():
+            if action == "add-vrf":
+                vrf_config = _render(
+                    ADD_VRF_TEMPLATE, vrf_name=vrf_name,
+                    bgp_as=evpn_info['bgp_as'], vni=evpn_info['vni'])
+                updates[vrf_name] = evpn_info
+                if running_config is not None:
+                    if _is_configured(vrf_config, running_config):
+                        continue
+                elif self._configured.get(vrf_name) == evpn_info:
+                    continue
+            else:
+                updates[vrf_name] = None
+                if running_config is not None:
+                    if (((), 'vrf {}'.format(vrf_name)) not in
+                            running_config):
+                        continue
+                elif vrf_name not in self._configured:
+                    continue
+                vrf_config = _render(
+                    DEL_VRF_TEMPLATE, vrf_name=vrf_name,
+                    bgp_as=evpn_info['bgp_as'])
+            configs.append(vrf_config)
+
+        if configs:
+            LOG.info("Applying FRR configuration for %d VRF(s)", len(configs))
+            _run_vtysh_config_with_tempfile(''.join(configs))
+        else:
+            LOG.debug("FRR configuration already up to date for VRFs: %s",
+                      list(pending.keys()))
+
+        for vrf_name, evpn_info in updates.items():
+            if evpn_info is None:
+                self._configured.pop(vrf_name, None)
+            else:
+                self._configured[vrf_name] = evpn_info
+
+
+def get_config_manager():
+    global _config_manager
+    if _config_manager is None:
+        _config_manager = FrrConfigManager(
+            flush_interval=CONF.frr_reconfigure_interval)
+    return _config_manager
+
+
+def batch_config():
+    return get_config_manager().batch()
+
+
+def flush_config():
+    """Apply the queued VRF changes, if any."""
+    if _config_manager is not None:
+        _config_manager.flush()
+
+
 def vrf_reconfigure(evpn_info, action):
     LOG.info("FRR reconfiguration (action = %s) for evpn: %s",
              action, evpn_info)
     if action == "add-vrf":
-        vrf_template = Template(ADD_VRF_TEMPLATE)
-        vrf_config = vrf_template.render(
-            vrf_name="{}{}".format(constants.OVN_EVPN_VRF_PREFIX,
-                                   evpn_info['vni']),
-            bgp_as=evpn_info['bgp_as'],
-            vni=evpn_info['vni'])
+        get_config_manager().add_vrf(evpn_info)
     elif action == "del-vrf":
-        vrf_template = Template(DEL_VRF_TEMPLATE)
-        vrf_config = vrf_template.render(
-            vrf_name="{}{}".format(constants.OVN_EVPN_VRF_PREFIX,
-                                   evpn_info['vni']),
-            bgp_as=evpn_info['bgp_as'])
+        get_config_manager().del_vrf(evpn_info)
     else:
         LOG.error("Unknown FRR reconfiguration action: %s", action)
-        return
-    _run_vtysh_config_with_tempfile(vrf_config)
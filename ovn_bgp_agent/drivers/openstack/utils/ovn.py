@@ -13,6 +13,8 @@
 # limitations under the License.
 
 import contextlib
+
+from neutron_lib._i18n import _
 from oslo_config import cfg
 from oslo_log import log as logging
 
@@ -98,8 +100,23 @@ class OvnSbIdl(OvnIdl):
 class OvnNbIdl(OvnIdl):
     SCHEMA = 'OVN_Northbound'
 
-    def __init__(self, connection_string, events=None, tables=None):
-        if connection_string.startswith("ssl"):
+    def __init__(self, connection_string, events=None, tables=None,
+                 lrouters=None, route_external_ids=None):
+        """Connect to the OVN NB DB.
+
+        :param connection_string: a comma separated list of remotes, the
+                                  connection fails over to the next one
+                                  when the current one is lost.
+        :param lrouters: if given, only these Logical_Router rows are
+                         monitored.
+        :param route_external_ids: if given, only the
+                                   Logical_Router_Static_Route rows with
+                                   all these external_ids are monitored.
+        """
+        # NOTE: the SSL files are global to the process, set them if any of
+        # the remotes needs them
+        if any(remote.strip().startswith("ssl")
+               for remote in connection_string.split(',')):
             self._check_and_set_ssl_files(self.SCHEMA)
         helper = self._get_ovsdb_helper(connection_string)
         self._events = events
@@ -109,6 +126,21 @@ class OvnNbIdl(OvnIdl):
             helper.register_table(table)
         super(OvnNbIdl, self).__init__(
             None, connection_string, helper)
+        if lrouters and 'Logical_Router' in tables:
+            self.cond_change('Logical_Router', [
+                ['name', '==', lrouter] for lrouter in sorted(lrouters)])
+        if route_external_ids and 'Logical_Router_Static_Route' in tables:
+            # NOTE: the conditions of a table are ORed, so all the
+            # external_ids go in the same map
+            self.cond_change('Logical_Router_Static_Route', [
+                ['external_ids', 'includes',
+                 ['map', [list(item) for item in
+                          sorted(route_external_ids.items())]]]])
+        self.static_route_index = StaticRouteIndex()
+
+    def notify(self, event, row, updates=None):
+        self.static_route_index.notify(event, row, updates)
+        super(OvnNbIdl, self).notify(event, row, updates)
 
     def _get_ovsdb_helper(self, connection_string):
         return idlutils.get_schema_helper(connection_string, self.SCHEMA)
@@ -221,6 +253,24 @@ class OvsdbSbOvnIdl(sb_impl_idl.OvnSbApiIdlImpl, Backend):
             if r.chassis and r.chassis[0].name == chassis
         ]
 
+    def get_cr_lrp_ports_standby_on_chassis(self, chassis):
+        """Return the cr-lrp ports the chassis is a backup gateway for
+
+        It requires the HA_Chassis_Group and HA_Chassis tables to be
+        monitored.
+        """
+        ports = []
+        for port in self.get_cr_lrp_ports():
+            if port.chassis and port.chassis[0].name == chassis:
+                continue
+            for ha_chassis_group in getattr(port, 'ha_chassis_group', []):
+                if any(ha_chassis.chassis and
+                       ha_chassis.chassis[0].name == chassis
+                       for ha_chassis in ha_chassis_group.ha_chassis):
+                    ports.append(port)
+                    break
+        return ports
+
     def get_cr_lrp_nat_addresses_info(self, cr_lrp_port_name, chassis, sb_idl):
         # NOTE: Assuming logical_port format is "cr-lrp-XXXX"
         patch_port_name = cr_lrp_port_name.split("cr-lrp-")[1]
@@ -371,6 +421,7 @@ class OvsdbSbOvnIdl(sb_impl_idl.OvnSbApiIdlImpl, Backend):
                     lbs.append(ovn_lb)
         return lbs
 
+
 class OvsdbNbOvnIdl(nb_impl_idl.OvnNbApiIdlImpl, Backend):
     def __init__(self, connection):
         super(OvsdbNbOvnIdl, self).__init__(connection)
@@ -379,9 +430,60 @@ class OvsdbNbOvnIdl(nb_impl_idl.OvnNbApiIdlImpl, Backend):
     def add_static_route(self, lrouter, **columns):
         return AddStaticRouteCommand(self, lrouter, **columns)
 
+    def add_static_routes(self, lrouter, routes):
+        """Add several static routes to a router.
+
+        :param routes: list of dicts with the columns of each route.
+        """
+        return AddStaticRoutesCommand(self, lrouter, routes)
+
     def delete_static_route(self, lrouter, ip_prefix, nexthop, if_exists=True):
         return DelStaticRouteCommand(self, lrouter, ip_prefix, nexthop,
-                                         if_exists)
+                                     if_exists)
+
+    def delete_static_routes(self, lrouter, routes, if_exists=True):
+        """Delete several static routes from a router.
+
+        :param routes: list of (ip_prefix, nexthop) tuples.
+        """
+        return DelStaticRoutesCommand(self, lrouter, routes, if_exists)
+
+    def get_lrouter_static_routes(self, lrouter_name, external_ids=None):
+        """Return the static routes of a router
+
+        :param external_ids: if given, only the routes with all these
+                             external_ids are returned.
+        """
+        try:
+            lrouter = idlutils.row_by_value(self.idl, 'Logical_Router',
+                                            'name', lrouter_name)
+        except idlutils.RowNotFound:
+            return []
+        routes = lrouter.static_routes
+        if external_ids:
+            routes = [route for route in routes
+                      if all(route.external_ids.get(key) == value
+                             for key, value in external_ids.items())]
+        return routes
+
+    def get_static_routes(self, lrouter, ip_prefix, nexthop):
+        """Return the static routes of the router matching ip_prefix/nexthop
+
+        :param lrouter: the Logical_Router row.
+        """
+        rows = self.tables['Logical_Router_Static_Route'].rows
+        routes = []
+        for route_uuid in list(self.idl.static_route_index.get(
+                lrouter.uuid, ip_prefix, nexthop)):
+            route = rows.get(route_uuid)
+            # NOTE: the rows deleted while the IDL was disconnected are not
+            # notified, discard them here
+            if (route is None or route.ip_prefix != ip_prefix or
+                    route.nexthop != nexthop):
+                self.idl.static_route_index.discard(lrouter.uuid, route_uuid)
+                continue
+            routes.append(route)
+        return routes
 
     @contextlib.contextmanager
     def transaction(self, *args, **kwargs):
@@ -398,61 +500,161 @@ class OvsdbNbOvnIdl(nb_impl_idl.OvnNbApiIdlImpl, Backend):
             LOG.info('Transaction aborted')
             raise
 
-class AddStaticRouteCommand(command.BaseCommand):
-    def __init__(self, api, lrouter, **columns):
-        super(AddStaticRouteCommand, self).__init__(api)
-        self.lrouter = lrouter
-        self.columns = columns
 
-    def run_idl(self, txn):
-        try:
-            lrouter = idlutils.row_by_value(self.api.idl, 'Logical_Router',
-                                            'name', self.lrouter)
-        except idlutils.RowNotFound:
-            msg = _("Logical Router %s does not exist") % self.lrouter
-            raise RuntimeError(msg)
+class StaticRouteIndex(object):
+    """Index of the static routes of each Logical_Router.
+
+    Maps each router to its Logical_Router_Static_Route rows by
+    (ip_prefix, nexthop), so that a route can be found without walking
+    the static_routes column of the router. It is kept up to date from the
+    IDL notifications of both tables, which can arrive in any order.
+    """
+
+    def __init__(self):
+        # route uuid -> (ip_prefix, nexthop)
+        self._route_keys = {}
+        # route uuid -> router uuid
+        self._route_router = {}
+        # router uuid -> set of route uuids
+        self._router_routes = {}
+        # router uuid -> {(ip_prefix, nexthop): set of route uuids}
+        self._index = {}
+
+    def get(self, router_uuid, ip_prefix, nexthop):
+        return self._index.get(router_uuid, {}).get(
+            (ip_prefix, nexthop), set())
+
+    def discard(self, router_uuid, route_uuid):
+        key = self._route_keys.pop(route_uuid, None)
+        if self._route_router.get(route_uuid) == router_uuid:
+            del self._route_router[route_uuid]
+            self._router_routes[router_uuid].discard(route_uuid)
+        self._unindex(router_uuid, key, route_uuid)
+
+    def _unindex(self, router_uuid, key, route_uuid):
+        routes = self._index.get(router_uuid, {}).get(key)
+        if routes is None:
+            return
+        routes.discard(route_uuid)
+        if not routes:
+            del self._index[router_uuid][key]
+
+    def _index_route(self, router_uuid, route_uuid):
+        key = self._route_keys.get(route_uuid)
+        if key is not None:
+            self._index.setdefault(router_uuid, {}).setdefault(
+                key, set()).add(route_uuid)
+
+    def notify(self, event_type, row, updates=None):
+        table = row._table.name
+        if table == 'Logical_Router':
+            self._notify_router(event_type, row, updates)
+        elif table == 'Logical_Router_Static_Route':
+            self._notify_route(event_type, row, updates)
+
+    def _notify_router(self, event_type, row, updates):
+        old_routes = self._router_routes.get(row.uuid, set())
+        if event_type == event.RowEvent.ROW_DELETE:
+            new_routes = set()
+        elif (event_type == event.RowEvent.ROW_UPDATE and
+                updates is not None and
+                not hasattr(updates, 'static_routes')):
+            return
+        else:
+            new_routes = set(route.uuid for route in row.static_routes)
+
+        for route_uuid in old_routes - new_routes:
+            if self._route_router.get(route_uuid) == row.uuid:
+                del self._route_router[route_uuid]
+            self._unindex(row.uuid, self._route_keys.get(route_uuid),
+                          route_uuid)
+        for route_uuid in new_routes - old_routes:
+            self._route_router[route_uuid] = row.uuid
+            self._index_route(row.uuid, route_uuid)
+
+        if new_routes:
+            self._router_routes[row.uuid] = new_routes
+        else:
+            self._router_routes.pop(row.uuid, None)
+            self._index.pop(row.uuid, None)
+
+    def _notify_route(self, event_type, row, updates):
+        router_uuid = self._route_router.get(row.uuid)
+        old_key = self._route_keys.pop(row.uuid, None)
+        if router_uuid is not None:
+            self._unindex(router_uuid, old_key, row.uuid)
+        if event_type == event.RowEvent.ROW_DELETE:
+            return
+        self._route_keys[row.uuid] = (row.ip_prefix, row.nexthop)
+        if router_uuid is not None:
+            self._index_route(router_uuid, row.uuid)
 
-        static_routes = getattr(lrouter, 'static_routes', [])
-        self.ip_prefix = self.columns.get('ip_prefix')
-        self.nexthop = self.columns.get('nexthop')
 
-        new_route = (self.ip_prefix, self.nexthop)
-        existing_routes = [(route.ip_prefix, route.nexthop) for route in static_routes]
+def _get_lrouter(api, lrouter_name):
+    try:
+        return idlutils.row_by_value(api.idl, 'Logical_Router', 'name',
+                                     lrouter_name)
+    except idlutils.RowNotFound:
+        msg = _("Logical Router %s does not exist") % lrouter_name
+        raise RuntimeError(msg)
 
-        if new_route in existing_routes:
-            LOG.info(f"Route {new_route} exists, skipping")
-            return
 
-        if len(existing_routes) == len(static_routes):
+class AddStaticRoutesCommand(command.BaseCommand):
+    def __init__(self, api, lrouter, routes):
+        super(AddStaticRoutesCommand, self).__init__(api)
+        self.lrouter = lrouter
+        self.routes = routes
+
+    def run_idl(self, txn):
+        lrouter = _get_lrouter(self.api, self.lrouter)
+
+        added = set()
+        for columns in self.routes:
+            new_route = (columns.get('ip_prefix'), columns.get('nexthop'))
+            if (new_route in added or
+                    self.api.get_static_routes(lrouter, *new_route)):
+                LOG.debug("Route %s exists, skipping", new_route)
+                continue
             row = txn.insert(self.api._tables['Logical_Router_Static_Route'])
-            for col, val in self.columns.items():
+            for col, val in columns.items():
                 setattr(row, col, val)
             lrouter.addvalue('static_routes', row.uuid)
+            added.add(new_route)
 
-class DelStaticRouteCommand(command.BaseCommand):
-    def __init__(self, api, lrouter, ip_prefix, nexthop, if_exists):
-        super(DelStaticRouteCommand, self).__init__(api)
+
+class AddStaticRouteCommand(AddStaticRoutesCommand):
+    def __init__(self, api, lrouter, **columns):
+        super(AddStaticRouteCommand, self).__init__(api, lrouter, [columns])
+        self.columns = columns
+        self.ip_prefix = columns.get('ip_prefix')
+        self.nexthop = columns.get('nexthop')
+
+
+class DelStaticRoutesCommand(command.BaseCommand):
+    def __init__(self, api, lrouter, routes, if_exists):
+        super(DelStaticRoutesCommand, self).__init__(api)
         self.lrouter = lrouter
-        self.ip_prefix = ip_prefix
-        self.nexthop = nexthop
+        self.routes = routes
         self.if_exists = if_exists
 
     def run_idl(self, txn):
         try:
-            lrouter = idlutils.row_by_value(self.api.idl, 'Logical_Router',
-                                            'name', self.lrouter)
-        except idlutils.RowNotFound:
+            lrouter = _get_lrouter(self.api, self.lrouter)
+        except RuntimeError:
             if self.if_exists:
                 return
-            msg = _("Logical Router %s does not exist") % self.lrouter
-            raise RuntimeError(msg)
-
-        static_routes = getattr(lrouter, 'static_routes', [])
-        for route in static_routes:
-            ip_prefix = getattr(route, 'ip_prefix', '')
-            nexthop = getattr(route, 'nexthop', '')
-            if self.ip_prefix == ip_prefix and self.nexthop == nexthop:
+            raise
+
+        for ip_prefix, nexthop in self.routes:
+            for route in self.api.get_static_routes(lrouter, ip_prefix,
+                                                    nexthop)[:1]:
                 lrouter.delvalue('static_routes', route)
                 route.delete()
-                break
 
+
+class DelStaticRouteCommand(DelStaticRoutesCommand):
+    def __init__(self, api, lrouter, ip_prefix, nexthop, if_exists):
+        super(DelStaticRouteCommand, self).__init__(
+            api, lrouter, [(ip_prefix, nexthop)], if_exists)
+        self.ip_prefix = ip_prefix
+        self.nexthop = nexthop
@@ -225,6 +225,17 @@ def del_device_from_ovs_bridge(device, bridge=None):
     ovn_bgp_agent.privileged.ovs_vsctl.ovs_cmd('ovs-vsctl', args)
 
 
+def del_devices_from_ovs_bridges(devices):
+    # remove them in a single OVSDB transaction
+    args = []
+    for device in devices:
+        if args:
+            args.append('--')
+        args.extend(['--if-exists', 'del-port', device])
+    if args:
+        ovn_bgp_agent.privileged.ovs_vsctl.ovs_cmd('ovs-vsctl', args)
+
+
 def add_vlan_port_to_ovs_bridge(bridge, vlan, vlan_tag):
     # ovs-vsctl add-port BRIDGE VLAN tag=VALN_ID
     # -- set interface VLAN type=internal
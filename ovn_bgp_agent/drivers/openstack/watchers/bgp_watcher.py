@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import itertools
+
 from oslo_concurrency import lockutils
 from oslo_log import log as logging
 from ovsdbapp.backend.ovs_idl import event as row_event
@@ -407,23 +409,17 @@ class OVNLBMemberUpdateEvent(base_watcher.OVNLBMemberEvent):
                 if dp_datapaths:
                     old_dp = dp_datapaths
 
-        ovn_lb_cr_lrp = ""
-        for cr_lrp_port, cr_lrp_info in self.agent.ovn_local_cr_lrps.items():
-            if cr_lrp_info.get('provider_datapath') not in row_dp:
-                continue
-            if event == self.ROW_DELETE or not row.vips:
-                if row.name in cr_lrp_info['ovn_lbs']:
-                    ovn_lb_cr_lrp = cr_lrp_port
-                    break
-            else:
-                # old.datapath needed for members deletion on different subnet
-                match_subnets_datapaths = [
-                    subnet_dp for subnet_dp in cr_lrp_info[
-                        'subnets_datapath'].values()
-                    if (subnet_dp in row_dp)]
-                if match_subnets_datapaths:
-                    ovn_lb_cr_lrp = cr_lrp_port
-                    break
+        cr_lrps = self.agent.ovn_local_cr_lrps
+        if event == self.ROW_DELETE or not row.vips:
+            candidates = [cr_lrps.get_by_ovn_lb(row.name)]
+        else:
+            # old.datapath needed for members deletion on different subnet
+            candidates = itertools.chain.from_iterable(
+                cr_lrps.get_by_subnet_datapath(dp) for dp in row_dp)
+        ovn_lb_cr_lrp = next(
+            (cr_lrp_port for cr_lrp_port in candidates
+             if cr_lrp_port and
+             cr_lrps[cr_lrp_port].provider_datapath in row_dp), None)
         if not ovn_lb_cr_lrp:
             return
 
@@ -49,3 +49,12 @@ class PortNotFound(OVNBGPAgentException):
     """
 
     message = _("OVN port was not found: %(port)s.")
+
+
+class InvalidFPMMessage(OVNBGPAgentException):
+    """Invalid message received on the FPM connection.
+
+    :param reason: Why the message could not be processed.
+    """
+
+    message = _("Invalid FPM message: %(reason)s.")
@@ -12,12 +12,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import errno
 import ipaddress
+import json
 import os
 import pyroute2
 
 from pyroute2 import netlink as pyroute_netlink
 from pyroute2.netlink.rtnl import ndmsg
+from socket import AF_INET
 from socket import AF_INET6
 
 from oslo_concurrency import processutils
@@ -30,6 +33,12 @@ import ovn_bgp_agent.privileged.linux_net
 
 LOG = logging.getLogger(__name__)
 
+# highest metric, for the VRF routes only used if nothing else matches
+UNREACHABLE_ROUTE_METRIC = 4278198272
+
+SYSCTL_PATH = '/proc/sys'
+SYSCTL_SEPARATORS = str.maketrans('./', '/.')
+
 
 @ovn_bgp_agent.privileged.default.entrypoint
 def set_device_status(device, status, ndb=None):
@@ -80,6 +89,119 @@ def ensure_vxlan(vxlan_name, vni, local_ip, dstport):
                 vxlan_learning=False).set('state', constants.LINK_UP).commit()
 
 
+@ovn_bgp_agent.privileged.default.entrypoint
+def ensure_vlan_bridge(bridge_name):
+    with pyroute2.NDB() as ndb:
+        try:
+            set_device_status(bridge_name, constants.LINK_UP, ndb=ndb)
+        except KeyError:
+            ndb.interfaces.create(
+                kind="bridge", ifname=bridge_name, br_stp_state=0,
+                br_vlan_filtering=1, br_vlan_default_pvid=0,
+                br_mcast_snooping=0).set('state', constants.LINK_UP).commit()
+
+
+@ovn_bgp_agent.privileged.default.entrypoint
+def ensure_vxlan_vnifilter(vxlan_name, local_ip, dstport, bridge_name):
+    try:
+        set_device_status(vxlan_name, constants.LINK_UP)
+        return
+    except KeyError:
+        pass
+    # FIXME: pyroute2 does not support the VXLAN VNI filtering
+    # (IFLA_VXLAN_VNIFILTER) nor the bridge per port link options
+    commands = [
+        ["ip", "link", "add", vxlan_name, "type", "vxlan", "dstport",
+         str(dstport), "local", local_ip, "nolearning", "external",
+         "vnifilter"],
+        ["ip", "link", "set", vxlan_name, "master", bridge_name,
+         "addrgenmode", "none"],
+        ["bridge", "link", "set", "dev", vxlan_name, "vlan_tunnel", "on",
+         "neigh_suppress", "on", "learning", "off"],
+        ["ip", "link", "set", vxlan_name, "up"]]
+    for command in commands:
+        try:
+            processutils.execute(*command)
+        except Exception as e:
+            LOG.error("Unable to execute %s. Exception: %s", command, e)
+            raise
+
+
+@ovn_bgp_agent.privileged.default.entrypoint
+def ensure_vlan_device(vlan_name, link, vlan_id):
+    with pyroute2.NDB() as ndb:
+        try:
+            set_device_status(vlan_name, constants.LINK_UP, ndb=ndb)
+        except KeyError:
+            ndb.interfaces.create(
+                kind="vlan", ifname=vlan_name, vlan_id=int(vlan_id),
+                link=ndb.interfaces[link]['index']).set(
+                'state', constants.LINK_UP).commit()
+
+
+@ovn_bgp_agent.privileged.default.entrypoint
+def vlan_tunnels_show(vxlan_name):
+    command = ["bridge", "-j", "vlan", "tunnelshow", "dev", vxlan_name]
+    env = dict(os.environ)
+    env['LC_ALL'] = 'C'
+    try:
+        output, _ = processutils.execute(*command, env_variables=env)
+    except processutils.ProcessExecutionError as e:
+        if "Cannot find device" in e.stderr:
+            return []
+        LOG.error("Unable to execute %s. Exception: %s", command, e)
+        raise
+    return json.loads(output or "[]")
+
+
+@ovn_bgp_agent.privileged.default.entrypoint
+def add_vni_vlan_mapping(vxlan_name, bridge_name, vni, vlan):
+    commands = [
+        "vlan add dev {} vid {}".format(vxlan_name, vlan),
+        "vlan add dev {} vid {} tunnel_info id {}".format(
+            vxlan_name, vlan, vni),
+        "vni add dev {} vni {}".format(vxlan_name, vni),
+        "vlan add dev {} vid {} self".format(bridge_name, vlan)]
+    env = dict(os.environ)
+    env['LC_ALL'] = 'C'
+    try:
+        # NOTE: -force keeps applying the rest of the commands on errors,
+        # e.g., if the mapping was partially configured
+        processutils.execute("bridge", "-force", "-batch", "-",
+                             process_input="\n".join(commands),
+                             env_variables=env)
+    except processutils.ProcessExecutionError as e:
+        if "File exists" in e.stderr:
+            return
+        LOG.error("Unable to map VNI %s to VLAN %s. Exception: %s", vni,
+                  vlan, e)
+        raise
+
+
+@ovn_bgp_agent.privileged.default.entrypoint
+def del_vni_vlan_mapping(vxlan_name, bridge_name, vni, vlan):
+    # NOTE: removing the VLAN from the VXLAN device also removes its
+    # tunnel_info mapping
+    commands = [
+        "vni del dev {} vni {}".format(vxlan_name, vni),
+        "vlan del dev {} vid {}".format(vxlan_name, vlan),
+        "vlan del dev {} vid {} self".format(bridge_name, vlan)]
+    env = dict(os.environ)
+    env['LC_ALL'] = 'C'
+    try:
+        processutils.execute("bridge", "-force", "-batch", "-",
+                             process_input="\n".join(commands),
+                             env_variables=env)
+    except processutils.ProcessExecutionError as e:
+        if ("No such file or directory" in e.stderr or
+                "Cannot find device" in e.stderr):
+            # Already deleted
+            return
+        LOG.error("Unable to unmap VNI %s from VLAN %s. Exception: %s", vni,
+                  vlan, e)
+        raise
+
+
 @ovn_bgp_agent.privileged.default.entrypoint
 def ensure_veth(veth_name, veth_peer):
     try:
@@ -121,6 +243,40 @@ def delete_device(device):
         LOG.debug("Interfaces %s already deleted.", device)
 
 
+@ovn_bgp_agent.privileged.default.entrypoint
+def delete_devices(devices):
+    with pyroute2.NDB() as ndb:
+        for device in devices:
+            try:
+                ndb.interfaces[device].remove().commit()
+            except KeyError:
+                LOG.debug("Interfaces %s already deleted.", device)
+
+
+@ovn_bgp_agent.privileged.default.entrypoint
+def create_device(device, kind, **attrs):
+    """Create a device, leaving it down"""
+    with pyroute2.NDB() as ndb:
+        ndb.interfaces.create(kind=kind, ifname=device, **attrs).commit()
+
+
+@ovn_bgp_agent.privileged.default.entrypoint
+def rename_device(device, new_name):
+    """Rename a device, which must be down
+
+    :returns: False if there is already a device with the new name, True
+              otherwise
+    """
+    with pyroute2.IPRoute() as iproute:
+        if iproute.link_lookup(ifname=new_name):
+            return False
+        index = iproute.link_lookup(ifname=device)
+        if not index:
+            raise KeyError(device)
+        iproute.link('set', index=index[0], ifname=new_name)
+    return True
+
+
 @ovn_bgp_agent.privileged.default.entrypoint
 def route_create(route):
     try:
@@ -140,6 +296,25 @@ def route_delete(route):
             LOG.debug("Route already deleted: {}".format(route))
 
 
+@ovn_bgp_agent.privileged.default.entrypoint
+def routes_create(routes):
+    with pyroute2.IPRoute() as iproute:
+        for route in routes:
+            iproute.route('replace', **route)
+
+
+@ovn_bgp_agent.privileged.default.entrypoint
+def routes_delete(routes):
+    with pyroute2.IPRoute() as iproute:
+        for route in routes:
+            try:
+                iproute.route('del', **route)
+            except pyroute_netlink.exceptions.NetlinkError as e:
+                if e.code != errno.ESRCH:
+                    raise
+                LOG.debug("Route already deleted: %s", route)
+
+
 @ovn_bgp_agent.privileged.default.entrypoint
 def ensure_vlan_device_for_network(bridge, vlan_tag):
     vlan_device_name = '{}.{}'.format(bridge, vlan_tag)
@@ -154,14 +329,40 @@ def ensure_vlan_device_for_network(bridge, vlan_tag):
                 'state', constants.LINK_UP).commit()
 
 
+def _get_sysctl_path(flag):
+    # as sysctl does, the dots split the path and the slashes are the dots
+    # on the names, e.g., net.ipv4.conf.br-ex/10.proxy_arp
+    return os.path.join(SYSCTL_PATH, flag.translate(SYSCTL_SEPARATORS))
+
+
 @ovn_bgp_agent.privileged.default.entrypoint
+def set_kernel_flags(flags):
+    """Set the {flag: value} kernel flags, writing /proc/sys directly
+
+    The flags that already have the given value are not written.
+
+    :returns: the list of flags written.
+    """
+    written = []
+    for flag, value in flags.items():
+        path = _get_sysctl_path(flag)
+        value = str(value)
+        try:
+            with open(path) as f:
+                if f.read().strip() == value:
+                    continue
+            with open(path, 'w') as f:
+                f.write(value)
+        except OSError as e:
+            LOG.error("Unable to set kernel flag %s to %s. Exception: %s",
+                      flag, value, e)
+            raise
+        written.append(flag)
+    return written
+
+
 def set_kernel_flag(flag, value):
-    command = ["sysctl", "-w", "{}={}".format(flag, value)]
-    try:
-        return processutils.execute(*command)
-    except Exception as e:
-        LOG.error("Unable to execute %s. Exception: %s", command, e)
-        raise
+    return set_kernel_flags({flag: value})
 
 
 @ovn_bgp_agent.privileged.default.entrypoint
@@ -233,36 +434,72 @@ def delete_ip_rules(ip_rules):
                           "deleting rule %s", rule)
 
 
+def _get_family_flag(family):
+    return "-6" if family == AF_INET6 else "-4"
+
+
 @ovn_bgp_agent.privileged.default.entrypoint
-def add_ndp_proxy(ip, dev, vlan=None):
-    # FIXME(ltomasbo): This should use pyroute instead but I didn't find
-    # out how
-    net_ip = str(ipaddress.IPv6Network(ip, strict=False).network_address)
-    dev_name = dev
-    if vlan:
-        dev_name = "{}.{}".format(dev, vlan)
-    command = ["ip", "-6", "nei", "add", "proxy", net_ip, "dev", dev_name]
+def nexthops_show(family):
+    # FIXME: pyroute2 does not support nexthop objects (RTM_*NEXTHOP)
+    command = ["ip", _get_family_flag(family), "-j", "nexthop", "show"]
     try:
-        return processutils.execute(*command)
+        output, _ = processutils.execute(*command)
     except Exception as e:
         LOG.error("Unable to execute %s. Exception: %s", command, e)
         raise
+    return json.loads(output or "[]")
+
+
+def _get_nexthop_command(action, nh_id, family, dev, via=None):
+    command = ["ip", _get_family_flag(family), "nexthop", action, "id",
+               str(nh_id)]
+    if via:
+        command.extend(["via", via])
+    command.extend(["dev", dev, "proto", str(constants.NEXTHOP_PROTO)])
+    return command
 
 
 @ovn_bgp_agent.privileged.default.entrypoint
-def del_ndp_proxy(ip, dev, vlan=None):
-    # FIXME(ltomasbo): This should use pyroute instead but I didn't find
-    # out how
-    net_ip = str(ipaddress.IPv6Network(ip, strict=False).network_address)
-    dev_name = dev
-    if vlan:
-        dev_name = "{}.{}".format(dev, vlan)
-    command = ["ip", "-6", "nei", "del", "proxy", net_ip, "dev", dev_name]
+def nexthop_add(nh_id, family, dev, via=None):
+    """Create a nexthop object with the given id
+
+    :returns: False if the nexthop id is already in use, True otherwise
+    """
+    command = _get_nexthop_command("add", nh_id, family, dev, via=via)
     env = dict(os.environ)
     env['LC_ALL'] = 'C'
     try:
-        return processutils.execute(*command, env_variables=env)
+        processutils.execute(*command, env_variables=env)
+    except processutils.ProcessExecutionError as e:
+        if "File exists" in e.stderr:
+            return False
+        LOG.error("Unable to execute %s. Exception: %s", command, e)
+        raise
+    return True
+
+
+@ovn_bgp_agent.privileged.default.entrypoint
+def nexthop_replace(nh_id, family, dev, via=None):
+    """Change the device and gateway of an existing nexthop object
+
+    All the routes using it are updated by the kernel at once.
+    """
+    command = _get_nexthop_command("replace", nh_id, family, dev, via=via)
+    try:
+        processutils.execute(*command)
     except Exception as e:
+        LOG.error("Unable to execute %s. Exception: %s", command, e)
+        raise
+
+
+@ovn_bgp_agent.privileged.default.entrypoint
+def nexthop_delete(nh_id):
+    command = ["ip", "nexthop", "del", "id", str(nh_id)]
+    env = dict(os.environ)
+    env['LC_ALL'] = 'C'
+    try:
+        processutils.execute(*command, env_variables=env)
+    except processutils.ProcessExecutionError as e:
         if "No such file or directory" in e.stderr:
             # Already deleted
             return
@@ -270,6 +507,73 @@ def del_ndp_proxy(ip, dev, vlan=None):
         raise
 
 
+@ovn_bgp_agent.privileged.default.entrypoint
+def routes_replace_with_nexthop(routes):
+    # NOTE: pyroute2 cannot encode RTA_NH_ID, so all the routes are
+    # replaced in one go through the ip batch mode
+    commands = ["route replace {}/{} table {} nhid {} proto {}".format(
+        route['dst'], route['dst_len'], route['table'], route['nh_id'],
+        route.get('proto', 3)) for route in routes]
+    try:
+        processutils.execute("ip", "-batch", "-",
+                             process_input="\n".join(commands))
+    except Exception as e:
+        LOG.error("Unable to replace routes %s. Exception: %s", routes, e)
+        raise
+
+
+def _get_ndp_proxy(iproute, ip, dev, vlan=None):
+    net_ip = str(ipaddress.IPv6Network(ip, strict=False).network_address)
+    dev_name = dev
+    if vlan:
+        dev_name = "{}.{}".format(dev, vlan)
+    index = iproute.link_lookup(ifname=dev_name)
+    if not index:
+        raise KeyError(dev_name)
+    return {'dst': net_ip, 'ifindex': index[0], 'family': AF_INET6,
+            'flags': ndmsg.NTF_PROXY}
+
+
+@ovn_bgp_agent.privileged.default.entrypoint
+def add_ndp_proxies(ndp_proxies):
+    """Add the NDP proxy entries of the (ip, dev, vlan) tuples"""
+    with pyroute2.IPRoute() as iproute:
+        for ip, dev, vlan in ndp_proxies:
+            neigh = _get_ndp_proxy(iproute, ip, dev, vlan)
+            try:
+                iproute.neigh('add', state=ndmsg.states['permanent'],
+                              **neigh)
+            except pyroute_netlink.exceptions.NetlinkError as e:
+                if e.code != errno.EEXIST:
+                    raise
+                LOG.debug("NDP proxy already existing: %s", neigh)
+
+
+@ovn_bgp_agent.privileged.default.entrypoint
+def del_ndp_proxies(ndp_proxies):
+    """Delete the NDP proxy entries of the (ip, dev, vlan) tuples"""
+    with pyroute2.IPRoute() as iproute:
+        for ip, dev, vlan in ndp_proxies:
+            try:
+                neigh = _get_ndp_proxy(iproute, ip, dev, vlan)
+                iproute.neigh('del', **neigh)
+            except KeyError:
+                # the entries are removed along with the device
+                LOG.debug("Device of NDP proxy %s already deleted", ip)
+            except pyroute_netlink.exceptions.NetlinkError as e:
+                if e.code != errno.ENOENT:
+                    raise
+                LOG.debug("NDP proxy already deleted: %s", neigh)
+
+
+def add_ndp_proxy(ip, dev, vlan=None):
+    add_ndp_proxies([(ip, dev, vlan)])
+
+
+def del_ndp_proxy(ip, dev, vlan=None):
+    del_ndp_proxies([(ip, dev, vlan)])
+
+
 @ovn_bgp_agent.privileged.default.entrypoint
 def add_ip_to_dev(ip, nic):
     try:
@@ -349,22 +653,36 @@ def del_ip_nei(ip, lladdr, dev):
                           state=ndmsg.states['permanent'])
 
 
+def _get_vrf_table(iproute, vrf_name):
+    link = iproute.link('get', ifname=vrf_name)[0]
+    return link.get_nested('IFLA_LINKINFO', 'IFLA_INFO_DATA',
+                           'IFLA_VRF_TABLE')
+
+
 @ovn_bgp_agent.privileged.default.entrypoint
+def add_unreachable_routes(vrf_names):
+    """Add an IPv4 and IPv6 unreachable default route to each VRF
+
+    The routes have the highest metric so that they are only used if no
+    other route matches, instead of falling back to the main table.
+    """
+    with pyroute2.IPRoute() as iproute:
+        for vrf_name in vrf_names:
+            table = _get_vrf_table(iproute, vrf_name)
+            for family in (AF_INET, AF_INET6):
+                try:
+                    iproute.route('add', table=table, family=family,
+                                  dst_len=0, type='unreachable',
+                                  priority=UNREACHABLE_ROUTE_METRIC)
+                except pyroute_netlink.exceptions.NetlinkError as e:
+                    if e.code != errno.EEXIST:
+                        raise
+                    LOG.debug("Unreachable route already existing on VRF "
+                              "%s (family %s)", vrf_name, family)
+
+
 def add_unreachable_route(vrf_name):
-    # FIXME: This should use pyroute instead but I didn't find
-    # out how
-    env = dict(os.environ)
-    env['LC_ALL'] = 'C'
-    for ip_version in [-4, -6]:
-        command = ["ip", ip_version, "route", "add", "vrf", vrf_name,
-                   "unreachable", "default", "metric", "4278198272"]
-        try:
-            processutils.execute(*command, env_variables=env)
-        except Exception as e:
-            if "RTNETLINK answers: File exists" in e.stderr:
-                continue
-            LOG.error("Unable to execute %s. Exception: %s", command, e)
-            raise
+    add_unreachable_routes([vrf_name])
 
 
 @ovn_bgp_agent.privileged.default.entrypoint
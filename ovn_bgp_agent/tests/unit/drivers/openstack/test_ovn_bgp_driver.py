@@ -13,6 +13,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import ipaddress
+from socket import AF_INET
+from socket import AF_INET6
 from unittest import mock
 
 from oslo_config import cfg
@@ -20,7 +23,10 @@ from oslo_config import cfg
 from ovn_bgp_agent import config
 from ovn_bgp_agent import constants
 from ovn_bgp_agent.drivers.openstack import ovn_bgp_driver
+from ovn_bgp_agent.drivers.openstack.utils import aggregation
+from ovn_bgp_agent.drivers.openstack.utils import cr_lrp_store
 from ovn_bgp_agent.drivers.openstack.utils import driver_utils
+from ovn_bgp_agent.drivers.openstack.utils import enable_fdp
 from ovn_bgp_agent.drivers.openstack.utils import frr
 from ovn_bgp_agent.drivers.openstack.utils import ovn
 from ovn_bgp_agent.drivers.openstack.utils import ovs
@@ -61,23 +67,28 @@ class TestOVNBGPDriver(test_base.TestCase):
         self.cr_lrp0 = 'cr-fake-logical-port'
         self.cr_lrp1 = 'cr-fake-logical-port1'
         self.lrp0 = 'lrp-fake-logical-port'
-        self.bgp_driver.ovn_local_cr_lrps = {
-            self.cr_lrp0: {'provider_datapath': 'fake-provider-dp',
-                           'router_datapath': 'fake-router-dp',
-                           'ips': [self.fip],
-                           'subnets_datapath': {self.lrp0: 'fake-lrp-dp'},
-                           'subnets_cidr': ['192.168.1.1/24'],
-                           'ovn_lbs': [],
-                           'bridge_device': self.bridge,
-                           'bridge_vlan': None},
-            self.cr_lrp1: {'provider_datapath': 'fake-provider-dp2'}}
+        self.bgp_driver.ovn_local_cr_lrps = cr_lrp_store.CRLRPStore()
+        self.bgp_driver.ovn_local_cr_lrps[self.cr_lrp0] = (
+            cr_lrp_store.CRLRPInfo(
+                'fake-router-dp', 'fake-provider-dp', [self.fip], self.mac,
+                bridge_device=self.bridge))
+        self.bgp_driver.ovn_local_cr_lrps.add_subnet(
+            self.cr_lrp0, self.lrp0, 'fake-lrp-dp', '192.168.1.1/24')
+        self.bgp_driver.ovn_local_cr_lrps[self.cr_lrp1] = (
+            cr_lrp_store.CRLRPInfo('fake-router-dp2', 'fake-provider-dp2',
+                                   [], None))
 
         # Mock pyroute2.NDB context manager object
         self.mock_ndb = mock.patch.object(linux_net.pyroute2, 'NDB').start()
         self.fake_ndb = self.mock_ndb().__enter__()
 
+    @mock.patch.object(enable_fdp, 'FpmServer')
+    @mock.patch.object(ovn, 'OvnNbIdl')
+    @mock.patch.object(linux_net, 'ensure_ovn_device')
+    @mock.patch.object(linux_net, 'ensure_vrf')
     @mock.patch.object(frr, 'vrf_leak')
-    def test_start(self, mock_vrf):
+    def test_start(self, mock_vrf, mock_ensure_vrf, mock_ensure_dev,
+                   mock_nb_idl, mock_fpm_server):
         self.bgp_driver.start()
 
         mock_vrf.assert_called_once_with(
@@ -86,6 +97,50 @@ class TestOVNBGPDriver(test_base.TestCase):
         self.mock_ovs_idl().start.assert_called_once_with(
             CONF.ovsdb_connection)
         self.mock_sbdb().start.assert_called_once_with()
+        mock_nb_idl.assert_called_once_with(
+            CONF.ovn_nb_connection, tables=ovn_bgp_driver.OVN_NB_TABLES,
+            events=None, lrouters={CONF.fpm_default_lrouter},
+            route_external_ids={
+                enable_fdp.ROUTE_OWNER_EXT_ID_KEY:
+                    self.mock_ovs_idl().get_own_chassis_name()})
+        mock_nb_idl.return_value.start.assert_called_once_with()
+
+    @mock.patch.object(enable_fdp, 'FpmServer')
+    @mock.patch.object(ovn, 'OvnNbIdl')
+    @mock.patch.object(linux_net, 'ensure_ovn_device')
+    @mock.patch.object(linux_net, 'ensure_vrf')
+    @mock.patch.object(frr, 'vrf_leak')
+    def test_start_route_advertisement(self, mock_vrf, *args):
+        CONF.set_override('bgp_advertisement_mode', 'route')
+        self.addCleanup(CONF.clear_override, 'bgp_advertisement_mode')
+        self.bgp_driver = ovn_bgp_driver.OVNBGPDriver()
+
+        self.bgp_driver.start()
+
+        mock_vrf.assert_called_once_with(
+            CONF.bgp_vrf, CONF.bgp_AS, CONF.bgp_router_id,
+            template=frr.LEAK_VRF_KERNEL_TEMPLATE)
+
+    @mock.patch.object(enable_fdp, 'FpmServer')
+    @mock.patch.object(ovn, 'OvnNbIdl')
+    @mock.patch.object(linux_net, 'ensure_ovn_device')
+    @mock.patch.object(linux_net, 'ensure_vrf')
+    @mock.patch.object(frr, 'vrf_leak')
+    def test_stop(self, mock_vrf, mock_ensure_vrf, mock_ensure_dev,
+                  mock_nb_idl, mock_fpm_server):
+        self.bgp_driver.start()
+
+        self.bgp_driver.stop()
+
+        mock_fpm_server.assert_called_once_with(
+            mock_nb_idl().start(),
+            owner=self.mock_ovs_idl().get_own_chassis_name())
+        mock_fpm_server.return_value.start.assert_called_once_with()
+        mock_fpm_server.return_value.stop.assert_called_once_with()
+
+    def test_stop_not_started(self):
+        # nothing to stop, must not fail
+        self.bgp_driver.stop()
 
     @mock.patch.object(linux_net, 'delete_bridge_ip_routes')
     @mock.patch.object(linux_net, 'delete_ip_rules')
@@ -108,7 +163,8 @@ class TestOVNBGPDriver(test_base.TestCase):
             'net0:bridge0', 'net1:bridge1']
         self.sb_idl.get_network_vlan_tag_by_network_name.side_effect = (
             [10], [11])
-        fake_ip_rules = 'fake-ip-rules'
+        fake_ip_rules = {
+            '172.24.4.10/32': {'table': 'fake-table', 'family': 2}}
         mock_get_ip_rules.return_value = fake_ip_rules
         ips = [self.ipv4, self.ipv6]
         mock_exposed_ips.return_value = ips
@@ -156,12 +212,12 @@ class TestOVNBGPDriver(test_base.TestCase):
             'bridge1': {'mac': mock.ANY, 'in_port': set()}},
             constants.OVS_RULE_COOKIE)
 
-        expected_calls = [mock.call('fake-port0', ips, fake_ip_rules),
-                          mock.call('fake-port1', ips, fake_ip_rules)]
+        expected_calls = [mock.call('fake-port0', set(), set()),
+                          mock.call('fake-port1', set(), set())]
         mock_ensure_port_exposed.assert_has_calls(expected_calls)
 
-        expected_calls = [mock.call('fake-cr-port0', ips, fake_ip_rules),
-                          mock.call('fake-cr-port1', ips, fake_ip_rules)]
+        expected_calls = [mock.call('fake-cr-port0', set(), set()),
+                          mock.call('fake-cr-port1', set(), set())]
         mock_ensure_cr_port_exposed.assert_has_calls(expected_calls)
 
         mock_del_exposed_ips.assert_called_once_with(
@@ -173,6 +229,64 @@ class TestOVNBGPDriver(test_base.TestCase):
 
         mock_get_ip_rules.assert_called_once_with(mock.ANY)
 
+    @mock.patch.object(linux_net, 'delete_bridge_ip_routes')
+    @mock.patch.object(linux_net, 'delete_ip_rules')
+    @mock.patch.object(linux_net, 'delete_exposed_ips')
+    @mock.patch.object(ovs, 'remove_extra_ovs_flows')
+    @mock.patch.object(ovs, 'get_ovs_flows_info')
+    @mock.patch.object(linux_net, 'get_ovn_ip_rules')
+    @mock.patch.object(linux_net, 'get_exposed_ips')
+    @mock.patch.object(linux_net, 'ensure_vlan_device_for_network')
+    @mock.patch.object(linux_net, 'ensure_routing_table_for_bridge')
+    @mock.patch.object(linux_net, 'ensure_arp_ndp_enabled_for_bridge')
+    @mock.patch.object(linux_net, 'ensure_ovn_device')
+    @mock.patch.object(linux_net, 'ensure_vrf')
+    def test_sync_compact_ip_rules(
+            self, mock_ensure_vrf, mock_ensure_ovn_dev, mock_ensure_arp,
+            mock_routing_bridge, mock_ensure_vlan_network, mock_exposed_ips,
+            mock_get_ip_rules, mock_flows_info, mock_remove_flows,
+            mock_del_exposed_ips, mock_del_ip_rules, mock_del_ip_routes):
+        self.bgp_driver._compact_ip_rules = True
+        self.mock_ovs_idl.get_ovn_bridge_mappings.return_value = []
+        mock_get_ip_rules.return_value = {
+            '172.24.4.0/31': {'table': 'fake-table', 'family': 2},
+            '172.24.4.5/32': {'table': 'fake-table', 'family': 2}}
+        mock_exposed_ips.return_value = []
+        self.sb_idl.get_ports_on_chassis.return_value = ['fake-port0']
+        self.sb_idl.get_cr_lrp_ports_on_chassis.return_value = []
+        self.bgp_driver.ovn_local_cr_lrps = cr_lrp_store.CRLRPStore()
+
+        def _ensure_port_exposed(port, seen_ips, seen_ip_rules):
+            for ip in ('172.24.4.0', '172.24.4.1'):
+                self.bgp_driver._ip_rule_aggregators[self.bridge].add(ip)
+
+        mock.patch.object(self.bgp_driver, '_ensure_port_exposed',
+                          side_effect=_ensure_port_exposed).start()
+
+        self.bgp_driver.sync()
+
+        mock_del_ip_rules.assert_called_once_with(
+            {'172.24.4.5/32': {'table': 'fake-table', 'family': 2}})
+
+    @mock.patch.object(linux_net, 'del_ips_from_dev')
+    @mock.patch.object(linux_net, 'del_ip_host_routes')
+    @mock.patch.object(linux_net, 'del_ip_route')
+    @mock.patch.object(linux_net, 'del_ip_rule')
+    def test__withdraw_provider_port_route_advertisement(
+            self, mock_del_rule, mock_del_route, mock_del_host_routes,
+            mock_del_ips_dev):
+        self.bgp_driver._route_advertisement = True
+        port_ips = [self.ipv4]
+        provider_datapath = 'fake-provider-dp'
+        mock_get_bridge = mock.patch.object(
+            self.bgp_driver, '_get_bridge_for_datapath').start()
+        mock_get_bridge.return_value = (self.bridge, 10)
+        self.bgp_driver._withdraw_provider_port(port_ips, provider_datapath)
+
+        mock_del_host_routes.assert_called_once_with(
+            CONF.bgp_nic, [self.ipv4], CONF.bgp_vrf_table_id)
+        mock_del_ips_dev.assert_not_called()
+
     @mock.patch.object(linux_net, 'get_ip_version')
     def test__ensure_cr_lrp_associated_ports_exposed(self, mock_ip_version):
         mock_expose_ip = mock.patch.object(
@@ -183,16 +297,18 @@ class TestOVNBGPDriver(test_base.TestCase):
         self.sb_idl.get_cr_lrp_nat_addresses_info.return_value = (
             [self.ipv4, self.ipv6], patch_port_row)
 
-        exposed_ips = [self.ipv4, '192.168.1.20']
-        ip_rules = {"{}/128".format(self.ipv6): 'fake-rules'}
+        seen_ips = set()
+        seen_ip_rules = set()
         self.bgp_driver._ensure_cr_lrp_associated_ports_exposed(
-            'fake-cr-lrp', exposed_ips, ip_rules)
+            'fake-cr-lrp', seen_ips, seen_ip_rules)
 
         mock_expose_ip.assert_called_once_with(
             [self.ipv4, self.ipv6], patch_port_row,
             associated_port='fake-cr-lrp')
-        self.assertEqual(['192.168.1.20'], exposed_ips)
-        self.assertEqual({}, ip_rules)
+        self.assertEqual({ipaddress.ip_address(self.ipv4),
+                          ipaddress.ip_address(self.ipv6)}, seen_ips)
+        self.assertEqual({ipaddress.ip_network(self.ipv4),
+                          ipaddress.ip_network(self.ipv6)}, seen_ip_rules)
 
     def test__ensure_port_exposed(self):
         mock_expose_ip = mock.patch.object(
@@ -203,14 +319,16 @@ class TestOVNBGPDriver(test_base.TestCase):
             'type': '',
             'mac': ['{} {} {}'.format(self.mac, self.ipv4, self.ipv6)]})
 
-        exposed_ips = [self.ipv4, self.ipv6]
-        ip_rules = {"{}/128".format(self.ipv6): 'fake-rules'}
-        self.bgp_driver._ensure_port_exposed(port, exposed_ips, ip_rules)
+        seen_ips = set()
+        seen_ip_rules = set()
+        self.bgp_driver._ensure_port_exposed(port, seen_ips, seen_ip_rules)
 
         mock_expose_ip.assert_called_once_with(
             [self.ipv4, self.ipv6], port)
-        self.assertEqual([], exposed_ips)
-        self.assertEqual({}, ip_rules)
+        self.assertEqual({ipaddress.ip_address(self.ipv4),
+                          ipaddress.ip_address(self.ipv6)}, seen_ips)
+        self.assertEqual({ipaddress.ip_network(self.ipv4),
+                          ipaddress.ip_network(self.ipv6)}, seen_ip_rules)
 
     def test__ensure_port_exposed_fip(self):
         fip = '172.24.4.225'
@@ -222,14 +340,14 @@ class TestOVNBGPDriver(test_base.TestCase):
             'type': '',
             'mac': ['{} {} {}'.format(self.mac, self.ipv4, self.ipv6)]})
 
-        exposed_ips = [self.ipv4, fip]
-        ip_rules = {"{}/128".format(self.ipv6): 'fake-rules'}
-        self.bgp_driver._ensure_port_exposed(port, exposed_ips, ip_rules)
+        seen_ips = set()
+        seen_ip_rules = set()
+        self.bgp_driver._ensure_port_exposed(port, seen_ips, seen_ip_rules)
 
         mock_expose_ip.assert_called_once_with(
             [self.ipv4, self.ipv6], port)
-        self.assertEqual([self.ipv4], exposed_ips)
-        self.assertEqual({"{}/128".format(self.ipv6): 'fake-rules'}, ip_rules)
+        self.assertEqual({ipaddress.ip_address(fip)}, seen_ips)
+        self.assertEqual({ipaddress.ip_network(fip)}, seen_ip_rules)
 
     def test__ensure_port_exposed_fip_unknown_mac(self):
         fip = '172.24.4.225'
@@ -242,15 +360,15 @@ class TestOVNBGPDriver(test_base.TestCase):
             'mac': ['unknown'],
             'datapath': 'fake-dp'})
 
-        exposed_ips = [self.ipv4, fip]
-        ip_rules = {"{}/128".format(self.ipv6): 'fake-rules'}
+        seen_ips = set()
+        seen_ip_rules = set()
         self.sb_idl.is_provider_network.return_value = False
 
-        self.bgp_driver._ensure_port_exposed(port, exposed_ips, ip_rules)
+        self.bgp_driver._ensure_port_exposed(port, seen_ips, seen_ip_rules)
 
         mock_expose_ip.assert_called_once_with([], port)
-        self.assertEqual([self.ipv4], exposed_ips)
-        self.assertEqual({"{}/128".format(self.ipv6): 'fake-rules'}, ip_rules)
+        self.assertEqual({ipaddress.ip_address(fip)}, seen_ips)
+        self.assertEqual({ipaddress.ip_network(fip)}, seen_ip_rules)
 
     def test__ensure_port_exposed_wrong_port_type(self):
         mock_expose_ip = mock.patch.object(
@@ -260,7 +378,7 @@ class TestOVNBGPDriver(test_base.TestCase):
             'type': 'non-existing-type',
             'mac': ['{} {} {}'.format(self.mac, self.ipv4, self.ipv6)]})
 
-        self.bgp_driver._ensure_port_exposed(port, [], {})
+        self.bgp_driver._ensure_port_exposed(port, set(), set())
 
         # Assert it was never called, the method should just return if
         # the port type is not OVN_VIF_PORT_TYPES
@@ -285,6 +403,406 @@ class TestOVNBGPDriver(test_base.TestCase):
         mock_add_route.assert_called_once_with(
             mock.ANY, self.ipv4, 'fake-table', self.bridge, vlan=10)
 
+    @mock.patch.object(linux_net, 'add_ips_to_dev')
+    @mock.patch.object(linux_net, 'add_ip_host_routes')
+    @mock.patch.object(linux_net, 'add_ip_route')
+    @mock.patch.object(linux_net, 'add_ip_rule')
+    def test__expose_provider_port_route_advertisement(
+            self, mock_add_rule, mock_add_route, mock_add_host_routes,
+            mock_add_ips_dev):
+        self.bgp_driver._route_advertisement = True
+        port_ips = [self.ipv4]
+        provider_datapath = 'fake-provider-dp'
+        mock_get_bridge = mock.patch.object(
+            self.bgp_driver, '_get_bridge_for_datapath').start()
+        mock_get_bridge.return_value = (self.bridge, 10)
+        self.bgp_driver._expose_provider_port(port_ips, provider_datapath)
+
+        mock_add_host_routes.assert_called_once_with(
+            CONF.bgp_nic, [self.ipv4], CONF.bgp_vrf_table_id)
+        mock_add_ips_dev.assert_not_called()
+        mock_add_rule.assert_called_once_with(
+            self.ipv4, 'fake-table', self.bridge)
+        mock_add_route.assert_called_once_with(
+            mock.ANY, self.ipv4, 'fake-table', self.bridge, vlan=10)
+
+    @mock.patch.object(linux_net, 'add_ip_route')
+    def test__add_ip_route_nexthops(self, mock_add_route):
+        self.bgp_driver.ovn_nexthops = {}
+        self.bgp_driver._add_ip_route(self.ipv4, 'fake-table', self.bridge,
+                                      vlan=10)
+        mock_add_route.assert_called_once_with(
+            self.bgp_driver.ovn_routing_tables_routes, self.ipv4,
+            'fake-table', self.bridge, vlan=10, nexthops={})
+
+    @mock.patch.object(linux_net, 'del_ip_route')
+    def test__del_ip_route_nexthops(self, mock_del_route):
+        self.bgp_driver.ovn_nexthops = {}
+        self.bgp_driver._del_ip_route(self.ipv4, 'fake-table', self.bridge,
+                                      vlan=10)
+        mock_del_route.assert_called_once_with(
+            self.bgp_driver.ovn_routing_tables_routes, self.ipv4,
+            'fake-table', self.bridge, vlan=10, nexthops={})
+
+    @mock.patch.object(linux_net, 'replace_ip_routes_with_nexthop')
+    @mock.patch.object(linux_net, 'add_ip_route')
+    def test__batch_ip_routes(self, mock_add_route, mock_replace_routes):
+        self.bgp_driver.ovn_nexthops = {}
+        mock_add_route.side_effect = (
+            lambda *args, batch, **kwargs: batch.append(args[1]))
+
+        with self.bgp_driver._batch_ip_routes():
+            self.bgp_driver._add_ip_route(self.ipv4, 'fake-table',
+                                          self.bridge)
+            # nested blocks are replaced along with the outermost one
+            with self.bgp_driver._batch_ip_routes():
+                self.bgp_driver._add_ip_route(self.ipv6, 'fake-table',
+                                              self.bridge)
+            mock_replace_routes.assert_not_called()
+
+        mock_replace_routes.assert_called_once_with([self.ipv4, self.ipv6])
+        self.assertIsNone(self.bgp_driver._nexthop_routes)
+
+    @mock.patch.object(linux_net, 'replace_ip_routes_with_nexthop')
+    @mock.patch.object(linux_net, 'add_ip_route')
+    def test__batch_ip_routes_no_nexthops(self, mock_add_route,
+                                          mock_replace_routes):
+        with self.bgp_driver._batch_ip_routes():
+            self.bgp_driver._add_ip_route(self.ipv4, 'fake-table',
+                                          self.bridge)
+
+        mock_add_route.assert_called_once_with(
+            self.bgp_driver.ovn_routing_tables_routes, self.ipv4,
+            'fake-table', self.bridge)
+        mock_replace_routes.assert_not_called()
+
+    @mock.patch.object(linux_net, 'del_ip_route')
+    @mock.patch.object(linux_net, 'replace_ip_routes_with_nexthop')
+    def test__del_ip_route_nexthops_batched(self, mock_replace_routes,
+                                            mock_del_route):
+        self.bgp_driver.ovn_nexthops = {}
+        with self.bgp_driver._batch_ip_routes():
+            self.bgp_driver._nexthop_routes.append('fake-route')
+            self.bgp_driver._del_ip_route(self.ipv4, 'fake-table',
+                                          self.bridge)
+            # the pending routes are replaced before the deletion
+            mock_replace_routes.assert_called_once_with(['fake-route'])
+            mock_del_route.assert_called_once_with(
+                self.bgp_driver.ovn_routing_tables_routes, self.ipv4,
+                'fake-table', self.bridge, nexthops={})
+
+    @mock.patch.object(linux_net, 'replace_nexthop')
+    def test__replace_cr_lrp_nexthops(self, mock_replace_nexthop):
+        self.bgp_driver.ovn_nexthops = {}
+        cr_lrp_info = cr_lrp_store.CRLRPInfo(
+            'fake-router-dp', 'fake-provider-dp',
+            ['172.24.4.10/24', self.ipv6 + '/64'], self.mac,
+            bridge_device=self.bridge)
+        self.bgp_driver._replace_cr_lrp_nexthops(
+            cr_lrp_info, ['172.24.4.11/24', self.ipv6 + '/64'], self.bridge,
+            None)
+
+        # only the IPv4 gateway changed
+        mock_replace_nexthop.assert_called_once_with(
+            self.bgp_driver.ovn_routing_tables_routes, {}, AF_INET,
+            self.bridge, vlan=None, new_vlan=None, via='172.24.4.10',
+            new_via='172.24.4.11')
+
+    def test__expose_ip_chassisredirect_port_previous(self):
+        self.sb_idl.get_provider_datapath_from_cr_lrp.return_value = (
+            'fake-provider-dp')
+        mock.patch.object(self.bgp_driver, '_get_bridge_for_datapath',
+                          return_value=(self.bridge, 10)).start()
+        mock.patch.object(self.bgp_driver, '_expose_cr_lrp_port').start()
+        mock_replace = mock.patch.object(
+            self.bgp_driver, '_replace_cr_lrp_nexthops').start()
+        # exposed before the sync in progress
+        self.bgp_driver._previous_cr_lrps = self.bgp_driver.ovn_local_cr_lrps
+        self.bgp_driver.ovn_local_cr_lrps = cr_lrp_store.CRLRPStore()
+        cr_lrp_info = self.bgp_driver._previous_cr_lrps[self.cr_lrp0]
+        row = fakes.create_object({
+            'type': constants.OVN_CHASSISREDIRECT_VIF_PORT_TYPE,
+            'logical_port': self.cr_lrp0,
+            'mac': ['{} {}'.format(self.mac, self.ipv4)],
+            'datapath': 'fake-router-dp'})
+
+        self.bgp_driver._expose_ip([self.ipv4], row)
+
+        mock_replace.assert_called_once_with(cr_lrp_info, [self.ipv4],
+                                             self.bridge, 10)
+
+    @mock.patch.object(linux_net, 'replace_nexthop')
+    def test__replace_cr_lrp_nexthops_vlan(self, mock_replace_nexthop):
+        self.bgp_driver.ovn_nexthops = {}
+        cr_lrp_info = cr_lrp_store.CRLRPInfo(
+            'fake-router-dp', 'fake-provider-dp', [self.ipv6 + '/64'],
+            self.mac, bridge_device=self.bridge, bridge_vlan=10)
+        self.bgp_driver._replace_cr_lrp_nexthops(
+            cr_lrp_info, [self.ipv6 + '/64'], self.bridge, 20)
+
+        mock_replace_nexthop.assert_called_once_with(
+            self.bgp_driver.ovn_routing_tables_routes, {}, AF_INET6,
+            self.bridge, vlan=10, new_vlan=20, via=self.ipv6,
+            new_via=self.ipv6)
+
+    @mock.patch.object(linux_net, 'replace_nexthop')
+    def test__replace_cr_lrp_nexthops_bridge_changed(
+            self, mock_replace_nexthop):
+        self.bgp_driver.ovn_nexthops = {}
+        cr_lrp_info = cr_lrp_store.CRLRPInfo(
+            'fake-router-dp', 'fake-provider-dp', ['172.24.4.10/24'],
+            self.mac, bridge_device='br-other')
+        self.bgp_driver._replace_cr_lrp_nexthops(
+            cr_lrp_info, ['172.24.4.11/24'], self.bridge, None)
+        mock_replace_nexthop.assert_not_called()
+
+    @mock.patch.object(linux_net, 'replace_nexthop')
+    def test__replace_cr_lrp_nexthops_no_nexthops(
+            self, mock_replace_nexthop):
+        cr_lrp_info = cr_lrp_store.CRLRPInfo(
+            'fake-router-dp', 'fake-provider-dp', ['172.24.4.10/24'],
+            self.mac, bridge_device=self.bridge)
+        self.bgp_driver._replace_cr_lrp_nexthops(
+            cr_lrp_info, ['172.24.4.11/24'], self.bridge, None)
+        mock_replace_nexthop.assert_not_called()
+
+    def _enable_route_aggregation(self):
+        self.bgp_driver._route_advertisement = True
+        self.bgp_driver._route_aggregator = aggregation.RouteAggregator()
+        for i in range(3):
+            self.bgp_driver._route_aggregator.add('172.24.4.{}'.format(i))
+
+    def test___init___prefix_aggregation_address_mode(self):
+        CONF.set_override('bgp_prefix_aggregation', True)
+        self.addCleanup(CONF.clear_override, 'bgp_prefix_aggregation')
+        bgp_driver = ovn_bgp_driver.OVNBGPDriver()
+        self.assertIsNone(bgp_driver._route_aggregator)
+
+    def test___init___prefix_aggregation_route_mode(self):
+        CONF.set_override('bgp_prefix_aggregation', True)
+        self.addCleanup(CONF.clear_override, 'bgp_prefix_aggregation')
+        CONF.set_override('bgp_advertisement_mode', 'route')
+        self.addCleanup(CONF.clear_override, 'bgp_advertisement_mode')
+        bgp_driver = ovn_bgp_driver.OVNBGPDriver()
+        self.assertIsInstance(bgp_driver._route_aggregator,
+                              aggregation.RouteAggregator)
+
+    @mock.patch.object(linux_net, 'del_ip_host_routes')
+    @mock.patch.object(linux_net, 'add_ip_host_routes')
+    def test__advertise_ips_aggregation(self, mock_add_host_routes,
+                                        mock_del_host_routes):
+        self._enable_route_aggregation()
+        self.bgp_driver._advertise_ips(['172.24.4.3', self.ipv4])
+
+        mock_add_host_routes.assert_called_once_with(
+            CONF.bgp_nic, ['172.24.4.0/30', '192.168.1.17/32'],
+            CONF.bgp_vrf_table_id)
+        mock_del_host_routes.assert_called_once_with(
+            CONF.bgp_nic, ['172.24.4.0/31', '172.24.4.2/32'],
+            CONF.bgp_vrf_table_id)
+
+    @mock.patch.object(linux_net, 'del_ip_host_routes')
+    @mock.patch.object(linux_net, 'add_ip_host_routes')
+    def test__advertise_ips_aggregation_same_batch(
+            self, mock_add_host_routes, mock_del_host_routes):
+        self.bgp_driver._route_advertisement = True
+        self.bgp_driver._route_aggregator = aggregation.RouteAggregator()
+        self.bgp_driver._advertise_ips(
+            ['172.24.4.{}'.format(i) for i in range(4)])
+
+        mock_add_host_routes.assert_called_once_with(
+            CONF.bgp_nic, ['172.24.4.0/30'], CONF.bgp_vrf_table_id)
+        mock_del_host_routes.assert_called_once_with(
+            CONF.bgp_nic, [], CONF.bgp_vrf_table_id)
+
+    @mock.patch.object(linux_net, 'del_ip_host_routes')
+    @mock.patch.object(linux_net, 'add_ip_host_routes')
+    def test__advertise_ips_aggregation_deferred(
+            self, mock_add_host_routes, mock_del_host_routes):
+        self._enable_route_aggregation()
+        self.bgp_driver._defer_advertisement = True
+        self.bgp_driver._advertise_ips(['172.24.4.3'])
+
+        mock_add_host_routes.assert_not_called()
+        mock_del_host_routes.assert_not_called()
+        self.assertEqual({'172.24.4.0/30'},
+                         self.bgp_driver._route_aggregator.get_prefixes())
+
+    @mock.patch.object(linux_net, 'del_ip_host_routes')
+    @mock.patch.object(linux_net, 'add_ip_host_routes')
+    def test__withdraw_advertised_ips_aggregation(
+            self, mock_add_host_routes, mock_del_host_routes):
+        self._enable_route_aggregation()
+        self.bgp_driver._route_aggregator.add('172.24.4.3')
+        self.bgp_driver._withdraw_advertised_ips(['172.24.4.1'])
+
+        mock_add_host_routes.assert_called_once_with(
+            CONF.bgp_nic, ['172.24.4.0/32', '172.24.4.2/31'],
+            CONF.bgp_vrf_table_id)
+        mock_del_host_routes.assert_called_once_with(
+            CONF.bgp_nic, ['172.24.4.0/30'], CONF.bgp_vrf_table_id)
+
+    def test__get_advertised_ips_on_network_aggregation(self):
+        self._enable_route_aggregation()
+        self.bgp_driver._route_aggregator.add(self.ipv4)
+        ret = self.bgp_driver._get_advertised_ips_on_network(
+            ipaddress.ip_network('172.24.4.0/24'))
+        self.assertEqual(['172.24.4.0', '172.24.4.1', '172.24.4.2'], ret)
+
+    @mock.patch.object(linux_net, 'del_ip_host_routes')
+    @mock.patch.object(linux_net, 'add_ip_host_routes')
+    def test__get_advertised_ips_on_network_route_mode(
+            self, mock_add_host_routes, mock_del_host_routes):
+        self.bgp_driver._route_advertisement = True
+        self.bgp_driver._advertise_ips(
+            ['172.24.4.{}'.format(i) for i in range(3)] + [self.ipv4])
+        self.bgp_driver._withdraw_advertised_ips(['172.24.4.1'])
+
+        ret = self.bgp_driver._get_advertised_ips_on_network(
+            ipaddress.ip_network('172.24.4.0/24'))
+
+        self.assertEqual(['172.24.4.0', '172.24.4.2'], ret)
+
+    @mock.patch.object(linux_net, 'delete_exposed_ips')
+    @mock.patch.object(linux_net, 'add_ips_to_dev')
+    def test__get_advertised_ips_on_network_address_mode(
+            self, mock_add_ips_dev, mock_delete_exposed_ips):
+        self.bgp_driver._advertise_ips([self.ipv4, self.ipv6])
+        self.bgp_driver._delete_advertised_ips([self.ipv4])
+
+        ret = self.bgp_driver._get_advertised_ips_on_network(
+            ipaddress.ip_network('192.168.1.0/24'))
+        self.assertEqual([], ret)
+        ret = self.bgp_driver._get_advertised_ips_on_network(
+            ipaddress.ip_network(self.ipv6))
+        self.assertEqual([self.ipv6], ret)
+
+    @mock.patch.object(linux_net, 'delete_exposed_ips')
+    @mock.patch.object(linux_net, 'get_exposed_ips')
+    @mock.patch.object(linux_net, 'del_ip_host_routes')
+    def test__sync_advertised_ips_route_mode(
+            self, mock_del_host_routes, mock_get_exposed_ips,
+            mock_delete_exposed_ips):
+        self.bgp_driver._route_advertisement = True
+        mock_get_exposed_ips.return_value = [self.ipv4, self.ipv6]
+        self.bgp_driver._sync_advertised_ips(['10.0.0.1'])
+
+        mock_get_exposed_ips.assert_called_once_with(CONF.bgp_nic)
+        mock_delete_exposed_ips.assert_called_once_with(
+            [self.ipv4, self.ipv6], CONF.bgp_nic)
+        mock_del_host_routes.assert_called_once_with(
+            CONF.bgp_nic, ['10.0.0.1'], CONF.bgp_vrf_table_id)
+
+    @mock.patch.object(linux_net, 'delete_exposed_ips')
+    @mock.patch.object(linux_net, 'get_exposed_ips')
+    def test__sync_advertised_ips_address_mode(
+            self, mock_get_exposed_ips, mock_delete_exposed_ips):
+        self.bgp_driver._sync_advertised_ips([self.ipv4])
+
+        mock_get_exposed_ips.assert_not_called()
+        mock_delete_exposed_ips.assert_called_once_with(
+            [self.ipv4], CONF.bgp_nic)
+
+    @mock.patch.object(linux_net, 'delete_exposed_ips')
+    def test__sync_advertised_ips_seen(self, mock_delete_exposed_ips):
+        exposed_ips = [self.ipv4, '2001:db8::1', '2001:db8::2']
+        seen_ips = {ipaddress.ip_address(self.ipv4),
+                    ipaddress.ip_address('2001:db8:0::0001')}
+
+        self.bgp_driver._sync_advertised_ips(exposed_ips, seen_ips)
+
+        mock_delete_exposed_ips.assert_called_once_with(
+            ['2001:db8::2'], CONF.bgp_nic)
+
+    @mock.patch.object(linux_net, 'get_exposed_ips', return_value=[])
+    @mock.patch.object(linux_net, 'del_ip_host_routes')
+    @mock.patch.object(linux_net, 'add_ip_host_routes')
+    def test__sync_advertised_ips_aggregation(
+            self, mock_add_host_routes, mock_del_host_routes, mock_get_ips):
+        self._enable_route_aggregation()
+        self.bgp_driver._route_aggregator.add('172.24.4.3')
+        exposed_ips = ['172.24.4.0/32', '172.24.4.1/32', '172.24.4.2/31',
+                       '10.0.0.1/32']
+        self.bgp_driver._sync_advertised_ips(exposed_ips)
+
+        mock_add_host_routes.assert_called_once_with(
+            CONF.bgp_nic, ['172.24.4.0/30'], CONF.bgp_vrf_table_id)
+        mock_del_host_routes.assert_called_once_with(
+            CONF.bgp_nic, ['10.0.0.1/32', '172.24.4.0/32', '172.24.4.1/32',
+                           '172.24.4.2/31'],
+            CONF.bgp_vrf_table_id)
+
+    @mock.patch.object(linux_net, 'add_ip_nei')
+    @mock.patch.object(linux_net, 'del_ip_rule')
+    @mock.patch.object(linux_net, 'add_ips_to_dev')
+    @mock.patch.object(linux_net, 'add_ip_route')
+    @mock.patch.object(linux_net, 'add_ip_rule')
+    def test__expose_provider_port_compact_ip_rules(
+            self, mock_add_rule, mock_add_route, mock_add_ips_dev,
+            mock_del_rule, mock_add_nei):
+        self.bgp_driver._compact_ip_rules = True
+        self.bgp_driver._ip_rule_aggregators[self.bridge].add('172.24.4.0')
+        port_ips = ['172.24.4.1']
+        mock_get_bridge = mock.patch.object(
+            self.bgp_driver, '_get_bridge_for_datapath').start()
+        mock_get_bridge.return_value = (self.bridge, 10)
+        self.bgp_driver._expose_provider_port(port_ips, 'fake-provider-dp',
+                                              lladdr=self.mac)
+
+        mock_add_ips_dev.assert_called_once_with(CONF.bgp_nic, port_ips)
+        mock_add_rule.assert_called_once_with('172.24.4.0/31', 'fake-table')
+        mock_del_rule.assert_called_once_with('172.24.4.0/32', 'fake-table')
+        mock_add_nei.assert_called_once_with('172.24.4.1', self.mac,
+                                             self.bridge)
+        mock_add_route.assert_called_once_with(
+            mock.ANY, '172.24.4.1', 'fake-table', self.bridge, vlan=10)
+
+    @mock.patch.object(linux_net, 'add_ip_rule')
+    @mock.patch.object(linux_net, 'add_ip_route')
+    def test__expose_provider_port_compact_ip_rules_invalid_ip(
+            self, mock_add_route, mock_add_rule):
+        self.bgp_driver._compact_ip_rules = True
+        mock_get_bridge = mock.patch.object(
+            self.bgp_driver, '_get_bridge_for_datapath').start()
+        mock_get_bridge.return_value = (self.bridge, 10)
+        mock_add_ips_dev = mock.patch.object(
+            linux_net, 'add_ips_to_dev').start()
+
+        ret = self.bgp_driver._expose_provider_port(['invalid-ip'],
+                                                    'fake-provider-dp')
+
+        self.assertEqual([], ret)
+        mock_add_ips_dev.assert_called_once_with(CONF.bgp_nic,
+                                                 ['invalid-ip'])
+        mock_add_rule.assert_not_called()
+        mock_add_route.assert_not_called()
+
+    @mock.patch.object(linux_net, 'del_ip_nei')
+    @mock.patch.object(linux_net, 'add_ip_rule')
+    @mock.patch.object(linux_net, 'del_ips_from_dev')
+    @mock.patch.object(linux_net, 'del_ip_route')
+    @mock.patch.object(linux_net, 'del_ip_rule')
+    def test__withdraw_provider_port_compact_ip_rules(
+            self, mock_del_rule, mock_del_route, mock_del_ips_dev,
+            mock_add_rule, mock_del_nei):
+        self.bgp_driver._compact_ip_rules = True
+        for ip in ('172.24.4.0', '172.24.4.1'):
+            self.bgp_driver._ip_rule_aggregators[self.bridge].add(ip)
+        mock_get_bridge = mock.patch.object(
+            self.bgp_driver, '_get_bridge_for_datapath').start()
+        mock_get_bridge.return_value = (self.bridge, 10)
+        self.bgp_driver._withdraw_provider_port(
+            ['172.24.4.1'], 'fake-provider-dp', lladdr=self.mac)
+
+        mock_del_ips_dev.assert_called_once_with(CONF.bgp_nic,
+                                                 ['172.24.4.1'])
+        mock_add_rule.assert_called_once_with('172.24.4.0/32', 'fake-table')
+        mock_del_rule.assert_called_once_with('172.24.4.0/31', 'fake-table')
+        mock_del_nei.assert_called_once_with('172.24.4.1', self.mac,
+                                             self.bridge)
+        mock_del_route.assert_called_once_with(
+            mock.ANY, '172.24.4.1', 'fake-table', self.bridge, vlan=10)
+
     @mock.patch.object(linux_net, 'add_ips_to_dev')
     @mock.patch.object(linux_net, 'add_ip_route')
     @mock.patch.object(linux_net, 'add_ip_rule')
@@ -532,15 +1050,12 @@ class TestOVNBGPDriver(test_base.TestCase):
     def test__process_lrp_port(self, mock_ip_version, mock_add_rule,
                                mock_add_route, mock_add_ips_dev):
         mock_ip_version.return_value = constants.IP_VERSION_4
-        gateway = {}
-        gateway['ips'] = ['{}/32'.format(self.fip),
-                          '2003::1234:abcd:ffff:c0a8:102/128']
-        gateway['provider_datapath'] = 'bc6780f4-9510-4270-b4d2-b8d5c6802713'
-        gateway['subnets_datapath'] = {}
-        gateway['subnets_cidr'] = []
-        gateway['bridge_device'] = self.bridge
-        gateway['bridge_vlan'] = 10
-        self.bgp_driver.ovn_local_cr_lrps = {'gateway_port': gateway}
+        gateway = cr_lrp_store.CRLRPInfo(
+            'fake-router-dp', 'bc6780f4-9510-4270-b4d2-b8d5c6802713',
+            ['{}/32'.format(self.fip), '2003::1234:abcd:ffff:c0a8:102/128'],
+            self.mac, bridge_device=self.bridge, bridge_vlan=10)
+        self.bgp_driver.ovn_local_cr_lrps = cr_lrp_store.CRLRPStore()
+        self.bgp_driver.ovn_local_cr_lrps['gateway_port'] = gateway
 
         router_port = fakes.create_object({
             'chassis': [],
@@ -617,15 +1132,12 @@ class TestOVNBGPDriver(test_base.TestCase):
 
         mock_ipv6_gua.return_value = True
         mock_ip_version.return_value = constants.IP_VERSION_6
-        gateway = {}
-        gateway['ips'] = ['{}/32'.format(self.fip),
-                          '2003::1234:abcd:ffff:c0a8:102/128']
-        gateway['provider_datapath'] = 'bc6780f4-9510-4270-b4d2-b8d5c6802713'
-        gateway['subnets_datapath'] = {}
-        gateway['subnets_cidr'] = []
-        gateway['bridge_device'] = self.bridge
-        gateway['bridge_vlan'] = 10
-        self.bgp_driver.ovn_local_cr_lrps = {'gateway_port': gateway}
+        gateway = cr_lrp_store.CRLRPInfo(
+            'fake-router-dp', 'bc6780f4-9510-4270-b4d2-b8d5c6802713',
+            ['{}/32'.format(self.fip), '2003::1234:abcd:ffff:c0a8:102/128'],
+            self.mac, bridge_device=self.bridge, bridge_vlan=10)
+        self.bgp_driver.ovn_local_cr_lrps = cr_lrp_store.CRLRPStore()
+        self.bgp_driver.ovn_local_cr_lrps['gateway_port'] = gateway
 
         router_port = fakes.create_object({
             'chassis': [],
@@ -702,15 +1214,12 @@ class TestOVNBGPDriver(test_base.TestCase):
         CONF.set_override('expose_ipv6_gua_tenant_networks', True)
         self.addCleanup(CONF.clear_override, 'expose_ipv6_gua_tenant_networks')
         mock_ipv6_gua.return_value = False
-        gateway = {}
-        gateway['ips'] = ['{}/32'.format(self.fip),
-                          '2003::1234:abcd:ffff:c0a8:102/128']
-        gateway['provider_datapath'] = 'bc6780f4-9510-4270-b4d2-b8d5c6802713'
-        gateway['subnets_datapath'] = {}
-        gateway['subnets_cidr'] = []
-        gateway['bridge_device'] = self.bridge
-        gateway['bridge_vlan'] = 10
-        self.bgp_driver.ovn_local_cr_lrps = {'gateway_port': gateway}
+        gateway = cr_lrp_store.CRLRPInfo(
+            'fake-router-dp', 'bc6780f4-9510-4270-b4d2-b8d5c6802713',
+            ['{}/32'.format(self.fip), '2003::1234:abcd:ffff:c0a8:102/128'],
+            self.mac, bridge_device=self.bridge, bridge_vlan=10)
+        self.bgp_driver.ovn_local_cr_lrps = cr_lrp_store.CRLRPStore()
+        self.bgp_driver.ovn_local_cr_lrps['gateway_port'] = gateway
 
         router_port = fakes.create_object({
             'chassis': [],
@@ -738,15 +1247,12 @@ class TestOVNBGPDriver(test_base.TestCase):
     def test__process_lrp_port_invalid_ip(
             self, mock_ip_version, mock_add_rule, mock_add_route):
         mock_ip_version.return_value = constants.IP_VERSION_4
-        gateway = {}
-        gateway['ips'] = ['{}/32'.format(self.fip),
-                          '2003::1234:abcd:ffff:c0a8:102/128']
-        gateway['provider_datapath'] = 'bc6780f4-9510-4270-b4d2-b8d5c6802713'
-        gateway['subnets_datapath'] = {}
-        gateway['subnets_cidr'] = []
-        gateway['bridge_device'] = self.bridge
-        gateway['bridge_vlan'] = 10
-        self.bgp_driver.ovn_local_cr_lrps = {'gateway_port': gateway}
+        gateway = cr_lrp_store.CRLRPInfo(
+            'fake-router-dp', 'bc6780f4-9510-4270-b4d2-b8d5c6802713',
+            ['{}/32'.format(self.fip), '2003::1234:abcd:ffff:c0a8:102/128'],
+            self.mac, bridge_device=self.bridge, bridge_vlan=10)
+        self.bgp_driver.ovn_local_cr_lrps = cr_lrp_store.CRLRPStore()
+        self.bgp_driver.ovn_local_cr_lrps['gateway_port'] = gateway
 
         router_port = fakes.create_object({
             'chassis': [],
@@ -975,7 +1481,7 @@ class TestOVNBGPDriver(test_base.TestCase):
                                     self.bridge, vlan=10)]
         mock_add_route.assert_has_calls(expected_calls)
 
-    @mock.patch.object(linux_net, 'add_ndp_proxy')
+    @mock.patch.object(linux_net, 'add_ndp_proxies')
     @mock.patch.object(linux_net, 'get_ip_version')
     @mock.patch.object(linux_net, 'add_ip_route')
     @mock.patch.object(linux_net, 'add_ip_rule')
@@ -1048,7 +1554,7 @@ class TestOVNBGPDriver(test_base.TestCase):
                                     self.bridge, vlan=10)]
         mock_add_route.assert_has_calls(expected_calls)
 
-        mock_ndp_proxy.assert_called_once_with(self.ipv6, self.bridge, 10)
+        mock_ndp_proxy.assert_called_once_with([(self.ipv6, self.bridge, 10)])
 
         expected_calls = [mock.call(lrp0, self.cr_lrp0),
                           mock.call(lrp1, self.cr_lrp0),
@@ -1212,7 +1718,7 @@ class TestOVNBGPDriver(test_base.TestCase):
                                     self.bridge, vlan=10)]
         mock_del_route.assert_has_calls(expected_calls)
 
-    @mock.patch.object(linux_net, 'del_ndp_proxy')
+    @mock.patch.object(linux_net, 'del_ndp_proxies')
     @mock.patch.object(linux_net, 'get_ip_version')
     @mock.patch.object(linux_net, 'del_ip_route')
     @mock.patch.object(linux_net, 'del_ip_rule')
@@ -1253,7 +1759,8 @@ class TestOVNBGPDriver(test_base.TestCase):
                                     self.bridge, vlan=None)]
         mock_del_route.assert_has_calls(expected_calls)
 
-        mock_ndp_proxy.assert_called_once_with(self.ipv6, self.bridge, None)
+        mock_ndp_proxy.assert_called_once_with(
+            [(self.ipv6, self.bridge, None)])
 
         mock_withdraw_lrp_port.assert_called_once_with(
             '192.168.1.1/24', None, self.cr_lrp0)
@@ -1416,7 +1923,7 @@ class TestOVNBGPDriver(test_base.TestCase):
 
         mock_del_ip_dev.assert_not_called()
 
-    @mock.patch.object(linux_net, 'add_ndp_proxy')
+    @mock.patch.object(linux_net, 'add_ndp_proxies')
     @mock.patch.object(linux_net, 'get_ip_version')
     def test__expose_cr_lrp_port(self, mock_ip_version, mock_ndp_proxy):
         mock_expose_provider_port = mock.patch.object(
@@ -1442,11 +1949,12 @@ class TestOVNBGPDriver(test_base.TestCase):
         mock_expose_provider_port.assert_called_once_with(
             ips_without_mask, 'fake-provider-dp', self.bridge, None,
             lladdr=self.mac)
-        mock_ndp_proxy.assert_called_once_with(self.ipv6, self.bridge, None)
+        mock_ndp_proxy.assert_called_once_with(
+            [(self.ipv6, self.bridge, None)])
         mock_process_lrp_port.assert_called_once_with(dp_port0, self.cr_lrp0)
         mock_process_ovn_lb.assert_called_once_with(ovn_lb, self.cr_lrp0)
 
-    @mock.patch.object(linux_net, 'del_ndp_proxy')
+    @mock.patch.object(linux_net, 'del_ndp_proxies')
     @mock.patch.object(linux_net, 'get_ip_version')
     def test__withdraw_cr_lrp_port(self, mock_ip_version, mock_ndp_proxy):
         mock_withdraw_provider_port = mock.patch.object(
@@ -1460,15 +1968,13 @@ class TestOVNBGPDriver(test_base.TestCase):
         mock_ip_version.side_effect = [constants.IP_VERSION_4,
                                        constants.IP_VERSION_6]
         ovn_lb = mock.Mock()
-        gateway = {
-            'ips': ips,
-            'provider_datapath': 'fake-provider-dp',
-            'subnets_cidr': ['192.168.1.1/24'],
-            'bridge_device': self.bridge,
-            'bridge_vlan': 10,
-            'mac': self.mac,
-            'ovn_lbs': [ovn_lb]}
-        self.bgp_driver.ovn_local_cr_lrps = {'gateway_port': gateway}
+        gateway = cr_lrp_store.CRLRPInfo(
+            'fake-router-dp', 'fake-provider-dp', ips, self.mac,
+            bridge_device=self.bridge, bridge_vlan=10)
+        gateway.subnets_cidr.append('192.168.1.1/24')
+        self.bgp_driver.ovn_local_cr_lrps = cr_lrp_store.CRLRPStore()
+        self.bgp_driver.ovn_local_cr_lrps['gateway_port'] = gateway
+        self.bgp_driver.ovn_local_cr_lrps.add_ovn_lb('gateway_port', ovn_lb)
 
         self.bgp_driver._withdraw_cr_lrp_port(
             ips, self.mac, self.bridge, 10,
@@ -1478,7 +1984,7 @@ class TestOVNBGPDriver(test_base.TestCase):
         mock_withdraw_provider_port.assert_called_once_with(
             ips_without_mask, 'fake-provider-dp', bridge_device=self.bridge,
             bridge_vlan=10, lladdr=self.mac)
-        mock_ndp_proxy.assert_called_once_with(self.ipv6, self.bridge, 10)
+        mock_ndp_proxy.assert_called_once_with([(self.ipv6, self.bridge, 10)])
         mock_withdraw_lrp_port.assert_called_once_with('192.168.1.1/24', None,
                                                        'gateway_port')
         mock_withdraw_ovn_lb_on_provider.assert_called_once_with(
@@ -1520,11 +2026,11 @@ class TestOVNBGPDriver(test_base.TestCase):
             mask='32', via=self.fip)
         expected_calls = [
             mock.call(dp_port0, ip_version=constants.IP_VERSION_4,
-                      exposed_ips=[], ovn_ip_rules={}),
+                      seen_ips=None, seen_ip_rules=None),
             mock.call(dp_port1, ip_version=constants.IP_VERSION_4,
-                      exposed_ips=[], ovn_ip_rules={}),
+                      seen_ips=None, seen_ip_rules=None),
             mock.call(dp_port2, ip_version=constants.IP_VERSION_4,
-                      exposed_ips=[], ovn_ip_rules={})]
+                      seen_ips=None, seen_ip_rules=None)]
         mock_expose_tenant_port.assert_has_calls(expected_calls)
 
     @mock.patch.object(linux_net, 'add_ip_route')
@@ -1606,11 +2112,11 @@ class TestOVNBGPDriver(test_base.TestCase):
             mask='128', via=self.fip)
         expected_calls = [
             mock.call(dp_port0, ip_version=constants.IP_VERSION_6,
-                      exposed_ips=[], ovn_ip_rules={}),
+                      seen_ips=None, seen_ip_rules=None),
             mock.call(dp_port1, ip_version=constants.IP_VERSION_6,
-                      exposed_ips=[], ovn_ip_rules={}),
+                      seen_ips=None, seen_ip_rules=None),
             mock.call(dp_port2, ip_version=constants.IP_VERSION_6,
-                      exposed_ips=[], ovn_ip_rules={})]
+                      seen_ips=None, seen_ip_rules=None)]
         mock_expose_tenant_port.assert_has_calls(expected_calls)
 
     @mock.patch.object(linux_net, 'add_ip_route')
@@ -1724,16 +2230,15 @@ class TestOVNBGPDriver(test_base.TestCase):
 
         mock_withdraw_lrp_port.assert_not_called()
 
-    @mock.patch.object(linux_net, 'get_exposed_ips_on_network')
     @mock.patch.object(linux_net, 'delete_exposed_ips')
     @mock.patch.object(linux_net, 'del_ip_route')
     @mock.patch.object(linux_net, 'del_ip_rule')
     @mock.patch.object(linux_net, 'get_ip_version')
     def test__withdraw_lrp_port(
             self, mock_ip_version, mock_del_rule, mock_del_route,
-            mock_del_exposed_ips, mock_get_exposed_ips):
+            mock_del_exposed_ips):
         mock_ip_version.return_value = constants.IP_VERSION_4
-        mock_get_exposed_ips.return_value = [self.ipv4]
+        self.bgp_driver._track_advertised_ips([self.ipv4, '10.10.1.76'])
         self.bgp_driver.ovn_local_lrps = {self.lrp0: self.cr_lrp0}
 
         self.bgp_driver._withdraw_lrp_port(
@@ -1746,8 +2251,9 @@ class TestOVNBGPDriver(test_base.TestCase):
             mask='32', via=self.fip)
         mock_del_exposed_ips.assert_called_once_with(
             [self.ipv4], CONF.bgp_nic)
+        self.assertEqual(['10.10.1.76'], [
+            ip for _, ip in self.bgp_driver._advertised_ips.items()])
 
-    @mock.patch.object(linux_net, 'get_exposed_ips_on_network')
     @mock.patch.object(linux_net, 'delete_exposed_ips')
     @mock.patch.object(linux_net, 'del_ip_route')
     @mock.patch.object(linux_net, 'del_ip_rule')
@@ -1755,14 +2261,14 @@ class TestOVNBGPDriver(test_base.TestCase):
     @mock.patch.object(driver_utils, 'is_ipv6_gua')
     def test__withdraw_lrp_port_gua(
             self, mock_ipv6_gua, mock_ip_version, mock_del_rule,
-            mock_del_route, mock_del_exposed_ips, mock_get_exposed_ips):
+            mock_del_route, mock_del_exposed_ips):
         CONF.set_override('expose_tenant_networks', False)
         self.addCleanup(CONF.clear_override, 'expose_tenant_networks')
         CONF.set_override('expose_ipv6_gua_tenant_networks', True)
         self.addCleanup(CONF.clear_override, 'expose_ipv6_gua_tenant_networks')
         mock_ipv6_gua.return_value = True
         mock_ip_version.return_value = constants.IP_VERSION_6
-        mock_get_exposed_ips.return_value = [self.ipv6]
+        self.bgp_driver._track_advertised_ips([self.ipv6])
         self.bgp_driver.ovn_local_lrps = {self.lrp0: self.cr_lrp0}
 
         self.bgp_driver._withdraw_lrp_port(
@@ -1776,20 +2282,19 @@ class TestOVNBGPDriver(test_base.TestCase):
         mock_del_exposed_ips.assert_called_once_with(
             [self.ipv6], CONF.bgp_nic)
 
-    @mock.patch.object(linux_net, 'get_exposed_ips_on_network')
     @mock.patch.object(linux_net, 'delete_exposed_ips')
     @mock.patch.object(linux_net, 'del_ip_route')
     @mock.patch.object(linux_net, 'del_ip_rule')
     @mock.patch.object(driver_utils, 'is_ipv6_gua')
     def test__withdraw_lrp_port_no_gua(
             self, mock_ipv6_gua, mock_del_rule, mock_del_route,
-            mock_del_exposed_ips, mock_get_exposed_ips):
+            mock_del_exposed_ips):
         CONF.set_override('expose_tenant_networks', False)
         self.addCleanup(CONF.clear_override, 'expose_tenant_networks')
         CONF.set_override('expose_ipv6_gua_tenant_networks', True)
         self.addCleanup(CONF.clear_override, 'expose_ipv6_gua_tenant_networks')
         mock_ipv6_gua.return_value = False
-        mock_get_exposed_ips.return_value = [self.ipv6]
+        self.bgp_driver._track_advertised_ips([self.ipv6])
         self.bgp_driver.ovn_local_lrps = {self.lrp0: self.cr_lrp0}
 
         self.bgp_driver._withdraw_lrp_port(
@@ -13,6 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from socket import AF_INET
 from unittest import mock
 
 from oslo_config import cfg
@@ -20,6 +21,8 @@ from oslo_config import cfg
 from ovn_bgp_agent import config
 from ovn_bgp_agent import constants
 from ovn_bgp_agent.drivers.openstack import ovn_evpn_driver
+from ovn_bgp_agent.drivers.openstack.utils import cr_lrp_store
+from ovn_bgp_agent.drivers.openstack.utils import evpn_context
 from ovn_bgp_agent.drivers.openstack.utils import frr
 from ovn_bgp_agent.drivers.openstack.utils import ovn
 from ovn_bgp_agent.drivers.openstack.utils import ovs
@@ -38,6 +41,10 @@ class TestOVNEVPNDriver(test_base.TestCase):
         self.evpn_driver = ovn_evpn_driver.OVNEVPNDriver()
         self.mock_sbdb = mock.patch.object(ovn, 'OvnSbIdl').start()
         self.mock_ovs_idl = mock.patch.object(ovs, 'OvsIdl').start()
+        self.mock_contexts_start = mock.patch.object(
+            evpn_context.EVPNContextManager, 'start').start()
+        self.mock_contexts_stop = mock.patch.object(
+            evpn_context.EVPNContextManager, 'stop').start()
         self.evpn_driver.ovs_idl = self.mock_ovs_idl
         self.evpn_driver.sb_idl = mock.Mock()
         self.sb_idl = self.evpn_driver.sb_idl
@@ -60,58 +67,69 @@ class TestOVNEVPNDriver(test_base.TestCase):
             'vrf_name': 'fake-vrf-name',
             'veth_vrf': 'fake-veth-vrf',
             'veth_ovs': 'fake-veth-ovs',
-            'vlan_name': 'fake-vlan-name'})
+            'vlan_name': 'fake-vlan-name',
+            'svi_name': None})
         self.cr_lrp = 'cr-fake-logical-port'
         self.cr_lrp1 = 'cr-fake-logical-port1'
-        self.evpn_driver.ovn_local_cr_lrps = {
-            self.cr_lrp: {
-                'provider_datapath': 'fake-provider-dp',
-                'ips': [self.fip],
-                'vni': self.vni,
-                'bgp_as': 'fake-bgp-as',
-                'bridge': self.bridge,
-                'vlan': 'fake-vlan',
-                'vxlan': 'fake-vxlan',
-                'vrf': 'fake-vrf',
-                'veth_vrf': 'fake-veth-vrf',
-                'veth_ovs': 'fake-veth-ovs',
-                'lo': 'fake-lo',
-                'mac': self.mac},
-            self.cr_lrp1: {
-                'provider_datapath': 'fake-provider-dp1',
-                'ips': [self.fip],
-                'vni': self.vni1,
-                'bgp_as': 'fake-bgp-as1',
-                'bridge': self.bridge,
-                'vlan': 'fake-vlan1',
-                'vxlan': 'fake-vxlan1',
-                'vrf': 'fake-vrf1',
-                'veth_vrf': 'fake-veth-vrf1',
-                'veth_ovs': 'fake-veth-ovs1',
-                'lo': 'fake-lo1',
-                'mac': self.mac1},
-        }
+        self.evpn_driver.ovn_local_cr_lrps = cr_lrp_store.CRLRPStore()
+        self.evpn_driver.ovn_local_cr_lrps[self.cr_lrp] = (
+            cr_lrp_store.EVPNCRLRPInfo(
+                'fake-router-dp', 'fake-provider-dp', [self.fip], self.mac,
+                self.vni, 'fake-bgp-as', bridge=self.bridge,
+                vlan='fake-vlan', vxlan='fake-vxlan', vrf='fake-vrf',
+                veth_vrf='fake-veth-vrf', veth_ovs='fake-veth-ovs',
+                lo='fake-lo'))
+        self.evpn_driver.ovn_local_cr_lrps[self.cr_lrp1] = (
+            cr_lrp_store.EVPNCRLRPInfo(
+                'fake-router-dp1', 'fake-provider-dp1', [self.fip], self.mac1,
+                self.vni1, 'fake-bgp-as1', bridge=self.bridge,
+                vlan='fake-vlan1', vxlan='fake-vxlan1', vrf='fake-vrf1',
+                veth_vrf='fake-veth-vrf1', veth_ovs='fake-veth-ovs1',
+                lo='fake-lo1'))
         self.evpn_driver._ovn_routing_tables_routes = {
-            'fake-vlan': [{
-                'route': {
-                    'oif': 'fake-oif',
-                    'gateway': 'fake-gateway',
-                    'dst': '{}/32'.format(self.ipv4),
-                    'dst_len': 32,
-                    'table': 'fake-table'},
-                'vlan': 88,
-                }]
+            'fake-vlan': {linux_net.RouteKey(
+                table='fake-table', dst='{}/32'.format(self.ipv4),
+                dst_len=32, family=AF_INET, oif='fake-oif', vlan=88,
+                gateway='fake-gateway')}
             }
 
+    def _get_cr_lrp_info_attrs(self, cr_lrp_info):
+        return {attr: getattr(cr_lrp_info, attr) for attr in (
+            'router_datapath', 'provider_datapath', 'ips', 'mac', 'vni',
+            'bgp_as', 'lo', 'bridge', 'vxlan', 'vrf', 'veth_vrf',
+            'veth_ovs', 'vlan', 'svi')}
+
     def test_start(self):
         self.evpn_driver.start()
         # Assert connections were started
         self.mock_ovs_idl().start.assert_called_once_with(
             CONF.ovsdb_connection)
         self.mock_sbdb().start.assert_called_once_with()
-
+        self.mock_sbdb.assert_any_call(
+            mock.ANY, chassis=mock.ANY, events=mock.ANY,
+            tables=ovn_evpn_driver.OVN_TABLES + ['Chassis_Private'])
+        self.mock_contexts_start.assert_called_once_with()
+
+    def test_start_prebuild_standby(self):
+        CONF.set_override('evpn_prebuild_standby', True)
+        self.addCleanup(CONF.clear_override, 'evpn_prebuild_standby')
+        self.evpn_driver.start()
+        self.mock_sbdb.assert_any_call(
+            mock.ANY, chassis=mock.ANY, events=mock.ANY,
+            tables=(ovn_evpn_driver.OVN_TABLES +
+                    ovn_evpn_driver.OVN_HA_TABLES + ['Chassis_Private']))
+
+    @mock.patch.object(frr, 'flush_config')
+    def test_stop(self, mock_flush):
+        self.evpn_driver.stop()
+        mock_flush.assert_called_once_with()
+        self.mock_contexts_stop.assert_called_once_with()
+
+    @mock.patch.object(linux_net, 'get_links_and_routes')
+    @mock.patch.object(frr, 'batch_config')
     @mock.patch.object(linux_net, 'ensure_arp_ndp_enabled_for_bridge')
-    def test_sync(self, mock_ensure_ndp):
+    def test_sync(self, mock_ensure_ndp, mock_batch, mock_get_links):
+        mock_get_links.return_value = ('fake-links', 'fake-routes')
         self.mock_ovs_idl.get_ovn_bridge_mappings.return_value = [
             'net0:bridge0', 'net1:bridge1']
         port0 = fakes.create_object({
@@ -133,6 +151,10 @@ class TestOVNEVPNDriver(test_base.TestCase):
             self.evpn_driver, '_remove_extra_ovs_flows').start()
         mock_remove_extra_vrfs = mock.patch.object(
             self.evpn_driver, '_remove_extra_vrfs').start()
+        mock_prebuild = mock.patch.object(
+            self.evpn_driver, '_prebuild_standby_cr_lrps').start()
+        mock_refill = mock.patch.object(
+            self.evpn_driver._device_pool, 'refill').start()
 
         self.evpn_driver.sync()
 
@@ -140,21 +162,102 @@ class TestOVNEVPNDriver(test_base.TestCase):
         mock_ensure_ndp.assert_has_calls(expected_calls)
         mock_expose_ip.assert_called_once_with(port0, cr_lrp=True)
         mock_remove_extra_exposed_ips.assert_called_once_with()
-        mock_remove_extra_routes.assert_called_once_with()
+        mock_get_links.assert_called_once_with(set())
+        mock_remove_extra_routes.assert_called_once_with(
+            'fake-links', 'fake-routes')
         mock_remove_extra_ovs_flows.assert_called_once_with()
-        mock_remove_extra_vrfs.assert_called_once_with()
+        mock_remove_extra_vrfs.assert_called_once_with('fake-links')
+        mock_batch.return_value.__exit__.assert_called_once_with(
+            None, None, None)
+        mock_prebuild.assert_not_called()
+        mock_refill.assert_called_once_with()
+
+    @mock.patch.object(linux_net, 'get_links_and_routes')
+    @mock.patch.object(frr, 'batch_config')
+    @mock.patch.object(linux_net, 'ensure_arp_ndp_enabled_for_bridge')
+    def test_sync_prebuild_standby(self, mock_ensure_ndp, mock_batch,
+                                   mock_get_links):
+        mock_get_links.return_value = ({}, {})
+        CONF.set_override('evpn_prebuild_standby', True)
+        self.addCleanup(CONF.clear_override, 'evpn_prebuild_standby')
+        self.mock_ovs_idl.get_ovn_bridge_mappings.return_value = []
+        self.sb_idl.get_ports_on_chassis.return_value = []
+        for method in ('_remove_extra_exposed_ips', '_remove_extra_routes',
+                       '_remove_extra_ovs_flows', '_remove_extra_vrfs'):
+            mock.patch.object(self.evpn_driver, method).start()
+        mock_prebuild = mock.patch.object(
+            self.evpn_driver, '_prebuild_standby_cr_lrps').start()
+        mock.patch.object(self.evpn_driver._device_pool, 'refill').start()
+
+        self.evpn_driver.sync()
+
+        mock_prebuild.assert_called_once_with()
+
+    @mock.patch.object(frr, 'vrf_reconfigure')
+    def test__prebuild_standby_cr_lrps(self, mock_vrf_reconfigure):
+        port0 = fakes.create_object({'logical_port': 'cr-lrp-port0',
+                                     'datapath': 'fake-router-dp'})
+        port1 = fakes.create_object({'logical_port': 'cr-lrp-port1',
+                                     'datapath': 'fake-router-dp'})
+        port2 = fakes.create_object({'logical_port': 'cr-lrp-port2',
+                                     'datapath': 'fake-router-dp'})
+        self.sb_idl.get_cr_lrp_ports_standby_on_chassis.return_value = [
+            port0, port1, port2]
+        evpn_info = {'bgp_as': 'fake-bgp-as', 'vni': 99}
+        # port1 has no EVPN info, port2 is not connected to a provider
+        self.sb_idl.get_evpn_info_from_port_name.side_effect = (
+            evpn_info, None, evpn_info)
+        self.sb_idl.get_fip_associated.side_effect = (
+            (None, 'fake-provider-dp'), (None, None))
+        mock.patch.object(self.evpn_driver, '_get_bridge_for_datapath',
+                          return_value=(self.bridge, None)).start()
+        mock_ensure_evpn = mock.patch.object(
+            self.evpn_driver, '_ensure_evpn_devices').start()
+        mock_ensure_evpn.return_value = self.evpn_device
+        # no longer a standby one, and its VNI is not used by other ports
+        self.evpn_driver._ovn_standby_cr_lrps = {
+            'cr-lrp-old': cr_lrp_store.EVPNCRLRPInfo(
+                'fake-router-dp', 'fake-provider-dp', [], None, 100,
+                'fake-bgp-as'),
+            'cr-lrp-active': cr_lrp_store.EVPNCRLRPInfo(
+                'fake-router-dp', 'fake-provider-dp', [], None, self.vni,
+                'fake-bgp-as')}
+
+        self.evpn_driver._prebuild_standby_cr_lrps()
+
+        self.sb_idl.get_cr_lrp_ports_standby_on_chassis.\
+            assert_called_once_with('fake-chassis')
+        mock_ensure_evpn.assert_called_once_with(self.bridge, 99, None)
+        self.assertEqual(['cr-lrp-port0'],
+                         list(self.evpn_driver._ovn_standby_cr_lrps))
+        self.assertEqual(
+            {'router_datapath': 'fake-router-dp',
+             'provider_datapath': 'fake-provider-dp', 'ips': [], 'mac': None,
+             'vni': 99, 'bgp_as': 'fake-bgp-as', 'lo': 'fake-lo-name',
+             'bridge': self.bridge, 'vxlan': 'fake-vxlan-name',
+             'vrf': 'fake-vrf-name', 'veth_vrf': 'fake-veth-vrf',
+             'veth_ovs': 'fake-veth-ovs', 'vlan': 'fake-vlan-name',
+             'svi': None},
+            self._get_cr_lrp_info_attrs(
+                self.evpn_driver._ovn_standby_cr_lrps['cr-lrp-port0']))
+        expected_calls = [
+            mock.call(evpn_info, action='add-vrf'),
+            mock.call({'vni': 100, 'bgp_as': 'fake-bgp-as'},
+                      action='del-vrf')]
+        self.assertEqual(expected_calls,
+                         mock_vrf_reconfigure.call_args_list)
 
     def test__ensure_network_exposed(self):
-        self.sb_idl.get_evpn_info_from_port_name.return_value = 'fake-info'
+        self.sb_idl.get_evpn_info_from_port_name.return_value = self.evpn_info
         self.sb_idl.get_port_datapath.return_value = 'fake-dp'
         mock_expose_subnet = mock.patch.object(
             self.evpn_driver, '_expose_subnet').start()
         mock_get_bridge = mock.patch.object(
             self.evpn_driver, '_get_bridge_for_datapath').start()
         mock_get_bridge.return_value = (self.bridge, self.vlan_tag)
-        gateway = {}
-        gateway['ips'] = ['10.10.10.1/32']
-        gateway['provider_datapath'] = 'fake-prov-dp'
+        gateway = cr_lrp_store.EVPNCRLRPInfo(
+            'fake-dp', 'fake-prov-dp', ['10.10.10.1/32'], self.mac, self.vni,
+            'fake-bgp-as')
         lrp = fakes.create_object({
             'name': 'fake-lrp',
             'logical_port': self.cr_lrp,
@@ -165,9 +268,12 @@ class TestOVNEVPNDriver(test_base.TestCase):
         self.evpn_driver._ensure_network_exposed(lrp, gateway)
 
         mock_expose_subnet.assert_called_once_with(
-            self.ipv4, ['10.10.10.1'],
-            {'ips': ['10.10.10.1/32'], 'provider_datapath': 'fake-prov-dp'},
-            self.bridge, self.vlan_tag, 'fake-dp')
+            self.ipv4, ['10.10.10.1'], gateway, self.bridge, self.vlan_tag,
+            'fake-dp')
+        self.assertEqual(
+            {'datapath': 'fake-dp', 'ip': self.ipv4, 'vni': self.vni,
+             'bgp_as': 'fake-bgp-as'},
+            self.evpn_driver.ovn_local_lrps[self.cr_lrp])
 
     def test__get_bridge_for_datapath(self):
         self.sb_idl.get_network_name_and_tag.return_value = (
@@ -227,20 +333,34 @@ class TestOVNEVPNDriver(test_base.TestCase):
             'fake-vlan-name', self.vlan_tag)
         mock_ensure_evpn.assert_called_once_with(
             self.bridge, self.vni, self.vlan_tag)
-        mock_ensure_net_exposed.assert_called_once_with(
-            lrp1,
+        mock_ensure_net_exposed.assert_called_once_with(lrp1, mock.ANY)
+        cr_lrp_info = mock_ensure_net_exposed.call_args[0][1]
+        self.assertEqual(
             {'router_datapath': 'fake-dp', 'provider_datapath': 'fake-dp',
              'ips': [self.ipv4, self.ipv6], 'mac': self.mac, 'vni': self.vni,
              'bgp_as': 'fake-bgp-as', 'lo': 'fake-lo-name',
              'bridge': self.bridge, 'vxlan': 'fake-vxlan-name',
              'vrf': 'fake-vrf-name', 'veth_vrf': 'fake-veth-vrf',
-             'veth_ovs': 'fake-veth-ovs', 'vlan': 'fake-vlan-name'})
+             'veth_ovs': 'fake-veth-ovs', 'vlan': 'fake-vlan-name',
+             'svi': None},
+            self._get_cr_lrp_info_attrs(cr_lrp_info))
         mock_vrf_reconfigure.assert_called_once_with(
             self.evpn_info, action='add-vrf')
         expected_calls = [mock.call(self.ipv4, self.mac, 'fake-vlan-name'),
                           mock.call(self.ipv6, self.mac, 'fake-vlan-name')]
         mock_add_ip_nei.assert_has_calls(expected_calls)
 
+    def test_expose_ip_stats(self):
+        self.evpn_driver._ovn_standby_cr_lrps = {
+            self.cr_lrp: cr_lrp_store.EVPNCRLRPInfo(
+                'fake-dp', 'fake-dp', [], None, self.vni, 'fake-bgp-as')}
+        self._test_expose_ip(cr_lrp=True)
+        self.assertEqual(1, self.evpn_driver.stats['evpn_cr_lrp_exposed'])
+        self.assertEqual(
+            1, self.evpn_driver.stats['evpn_cr_lrp_exposed_prebuilt'])
+        self.assertIn('evpn_cr_lrp_expose_latency_ms',
+                      self.evpn_driver.stats)
+
     def test_expose_ip(self):
         self._test_expose_ip(cr_lrp=False)
 
@@ -288,19 +408,26 @@ class TestOVNEVPNDriver(test_base.TestCase):
     @mock.patch.object(linux_net, 'add_ips_to_dev')
     def test_expose_remote_ip(self, mock_add_ip_dev):
         self.sb_idl.is_provider_network.return_value = False
-        self.sb_idl.get_evpn_info_from_port_name.return_value = self.evpn_info
         lrp = 'fake-lrp'
         self.sb_idl.get_lrp_port_for_datapath.return_value = lrp
-        self.evpn_driver.ovn_local_lrps = {lrp: 'fake-lrp'}
+        self.evpn_driver.ovn_local_lrps = {
+            lrp: {'datapath': 'fake-dp', 'ip': self.ipv4, 'vni': self.vni,
+                  'bgp_as': 'fake-bgp-as'}}
         row = fakes.create_object({
             'name': 'fake-row', 'datapath': 'fake-dp'})
 
         ips = [self.ipv4, self.ipv6]
         self.evpn_driver.expose_remote_ip(ips, row)
 
+        # the VNI of the router interface is not looked up again
+        self.sb_idl.get_evpn_info_from_port_name.assert_not_called()
+
         lo_name = constants.OVN_EVPN_LO_PREFIX + str(self.vni)
         mock_add_ip_dev.assert_called_once_with(
             lo_name, ips, clear_local_route_at_table=self.vni)
+        self.assertEqual(
+            ips, [ip for _, ip in
+                  self.evpn_driver._ovn_exposed_evpn_ips[lo_name].items()])
 
     @mock.patch.object(linux_net, 'add_ips_to_dev')
     def test_expose_remote_ip_is_provider_network(self, mock_add_ip_dev):
@@ -330,18 +457,29 @@ class TestOVNEVPNDriver(test_base.TestCase):
     @mock.patch.object(linux_net, 'del_ips_from_dev')
     def test_withdraw_remote_ip(self, mock_del_ip_dev):
         self.sb_idl.is_provider_network.return_value = False
-        self.sb_idl.get_evpn_info_from_port_name.return_value = self.evpn_info
         lrp = 'fake-lrp'
         self.sb_idl.get_lrp_port_for_datapath.return_value = lrp
-        self.evpn_driver.ovn_local_lrps = {lrp: 'fake-lrp'}
+        self.evpn_driver.ovn_local_lrps = {
+            lrp: {'datapath': 'fake-dp', 'ip': self.ipv4, 'vni': self.vni,
+                  'bgp_as': 'fake-bgp-as'}}
         row = fakes.create_object({
             'name': 'fake-row', 'datapath': 'fake-dp'})
 
+        lo_name = constants.OVN_EVPN_LO_PREFIX + str(self.vni)
+        self.evpn_driver._track_exposed_evpn_ips(
+            lo_name, [self.ipv4, self.ipv6, '10.10.1.76'])
+
         ips = [self.ipv4, self.ipv6]
         self.evpn_driver.withdraw_remote_ip(ips, row)
 
-        lo_name = constants.OVN_EVPN_LO_PREFIX + str(self.vni)
+        # the VNI of the router interface is not looked up again
+        self.sb_idl.get_evpn_info_from_port_name.assert_not_called()
+
         mock_del_ip_dev.assert_called_once_with(lo_name, ips)
+        self.assertEqual(
+            ['10.10.1.76'],
+            [ip for _, ip in
+             self.evpn_driver._ovn_exposed_evpn_ips[lo_name].items()])
 
     @mock.patch.object(linux_net, 'del_ips_from_dev')
     def test_withdraw_remote_ip_is_provider_network(self, mock_del_ip_dev):
@@ -424,7 +562,7 @@ class TestOVNEVPNDriver(test_base.TestCase):
 
         mock_add_route.assert_called_once_with(
             mock.ANY, ip, self.vni, 'fake-vlan',
-            mask=cidr, via=self.fip)
+            mask=cidr, via=self.fip, oif=None)
         mock_ensure_evpn_flow.assert_called_once_with(
             self.bridge, constants.OVS_VRF_RULE_COOKIE, self.mac,
             'fake-vlan', 'fake-vlan', '{}/{}'.format(ip, cidr),
@@ -439,13 +577,12 @@ class TestOVNEVPNDriver(test_base.TestCase):
         self._test__expose_subnet(use_ipv6=True)
 
     @mock.patch.object(linux_net, 'delete_exposed_ips')
-    @mock.patch.object(linux_net, 'get_exposed_ips_on_network')
     @mock.patch.object(ovs, 'remove_evpn_network_ovs_flow')
     @mock.patch.object(linux_net, 'del_ip_route')
     @mock.patch.object(linux_net, 'get_ip_version')
     def _test_withdraw_subnet(
             self, mock_ip_version, mock_del_route, mock_remove_evpn_flows,
-            mock_get_ips, mock_del_ips, use_ipv6=False):
+            mock_del_ips, use_ipv6=False):
         # IPv4 vs IPv6 mocks
         ip = self.ipv6 if use_ipv6 else self.ipv4
         mock_ip_version.return_value = (
@@ -459,8 +596,9 @@ class TestOVNEVPNDriver(test_base.TestCase):
         mock_get_bridge = mock.patch.object(
             self.evpn_driver, '_get_bridge_for_datapath').start()
         mock_get_bridge.return_value = (self.bridge, self.vlan_tag)
-        net_ips = ['10.10.10.1', '2001:0db8:85a3:0000:0000:8a2e:0370:7334']
-        mock_get_ips.return_value = net_ips
+        # only the IPs exposed on the subnet are withdrawn
+        self.evpn_driver._track_exposed_evpn_ips(
+            'fake-lo', [ip, '10.10.10.1', '2001:db8:85a3::8a2e:370:7334'])
 
         row = fakes.create_object({
             'name': 'fake-row',
@@ -473,7 +611,8 @@ class TestOVNEVPNDriver(test_base.TestCase):
         mock_remove_evpn_flows.assert_called_once_with(
             self.bridge, constants.OVS_VRF_RULE_COOKIE, self.mac,
             '{}/{}'.format(ip, cidr))
-        mock_del_ips.assert_called_once_with(net_ips, 'fake-lo')
+        mock_del_ips.assert_called_once_with([ip], 'fake-lo')
+        self.assertNotIn(ip, self.evpn_driver._ovn_exposed_evpn_ips['fake-lo'])
 
     def test_withdraw_subnet(self):
         self._test_withdraw_subnet()
@@ -540,13 +679,152 @@ class TestOVNEVPNDriver(test_base.TestCase):
             set_master_expected_calls.append(mock.call(veth_vrf, vrf_name))
 
         mock_set_master.assert_has_calls(set_master_expected_calls)
+        self.assertEqual(
+            self.ipv4, self.evpn_driver._evpn_contexts.find(self.vni).vtep_ip)
 
     def test__ensure_evpn_devices(self):
         self._test__ensure_evpn_devices()
 
+    @mock.patch.object(linux_net, 'ensure_bridge')
+    @mock.patch.object(linux_net, 'get_nic_ip')
+    @mock.patch.object(linux_net, 'ensure_vrf')
+    def test__ensure_evpn_devices_no_local_ip(
+            self, mock_ensure_vrf, mock_get_nic_ip, mock_ensure_bridge):
+        mock_get_nic_ip.return_value = []
+
+        ret = self.evpn_driver._ensure_evpn_devices(
+            'datapath-bridge', self.vni, self.vlan_tag)
+
+        self.assertEqual(ovn_evpn_driver.EVPN_INFO(), ret)
+        mock_ensure_bridge.assert_not_called()
+
     def test__ensure_evpn_devices_not_vlan(self):
         self._test__ensure_evpn_devices(use_vlan=False)
 
+    @mock.patch.object(linux_net, 'ensure_veth')
+    @mock.patch.object(linux_net, 'get_nic_ip')
+    @mock.patch.object(linux_net, 'ensure_dummy_device')
+    @mock.patch.object(linux_net, 'ensure_vxlan')
+    @mock.patch.object(linux_net, 'ensure_bridge')
+    @mock.patch.object(linux_net, 'set_master_for_device')
+    @mock.patch.object(linux_net, 'ensure_vrf')
+    def test__ensure_evpn_devices_single_vxlan(
+            self, mock_ensure_vrf, mock_set_master, mock_ensure_bridge,
+            mock_ensure_vxlan, mock_ensure_dummy, mock_get_nic_ip,
+            mock_ensure_veth):
+        CONF.set_override('evpn_single_vxlan', True)
+        self.addCleanup(CONF.clear_override, 'evpn_single_vxlan')
+        mock_get_nic_ip.return_value = [self.ipv4]
+        mock_ensure_vni_vlan = mock.patch.object(
+            self.evpn_driver, '_ensure_evpn_vni_vlan').start()
+        mock_ensure_vni_vlan.return_value = 'fake-svi'
+
+        ret = self.evpn_driver._ensure_evpn_devices(
+            'datapath-bridge', self.vni, None)
+
+        vrf_name = constants.OVN_EVPN_VRF_PREFIX + str(self.vni)
+        lo_name = constants.OVN_EVPN_LO_PREFIX + str(self.vni)
+        veth_vrf = constants.OVN_EVPN_VETH_VRF_PREFIX + str(self.vni)
+        veth_ovs = constants.OVN_EVPN_VETH_OVS_PREFIX + str(self.vni)
+        self.assertEqual(ovn_evpn_driver.EVPN_INFO(
+            vrf_name, lo_name, constants.OVN_EVPN_SINGLE_BRIDGE,
+            constants.OVN_EVPN_SINGLE_VXLAN, veth_vrf, veth_ovs, None,
+            'fake-svi'), ret)
+        mock_ensure_vni_vlan.assert_called_once_with(
+            self.vni, vrf_name, self.ipv4)
+        mock_ensure_bridge.assert_not_called()
+        mock_ensure_vxlan.assert_not_called()
+        mock_set_master.assert_has_calls([mock.call(lo_name, vrf_name),
+                                          mock.call(veth_vrf, vrf_name)])
+
+    @mock.patch.object(linux_net, 'ensure_dummy_device')
+    @mock.patch.object(linux_net, 'ensure_vrf')
+    def test__ensure_evpn_devices_single_vxlan_no_vlan(
+            self, mock_ensure_vrf, mock_ensure_dummy):
+        CONF.set_override('evpn_single_vxlan', True)
+        self.addCleanup(CONF.clear_override, 'evpn_single_vxlan')
+        CONF.set_override('evpn_local_ip', self.ipv4)
+        self.addCleanup(CONF.clear_override, 'evpn_local_ip')
+        mock.patch.object(self.evpn_driver, '_ensure_evpn_vni_vlan',
+                          return_value=None).start()
+
+        ret = self.evpn_driver._ensure_evpn_devices(
+            'datapath-bridge', self.vni, None)
+
+        self.assertIsNone(ret.vrf_name)
+        mock_ensure_dummy.assert_not_called()
+
+    @mock.patch.object(linux_net, 'set_master_for_device')
+    @mock.patch.object(linux_net, 'ensure_vlan_device')
+    @mock.patch.object(linux_net, 'add_vni_vlan_mapping')
+    @mock.patch.object(linux_net, 'get_vni_vlan_mappings')
+    @mock.patch.object(linux_net, 'ensure_vxlan_vnifilter')
+    @mock.patch.object(linux_net, 'ensure_vlan_bridge')
+    def test__ensure_evpn_vni_vlan(
+            self, mock_ensure_bridge, mock_ensure_vxlan, mock_get_mappings,
+            mock_add_mapping, mock_ensure_vlan, mock_set_master):
+        CONF.set_override('evpn_single_vxlan', True)
+        self.addCleanup(CONF.clear_override, 'evpn_single_vxlan')
+        mock_get_mappings.return_value = {self.vni1: 1}
+        bridge = constants.OVN_EVPN_SINGLE_BRIDGE
+        vxlan = constants.OVN_EVPN_SINGLE_VXLAN
+        svi_name = constants.OVN_EVPN_SVI_PREFIX + str(self.vni)
+
+        ret = self.evpn_driver._ensure_evpn_vni_vlan(
+            self.vni, 'fake-vrf', self.ipv4)
+
+        self.assertEqual(svi_name, ret)
+        self.assertEqual({self.vni1: 1, self.vni: 2},
+                         self.evpn_driver._evpn_vlans)
+        mock_ensure_bridge.assert_called_once_with(bridge)
+        mock_ensure_vxlan.assert_called_once_with(
+            vxlan, self.ipv4, CONF.evpn_udp_dstport, bridge)
+        mock_get_mappings.assert_called_once_with(vxlan)
+        mock_add_mapping.assert_called_once_with(vxlan, bridge, self.vni, 2)
+        mock_ensure_vlan.assert_called_once_with(svi_name, bridge, 2)
+        mock_set_master.assert_called_once_with(svi_name, 'fake-vrf')
+
+    @mock.patch.object(linux_net, 'add_vni_vlan_mapping')
+    @mock.patch.object(linux_net, 'ensure_vxlan_vnifilter')
+    @mock.patch.object(linux_net, 'ensure_vlan_bridge')
+    def test__ensure_evpn_vni_vlan_no_free_vlan(
+            self, mock_ensure_bridge, mock_ensure_vxlan, mock_add_mapping):
+        self.evpn_driver._evpn_vlans = {
+            vni: vni for vni in range(constants.EVPN_VLAN_MIN,
+                                      constants.EVPN_VLAN_MAX + 1)}
+
+        ret = self.evpn_driver._ensure_evpn_vni_vlan(
+            self.vni1 + constants.EVPN_VLAN_MAX, 'fake-vrf', self.ipv4)
+
+        self.assertIsNone(ret)
+        mock_add_mapping.assert_not_called()
+
+    def test__get_evpn_vlan_already_mapped(self):
+        self.evpn_driver._evpn_vlans = {self.vni: 5}
+        self.assertEqual(5, self.evpn_driver._get_evpn_vlan(str(self.vni)))
+
+    @mock.patch.object(linux_net, 'delete_device')
+    @mock.patch.object(linux_net, 'del_vni_vlan_mapping')
+    def test__remove_evpn_devices_single_vxlan(self, mock_del_mapping,
+                                               mock_del_device):
+        CONF.set_override('evpn_single_vxlan', True)
+        self.addCleanup(CONF.clear_override, 'evpn_single_vxlan')
+        self.evpn_driver._evpn_vlans = {self.vni: 2, self.vni1: 1}
+
+        self.evpn_driver._remove_evpn_devices(self.vni)
+
+        mock_del_mapping.assert_called_once_with(
+            constants.OVN_EVPN_SINGLE_VXLAN, constants.OVN_EVPN_SINGLE_BRIDGE,
+            self.vni, 2)
+        self.assertEqual({self.vni1: 1}, self.evpn_driver._evpn_vlans)
+        expected_calls = [
+            mock.call(constants.OVN_EVPN_LO_PREFIX + str(self.vni)),
+            mock.call(constants.OVN_EVPN_VRF_PREFIX + str(self.vni)),
+            mock.call(constants.OVN_EVPN_SVI_PREFIX + str(self.vni)),
+            mock.call(constants.OVN_EVPN_VETH_VRF_PREFIX + str(self.vni)),
+            mock.call(constants.OVN_EVPN_VLAN_PREFIX + str(self.vni))]
+        self.assertEqual(expected_calls, mock_del_device.call_args_list)
+
     @mock.patch.object(linux_net, 'delete_device')
     def test__remove_evpn_devices(self, mock_del_device):
         vrf_name = constants.OVN_EVPN_VRF_PREFIX + str(self.vni)
@@ -564,7 +842,7 @@ class TestOVNEVPNDriver(test_base.TestCase):
         mock_del_device.assert_has_calls(expected_calls)
 
     @mock.patch.object(linux_net, 'add_unreachable_route')
-    @mock.patch.object(linux_net, 'add_ndp_proxy')
+    @mock.patch.object(linux_net, 'add_ndp_proxies')
     @mock.patch.object(linux_net, 'get_ip_version')
     @mock.patch.object(linux_net, 'add_ip_route')
     @mock.patch.object(ovs, 'add_device_to_ovs_bridge')
@@ -588,16 +866,19 @@ class TestOVNEVPNDriver(test_base.TestCase):
         mock_add_unreachable_route.assert_called_once_with(vrf)
 
         if not use_vlan:
-            mock_add_ndp_proxy.assert_called_once_with(self.ipv6, dp_bridge)
+            mock_add_ndp_proxy.assert_called_once_with(
+                [(self.ipv6, dp_bridge, None)])
             mock_add_ovs_bridge.assert_called_once_with(veth_ovs, dp_bridge)
             add_route_expected_calls = [
-                mock.call(mock.ANY, self.ipv4, self.vni, veth_vrf),
-                mock.call(mock.ANY, self.ipv6, self.vni, veth_vrf)]
+                mock.call(mock.ANY, self.ipv4, self.vni, veth_vrf, oif=None),
+                mock.call(mock.ANY, self.ipv6, self.vni, veth_vrf,
+                          oif=None)]
         else:
-            mock_add_ndp_proxy.assert_called_once_with(self.ipv6, vlan)
+            mock_add_ndp_proxy.assert_called_once_with(
+                [(self.ipv6, vlan, None)])
             add_route_expected_calls = [
-                mock.call(mock.ANY, self.ipv4, self.vni, vlan),
-                mock.call(mock.ANY, self.ipv6, self.vni, vlan)]
+                mock.call(mock.ANY, self.ipv4, self.vni, vlan, oif=None),
+                mock.call(mock.ANY, self.ipv6, self.vni, vlan, oif=None)]
 
         mock_add_route.assert_has_calls(add_route_expected_calls)
 
@@ -607,7 +888,7 @@ class TestOVNEVPNDriver(test_base.TestCase):
     def test__connect_evpn_to_ovn_not_vlan(self):
         self._test__connect_evpn_to_ovn(use_vlan=False)
 
-    @mock.patch.object(linux_net, 'del_ndp_proxy')
+    @mock.patch.object(linux_net, 'del_ndp_proxies')
     @mock.patch.object(linux_net, 'delete_routes_from_table')
     @mock.patch.object(ovs, 'del_device_from_ovs_bridge')
     @mock.patch.object(linux_net, 'get_ip_version')
@@ -633,7 +914,8 @@ class TestOVNEVPNDriver(test_base.TestCase):
 
         mock_del_device.assert_called_once_with(device, dp_bridge)
         if clean_ndp:
-            mock_del_ndp.assert_called_once_with(self.ipv6, dp_bridge)
+            mock_del_ndp.assert_called_once_with(
+                [(self.ipv6, dp_bridge, None)])
         else:
             mock_del_ndp.assert_not_called()
 
@@ -646,61 +928,170 @@ class TestOVNEVPNDriver(test_base.TestCase):
     def test_disconnect_evpn_from_ovn_not_vlan(self):
         self._test_disconnect_evpn_from_ovn(use_vlan=False)
 
-    @mock.patch.object(ovs, 'del_device_from_ovs_bridge')
-    @mock.patch.object(linux_net, 'delete_device')
-    @mock.patch.object(linux_net, 'get_interfaces')
+    def _get_links(self, *interfaces):
+        kinds = {'vrf-': 'vrf', 'lo-': 'dummy', 'br-': 'bridge',
+                 'vxlan-': 'vxlan', 'veth-vrf-': 'veth',
+                 'vlan-': 'openvswitch', 'svi-': 'vlan'}
+        links = {}
+        for index, interface in enumerate(interfaces):
+            kind = next((k for p, k in kinds.items()
+                         if interface.startswith(p)), None)
+            links[interface] = {'index': index, 'kind': kind,
+                                'master': None}
+        return links
+
+    @mock.patch.object(ovs, 'del_devices_from_ovs_bridges')
+    @mock.patch.object(linux_net, 'delete_devices')
+    @mock.patch.object(linux_net, 'get_links_and_routes')
     def test__remove_extra_vrfs(
-            self, mock_get_ifaces, mock_del_device, mock_del_device_bridge):
+            self, mock_get_links, mock_del_devices, mock_del_ovs_ports):
         # NOTE(lucasagomes): Remove cr_lrp1 to simplify the test
         self.evpn_driver.ovn_local_cr_lrps.pop(self.cr_lrp1, None)
-        mock_get_ifaces.return_value = [
+        links = self._get_links(*[
             '%siface' % type_ for type_ in (
                 constants.OVN_EVPN_VRF_PREFIX,
                 constants.OVN_EVPN_LO_PREFIX,
                 constants.OVN_EVPN_BRIDGE_PREFIX,
                 constants.OVN_EVPN_VXLAN_PREFIX,
                 constants.OVN_EVPN_VETH_VRF_PREFIX,
-                constants.OVN_EVPN_VLAN_PREFIX)]
+                constants.OVN_EVPN_VLAN_PREFIX)])
+        mock_get_links.return_value = (links, {})
 
         self.evpn_driver._remove_extra_vrfs()
 
         # Assertions
-        expected_calls = [mock.call('vrf-iface'),
-                          mock.call('lo-iface'),
-                          mock.call('br-iface'),
-                          mock.call('vxlan-iface'),
-                          mock.call('veth-vrf-iface')]
-        mock_del_device.assert_has_calls(expected_calls)
-
-        expected_calls = [mock.call('veth-vrf-iface'),
-                          mock.call('vlan-iface')]
-        mock_del_device_bridge.assert_has_calls(expected_calls)
+        mock_get_links.assert_called_once_with([])
+        mock_del_devices.assert_called_once_with(mock.ANY)
+        self.assertEqual(
+            ['br-iface', 'lo-iface', 'veth-vrf-iface', 'vrf-iface',
+             'vxlan-iface'],
+            sorted(mock_del_devices.call_args[0][0]))
+        mock_del_ovs_ports.assert_called_once_with(mock.ANY)
+        self.assertEqual(['veth-ovs-iface', 'vlan-iface'],
+                         sorted(mock_del_ovs_ports.call_args[0][0]))
+
+    @mock.patch.object(ovs, 'del_devices_from_ovs_bridges')
+    @mock.patch.object(linux_net, 'delete_devices')
+    def test__remove_extra_vrfs_contexts(self, mock_del_devices,
+                                         mock_del_ovs_ports):
+        self.evpn_driver._evpn_contexts.get(self.vni)
+        self.evpn_driver._evpn_contexts.get(99)
+
+        self.evpn_driver._remove_extra_vrfs({})
+
+        # only the contexts of the VNIs in use are kept
+        self.assertIn(self.vni, self.evpn_driver._evpn_contexts)
+        self.assertNotIn(99, self.evpn_driver._evpn_contexts)
+
+    @mock.patch.object(ovs, 'del_devices_from_ovs_bridges')
+    @mock.patch.object(linux_net, 'delete_devices')
+    def test__remove_extra_vrfs_keep(self, mock_del_devices,
+                                     mock_del_ovs_ports):
+        links = self._get_links(
+            'fake-vrf', 'fake-lo', self.bridge, 'fake-vxlan', 'fake-vlan',
+            'fake-veth-vrf1', constants.OVN_INTEGRATION_BRIDGE, 'br-tun',
+            'fake-vlan.88', 'eth0')
+        # not created by the agent
+        links['br-tun']['kind'] = 'openvswitch'
+
+        self.evpn_driver._remove_extra_vrfs(links)
+
+        mock_del_devices.assert_not_called()
+        mock_del_ovs_ports.assert_not_called()
+
+    @mock.patch.object(ovs, 'del_devices_from_ovs_bridges')
+    @mock.patch.object(linux_net, 'delete_devices')
+    def test__remove_extra_vrfs_standby(
+            self, mock_del_devices, mock_del_ovs_ports):
+        self.evpn_driver.ovn_local_cr_lrps.pop(self.cr_lrp1, None)
+        self.evpn_driver._ovn_standby_cr_lrps = {
+            'cr-lrp-standby': cr_lrp_store.EVPNCRLRPInfo(
+                'fake-router-dp', 'fake-provider-dp', [], None, 99,
+                'fake-bgp-as', lo='lo-99', bridge='br-99', vxlan='vxlan-99',
+                vrf='vrf-99', vlan='vlan-99')}
+        links = self._get_links(
+            'vrf-99', 'lo-99', 'br-99', 'vxlan-99', 'vlan-99', 'vrf-100')
+
+        self.evpn_driver._remove_extra_vrfs(links)
+
+        mock_del_devices.assert_called_once_with(['vrf-100'])
+        mock_del_ovs_ports.assert_not_called()
+
+    @mock.patch.object(linux_net, 'del_vni_vlan_mapping')
+    @mock.patch.object(linux_net, 'get_vni_vlan_mappings')
+    @mock.patch.object(ovs, 'del_devices_from_ovs_bridges')
+    @mock.patch.object(linux_net, 'delete_devices')
+    def test__remove_extra_vrfs_single_vxlan(
+            self, mock_del_devices, mock_del_ovs_ports, mock_get_mappings,
+            mock_del_mapping):
+        CONF.set_override('evpn_single_vxlan', True)
+        self.addCleanup(CONF.clear_override, 'evpn_single_vxlan')
+        self.evpn_driver.ovn_local_cr_lrps.pop(self.cr_lrp1, None)
+        svi_name = constants.OVN_EVPN_SVI_PREFIX + str(self.vni)
+        self.evpn_driver.ovn_local_cr_lrps[self.cr_lrp].svi = svi_name
+        mock_get_mappings.return_value = {self.vni: 1, self.vni1: 2}
+        links = self._get_links(
+            constants.OVN_EVPN_SINGLE_BRIDGE, constants.OVN_EVPN_SINGLE_VXLAN,
+            svi_name, constants.OVN_EVPN_SVI_PREFIX + str(self.vni1))
+
+        self.evpn_driver._remove_extra_vrfs(links)
+
+        mock_del_mapping.assert_called_once_with(
+            constants.OVN_EVPN_SINGLE_VXLAN, constants.OVN_EVPN_SINGLE_BRIDGE,
+            self.vni1, 2)
+        self.assertEqual({self.vni: 1}, self.evpn_driver._evpn_vlans)
+        mock_del_devices.assert_called_once_with(
+            [constants.OVN_EVPN_SVI_PREFIX + str(self.vni1)])
 
-    @mock.patch.object(linux_net, 'get_interface_index')
     @mock.patch.object(linux_net, 'delete_ip_routes')
-    @mock.patch.object(linux_net, 'get_routes_on_tables')
-    def test__remove_extra_routes(
-            self, mock_get_routes, mock_del_ip_routes, mock_index):
-        mock_index.return_value = 'fake-oif'
+    @mock.patch.object(linux_net, 'get_links_and_routes')
+    def test__remove_extra_routes(self, mock_get_links, mock_del_ip_routes):
         mock_table_ids = mock.patch.object(
             self.evpn_driver, '_get_table_ids').start()
-        mock_table_ids.return_value = ['fake-table-id']
+        mock_table_ids.return_value = ['fake-table']
         route_to_del = {
             'oif': 'fake-oif0',
             'gateway': 'fake-gateway0',
             'dst': 'fake-dst0',
             'dst_len': 'fake-dst-len0',
-            'table': 'fake-table0'}
-        mock_get_routes.return_value = [
-            self.evpn_driver._ovn_routing_tables_routes[
-                'fake-vlan'][0]['route'],
-            route_to_del]
+            'table': 'fake-table'}
+        mock_get_links.return_value = (
+            {'fake-vlan': {'index': 'fake-oif'}},
+            {'fake-table': [
+                {'oif': 'fake-oif', 'gateway': 'fake-gateway',
+                 'dst': '{}/32'.format(self.ipv4), 'dst_len': 32,
+                 'table': 'fake-table'},
+                route_to_del],
+             'other-table': [{}]})
 
         self.evpn_driver._remove_extra_routes()
 
         # Assert the route meant to be deleted was deleted
+        mock_get_links.assert_called_once_with({'fake-table'})
         mock_del_ip_routes.assert_called_once_with([route_to_del])
 
+    @mock.patch.object(linux_net, 'delete_ip_routes')
+    def test__remove_extra_routes_cr_lrp(self, mock_del_ip_routes):
+        mock.patch.object(self.evpn_driver, '_get_table_ids',
+                          return_value=[10]).start()
+        cr_lrp_route = {'dst': self.fip, 'dst_len': 32, 'table': 10}
+        self.evpn_driver._ovn_routing_tables_routes = {
+            'fake-vlan': {linux_net.RouteKey(
+                table=10, dst=self.fip, dst_len=32, family=AF_INET, oif=5)}}
+        kept = dict(cr_lrp_route, oif=5, gateway=None)
+        # same destination through another device
+        stale = dict(cr_lrp_route, oif=6, gateway=None)
+
+        self.evpn_driver._remove_extra_routes(
+            {'fake-vlan': {'index': 5}}, {10: [kept, stale]})
+
+        mock_del_ip_routes.assert_called_once_with([stale])
+
+    @mock.patch.object(linux_net, 'delete_ip_routes')
+    def test__remove_extra_routes_no_routes(self, mock_del_ip_routes):
+        self.evpn_driver._remove_extra_routes({}, {})
+        mock_del_ip_routes.assert_not_called()
+
     @mock.patch.object(ovs, 'get_flow_info')
     @mock.patch.object(ovs, 'get_bridge_flows')
     @mock.patch.object(ovs, 'del_flow')
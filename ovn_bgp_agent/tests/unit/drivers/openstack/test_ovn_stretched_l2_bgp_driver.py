@@ -202,11 +202,16 @@ class TestOVNBGPStretchedL2Driver(test_base.TestCase):
             )
 
             self.assertTrue(test_route in self.bgp_driver.vrf_routes)
+            self.assertEqual(
+                {test_route},
+                self.bgp_driver._vrf_routes_by_gateway[test_route.dst])
 
     @mock.patch.object(linux_net, "del_ip_route")
     def test__del_route(self, mock_del_route):
-        self.bgp_driver.vrf_routes.add(self.test_route_ipv4)
-        self.bgp_driver.vrf_routes.add(self.test_route_ipv6)
+        for test_route in [self.test_route_ipv4, self.test_route_ipv6]:
+            self.bgp_driver.vrf_routes.add(test_route)
+            self.bgp_driver._vrf_routes_by_gateway[test_route.dst] = {
+                test_route}
         for test_route in [self.test_route_ipv4, self.test_route_ipv6]:
             self.bgp_driver._del_route(
                 test_route.network,
@@ -225,6 +230,8 @@ class TestOVNBGPStretchedL2Driver(test_base.TestCase):
             )
 
             self.assertTrue(test_route not in self.bgp_driver.vrf_routes)
+            self.assertNotIn(test_route.dst,
+                             self.bgp_driver._vrf_routes_by_gateway)
 
     def test__get_addr_scopes(self):
         addr_scopes = self.bgp_driver._get_addr_scopes(self.lp0)
@@ -384,14 +391,12 @@ class TestOVNBGPStretchedL2Driver(test_base.TestCase):
             row, self.cr_lrp0.logical_port, ["3.3.3.3/24"], ["1.1.1.1/24"]
         )
 
-    @mock.patch.object(linux_net, "get_exposed_routes_on_network")
     @mock.patch.object(linux_net, "del_ip_route")
     @mock.patch.object(linux_net, "add_ip_route")
     def test__update_network(
         self,
         mock_add_ip_route,
         mock_del_ip_route,
-        mock_get_exposed_routes_on_network,
     ):
         gateway = {}
         gateway["ips"] = [
@@ -410,11 +415,6 @@ class TestOVNBGPStretchedL2Driver(test_base.TestCase):
         add_ips = ["192.168.1.1/24", "fdcc:8cf2:d40c:2::1/64"]
         delete_ips = ["192.168.0.1/24"]
 
-        mock_get_exposed_routes_on_network.side_effect = (
-            ["route-v4"],
-            ["route-v6"],
-        )
-
         self.sb_idl.get_port_by_name.return_value = self.fake_patch_port
 
         self.bgp_driver._update_network(
@@ -488,14 +488,12 @@ class TestOVNBGPStretchedL2Driver(test_base.TestCase):
             }
         )
 
-    @mock.patch.object(linux_net, "get_exposed_routes_on_network")
     @mock.patch.object(linux_net, "del_ip_route")
     @mock.patch.object(linux_net, "add_ip_route")
     def test__update_network_no_gateway(
         self,
         mock_add_ip_route,
         mock_del_ip_route,
-        mock_get_exposed_routes_on_network,
     ):
         self.bgp_driver.ovn_local_cr_lrps = {}
 
@@ -511,19 +509,16 @@ class TestOVNBGPStretchedL2Driver(test_base.TestCase):
             self.router_port, "gateway_port", add_ips, delete_ips
         )
 
-        mock_get_exposed_routes_on_network.assert_not_called()
         mock_del_ip_route.assert_not_called()
         mock_add_ip_route.assert_not_called()
         self.sb_idl.get_port_by_name.assert_not_called()
 
-    @mock.patch.object(linux_net, "get_exposed_routes_on_network")
     @mock.patch.object(linux_net, "del_ip_route")
     @mock.patch.object(linux_net, "add_ip_route")
     def test__update_network_no_mac(
         self,
         mock_add_ip_route,
         mock_del_ip_route,
-        mock_get_exposed_routes_on_network,
     ):
         gateway = {}
         gateway["ips"] = [
@@ -542,7 +537,6 @@ class TestOVNBGPStretchedL2Driver(test_base.TestCase):
             self.router_port, "gateway_port", add_ips, delete_ips
         )
 
-        mock_get_exposed_routes_on_network.assert_not_called()
         mock_del_ip_route.assert_not_called()
         mock_add_ip_route.assert_not_called()
         self.sb_idl.get_port_by_name.assert_not_called()
@@ -830,10 +824,9 @@ class TestOVNBGPStretchedL2Driver(test_base.TestCase):
             {}
         )
 
-    @mock.patch.object(linux_net, "get_exposed_routes_on_network")
     @mock.patch.object(linux_net, "del_ip_route")
     def test__withdraw_subnet(
-        self, mock_del_ip_route, mock_get_exposed_routes_on_network
+        self, mock_del_ip_route
     ):
         gateway = {}
         gateway["ips"] = [
@@ -851,7 +844,10 @@ class TestOVNBGPStretchedL2Driver(test_base.TestCase):
             }
         }
 
-        mock_get_exposed_routes_on_network.side_effect = (["route-v4"], [])
+        # another subnet is still routed through the IPv4 gateway
+        self.bgp_driver._vrf_routes_by_gateway["10.0.0.10"] = {
+            ovn_stretched_l2_bgp_driver.HashedRoute(
+                network="192.168.2.0", prefix_len=24, dst="10.0.0.10")}
 
         self.bgp_driver._withdraw_subnet(port_info, "gateway_port")
 
@@ -887,15 +883,13 @@ class TestOVNBGPStretchedL2Driver(test_base.TestCase):
 
         mock_del_ip_route.assert_has_calls(expected_calls)
 
-    @mock.patch.object(linux_net, "get_exposed_routes_on_network")
     @mock.patch.object(linux_net, "del_ip_route")
     def test__withdraw_subnet_no_gateway(
-        self, mock_del_ip_route, mock_get_exposed_routes_on_network
+        self, mock_del_ip_route
     ):
         self.bgp_driver.ovn_local_cr_lrps = {}
         self.bgp_driver._withdraw_subnet(self.router_port, "gateway_port")
         mock_del_ip_route.assert_not_called()
-        mock_get_exposed_routes_on_network.assert_not_called()
 
     @mock.patch.object(linux_net, "delete_ip_routes")
     @mock.patch.object(linux_net, "get_routes_on_tables")
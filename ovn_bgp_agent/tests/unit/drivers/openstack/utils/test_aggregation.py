@@ -0,0 +1,75 @@
+# Copyright 2022 Red Hat, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import ipaddress
+
+from ovn_bgp_agent.drivers.openstack.utils import aggregation
+from ovn_bgp_agent.tests import base as test_base
+
+
+class TestRouteAggregator(test_base.TestCase):
+
+    def setUp(self):
+        super(TestRouteAggregator, self).setUp()
+        self.aggregator = aggregation.RouteAggregator()
+        for i in range(1, 8):
+            self.aggregator.add('172.24.4.{}'.format(i))
+
+    def test_add(self):
+        ret = self.aggregator.add('172.24.4.0')
+        self.assertEqual(
+            (['172.24.4.0/29'],
+             ['172.24.4.4/30', '172.24.4.2/31', '172.24.4.1/32']), ret)
+        self.assertEqual({'172.24.4.0/29'}, self.aggregator.get_prefixes())
+
+    def test_add_not_aggregated(self):
+        ret = self.aggregator.add('172.24.4.9')
+        self.assertEqual((['172.24.4.9/32'], []), ret)
+
+    def test_add_existing(self):
+        self.assertEqual(([], []), self.aggregator.add('172.24.4.1'))
+
+    def test_add_ipv6(self):
+        self.aggregator.add('2001:db8::')
+        ret = self.aggregator.add('2001:db8::1')
+        self.assertEqual((['2001:db8::/127'], ['2001:db8::/128']), ret)
+
+    def test_remove(self):
+        self.aggregator.add('172.24.4.0')
+        ret = self.aggregator.remove('172.24.4.6')
+        self.assertEqual(
+            (['172.24.4.0/30', '172.24.4.4/31', '172.24.4.7/32'],
+             ['172.24.4.0/29']), ret)
+        self.assertEqual(
+            {'172.24.4.0/30', '172.24.4.4/31', '172.24.4.7/32'},
+            self.aggregator.get_prefixes())
+
+    def test_remove_not_aggregated(self):
+        ret = self.aggregator.remove('172.24.4.1')
+        self.assertEqual(([], ['172.24.4.1/32']), ret)
+
+    def test_remove_not_found(self):
+        self.assertEqual(([], []), self.aggregator.remove('172.24.4.9'))
+
+    def test_add_remove_all(self):
+        for i in range(1, 8):
+            self.aggregator.remove('172.24.4.{}'.format(i))
+        self.assertEqual(0, len(self.aggregator))
+        self.assertEqual(set(), self.aggregator.get_prefixes())
+
+    def test_get_ips_on_network(self):
+        ret = self.aggregator.get_ips_on_network(
+            ipaddress.ip_network('172.24.4.4/31'))
+        self.assertEqual(['172.24.4.4', '172.24.4.5'], ret)
@@ -0,0 +1,160 @@
+# Copyright 2022 Red Hat, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from ovn_bgp_agent.drivers.openstack.utils import cr_lrp_store
+from ovn_bgp_agent.tests import base as test_base
+
+
+class TestCRLRPInfo(test_base.TestCase):
+
+    def test_slots(self):
+        cr_lrp_info = cr_lrp_store.CRLRPInfo(
+            'router-dp', 'provider-dp', ['172.24.4.10/24'], 'fake-mac')
+
+        self.assertEqual({}, cr_lrp_info.subnets_datapath)
+        self.assertEqual([], cr_lrp_info.subnets_cidr)
+        self.assertEqual(set(), cr_lrp_info.ovn_lbs)
+        self.assertIsNone(cr_lrp_info.bridge_device)
+        self.assertRaises(AttributeError, setattr, cr_lrp_info, 'vni', 10)
+
+    def test_evpn_devices(self):
+        cr_lrp_info = cr_lrp_store.EVPNCRLRPInfo(
+            'router-dp', 'provider-dp', ['172.24.4.10/24'], 'fake-mac', 10,
+            64999, vrf='vrf-10', lo='lo-10', bridge='br-10',
+            vxlan='vxlan-10', veth_vrf='veth-vrf-10', veth_ovs='veth-ovs-10',
+            vlan='vlan-10')
+
+        self.assertEqual(
+            ['vrf-10', 'lo-10', 'br-10', 'vxlan-10', 'veth-vrf-10',
+             'vlan-10', None], cr_lrp_info.devices)
+
+
+class TestCRLRPStore(test_base.TestCase):
+
+    def setUp(self):
+        super(TestCRLRPStore, self).setUp()
+        self.store = cr_lrp_store.CRLRPStore()
+        self.store['cr-lrp0'] = cr_lrp_store.CRLRPInfo(
+            'router-dp0', 'provider-dp', ['172.24.4.10/24'], 'fake-mac0')
+        self.store['cr-lrp1'] = cr_lrp_store.CRLRPInfo(
+            'router-dp1', 'provider-dp', ['172.24.4.11/24'], 'fake-mac1')
+
+    def test_mapping(self):
+        self.assertEqual(2, len(self.store))
+        self.assertIn('cr-lrp0', self.store)
+        self.assertEqual(['cr-lrp0', 'cr-lrp1'], sorted(self.store))
+        self.assertEqual('router-dp0', self.store['cr-lrp0'].router_datapath)
+        self.assertIsNone(self.store.get('cr-lrp2'))
+        self.assertRaises(KeyError, self.store.__getitem__, 'cr-lrp2')
+
+    def test_get_by_provider_datapath(self):
+        self.assertEqual({'cr-lrp0', 'cr-lrp1'},
+                         self.store.get_by_provider_datapath('provider-dp'))
+        self.assertEqual(set(),
+                         self.store.get_by_provider_datapath('other-dp'))
+
+    def test_delete(self):
+        self.store.add_subnet('cr-lrp0', 'lrp0', 'subnet-dp0',
+                              '10.0.0.1/24')
+        self.store.add_ovn_lb('cr-lrp0', 'ovn-lb0')
+
+        del self.store['cr-lrp0']
+
+        self.assertNotIn('cr-lrp0', self.store)
+        self.assertEqual({'cr-lrp1'},
+                         self.store.get_by_provider_datapath('provider-dp'))
+        self.assertEqual(set(),
+                         self.store.get_by_subnet_datapath('subnet-dp0'))
+        self.assertIsNone(self.store.get_by_ovn_lb('ovn-lb0'))
+
+    def test_pop(self):
+        cr_lrp_info = self.store['cr-lrp0']
+
+        self.assertIs(cr_lrp_info, self.store.pop('cr-lrp0'))
+        self.assertIsNone(self.store.pop('cr-lrp0', None))
+        self.assertRaises(KeyError, self.store.pop, 'cr-lrp0')
+        self.assertEqual({'cr-lrp1'},
+                         self.store.get_by_provider_datapath('provider-dp'))
+
+    def test_replace(self):
+        self.store.add_subnet('cr-lrp0', 'lrp0', 'subnet-dp0',
+                              '10.0.0.1/24')
+
+        self.store['cr-lrp0'] = cr_lrp_store.CRLRPInfo(
+            'router-dp0', 'other-dp', ['172.24.5.10/24'], 'fake-mac0')
+
+        self.assertEqual({'cr-lrp1'},
+                         self.store.get_by_provider_datapath('provider-dp'))
+        self.assertEqual({'cr-lrp0'},
+                         self.store.get_by_provider_datapath('other-dp'))
+        self.assertEqual(set(),
+                         self.store.get_by_subnet_datapath('subnet-dp0'))
+
+    def test_add_remove_subnet(self):
+        self.store.add_subnet('cr-lrp0', 'lrp0', 'subnet-dp0',
+                              '10.0.0.1/24')
+        self.store.add_subnet('cr-lrp0', 'lrp1', 'subnet-dp0',
+                              'fd00::1/64')
+        self.store.add_subnet('cr-lrp1', 'lrp2', 'subnet-dp0',
+                              '10.0.1.1/24')
+
+        self.assertEqual({'lrp0': 'subnet-dp0', 'lrp1': 'subnet-dp0'},
+                         self.store['cr-lrp0'].subnets_datapath)
+        self.assertEqual(['10.0.0.1/24', 'fd00::1/64'],
+                         self.store['cr-lrp0'].subnets_cidr)
+        self.assertEqual({'cr-lrp0', 'cr-lrp1'},
+                         self.store.get_by_subnet_datapath('subnet-dp0'))
+
+        # still connected to the subnet through lrp1
+        self.store.remove_subnet('cr-lrp0', 'lrp0')
+        self.assertEqual({'cr-lrp0', 'cr-lrp1'},
+                         self.store.get_by_subnet_datapath('subnet-dp0'))
+
+        self.store.remove_subnet('cr-lrp0', 'lrp1')
+        self.store.remove_subnet('cr-lrp0', 'lrp1')
+        self.assertEqual({'cr-lrp1'},
+                         self.store.get_by_subnet_datapath('subnet-dp0'))
+
+    def test_add_subnet_datapath_changed(self):
+        self.store.add_subnet('cr-lrp0', 'lrp0', 'subnet-dp0',
+                              '10.0.0.1/24')
+
+        self.store.add_subnet('cr-lrp0', 'lrp0', 'subnet-dp1',
+                              '10.0.0.1/24')
+
+        self.assertEqual(set(),
+                         self.store.get_by_subnet_datapath('subnet-dp0'))
+        self.assertEqual({'cr-lrp0'},
+                         self.store.get_by_subnet_datapath('subnet-dp1'))
+
+    def test_add_remove_ovn_lb(self):
+        self.store.add_ovn_lb('cr-lrp0', 'ovn-lb0')
+
+        self.assertEqual({'ovn-lb0'}, self.store['cr-lrp0'].ovn_lbs)
+        self.assertEqual('cr-lrp0', self.store.get_by_ovn_lb('ovn-lb0'))
+
+        self.store.remove_ovn_lb('cr-lrp0', 'ovn-lb0')
+        self.store.remove_ovn_lb('cr-lrp0', 'ovn-lb0')
+
+        self.assertEqual(set(), self.store['cr-lrp0'].ovn_lbs)
+        self.assertIsNone(self.store.get_by_ovn_lb('ovn-lb0'))
+
+    def test_remove_ovn_lb_moved(self):
+        self.store.add_ovn_lb('cr-lrp0', 'ovn-lb0')
+        self.store.add_ovn_lb('cr-lrp1', 'ovn-lb0')
+
+        self.store.remove_ovn_lb('cr-lrp0', 'ovn-lb0')
+
+        self.assertEqual('cr-lrp1', self.store.get_by_ovn_lb('ovn-lb0'))
@@ -0,0 +1,107 @@
+# Copyright 2022 Red Hat, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from unittest import mock
+
+from ovn_bgp_agent import config
+from ovn_bgp_agent.drivers.openstack.utils import dampening
+from ovn_bgp_agent.tests import base as test_base
+
+KEY = ('10.0.0.1', 32)
+
+
+class TestRouteDampening(test_base.TestCase):
+
+    def setUp(self):
+        super(TestRouteDampening, self).setUp()
+        self.clock = mock.Mock(return_value=0)
+        self.dampening = dampening.RouteDampening(
+            half_life=10, penalty=1000, suppress_threshold=2000,
+            reuse_threshold=750, max_suppress_time=30, clock=self.clock)
+
+    def test_invalid_thresholds(self):
+        self.assertRaises(ValueError, dampening.RouteDampening, 10, 1000,
+                          750, 750, 30)
+
+    def test_from_config(self):
+        config.register_opts()
+
+        ret = dampening.RouteDampening.from_config()
+
+        self.assertEqual(1000, ret.penalty)
+        self.assertEqual(2000, ret.suppress_threshold)
+        self.assertEqual(750, ret.reuse_threshold)
+
+    def test_flap_suppress(self):
+        self.assertFalse(self.dampening.flap(KEY))
+        self.assertFalse(self.dampening.flap(KEY))
+        self.assertTrue(self.dampening.flap(KEY))
+
+        self.assertTrue(self.dampening.is_suppressed(KEY))
+        self.assertEqual([KEY], self.dampening.suppressed)
+        self.assertEqual({'fpm_dampening_flaps': 3,
+                          'fpm_dampening_suppressions': 1,
+                          'fpm_dampening_suppressed': 1},
+                         self.dampening.stats)
+
+    def test_flap_decay(self):
+        self.dampening.flap(KEY)
+        self.dampening.flap(KEY)
+        # the penalty of 2000 is halved after a half life
+        self.clock.return_value = 10
+
+        self.assertFalse(self.dampening.flap(KEY))
+        self.assertFalse(self.dampening.is_suppressed(KEY))
+
+    def test_flap_weight(self):
+        self.dampening.flap(KEY)
+        self.dampening.flap(KEY)
+
+        self.assertFalse(self.dampening.flap(KEY, weight=0))
+        self.assertTrue(self.dampening.flap(KEY, weight=0.5))
+
+    def test_get_reusable(self):
+        for _ in range(3):
+            self.dampening.flap(KEY)
+        self.dampening.flap(('10.0.0.2', 32))
+        self.clock.return_value = 10
+
+        # 1500 is above the reuse threshold
+        self.assertEqual([], self.dampening.get_reusable())
+
+        self.clock.return_value = 21
+        self.assertEqual([KEY], self.dampening.get_reusable())
+        self.assertFalse(self.dampening.is_suppressed(KEY))
+        self.assertEqual(0, self.dampening.stats['fpm_dampening_suppressed'])
+        self.assertEqual(1, self.dampening.stats['fpm_dampening_reused'])
+        # the penalties that decayed enough are forgotten
+        self.assertEqual(1, len(self.dampening))
+
+    def test_max_suppress_time(self):
+        for _ in range(100):
+            self.dampening.flap(KEY)
+        # the penalty is capped to be reused after max_suppress_time
+        self.clock.return_value = 30.1
+
+        self.assertEqual([KEY], self.dampening.get_reusable())
+
+    def test_clear(self):
+        for _ in range(3):
+            self.dampening.flap(KEY)
+
+        self.dampening.clear()
+
+        self.assertEqual(0, len(self.dampening))
+        self.assertEqual(0, self.dampening.stats['fpm_dampening_suppressed'])
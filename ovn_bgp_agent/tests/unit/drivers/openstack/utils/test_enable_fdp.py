@@ -0,0 +1,946 @@
+# Copyright 2022 Red Hat, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import asyncio
+import socket
+import threading
+import time
+from unittest import mock
+
+from oslo_config import cfg
+from pyroute2.netlink.rtnl import RTM_DELROUTE
+from pyroute2.netlink.rtnl import RTM_NEWROUTE
+from pyroute2.netlink.rtnl.rtmsg import rtmsg
+
+from ovn_bgp_agent import config
+from ovn_bgp_agent.drivers.openstack.utils import enable_fdp
+from ovn_bgp_agent import exceptions
+from ovn_bgp_agent.tests import base as test_base
+
+CONF = cfg.CONF
+
+
+def _route_msg(msg_type, dst, gateway, proto=enable_fdp.RTPROT_BGP):
+    msg = rtmsg()
+    msg['header']['type'] = msg_type
+    msg['family'] = socket.AF_INET
+    msg['dst_len'] = 32
+    msg['proto'] = proto
+    msg['attrs'] = [('RTA_DST', dst), ('RTA_GATEWAY', gateway)]
+    msg.encode()
+    return bytes(msg.data)
+
+
+def _fpm_frame(payload, version=enable_fdp.FPM_PROTO_VERSION,
+               msg_type=enable_fdp.FPM_MSG_TYPE_NETLINK):
+    return enable_fdp.FPM_HEADER.pack(
+        version, msg_type, enable_fdp.FPM_HEADER.size + len(payload)) + payload
+
+
+class TestUpdateRoutes(test_base.TestCase):
+
+    def setUp(self):
+        super(TestUpdateRoutes, self).setUp()
+        config.register_opts()
+        self.nb_idl = mock.Mock()
+        self.update_routes = enable_fdp.UpdateRoutes(self.nb_idl)
+
+    @mock.patch.object(enable_fdp.UpdateRoutes, 'del_route_NBDB')
+    @mock.patch.object(enable_fdp.UpdateRoutes, 'add_route_NBDB')
+    def test_update_FRR_route_to_NBDB(self, mock_add, mock_del):
+        self.update_routes.update_FRR_route_to_NBDB(
+            _route_msg(RTM_NEWROUTE, '10.0.0.2', '172.24.4.2'))
+        mock_add.reset_mock()
+        payload = (_route_msg(RTM_NEWROUTE, '10.0.0.1', '172.24.4.1') +
+                   _route_msg(RTM_DELROUTE, '10.0.0.2', '172.24.4.2'))
+
+        self.update_routes.update_FRR_route_to_NBDB(payload)
+
+        mock_add.assert_called_once_with('10.0.0.1', 32, '172.24.4.1',
+                                         lrouter='lr0')
+        mock_del.assert_called_once_with('10.0.0.2', 32, '172.24.4.2',
+                                         lrouter='lr0')
+
+    @mock.patch.object(enable_fdp.UpdateRoutes, 'del_route_NBDB')
+    def test_update_FRR_route_to_NBDB_del_not_added(self, mock_del):
+        # e.g., a kernel route, or a route added by an operator or Neutron
+        payload = (_route_msg(RTM_DELROUTE, '10.0.0.1', '172.24.4.1',
+                              proto=3) +
+                   _route_msg(RTM_DELROUTE, '10.0.0.2', '172.24.4.2'))
+
+        self.update_routes.update_FRR_route_to_NBDB(payload)
+
+        mock_del.assert_not_called()
+
+    @mock.patch.object(enable_fdp.UpdateRoutes, 'del_route_NBDB')
+    @mock.patch.object(enable_fdp.UpdateRoutes, 'add_route_NBDB')
+    def test_update_FRR_route_to_NBDB_not_bgp(self, mock_add, mock_del):
+        payload = _route_msg(RTM_NEWROUTE, '10.0.0.1', '172.24.4.1',
+                             proto=3)
+
+        self.update_routes.update_FRR_route_to_NBDB(payload)
+
+        mock_add.assert_not_called()
+        mock_del.assert_not_called()
+
+    @mock.patch.object(enable_fdp.UpdateRoutes, 'del_route_NBDB')
+    def test_update_FRR_route_to_NBDB_no_longer_bgp(self, mock_del):
+        self.update_routes.update_FRR_route_to_NBDB(
+            _route_msg(RTM_NEWROUTE, '10.0.0.1', '172.24.4.1'))
+
+        self.update_routes.update_FRR_route_to_NBDB(
+            _route_msg(RTM_NEWROUTE, '10.0.0.1', '172.24.4.254', proto=4))
+
+        mock_del.assert_called_once_with('10.0.0.1', 32, '172.24.4.1',
+                                         lrouter='lr0')
+
+    @mock.patch.object(enable_fdp.UpdateRoutes, 'del_route_NBDB')
+    @mock.patch.object(enable_fdp.UpdateRoutes, 'add_route_NBDB')
+    def test_update_FRR_route_to_NBDB_multipath(self, mock_add, mock_del):
+        def _multipath_msg(msg_type, gateways):
+            msg = rtmsg()
+            msg['header']['type'] = msg_type
+            msg['family'] = socket.AF_INET
+            msg['dst_len'] = 32
+            msg['proto'] = enable_fdp.RTPROT_BGP
+            msg['attrs'] = [('RTA_DST', '10.0.0.1')]
+            if gateways:
+                msg['attrs'].append(('RTA_MULTIPATH', [
+                    {'attrs': [('RTA_GATEWAY', gw)]} for gw in gateways]))
+            msg.encode()
+            return bytes(msg.data)
+
+        self.update_routes.update_FRR_route_to_NBDB(_multipath_msg(
+            RTM_NEWROUTE, ['172.24.4.1', '172.24.4.2']))
+        self.assertEqual(
+            [mock.call('10.0.0.1', 32, '172.24.4.1', lrouter='lr0'),
+             mock.call('10.0.0.1', 32, '172.24.4.2', lrouter='lr0')],
+            sorted(mock_add.call_args_list))
+        mock_del.assert_not_called()
+        mock_add.reset_mock()
+
+        # replaced by a route with a single nexthop, replayed
+        for _ in range(2):
+            self.update_routes.update_FRR_route_to_NBDB(_multipath_msg(
+                RTM_NEWROUTE, ['172.24.4.2']))
+        mock_add.assert_not_called()
+        mock_del.assert_called_once_with('10.0.0.1', 32, '172.24.4.1',
+                                         lrouter='lr0')
+        mock_del.reset_mock()
+
+        self.update_routes.update_FRR_route_to_NBDB(_multipath_msg(
+            RTM_DELROUTE, []))
+        mock_del.assert_called_once_with('10.0.0.1', 32, '172.24.4.2',
+                                         lrouter='lr0')
+
+    @mock.patch.object(enable_fdp.UpdateRoutes, 'add_route_NBDB')
+    def test_update_FRR_route_to_NBDB_oif(self, mock_add):
+        address_cache = mock.Mock()
+        address_cache.get.return_value = '172.24.4.10'
+        self.update_routes.address_cache = address_cache
+        msg = rtmsg()
+        msg['header']['type'] = RTM_NEWROUTE
+        msg['family'] = socket.AF_INET
+        msg['dst_len'] = 32
+        msg['proto'] = enable_fdp.RTPROT_BGP
+        msg['attrs'] = [('RTA_DST', '10.0.0.1'), ('RTA_OIF', 5)]
+        msg.encode()
+
+        self.update_routes.update_FRR_route_to_NBDB(bytes(msg.data))
+
+        address_cache.get.assert_called_once_with(socket.AF_INET, 5)
+        mock_add.assert_called_once_with('10.0.0.1', 32, '172.24.4.10',
+                                         lrouter='lr0')
+
+
+class TestInterfaceAddressCache(test_base.TestCase):
+
+    def setUp(self):
+        super(TestInterfaceAddressCache, self).setUp()
+        self.cache = enable_fdp.InterfaceAddressCache()
+        self.get_address_patcher = mock.patch.object(
+            enable_fdp, '_get_primary_address',
+            return_value='172.24.4.1')
+        self.mock_get_address = self.get_address_patcher.start()
+
+    def test_get(self):
+        self.cache._monitor = mock.Mock()
+
+        for _ in range(2):
+            self.assertEqual('172.24.4.1',
+                             self.cache.get(socket.AF_INET, 5))
+
+        self.mock_get_address.assert_called_once_with(socket.AF_INET, 5)
+
+    def test_get_not_monitoring(self):
+        for _ in range(2):
+            self.assertEqual('172.24.4.1',
+                             self.cache.get(socket.AF_INET, 5))
+
+        self.assertEqual(2, self.mock_get_address.call_count)
+
+    def test_get_invalidated_while_dumping(self):
+        self.cache._monitor = mock.Mock()
+
+        def _dump(family, ifindex):
+            self.cache.handle_notification(
+                {'event': 'RTM_NEWADDR', 'family': family, 'index': ifindex})
+            return '172.24.4.1'
+
+        self.mock_get_address.side_effect = _dump
+        self.cache.get(socket.AF_INET, 5)
+        self.cache.get(socket.AF_INET, 5)
+
+        self.assertEqual(2, self.mock_get_address.call_count)
+
+    def test_handle_notification(self):
+        self.cache._monitor = mock.Mock()
+        self.cache.get(socket.AF_INET, 5)
+        self.cache.get(socket.AF_INET6, 5)
+
+        self.cache.handle_notification(
+            {'event': 'RTM_DELADDR', 'family': socket.AF_INET, 'index': 5})
+        self.cache.get(socket.AF_INET, 5)
+        self.cache.get(socket.AF_INET6, 5)
+
+        self.assertEqual(3, self.mock_get_address.call_count)
+
+    def test_handle_notification_dellink(self):
+        self.cache._monitor = mock.Mock()
+        self.cache.get(socket.AF_INET, 5)
+        self.cache.get(socket.AF_INET6, 5)
+
+        self.cache.handle_notification(
+            {'event': 'RTM_DELLINK', 'family': socket.AF_UNSPEC, 'index': 5})
+        self.cache.get(socket.AF_INET, 5)
+        self.cache.get(socket.AF_INET6, 5)
+
+        self.assertEqual(4, self.mock_get_address.call_count)
+
+    def test_handle_notification_other_event(self):
+        self.cache._monitor = mock.Mock()
+        self.cache.get(socket.AF_INET, 5)
+
+        self.cache.handle_notification(
+            {'event': 'RTM_NEWLINK', 'family': socket.AF_UNSPEC, 'index': 5})
+        self.cache.get(socket.AF_INET, 5)
+
+        self.mock_get_address.assert_called_once_with(socket.AF_INET, 5)
+
+    @mock.patch.object(enable_fdp, 'IPRoute')
+    def test_start_stop(self, mock_ipr):
+        closed = threading.Event()
+        notification = {'event': 'RTM_NEWADDR', 'family': socket.AF_INET,
+                        'index': 5}
+        notifications = [[notification]]
+
+        def _get():
+            if notifications:
+                return notifications.pop()
+            closed.wait(5)
+            raise OSError()
+
+        ipr = mock_ipr.return_value
+        ipr.get.side_effect = _get
+        ipr.close.side_effect = closed.set
+
+        with mock.patch.object(self.cache, 'handle_notification') as m_h:
+            self.cache.start()
+            self.assertIs(ipr, self.cache._monitor)
+            self.cache.stop(timeout=5)
+
+        m_h.assert_called_once_with(notification)
+        ipr.bind.assert_called_once_with(
+            groups=(enable_fdp.RTMGRP_IPV4_IFADDR |
+                    enable_fdp.RTMGRP_IPV6_IFADDR | enable_fdp.RTMGRP_LINK))
+        self.assertFalse(self.cache._thread.is_alive())
+        self.assertIsNone(self.cache._monitor)
+
+    @mock.patch.object(enable_fdp, 'IPRoute')
+    def test__get_primary_address(self, mock_ipr):
+        self.get_address_patcher.stop()
+        secondary = mock.MagicMock()
+        secondary.__getitem__.return_value = enable_fdp.IFA_F_SECONDARY
+        primary = mock.MagicMock()
+        primary.__getitem__.return_value = 0
+        primary.get_attr.return_value = '172.24.4.10'
+        ipr = mock_ipr.return_value.__enter__.return_value
+        ipr.get_addr.return_value = [secondary, primary]
+
+        ret = enable_fdp._get_primary_address(socket.AF_INET, 5)
+
+        self.assertEqual('172.24.4.10', ret)
+        ipr.get_addr.assert_called_once_with(family=socket.AF_INET, index=5)
+
+
+class TestUpdateRoutesReplay(test_base.TestCase):
+
+    def setUp(self):
+        super(TestUpdateRoutesReplay, self).setUp()
+        config.register_opts()
+        self.nb_idl = mock.MagicMock()
+        self.update_routes = enable_fdp.UpdateRoutes(
+            self.nb_idl, address_cache=mock.Mock(), generation=3)
+        self.update_routes.start_replay()
+
+    def _replay(self, *routes):
+        self.update_routes.update_FRR_route_to_NBDB(b''.join(
+            _route_msg(msg_type, dst, gateway)
+            for msg_type, dst, gateway in routes))
+
+    def test_replay_not_committed(self):
+        self._replay((RTM_NEWROUTE, '10.0.0.1', '172.24.4.1'))
+
+        self.assertEqual(0, self.update_routes.pending)
+        self.nb_idl.transaction.assert_not_called()
+
+    def test_reconcile(self):
+        self.nb_idl.get_lrouter_static_routes.return_value = [
+            mock.Mock(ip_prefix='10.0.0.1', nexthop='172.24.4.1'),
+            mock.Mock(ip_prefix='10.0.0.2', nexthop='172.24.4.2'),
+            mock.Mock(ip_prefix='10.0.0.4', nexthop='172.24.4.4')]
+        self._replay((RTM_NEWROUTE, '10.0.0.1', '172.24.4.1'),
+                     (RTM_NEWROUTE, '10.0.0.2', '172.24.4.2'),
+                     (RTM_NEWROUTE, '10.0.0.3', '172.24.4.3'),
+                     (RTM_DELROUTE, '10.0.0.2', '172.24.4.2'))
+
+        self.update_routes.reconcile()
+
+        self.assertFalse(self.update_routes.replaying)
+        self.nb_idl.transaction.assert_called_once_with(check_error=True)
+        self.nb_idl.add_static_routes.assert_called_once_with(
+            'lr0', [{'ip_prefix': '10.0.0.3', 'nexthop': '172.24.4.3',
+                     'external_ids': {'routing_proto': 'bgp'}}])
+        self.nb_idl.delete_static_routes.assert_called_once_with(
+            'lr0', mock.ANY, if_exists=True)
+        self.assertEqual(
+            [('10.0.0.2', '172.24.4.2'), ('10.0.0.4', '172.24.4.4')],
+            sorted(self.nb_idl.delete_static_routes.call_args[0][1]))
+        self.assertEqual({'fpm_reconciliations': 1,
+                          'fpm_stale_routes_removed': 2},
+                         self.update_routes.stats)
+
+    def test_reconcile_in_sync(self):
+        self.nb_idl.get_lrouter_static_routes.return_value = [
+            mock.Mock(ip_prefix='10.0.0.1', nexthop='172.24.4.1')]
+        self._replay((RTM_NEWROUTE, '10.0.0.1', '172.24.4.1'))
+
+        self.update_routes.reconcile()
+
+        self.nb_idl.transaction.assert_not_called()
+        self.assertEqual(0, self.update_routes.stats[
+            'fpm_stale_routes_removed'])
+
+    def test_reconcile_owner(self):
+        self.update_routes.owner = 'chassis-1'
+        self.nb_idl.get_lrouter_static_routes.return_value = []
+        self._replay((RTM_NEWROUTE, '10.0.0.1', '172.24.4.1'))
+
+        self.update_routes.reconcile()
+
+        self.nb_idl.get_lrouter_static_routes.assert_called_once_with(
+            'lr0', external_ids={'routing_proto': 'bgp',
+                                 enable_fdp.ROUTE_OWNER_EXT_ID_KEY:
+                                 'chassis-1'})
+        self.nb_idl.add_static_routes.assert_called_once_with(
+            'lr0', [{'ip_prefix': '10.0.0.1', 'nexthop': '172.24.4.1',
+                     'external_ids': {'routing_proto': 'bgp',
+                                      enable_fdp.ROUTE_OWNER_EXT_ID_KEY:
+                                      'chassis-1'}}])
+
+    def test_after_reconcile(self):
+        self.nb_idl.get_lrouter_static_routes.return_value = []
+        self.update_routes.reconcile()
+
+        self._replay((RTM_NEWROUTE, '10.0.0.1', '172.24.4.1'))
+
+        self.assertEqual(1, self.update_routes.pending)
+
+
+class TestUpdateRoutesBatching(test_base.TestCase):
+
+    def setUp(self):
+        super(TestUpdateRoutesBatching, self).setUp()
+        config.register_opts()
+        self.nb_idl = mock.MagicMock()
+        self.txn = self.nb_idl.transaction.return_value.__enter__.return_value
+        self.update_routes = enable_fdp.UpdateRoutes(self.nb_idl,
+                                                     max_pending=3)
+
+    def test_add_del_route_NBDB_queued(self):
+        self.update_routes.add_route_NBDB('10.0.0.1', 32, '172.24.4.1')
+        self.update_routes.del_route_NBDB('10.0.0.2', 32, '172.24.4.2')
+
+        self.assertEqual(2, self.update_routes.pending)
+        self.nb_idl.transaction.assert_not_called()
+
+    def test_flush(self):
+        self.update_routes.proto = 'bgp'
+        self.update_routes.add_route_NBDB('10.0.0.1', 32, '172.24.4.1')
+        self.update_routes.del_route_NBDB('10.0.0.2', 32, '172.24.4.2')
+
+        self.update_routes.flush()
+
+        self.nb_idl.transaction.assert_called_once_with(check_error=True)
+        self.nb_idl.add_static_routes.assert_called_once_with(
+            'lr0', [{'ip_prefix': '10.0.0.1', 'nexthop': '172.24.4.1',
+                     'external_ids': {'routing_proto': 'bgp'}}])
+        self.nb_idl.delete_static_routes.assert_called_once_with(
+            'lr0', [('10.0.0.2', '172.24.4.2')], if_exists=True)
+        self.txn.add.assert_has_calls([
+            mock.call(self.nb_idl.add_static_routes.return_value),
+            mock.call(self.nb_idl.delete_static_routes.return_value)])
+        self.assertEqual(0, self.update_routes.pending)
+
+    def test_flush_nothing_pending(self):
+        self.update_routes.flush()
+
+        self.nb_idl.transaction.assert_not_called()
+
+    def test_flush_collapse(self):
+        self.update_routes.add_route_NBDB('10.0.0.1', 32, '172.24.4.1')
+        self.update_routes.del_route_NBDB('10.0.0.1', 32, '172.24.4.1')
+        self.update_routes.del_route_NBDB('10.0.0.2', 32, '172.24.4.2')
+        self.update_routes.add_route_NBDB('10.0.0.2', 32, '172.24.4.2')
+
+        self.update_routes.flush()
+
+        self.nb_idl.add_static_routes.assert_called_once_with(
+            'lr0', [{'ip_prefix': '10.0.0.2', 'nexthop': '172.24.4.2',
+                     'external_ids': {'routing_proto': 'static'}}])
+        self.nb_idl.delete_static_routes.assert_called_once_with(
+            'lr0', [('10.0.0.1', '172.24.4.1')], if_exists=True)
+        self.assertEqual(2, self.txn.add.call_count)
+
+    def test_flush_max_pending(self):
+        for i in range(1, 4):
+            self.update_routes.add_route_NBDB(
+                '10.0.0.{}'.format(i), 32, '172.24.4.1')
+
+        self.nb_idl.transaction.assert_called_once_with(check_error=True)
+        self.assertEqual(
+            3, len(self.nb_idl.add_static_routes.call_args[0][1]))
+        self.assertEqual(0, self.update_routes.pending)
+
+    def test_flush_error(self):
+        self.nb_idl.transaction.side_effect = RuntimeError
+        self.update_routes.add_route_NBDB('10.0.0.1', 32, '172.24.4.1')
+
+        # the error is logged and the changes discarded
+        self.update_routes.flush()
+
+        self.assertEqual(0, self.update_routes.pending)
+
+    def test_flush_error_retried(self):
+        self.nb_idl.transaction.side_effect = RuntimeError
+        self.update_routes.update_FRR_route_to_NBDB(
+            _route_msg(RTM_NEWROUTE, '10.0.0.1', '172.24.4.1'))
+        self.update_routes.update_FRR_route_to_NBDB(
+            _route_msg(RTM_NEWROUTE, '10.0.0.2', '172.24.4.2'))
+        self.update_routes.flush()
+        self.nb_idl.transaction.side_effect = None
+        self.nb_idl.add_static_routes.reset_mock()
+
+        # the failed changes are applied again with the next update
+        self.update_routes.update_FRR_route_to_NBDB(
+            _route_msg(RTM_DELROUTE, '10.0.0.2', '172.24.4.2'))
+        self.update_routes.flush()
+
+        self.assertEqual(1, self.update_routes.stats['fpm_nb_commit_failures'])
+        self.nb_idl.add_static_routes.assert_called_once_with(
+            'lr0', [{'ip_prefix': '10.0.0.1', 'nexthop': '172.24.4.1',
+                     'external_ids': {'routing_proto': 'bgp'}}])
+        self.nb_idl.delete_static_routes.assert_called_once_with(
+            'lr0', [('10.0.0.2', '172.24.4.2')], if_exists=True)
+
+
+class TestUpdateRoutesLrouters(test_base.TestCase):
+
+    def setUp(self):
+        super(TestUpdateRoutesLrouters, self).setUp()
+        config.register_opts()
+        self.nb_idl = mock.MagicMock()
+        self.update_routes = enable_fdp.UpdateRoutes(
+            self.nb_idl, max_pending=2, address_cache=mock.Mock(),
+            table_lrouters={1001: 'lr-vrf1'})
+
+    def _update(self, msg_type, dst, gateway, table=254):
+        msg = rtmsg()
+        msg['header']['type'] = msg_type
+        msg['family'] = socket.AF_INET
+        msg['dst_len'] = 32
+        msg['proto'] = enable_fdp.RTPROT_BGP
+        msg['attrs'] = [('RTA_DST', dst), ('RTA_GATEWAY', gateway),
+                        ('RTA_TABLE', table)]
+        msg.encode()
+        self.update_routes.update_FRR_route_to_NBDB(bytes(msg.data))
+
+    def test_get_table_lrouters(self):
+        CONF.set_override('fpm_table_lrouters',
+                          {'1001': 'lr-vrf1', '1002': 'lr-vrf2'})
+        self.addCleanup(CONF.clear_override, 'fpm_table_lrouters')
+
+        self.assertEqual({1001: 'lr-vrf1', 1002: 'lr-vrf2'},
+                         enable_fdp.get_table_lrouters())
+
+    def test_get_table_lrouters_invalid(self):
+        CONF.set_override('fpm_table_lrouters', {'vrf1': 'lr-vrf1'})
+        self.addCleanup(CONF.clear_override, 'fpm_table_lrouters')
+
+        self.assertRaises(ValueError, enable_fdp.get_table_lrouters)
+
+    def test_get_lrouters(self):
+        CONF.set_override('fpm_table_lrouters',
+                          {'1001': 'lr-vrf1', '1002': 'lr0'})
+        self.addCleanup(CONF.clear_override, 'fpm_table_lrouters')
+
+        self.assertEqual({'lr0', 'lr-vrf1'}, enable_fdp.get_lrouters())
+
+    def test_get_lrouter(self):
+        self.assertEqual('lr-vrf1', self.update_routes.get_lrouter(1001))
+        self.assertEqual('lr0', self.update_routes.get_lrouter(254))
+
+    def test_flush_per_lrouter(self):
+        self._update(RTM_NEWROUTE, '10.0.0.1', '172.24.4.1')
+        self._update(RTM_NEWROUTE, '10.0.0.1', '172.24.4.1', table=1001)
+
+        self.update_routes.flush()
+
+        self.assertEqual(2, self.nb_idl.transaction.call_count)
+        self.nb_idl.add_static_routes.assert_has_calls([
+            mock.call('lr0', [{'ip_prefix': '10.0.0.1',
+                               'nexthop': '172.24.4.1',
+                               'external_ids': {'routing_proto': 'bgp'}}]),
+            mock.call('lr-vrf1', [{'ip_prefix': '10.0.0.1',
+                                   'nexthop': '172.24.4.1',
+                                   'external_ids': {'routing_proto': 'bgp'}}])
+        ])
+
+    def test_max_pending_per_lrouter(self):
+        self._update(RTM_NEWROUTE, '10.0.0.1', '172.24.4.1')
+        self._update(RTM_NEWROUTE, '10.0.0.1', '172.24.4.1', table=1001)
+        self._update(RTM_NEWROUTE, '10.0.0.2', '172.24.4.1', table=1001)
+
+        # only the full queue of lr-vrf1 is committed
+        self.nb_idl.add_static_routes.assert_called_once_with(
+            'lr-vrf1', mock.ANY)
+        self.assertEqual(1, self.update_routes.pending)
+
+    def test_reconcile(self):
+        def _get_lrouter_static_routes(lrouter, external_ids=None):
+            if lrouter == 'lr-vrf1':
+                return [mock.Mock(ip_prefix='10.0.0.9',
+                                  nexthop='172.24.4.1')]
+            return [mock.Mock(ip_prefix='10.0.0.1', nexthop='172.24.4.1')]
+
+        self.nb_idl.get_lrouter_static_routes.side_effect = (
+            _get_lrouter_static_routes)
+        self.update_routes.start_replay()
+        self._update(RTM_NEWROUTE, '10.0.0.1', '172.24.4.1')
+        self._update(RTM_NEWROUTE, '10.0.0.1', '172.24.4.1', table=1001)
+
+        self.update_routes.reconcile()
+
+        self.nb_idl.add_static_routes.assert_called_once_with(
+            'lr-vrf1', [{'ip_prefix': '10.0.0.1', 'nexthop': '172.24.4.1',
+                         'external_ids': {'routing_proto': 'bgp'}}])
+        self.nb_idl.delete_static_routes.assert_called_once_with(
+            'lr-vrf1', [('10.0.0.9', '172.24.4.1')], if_exists=True)
+        self.assertEqual(1, self.update_routes.stats[
+            'fpm_stale_routes_removed'])
+
+
+class TestUpdateRoutesDampening(test_base.TestCase):
+
+    def setUp(self):
+        super(TestUpdateRoutesDampening, self).setUp()
+        config.register_opts()
+        self.nb_idl = mock.MagicMock()
+        self.dampening = mock.Mock()
+        self.dampening.flap.return_value = False
+        self.dampening.is_suppressed.return_value = False
+        self.update_routes = enable_fdp.UpdateRoutes(
+            self.nb_idl, address_cache=mock.Mock(), dampening=self.dampening)
+
+    def _update(self, msg_type, dst, gateway):
+        self.update_routes.update_FRR_route_to_NBDB(
+            _route_msg(msg_type, dst, gateway))
+
+    def test_announce_not_penalized(self):
+        self._update(RTM_NEWROUTE, '10.0.0.1', '172.24.4.1')
+
+        self.dampening.flap.assert_not_called()
+        self.assertEqual(1, self.update_routes.pending)
+
+    def test_withdraw_penalized(self):
+        self._update(RTM_NEWROUTE, '10.0.0.1', '172.24.4.1')
+        self._update(RTM_DELROUTE, '10.0.0.1', '172.24.4.1')
+
+        self.dampening.flap.assert_called_once_with(('lr0', '10.0.0.1', 32))
+
+    def test_next_hop_change_penalized(self):
+        self._update(RTM_NEWROUTE, '10.0.0.1', '172.24.4.1')
+        self._update(RTM_NEWROUTE, '10.0.0.1', '172.24.4.2')
+
+        self.dampening.flap.assert_called_once_with(
+            ('lr0', '10.0.0.1', 32), weight=0.5)
+
+    def test_suppressed_held(self):
+        self._update(RTM_NEWROUTE, '10.0.0.1', '172.24.4.1')
+        self.update_routes.flush()
+        self.dampening.flap.return_value = True
+        self.dampening.is_suppressed.return_value = True
+
+        self._update(RTM_NEWROUTE, '10.0.0.1', '172.24.4.2')
+        self._update(RTM_NEWROUTE, '10.0.0.1', '172.24.4.3')
+
+        # the replaced next hop is deleted, the new ones are held
+        self.update_routes.flush()
+        self.nb_idl.delete_static_routes.assert_called_once_with(
+            'lr0', [('10.0.0.1', '172.24.4.1')], if_exists=True)
+        self.assertEqual(1, self.nb_idl.add_static_routes.call_count)
+        self.assertEqual(
+            2, self.update_routes.stats['fpm_dampening_held_updates'])
+
+    def test_suppressed_withdrawal_applied(self):
+        self._update(RTM_NEWROUTE, '10.0.0.1', '172.24.4.1')
+        self.update_routes.flush()
+        self.dampening.flap.return_value = True
+        self.dampening.is_suppressed.return_value = True
+
+        self._update(RTM_DELROUTE, '10.0.0.1', '172.24.4.1')
+
+        self.update_routes.flush()
+        self.nb_idl.delete_static_routes.assert_called_once_with(
+            'lr0', [('10.0.0.1', '172.24.4.1')], if_exists=True)
+        self.assertEqual(
+            0, self.update_routes.stats['fpm_dampening_held_updates'])
+
+    def test_reuse_routes(self):
+        self._update(RTM_NEWROUTE, '10.0.0.1', '172.24.4.1')
+        self.update_routes.flush()
+        self.dampening.flap.return_value = True
+        self.dampening.is_suppressed.return_value = True
+        self._update(RTM_NEWROUTE, '10.0.0.1', '172.24.4.2')
+        self._update(RTM_NEWROUTE, '10.0.0.1', '172.24.4.3')
+        self.dampening.get_reusable.return_value = [('lr0', '10.0.0.1', 32)]
+
+        self.update_routes.reuse_routes()
+        self.update_routes.flush()
+
+        # only the last state of the route is applied
+        self.nb_idl.add_static_routes.assert_called_with(
+            'lr0', [{'ip_prefix': '10.0.0.1', 'nexthop': '172.24.4.3',
+                     'external_ids': {'routing_proto': 'bgp'}}])
+        self.nb_idl.delete_static_routes.assert_called_with(
+            'lr0', [('10.0.0.1', '172.24.4.1')], if_exists=True)
+
+    def test_reuse_routes_replaying(self):
+        self.update_routes.start_replay()
+
+        self.update_routes.reuse_routes()
+
+        self.dampening.get_reusable.assert_not_called()
+
+
+class TestCommitWorker(test_base.TestCase):
+
+    def setUp(self):
+        super(TestCommitWorker, self).setUp()
+        config.register_opts()
+        self.nb_idl = mock.MagicMock()
+        self.worker = enable_fdp.CommitWorker(self.nb_idl, max_queued=2)
+
+    def _pending(self, *dsts):
+        return dict(((dst, '172.24.4.1'), (enable_fdp.ROUTE_ADD, 32, 'bgp'))
+                    for dst in dsts)
+
+    def test_put(self):
+        self.worker.start()
+        self.addCleanup(self.worker.stop, timeout=5)
+
+        self.worker.put('lr0', self._pending('10.0.0.1'))
+
+        self.assertTrue(self.worker.wait(timeout=5))
+        self.nb_idl.add_static_routes.assert_called_once_with(
+            'lr0', [{'ip_prefix': '10.0.0.1', 'nexthop': '172.24.4.1',
+                     'external_ids': {'routing_proto': 'bgp'}}])
+        self.assertEqual(1, self.worker.stats['fpm_nb_commits'])
+        self.assertEqual(0, self.worker.stats['fpm_nb_commit_queue_depth'])
+
+    def test_put_failure(self):
+        self.nb_idl.transaction.side_effect = RuntimeError
+        on_failure = mock.Mock()
+        self.worker.start()
+        self.addCleanup(self.worker.stop, timeout=5)
+
+        self.worker.put('lr0', self._pending('10.0.0.1'),
+                        on_failure=on_failure)
+
+        self.assertTrue(self.worker.wait(timeout=5))
+        on_failure.assert_called_once_with('lr0', self._pending('10.0.0.1'))
+
+    def test_commit_order(self):
+        self.worker.put('lr0', {('10.0.0.1', '172.24.4.1'): (
+            enable_fdp.ROUTE_ADD, 32, 'bgp')})
+        self.worker.put('lr0', {('10.0.0.1', '172.24.4.1'): (
+            enable_fdp.ROUTE_DEL, 32, 'bgp')})
+        self.worker.start()
+        self.addCleanup(self.worker.stop, timeout=5)
+
+        self.assertTrue(self.worker.wait(timeout=5))
+        self.assertEqual(
+            ['add_static_routes', 'delete_static_routes'],
+            [c[0] for c in self.nb_idl.method_calls
+             if c[0].endswith('_static_routes')])
+
+    def test_put_queue_full(self):
+        self.worker.put('lr0', self._pending('10.0.0.1'))
+        self.worker.put('lr0', self._pending('10.0.0.2'))
+        thread = threading.Thread(
+            target=self.worker.put, args=('lr0', self._pending('10.0.0.3')))
+        thread.start()
+        thread.join(0.2)
+        self.assertTrue(thread.is_alive())
+        self.assertEqual(1, self.worker.stats['fpm_nb_commit_queue_full'])
+
+        self.worker.start()
+        self.addCleanup(self.worker.stop, timeout=5)
+
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertTrue(self.worker.wait(timeout=5))
+        self.assertEqual(3, self.worker.stats['fpm_nb_commits'])
+
+    def test_stop(self):
+        self.worker.put('lr0', self._pending('10.0.0.1'))
+        self.worker.start()
+        threads = list(self.worker._threads.values())
+
+        self.worker.stop(timeout=5)
+
+        # the queued batches are committed before stopping
+        self.nb_idl.add_static_routes.assert_called_once_with(
+            'lr0', mock.ANY)
+        self.assertEqual(1, len(threads))
+        self.assertFalse(threads[0].is_alive())
+
+    def test_queue_per_lrouter(self):
+        committing = threading.Event()
+        resume = threading.Event()
+
+        def _add_static_routes(lrouter, routes):
+            if lrouter == 'lr0':
+                committing.set()
+                resume.wait(5)
+
+        self.nb_idl.add_static_routes.side_effect = _add_static_routes
+        self.worker.start()
+        self.addCleanup(self.worker.stop, timeout=5)
+        self.addCleanup(resume.set)
+        self.worker.put('lr0', self._pending('10.0.0.1'))
+        self.assertTrue(committing.wait(5))
+        self.worker.put('lr0', self._pending('10.0.0.2'))
+        self.worker.put('lr0', self._pending('10.0.0.3'))
+
+        # lr1 is committed while the queue of lr0 is full and blocked
+        self.worker.put('lr1', self._pending('10.0.0.1'))
+        for _ in range(50):
+            if self.nb_idl.add_static_routes.call_count == 2:
+                break
+            time.sleep(0.1)
+        self.nb_idl.add_static_routes.assert_called_with('lr1', mock.ANY)
+
+        resume.set()
+        self.assertTrue(self.worker.wait(timeout=5))
+        self.assertEqual(4, self.nb_idl.add_static_routes.call_count)
+
+    def test_update_routes_flush(self):
+        commit_worker = mock.Mock()
+        update_routes = enable_fdp.UpdateRoutes(
+            self.nb_idl, commit_worker=commit_worker)
+        update_routes.add_route_NBDB('10.0.0.1', 32, '172.24.4.1')
+
+        update_routes.flush()
+
+        commit_worker.put.assert_called_once_with('lr0', {
+            ('10.0.0.1', '172.24.4.1'): (enable_fdp.ROUTE_ADD, 32,
+                                         'static')},
+            on_failure=update_routes._commit_failed)
+        self.nb_idl.transaction.assert_not_called()
+
+    def test_update_routes_reconcile(self):
+        commit_worker = mock.Mock()
+        update_routes = enable_fdp.UpdateRoutes(
+            self.nb_idl, commit_worker=commit_worker)
+        self.nb_idl.get_lrouter_static_routes.return_value = []
+        update_routes.start_replay()
+
+        update_routes.reconcile()
+
+        commit_worker.wait.assert_called_once_with()
+
+
+class TestReadFpmMessage(test_base.TestCase):
+
+    def _read(self, data):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+
+        async def _read_all():
+            reader = asyncio.StreamReader()
+            reader.feed_data(data)
+            reader.feed_eof()
+            messages = []
+            while True:
+                msg = await enable_fdp.read_fpm_message(reader)
+                if msg is None:
+                    return messages
+                messages.append(msg)
+
+        return loop.run_until_complete(_read_all())
+
+    def test_read_fpm_message(self):
+        payload1 = _route_msg(RTM_NEWROUTE, '10.0.0.1', '172.24.4.1')
+        payload2 = _route_msg(RTM_DELROUTE, '10.0.0.2', '172.24.4.2')
+
+        ret = self._read(_fpm_frame(payload1) + _fpm_frame(payload2))
+
+        self.assertEqual([payload1, payload2], ret)
+
+    def test_read_fpm_message_protobuf(self):
+        data = _fpm_frame(b'fake',
+                          msg_type=enable_fdp.FPM_MSG_TYPE_PROTOBUF)
+
+        self.assertRaises(exceptions.InvalidFPMMessage, self._read, data)
+
+    def test_read_fpm_message_wrong_version(self):
+        data = _fpm_frame(b'fake', version=2)
+
+        self.assertRaises(exceptions.InvalidFPMMessage, self._read, data)
+
+    def test_read_fpm_message_truncated(self):
+        data = _fpm_frame(_route_msg(RTM_NEWROUTE, '10.0.0.1',
+                                     '172.24.4.1'))[:-1]
+
+        self.assertRaises(exceptions.InvalidFPMMessage, self._read, data)
+
+
+class TestFpmServer(test_base.TestCase):
+
+    def setUp(self):
+        super(TestFpmServer, self).setUp()
+        config.register_opts()
+        self.server = enable_fdp.FpmServer(mock.Mock(), port=0)
+        self.server.start()
+        self.addCleanup(self.server.stop, timeout=5)
+
+    def _connect(self):
+        conn = socket.create_connection((self.server.address,
+                                         self.server.port))
+        self.addCleanup(conn.close)
+        return conn
+
+    @mock.patch.object(enable_fdp.UpdateRoutes, 'update_FRR_route_to_NBDB')
+    def test_multiple_connections(self, mock_update):
+        received = threading.Semaphore(0)
+        mock_update.side_effect = lambda payload: received.release()
+        payload1 = _route_msg(RTM_NEWROUTE, '10.0.0.1', '172.24.4.1')
+        payload2 = _route_msg(RTM_NEWROUTE, '10.0.0.2', '172.24.4.2')
+        conn1 = self._connect()
+        conn2 = self._connect()
+
+        conn1.sendall(_fpm_frame(payload1))
+        conn2.sendall(_fpm_frame(payload2))
+
+        self.assertTrue(received.acquire(timeout=5))
+        self.assertTrue(received.acquire(timeout=5))
+        mock_update.assert_has_calls(
+            [mock.call(payload1), mock.call(payload2)], any_order=True)
+
+    def test_routes_committed(self):
+        CONF.set_override('fpm_nb_batch_interval', 0.1)
+        self.addCleanup(CONF.clear_override, 'fpm_nb_batch_interval')
+        CONF.set_override('fpm_replay_idle_time', 0.3)
+        self.addCleanup(CONF.clear_override, 'fpm_replay_idle_time')
+        committed = threading.Semaphore(0)
+        nb_idl = self.server.nb_idl
+        nb_idl.transaction.side_effect = (
+            lambda **kwargs: committed.release() or mock.MagicMock())
+        nb_idl.get_lrouter_static_routes.return_value = [
+            mock.Mock(ip_prefix='10.0.0.1', nexthop='172.24.4.1'),
+            mock.Mock(ip_prefix='10.0.0.9', nexthop='172.24.4.1')]
+        conn = self._connect()
+
+        # replay
+        conn.sendall(
+            _fpm_frame(_route_msg(RTM_NEWROUTE, '10.0.0.1', '172.24.4.1')) +
+            _fpm_frame(_route_msg(RTM_NEWROUTE, '10.0.0.2', '172.24.4.2')))
+
+        self.assertTrue(committed.acquire(timeout=5))
+        nb_idl.get_lrouter_static_routes.assert_called_once_with(
+            'lr0', external_ids={'routing_proto': 'bgp'})
+        nb_idl.add_static_routes.assert_called_once_with(
+            'lr0', [{'ip_prefix': '10.0.0.2', 'nexthop': '172.24.4.2',
+                     'external_ids': {'routing_proto': 'bgp'}}])
+        nb_idl.delete_static_routes.assert_called_once_with(
+            'lr0', [('10.0.0.9', '172.24.4.1')], if_exists=True)
+        self.assertEqual(1, self.server.stats['fpm_stale_routes_removed'])
+
+        # routes received after the replay
+        conn.sendall(
+            _fpm_frame(_route_msg(RTM_NEWROUTE, '10.0.0.3', '172.24.4.3')))
+
+        self.assertTrue(committed.acquire(timeout=5))
+        self.assertEqual(2, nb_idl.add_static_routes.call_count)
+        nb_idl.add_static_routes.assert_called_with(
+            'lr0', [{'ip_prefix': '10.0.0.3', 'nexthop': '172.24.4.3',
+                     'external_ids': {'routing_proto': 'bgp'}}])
+
+    def test_stop(self):
+        conn = self._connect()
+        for _ in range(50):
+            if self.server._connections:
+                break
+            time.sleep(0.1)
+
+        self.server.stop(timeout=5)
+
+        self.assertFalse(self.server._thread.is_alive())
+        conn.settimeout(5)
+        self.assertEqual(b'', conn.recv(1))
+
+    def test_end_replay_max_time(self):
+        CONF.set_override('fpm_replay_idle_time', 0.3)
+        self.addCleanup(CONF.clear_override, 'fpm_replay_idle_time')
+        CONF.set_override('fpm_replay_max_time', 0.2)
+        self.addCleanup(CONF.clear_override, 'fpm_replay_max_time')
+        route_updater = mock.Mock(generation=self.server._generation)
+
+        async def _replay():
+            received = asyncio.Event()
+            replay = asyncio.ensure_future(
+                self.server._end_replay(route_updater, received))
+            # zebra never stops sending routes
+            while not replay.done():
+                received.set()
+                await asyncio.sleep(0.05)
+            await replay
+
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        loop.run_until_complete(asyncio.wait_for(_replay(), 5))
+
+        route_updater.reconcile.assert_called_once_with()
@@ -0,0 +1,168 @@
+# Copyright 2022 Red Hat, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from unittest import mock
+
+from oslo_config import cfg
+
+from ovn_bgp_agent import config
+from ovn_bgp_agent import constants
+from ovn_bgp_agent.drivers.openstack.utils import evpn_context
+from ovn_bgp_agent.tests import base as test_base
+from ovn_bgp_agent.utils import linux_net
+
+CONF = cfg.CONF
+
+
+class TestEVPNContext(test_base.TestCase):
+
+    def test_devices(self):
+        context = evpn_context.EVPNContext('77', bgp_as=64999)
+
+        self.assertEqual(77, context.table)
+        self.assertEqual('br-77', context.bridge_name)
+        self.assertIsNone(context.svi_name)
+        self.assertEqual(['lo-77', 'vrf-77', 'br-77', 'vxlan-77',
+                          'veth-vrf-77', 'vlan-77'], context.devices)
+
+    def test_devices_single_vxlan(self):
+        context = evpn_context.EVPNContext(77, single_vxlan=True)
+
+        self.assertEqual(constants.OVN_EVPN_SINGLE_BRIDGE,
+                         context.bridge_name)
+        self.assertEqual(constants.OVN_EVPN_SINGLE_VXLAN, context.vxlan_name)
+        self.assertEqual(['lo-77', 'vrf-77', 'svi-77', 'veth-vrf-77',
+                          'vlan-77'], context.devices)
+
+    def test_update_ifindexes(self):
+        context = evpn_context.EVPNContext(77)
+
+        context.update_ifindexes({'vrf-77': {'index': 3},
+                                  'veth-ovs-77': {'index': 4},
+                                  'vrf-88': {'index': 5}})
+
+        self.assertEqual({'vrf-77': 3, 'veth-ovs-77': 4}, context.ifindexes)
+
+
+class TestEVPNContextManager(test_base.TestCase):
+
+    def setUp(self):
+        super(TestEVPNContextManager, self).setUp()
+        config.register_opts()
+        self.mock_get_nic_ip = mock.patch.object(
+            linux_net, 'get_nic_ip').start()
+        self.mock_get_nic_ip.return_value = ['10.0.0.1']
+        self.mock_get_index = mock.patch.object(
+            linux_net, 'get_interface_index').start()
+        self.mock_get_index.return_value = 1
+        self.contexts = evpn_context.EVPNContextManager()
+        # as if the monitor thread was running
+        self.contexts._monitor = mock.Mock()
+
+    def _get_msg(self, event, index, ifname=None):
+        msg = {'event': event, 'index': index, 'family': 2}
+        return mock.Mock(get=msg.get, __getitem__=lambda _, k: msg[k],
+                         get_attr=mock.Mock(return_value=ifname))
+
+    def test_get(self):
+        context = self.contexts.get(77, bgp_as=64999)
+
+        self.assertIs(context, self.contexts.get('77'))
+        self.assertEqual(64999, context.bgp_as)
+        self.assertIs(context, self.contexts.find(77))
+        self.assertIsNone(self.contexts.find(88))
+        self.assertEqual(1, len(self.contexts))
+
+    def test_get_single_vxlan(self):
+        CONF.set_override('evpn_single_vxlan', True)
+        self.addCleanup(CONF.clear_override, 'evpn_single_vxlan')
+
+        self.assertEqual('svi-77', self.contexts.get(77).svi_name)
+
+    def test_remove(self):
+        context = self.contexts.get(77)
+
+        self.assertIs(context, self.contexts.remove(77))
+        self.assertIsNone(self.contexts.remove(77))
+        self.assertNotIn(77, self.contexts)
+
+    def test_get_vtep_ip(self):
+        self.assertEqual('10.0.0.1', self.contexts.get_vtep_ip())
+        self.assertEqual('10.0.0.1', self.contexts.get_vtep_ip())
+
+        self.mock_get_nic_ip.assert_called_once_with('lo', 32)
+        self.mock_get_index.assert_called_once_with('lo')
+
+    def test_get_vtep_ip_config(self):
+        CONF.set_override('evpn_local_ip', '10.0.0.2')
+        self.addCleanup(CONF.clear_override, 'evpn_local_ip')
+
+        self.assertEqual('10.0.0.2', self.contexts.get_vtep_ip())
+        self.mock_get_nic_ip.assert_not_called()
+
+    def test_get_vtep_ip_nic(self):
+        CONF.set_override('evpn_nic', 'eth1')
+        self.addCleanup(CONF.clear_override, 'evpn_nic')
+
+        self.contexts.get_vtep_ip()
+
+        self.mock_get_nic_ip.assert_called_once_with('eth1', False)
+
+    def test_get_vtep_ip_not_found(self):
+        self.mock_get_nic_ip.return_value = []
+
+        self.assertIsNone(self.contexts.get_vtep_ip())
+
+    def test_get_vtep_ip_not_monitoring(self):
+        self.contexts._monitor = None
+
+        self.contexts.get_vtep_ip()
+        self.contexts.get_vtep_ip()
+
+        self.assertEqual(2, self.mock_get_nic_ip.call_count)
+        self.mock_get_index.assert_not_called()
+
+    def test_handle_notification_address(self):
+        self.contexts.get_vtep_ip()
+
+        # other device
+        self.contexts.handle_notification(self._get_msg('RTM_NEWADDR', 2))
+        self.contexts.get_vtep_ip()
+        self.assertEqual(1, self.mock_get_nic_ip.call_count)
+
+        self.contexts.handle_notification(self._get_msg('RTM_DELADDR', 1))
+        self.contexts.get_vtep_ip()
+        self.assertEqual(2, self.mock_get_nic_ip.call_count)
+
+    def test_handle_notification_link(self):
+        context = self.contexts.get(77)
+        context.ifindexes = {'vrf-77': 3}
+
+        self.contexts.handle_notification(
+            self._get_msg('RTM_NEWLINK', 4, ifname='lo-77'))
+        self.contexts.handle_notification(
+            self._get_msg('RTM_NEWLINK', 5, ifname='eth0'))
+        self.assertEqual({'vrf-77': 3, 'lo-77': 4}, context.ifindexes)
+
+        self.contexts.handle_notification(
+            self._get_msg('RTM_DELLINK', 3, ifname='vrf-77'))
+        self.assertEqual({'lo-77': 4}, context.ifindexes)
+
+    def test_update_ifindexes(self):
+        context = self.contexts.get(77)
+
+        self.contexts.update_ifindexes({'lo-77': {'index': 4}})
+
+        self.assertEqual({'lo-77': 4}, context.ifindexes)
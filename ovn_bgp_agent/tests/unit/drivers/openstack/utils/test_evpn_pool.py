@@ -0,0 +1,152 @@
+# Copyright 2022 Red Hat, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from unittest import mock
+
+from ovn_bgp_agent.drivers.openstack.utils import evpn_pool
+from ovn_bgp_agent.tests import base as test_base
+from ovn_bgp_agent.utils import linux_net
+
+
+class TestEVPNDevicePool(test_base.TestCase):
+
+    def setUp(self):
+        super(TestEVPNDevicePool, self).setUp()
+        self.mock_get_ifaces = mock.patch.object(
+            linux_net, 'get_interfaces').start()
+        self.mock_get_ifaces.return_value = ['lo', 'lo-77']
+        self.mock_create = mock.patch.object(
+            linux_net, 'create_device').start()
+        self.mock_delete = mock.patch.object(
+            linux_net, 'delete_device').start()
+        self.mock_rename = mock.patch.object(
+            linux_net, 'rename_device').start()
+        self.mock_rename.return_value = True
+        self.pool = evpn_pool.EVPNDevicePool(1)
+
+    def test_refill(self):
+        self.pool.refill()
+
+        expected_calls = [
+            mock.call('ovnpool-lo-0', evpn_pool.DUMMY),
+            mock.call('ovnpool-br-0', evpn_pool.BRIDGE, br_stp_state=0),
+            mock.call('ovnpool-vrf-0', evpn_pool.VETH, peer='ovnpool-ovs-0')]
+        self.assertEqual(expected_calls, self.mock_create.call_args_list)
+        self.assertEqual(3, len(self.pool))
+        self.assertEqual(3, self.pool.stats['evpn_pool_free_devices'])
+        self.mock_delete.assert_not_called()
+
+    def test_refill_existing_and_extra(self):
+        self.mock_get_ifaces.return_value = [
+            'ovnpool-lo-0', 'ovnpool-vrf-0', 'ovnpool-ovs-0', 'ovnpool-lo-1']
+        pool = evpn_pool.EVPNDevicePool(1, bridges=False)
+
+        pool.refill()
+
+        self.mock_create.assert_not_called()
+        self.mock_delete.assert_called_once_with('ovnpool-lo-1')
+        self.assertEqual(2, len(pool))
+
+    def test_refill_create_error(self):
+        self.mock_create.side_effect = (None, Exception('Boom'), None)
+
+        self.pool.refill()
+
+        self.assertEqual(2, len(self.pool))
+
+    def test_refill_foreign_devices(self):
+        self.mock_get_ifaces.return_value = [
+            'ovnpool-lo-0', 'ovnpool-br-0', 'ovnpool-vrf-0', 'ovnpool-ovs-0',
+            'ovnpool-uplink', 'ovnpool-lo-x', 'ovnpool-lo-01', 'pool-lo-1']
+
+        self.pool.refill()
+
+        self.mock_delete.assert_not_called()
+
+    def test_refill_disabled(self):
+        self.mock_get_ifaces.return_value = [
+            'eth0', 'pool-uplink', 'br-ex', 'ovnpool-lo-0']
+        pool = evpn_pool.EVPNDevicePool(0)
+
+        pool.refill()
+
+        self.mock_get_ifaces.assert_not_called()
+        self.mock_create.assert_not_called()
+        self.mock_delete.assert_not_called()
+        self.assertEqual(0, len(pool))
+
+    def test_take(self):
+        self.pool.refill()
+
+        self.assertTrue(self.pool.take(evpn_pool.DUMMY, 'lo-88'))
+
+        self.mock_rename.assert_called_once_with('ovnpool-lo-0', 'lo-88')
+        self.assertEqual(2, len(self.pool))
+        self.assertEqual(1, self.pool.stats['evpn_pool_devices_used'])
+        # the device exists now
+        self.assertFalse(self.pool.take(evpn_pool.DUMMY, 'lo-88'))
+
+    def test_take_veth(self):
+        self.pool.refill()
+
+        self.assertTrue(self.pool.take(evpn_pool.VETH, 'veth-vrf-88',
+                                       peer='veth-ovs-88'))
+
+        expected_calls = [mock.call('ovnpool-vrf-0', 'veth-vrf-88'),
+                          mock.call('ovnpool-ovs-0', 'veth-ovs-88')]
+        self.assertEqual(expected_calls, self.mock_rename.call_args_list)
+
+    def test_take_existing_device(self):
+        self.pool.refill()
+
+        self.assertFalse(self.pool.take(evpn_pool.DUMMY, 'lo-77'))
+
+        self.mock_rename.assert_not_called()
+        self.assertEqual(3, len(self.pool))
+
+    def test_take_created_meanwhile(self):
+        self.pool.refill()
+        self.mock_rename.return_value = False
+
+        self.assertFalse(self.pool.take(evpn_pool.DUMMY, 'lo-88'))
+        self.assertEqual(3, len(self.pool))
+        self.assertFalse(self.pool.take(evpn_pool.DUMMY, 'lo-88'))
+        self.mock_rename.assert_called_once_with('ovnpool-lo-0', 'lo-88')
+
+    def test_take_pooled_device_missing(self):
+        self.pool.refill()
+        self.mock_rename.side_effect = KeyError('ovnpool-lo-0')
+
+        self.assertFalse(self.pool.take(evpn_pool.DUMMY, 'lo-88'))
+        self.assertEqual(2, len(self.pool))
+
+    def test_take_empty(self):
+        self.assertFalse(self.pool.take(evpn_pool.DUMMY, 'lo-88'))
+        self.assertFalse(self.pool.take(evpn_pool.BRIDGE, 'br-88'))
+        self.mock_rename.assert_not_called()
+
+    def test_take_no_bridges(self):
+        pool = evpn_pool.EVPNDevicePool(1, bridges=False)
+        pool.refill()
+
+        self.assertFalse(pool.take(evpn_pool.BRIDGE, 'br-88'))
+        self.mock_rename.assert_not_called()
+
+    def test_forget(self):
+        self.pool.refill()
+
+        self.pool.forget(['lo-77'])
+
+        self.assertTrue(self.pool.take(evpn_pool.DUMMY, 'lo-77'))
@@ -0,0 +1,121 @@
+# Copyright 2022 Red Hat, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import socket
+
+from pyroute2.netlink.rtnl.ifaddrmsg import ifaddrmsg
+from pyroute2.netlink.rtnl.rtmsg import rtmsg
+
+from ovn_bgp_agent.drivers.openstack.utils import fpm
+from ovn_bgp_agent import exceptions
+from ovn_bgp_agent.tests import base as test_base
+
+
+def _encode(msg_class, msg_type, attrs, **fields):
+    msg = msg_class()
+    msg['header']['type'] = msg_type
+    for field, value in fields.items():
+        msg[field] = value
+    msg['attrs'] = attrs
+    msg.encode()
+    return bytes(msg.data)
+
+
+class TestDecodeRoutes(test_base.TestCase):
+
+    def test_decode_routes(self):
+        payload = _encode(
+            rtmsg, fpm.RTM_NEWROUTE,
+            [('RTA_DST', '10.0.0.0'), ('RTA_GATEWAY', '172.24.4.1'),
+             ('RTA_OIF', 3)],
+            family=socket.AF_INET, dst_len=24, proto=186, table=254)
+
+        ret = list(fpm.decode_routes(payload))
+
+        self.assertEqual([fpm.Route(
+            fpm.RTM_NEWROUTE, socket.AF_INET, 254, 186, '10.0.0.0', 24,
+            (fpm.Nexthop('172.24.4.1', 3),))], ret)
+
+    def test_decode_routes_ipv6(self):
+        payload = _encode(
+            rtmsg, fpm.RTM_DELROUTE,
+            [('RTA_DST', '2001:db8::'), ('RTA_OIF', 7)],
+            family=socket.AF_INET6, dst_len=64, proto=186)
+
+        ret = list(fpm.decode_routes(bytearray(payload)))
+
+        self.assertEqual([fpm.Route(
+            fpm.RTM_DELROUTE, socket.AF_INET6, 0, 186, '2001:db8::', 64,
+            (fpm.Nexthop(None, 7),))], ret)
+
+    def test_decode_routes_multipath(self):
+        payload = _encode(
+            rtmsg, fpm.RTM_NEWROUTE,
+            [('RTA_DST', '10.0.0.0'), ('RTA_TABLE', 1000),
+             ('RTA_MULTIPATH', [
+                 {'attrs': [('RTA_GATEWAY', '172.24.4.1')], 'oif': 3},
+                 {'attrs': [('RTA_GATEWAY', '172.24.4.2')], 'oif': 4},
+                 {'attrs': [], 'oif': 5}])],
+            family=socket.AF_INET, dst_len=24, proto=186)
+
+        route, = fpm.decode_routes(payload)
+
+        self.assertEqual(1000, route.table)
+        self.assertEqual((fpm.Nexthop('172.24.4.1', 3),
+                          fpm.Nexthop('172.24.4.2', 4),
+                          fpm.Nexthop(None, 5)), route.nexthops)
+
+    def test_decode_routes_default_route(self):
+        payload = _encode(
+            rtmsg, fpm.RTM_NEWROUTE, [('RTA_GATEWAY', '172.24.4.1')],
+            family=socket.AF_INET, dst_len=0, proto=186)
+
+        route, = fpm.decode_routes(payload)
+
+        self.assertEqual('0.0.0.0', route.dst)
+        self.assertEqual(0, route.dst_len)
+
+    def test_decode_routes_several_messages(self):
+        route1 = _encode(rtmsg, fpm.RTM_NEWROUTE, [('RTA_DST', '10.0.0.1')],
+                         family=socket.AF_INET, dst_len=32)
+        address = _encode(ifaddrmsg, 20, [('IFA_ADDRESS', '10.0.0.2')],
+                          family=socket.AF_INET)
+        route2 = _encode(rtmsg, fpm.RTM_DELROUTE, [('RTA_DST', '10.0.0.3')],
+                         family=socket.AF_INET, dst_len=32)
+
+        ret = list(fpm.decode_routes(route1 + address + route2))
+
+        self.assertEqual(['10.0.0.1', '10.0.0.3'], [r.dst for r in ret])
+        self.assertEqual([fpm.RTM_NEWROUTE, fpm.RTM_DELROUTE],
+                         [r.msg_type for r in ret])
+        self.assertEqual([(), ()], [r.nexthops for r in ret])
+
+    def test_decode_routes_truncated(self):
+        payload = _encode(rtmsg, fpm.RTM_NEWROUTE, [('RTA_DST', '10.0.0.1')],
+                          family=socket.AF_INET, dst_len=32)
+
+        self.assertRaises(exceptions.InvalidFPMMessage, list,
+                          fpm.decode_routes(payload[:-1]))
+
+    def test_decode_routes_invalid_address(self):
+        payload = _encode(rtmsg, fpm.RTM_NEWROUTE, [('RTA_DST', '2001:db8::')],
+                          family=socket.AF_INET6, dst_len=64)
+        # claim it is an IPv4 route
+        payload = (payload[:fpm.NLMSG_HEADER.size] +
+                   bytes([socket.AF_INET]) +
+                   payload[fpm.NLMSG_HEADER.size + 1:])
+
+        self.assertRaises(exceptions.InvalidFPMMessage, list,
+                          fpm.decode_routes(payload))
@@ -14,18 +14,29 @@
 #    under the License.
 
 import tempfile
+import threading
 from unittest import mock
 
+from oslo_concurrency import processutils
+from oslo_config import cfg
+
+from ovn_bgp_agent import config
 from ovn_bgp_agent import constants
 from ovn_bgp_agent.drivers.openstack.utils import frr as frr_utils
 from ovn_bgp_agent.tests import base as test_base
 
+CONF = cfg.CONF
+
 
 class TestFrr(test_base.TestCase):
 
     def setUp(self):
         super(TestFrr, self).setUp()
+        config.register_opts()
+        CONF.set_override('frr_reconfigure_interval', 0)
         self.mock_vtysh = mock.patch('ovn_bgp_agent.privileged.vtysh').start()
+        self.mock_vtysh.run_vtysh_command.return_value = ''
+        mock.patch.object(frr_utils, '_config_manager', None).start()
 
     def test__get_router_id(self):
         router_id = 'fake-router'
@@ -55,6 +66,22 @@ class TestFrr(test_base.TestCase):
         # Assert the file was closed
         mock_tf.return_value.close.assert_called_once_with()
 
+    @mock.patch.object(tempfile, 'NamedTemporaryFile')
+    def test_vrf_leak_already_configured(self, mock_tf):
+        vrf = 'fake-vrf'
+        bgp_as = 'fake-bgp-as'
+        router_id = 'fake-router-id'
+        self.mock_vtysh.run_vtysh_command.return_value = (
+            frr_utils.LEAK_VRF_TEMPLATE.replace(
+                '{{ vrf_name }}', vrf).replace(
+                '{{ bgp_as }}', bgp_as).replace(
+                '{{ bgp_router_id }}', router_id))
+
+        frr_utils.vrf_leak(vrf, bgp_as, router_id)
+
+        self.assertFalse(mock_tf.called)
+        self.assertFalse(self.mock_vtysh.run_vtysh_config.called)
+
     @mock.patch.object(frr_utils, '_get_router_id')
     @mock.patch.object(tempfile, 'NamedTemporaryFile')
     def test_vrf_leak_no_router_id(self, mock_tf, mock_gri):
@@ -67,6 +94,9 @@ class TestFrr(test_base.TestCase):
     def _test_vrf_reconfigure(self, mock_tf, add_vrf=True):
         action = 'add-vrf' if add_vrf else 'del-vrf'
         evpn_info = {'vni': '1001', 'bgp_as': 'fake-bgp-as'}
+        if not add_vrf:
+            self.mock_vtysh.run_vtysh_command.return_value = (
+                'vrf vrf-1001\n vni 1001\nexit-vrf\n')
 
         frr_utils.vrf_reconfigure(evpn_info, action)
 
@@ -96,3 +126,187 @@ class TestFrr(test_base.TestCase):
         frr_utils.vrf_reconfigure('fake-evpn-info', 'non-existing-action')
         # Assert run_vtysh_command() wasn't called
         self.assertFalse(self.mock_vtysh.run_vtysh_config.called)
+
+    @mock.patch.object(tempfile, 'NamedTemporaryFile')
+    def test_vrf_reconfigure_add_vrf_already_configured(self, mock_tf):
+        evpn_info = {'vni': '1001', 'bgp_as': 'fake-bgp-as'}
+        self.mock_vtysh.run_vtysh_command.return_value = (
+            'vrf vrf-1001\n vni 1001\nexit-vrf\n!\n'
+            'router bgp fake-bgp-as vrf vrf-1001\n'
+            ' address-family ipv4 unicast\n'
+            '  redistribute connected\n'
+            ' exit-address-family\n'
+            ' address-family ipv6 unicast\n'
+            '  redistribute connected\n'
+            ' exit-address-family\n'
+            ' address-family l2vpn evpn\n'
+            '  advertise ipv4 unicast\n'
+            '  advertise ipv6 unicast\n'
+            ' exit-address-family\n'
+            'exit\n')
+
+        frr_utils.vrf_reconfigure(evpn_info, 'add-vrf')
+
+        self.assertFalse(mock_tf.called)
+        self.assertFalse(self.mock_vtysh.run_vtysh_config.called)
+
+    @mock.patch.object(tempfile, 'NamedTemporaryFile')
+    def test_vrf_reconfigure_del_vrf_not_configured(self, mock_tf):
+        evpn_info = {'vni': '1001', 'bgp_as': 'fake-bgp-as'}
+        self.mock_vtysh.run_vtysh_command.return_value = (
+            'vrf vrf-1002\n vni 1002\nexit-vrf\n')
+
+        frr_utils.vrf_reconfigure(evpn_info, 'del-vrf')
+
+        self.assertFalse(mock_tf.called)
+
+    @mock.patch.object(tempfile, 'NamedTemporaryFile')
+    def test_config_manager_batches_changes(self, mock_tf):
+        manager = frr_utils.FrrConfigManager(flush_interval=60)
+        self.addCleanup(manager.flush)
+        manager.add_vrf({'vni': 1001, 'bgp_as': 64999})
+        manager.add_vrf({'vni': 1002, 'bgp_as': 64999})
+        manager.add_vrf({'vni': 1003, 'bgp_as': 64999})
+        # the latest action for a VRF supersedes the pending one
+        manager.del_vrf({'vni': 1003, 'bgp_as': 64999})
+        self.assertFalse(mock_tf.called)
+
+        manager.flush()
+
+        mock_tf.return_value.write.assert_called_once()
+        write_arg = mock_tf.return_value.write.call_args_list[0][0][0]
+        self.assertIn('\nvrf vrf-1001', write_arg)
+        self.assertIn('\nvrf vrf-1002', write_arg)
+        self.assertNotIn('vrf-1003', write_arg)
+        self.mock_vtysh.run_vtysh_config.assert_called_once_with(
+            mock_tf.return_value.name)
+
+    @mock.patch.object(tempfile, 'NamedTemporaryFile')
+    def test_config_manager_no_running_config(self, mock_tf):
+        self.mock_vtysh.run_vtysh_command.side_effect = Exception
+        manager = frr_utils.FrrConfigManager()
+        evpn_info = {'vni': 1001, 'bgp_as': 64999}
+
+        manager.add_vrf(evpn_info)
+        # the cached configuration is used instead
+        manager.add_vrf(evpn_info)
+        manager.del_vrf(evpn_info)
+        manager.del_vrf(evpn_info)
+
+        self.assertEqual(2, self.mock_vtysh.run_vtysh_config.call_count)
+
+    @mock.patch.object(tempfile, 'NamedTemporaryFile')
+    def test_config_manager_batch(self, mock_tf):
+        manager = frr_utils.FrrConfigManager()
+        with manager.batch():
+            manager.add_vrf({'vni': 1001, 'bgp_as': 64999})
+            with manager.batch():
+                manager.add_vrf({'vni': 1002, 'bgp_as': 64999})
+            self.assertFalse(mock_tf.called)
+
+        mock_tf.return_value.write.assert_called_once()
+        write_arg = mock_tf.return_value.write.call_args_list[0][0][0]
+        self.assertIn('\nvrf vrf-1001', write_arg)
+        self.assertIn('\nvrf vrf-1002', write_arg)
+
+    @mock.patch.object(tempfile, 'NamedTemporaryFile')
+    def test_config_manager_flush_error(self, mock_tf):
+        self.mock_vtysh.run_vtysh_command.side_effect = Exception
+        self.mock_vtysh.run_vtysh_config.side_effect = [
+            processutils.ProcessExecutionError, None]
+        manager = frr_utils.FrrConfigManager()
+        evpn_info = {'vni': 1001, 'bgp_as': 64999}
+
+        self.assertRaises(processutils.ProcessExecutionError,
+                          manager.add_vrf, evpn_info)
+        # the failed change is not recorded as configured, but retried
+        self.assertEqual({}, manager._configured)
+        self.assertIn('vrf-1001', manager._pending)
+
+        manager.flush()
+
+        self.assertEqual(2, self.mock_vtysh.run_vtysh_config.call_count)
+        self.assertEqual({'vrf-1001': evpn_info}, manager._configured)
+        self.assertEqual({}, manager._pending)
+
+    @mock.patch.object(tempfile, 'NamedTemporaryFile')
+    def test_config_manager_flush_scheduled_error(self, mock_tf):
+        self.mock_vtysh.run_vtysh_config.side_effect = Exception
+        manager = frr_utils.FrrConfigManager(flush_interval=60)
+        self.addCleanup(manager.flush)
+        manager.add_vrf({'vni': 1001, 'bgp_as': 64999})
+        timer = manager._timer
+
+        with mock.patch.object(threading, 'Timer') as mock_timer:
+            manager._flush_scheduled()
+
+        # the flush is scheduled again
+        timer.cancel()
+        mock_timer.return_value.start.assert_called_once_with()
+        self.assertIn('vrf-1001', manager._pending)
+        self.mock_vtysh.run_vtysh_config.side_effect = None
+
+    @mock.patch.object(tempfile, 'NamedTemporaryFile')
+    def test_config_manager_batch_flush_error(self, mock_tf):
+        self.mock_vtysh.run_vtysh_config.side_effect = (
+            processutils.ProcessExecutionError)
+        manager = frr_utils.FrrConfigManager()
+        self.addCleanup(manager.flush)
+
+        def _batch():
+            with manager.batch():
+                manager.add_vrf({'vni': 1001, 'bgp_as': 64999})
+
+        with mock.patch.object(threading, 'Timer') as mock_timer:
+            self.assertRaises(processutils.ProcessExecutionError,
+                              _batch)
+
+        # the failed changes are retried later
+        mock_timer.assert_called_once_with(frr_utils.FLUSH_RETRY_INTERVAL,
+                                           manager._flush_scheduled)
+        mock_timer.return_value.start.assert_called_once_with()
+        self.assertIn('vrf-1001', manager._pending)
+        self.mock_vtysh.run_vtysh_config.side_effect = None
+
+    @mock.patch.object(tempfile, 'NamedTemporaryFile')
+    def test_config_manager_batch_body_error(self, mock_tf):
+        self.mock_vtysh.run_vtysh_config.side_effect = Exception
+        manager = frr_utils.FrrConfigManager()
+        self.addCleanup(manager.flush)
+
+        def _batch():
+            with manager.batch():
+                manager.add_vrf({'vni': 1001, 'bgp_as': 64999})
+                raise ValueError
+
+        with mock.patch.object(threading, 'Timer') as mock_timer:
+            # the exception of the block is not replaced by the flush one
+            self.assertRaises(ValueError, _batch)
+
+        self.mock_vtysh.run_vtysh_config.assert_called_once()
+        mock_timer.return_value.start.assert_called_once_with()
+        self.assertIn('vrf-1001', manager._pending)
+        self.mock_vtysh.run_vtysh_config.side_effect = None
+
+    def test_flush_config(self):
+        frr_utils.flush_config()
+        self.assertIsNone(frr_utils._config_manager)
+
+        with mock.patch.object(frr_utils.get_config_manager(),
+                               'flush') as mock_flush:
+            frr_utils.flush_config()
+        mock_flush.assert_called_once_with()
+
+    def test__parse_config(self):
+        config = ('router bgp 64999\n'
+                  ' address-family ipv4 unicast\n'
+                  '  import vrf bgp-vrf\n'
+                  ' exit-address-family\n'
+                  'exit\n'
+                  '!\n')
+        expected = {
+            ((), 'router bgp 64999'),
+            (('router bgp 64999',), 'address-family ipv4 unicast'),
+            (('router bgp 64999', 'address-family ipv4 unicast'),
+             'import vrf bgp-vrf')}
+        self.assertEqual(expected, frr_utils._parse_config(config))
@@ -191,6 +191,35 @@ class TestOvsdbSbOvnIdl(test_base.TestCase):
         # Port-1 is bound to chassis-1
         self.assertNotIn(port1, ret)
 
+    def test_get_cr_lrp_ports_standby_on_chassis(self):
+        ch0 = fakes.create_object({'name': 'chassis-0'})
+        ch1 = fakes.create_object({'name': 'chassis-1'})
+        ha_ch0 = fakes.create_object({'chassis': [ch0]})
+        ha_ch1 = fakes.create_object({'chassis': [ch1]})
+        group = fakes.create_object({'ha_chassis': [ha_ch0, ha_ch1]})
+        other_group = fakes.create_object({'ha_chassis': [ha_ch1]})
+        # active on chassis-1, chassis-0 is a backup
+        port0 = fakes.create_object({'name': 'port-0', 'chassis': [ch1],
+                                     'ha_chassis_group': [group]})
+        # active on chassis-0
+        port1 = fakes.create_object({'name': 'port-1', 'chassis': [ch0],
+                                     'ha_chassis_group': [group]})
+        # chassis-0 is not a gateway candidate
+        port2 = fakes.create_object({'name': 'port-2', 'chassis': [ch1],
+                                     'ha_chassis_group': [other_group]})
+        # not bound
+        port3 = fakes.create_object({'name': 'port-3', 'chassis': [],
+                                     'ha_chassis_group': [group]})
+        self.sb_idl.db_find_rows.return_value.execute.return_value = [
+            port0, port1, port2, port3]
+
+        ret = self.sb_idl.get_cr_lrp_ports_standby_on_chassis('chassis-0')
+
+        self.assertEqual([port0, port3], ret)
+        self.sb_idl.db_find_rows.assert_called_once_with(
+            'Port_Binding',
+            ('type', '=', constants.OVN_CHASSISREDIRECT_VIF_PORT_TYPE))
+
     def _test_get_provider_datapath_from_cr_lrp(self, port, found_port=True):
         ret_value = (fakes.create_object({'datapath': 'dp1'})
                      if found_port else None)
@@ -566,3 +595,265 @@ class TestOvnSbIdl(test_base.TestCase):
         mock_conn.assert_called_once_with(self.sb_idl, timeout=180)
         notify_handler.watch_events.assert_called_once_with(
             ['fake-event0', 'fake-event1'])
+
+
+def _fake_route(uuid, ip_prefix, nexthop):
+    table = fakes.create_object({'name': 'Logical_Router_Static_Route'})
+    return mock.Mock(uuid=uuid, ip_prefix=ip_prefix, nexthop=nexthop,
+                     _table=table)
+
+
+def _fake_router(uuid, static_routes):
+    table = fakes.create_object({'name': 'Logical_Router'})
+    return mock.Mock(uuid=uuid, static_routes=static_routes, _table=table)
+
+
+class TestStaticRouteIndex(test_base.TestCase):
+
+    def setUp(self):
+        super(TestStaticRouteIndex, self).setUp()
+        self.index = ovn_utils.StaticRouteIndex()
+        self.route1 = _fake_route('route1', '10.0.0.1', '172.24.4.1')
+        self.route2 = _fake_route('route2', '10.0.0.2', '172.24.4.1')
+        self.router = _fake_router('router', [self.route1, self.route2])
+
+    def test_notify_routes_first(self):
+        self.index.notify('create', self.route1)
+        self.index.notify('create', self.route2)
+        self.index.notify('create', self.router)
+
+        self.assertEqual({'route1'}, self.index.get(
+            'router', '10.0.0.1', '172.24.4.1'))
+        self.assertEqual({'route2'}, self.index.get(
+            'router', '10.0.0.2', '172.24.4.1'))
+
+    def test_notify_router_first(self):
+        self.index.notify('create', self.router)
+        self.index.notify('create', self.route1)
+
+        self.assertEqual({'route1'}, self.index.get(
+            'router', '10.0.0.1', '172.24.4.1'))
+        self.assertEqual(set(), self.index.get(
+            'router', '10.0.0.2', '172.24.4.1'))
+
+    def test_notify_router_update(self):
+        self.index.notify('create', self.route1)
+        self.index.notify('create', self.route2)
+        self.index.notify('create', self.router)
+        self.router.static_routes = [self.route2]
+
+        self.index.notify('update', self.router,
+                          mock.Mock(static_routes=[self.route1,
+                                                   self.route2]))
+
+        self.assertEqual(set(), self.index.get(
+            'router', '10.0.0.1', '172.24.4.1'))
+        self.assertEqual({'route2'}, self.index.get(
+            'router', '10.0.0.2', '172.24.4.1'))
+
+    def test_notify_router_update_other_column(self):
+        self.index.notify('create', self.route1)
+        self.index.notify('create', self.router)
+        self.router.static_routes = []
+
+        self.index.notify('update', self.router, mock.Mock(spec=['name']))
+
+        self.assertEqual({'route1'}, self.index.get(
+            'router', '10.0.0.1', '172.24.4.1'))
+
+    def test_notify_router_delete(self):
+        self.index.notify('create', self.route1)
+        self.index.notify('create', self.router)
+
+        self.index.notify('delete', self.router)
+
+        self.assertEqual(set(), self.index.get(
+            'router', '10.0.0.1', '172.24.4.1'))
+
+    def test_notify_route_update(self):
+        self.index.notify('create', self.route1)
+        self.index.notify('create', self.router)
+        self.route1.nexthop = '172.24.4.2'
+
+        self.index.notify('update', self.route1)
+
+        self.assertEqual(set(), self.index.get(
+            'router', '10.0.0.1', '172.24.4.1'))
+        self.assertEqual({'route1'}, self.index.get(
+            'router', '10.0.0.1', '172.24.4.2'))
+
+    def test_notify_route_delete(self):
+        self.index.notify('create', self.route1)
+        self.index.notify('create', self.router)
+
+        self.index.notify('delete', self.route1)
+
+        self.assertEqual(set(), self.index.get(
+            'router', '10.0.0.1', '172.24.4.1'))
+
+    def test_notify_duplicated_routes(self):
+        route3 = _fake_route('route3', '10.0.0.1', '172.24.4.1')
+        self.router.static_routes.append(route3)
+        for row in (self.route1, self.route2, route3, self.router):
+            self.index.notify('create', row)
+
+        self.index.notify('delete', self.route1)
+
+        self.assertEqual({'route3'}, self.index.get(
+            'router', '10.0.0.1', '172.24.4.1'))
+
+    def test_discard(self):
+        self.index.notify('create', self.route1)
+        self.index.notify('create', self.router)
+
+        self.index.discard('router', 'route1')
+
+        self.assertEqual(set(), self.index.get(
+            'router', '10.0.0.1', '172.24.4.1'))
+
+
+class TestOvsdbNbOvnIdl(test_base.TestCase):
+
+    def setUp(self):
+        super(TestOvsdbNbOvnIdl, self).setUp()
+        self.nb_idl = ovn_utils.OvsdbNbOvnIdl(mock.MagicMock())
+        self.index = ovn_utils.StaticRouteIndex()
+        self.nb_idl.idl.static_route_index = self.index
+        self.route1 = _fake_route('route1', '10.0.0.1', '172.24.4.1')
+        self.route2 = _fake_route('route2', '10.0.0.2', '172.24.4.1')
+        self.router = _fake_router('router', [self.route1, self.route2])
+        for row in (self.route1, self.route2, self.router):
+            self.index.notify('create', row)
+        self.rows = {'route1': self.route1, 'route2': self.route2}
+        self.nb_idl.idl.tables = {
+            'Logical_Router_Static_Route': mock.Mock(rows=self.rows)}
+        self.txn = mock.Mock()
+        mock.patch.object(idlutils, 'row_by_value',
+                          return_value=self.router).start()
+
+    def test_get_static_routes(self):
+        ret = self.nb_idl.get_static_routes(self.router, '10.0.0.1',
+                                            '172.24.4.1')
+
+        self.assertEqual([self.route1], ret)
+
+    def test_get_static_routes_stale(self):
+        # deleted while disconnected, no notification received
+        del self.rows['route1']
+
+        ret = self.nb_idl.get_static_routes(self.router, '10.0.0.1',
+                                            '172.24.4.1')
+
+        self.assertEqual([], ret)
+        self.assertEqual(set(), self.index.get(
+            'router', '10.0.0.1', '172.24.4.1'))
+
+    def test_get_lrouter_static_routes(self):
+        self.route1.external_ids = {'routing_proto': 'bgp'}
+        self.route2.external_ids = {}
+
+        ret = self.nb_idl.get_lrouter_static_routes(
+            'lr0', external_ids={'routing_proto': 'bgp'})
+
+        self.assertEqual([self.route1], ret)
+        idlutils.row_by_value.assert_called_once_with(
+            self.nb_idl.idl, 'Logical_Router', 'name', 'lr0')
+
+    def test_get_lrouter_static_routes_no_router(self):
+        idlutils.row_by_value.side_effect = idlutils.RowNotFound
+
+        self.assertEqual([], self.nb_idl.get_lrouter_static_routes('lr0'))
+
+    def test_add_static_routes(self):
+        routes = [{'ip_prefix': '10.0.0.1', 'nexthop': '172.24.4.1'},
+                  {'ip_prefix': '10.0.0.3', 'nexthop': '172.24.4.1'},
+                  {'ip_prefix': '10.0.0.3', 'nexthop': '172.24.4.1'}]
+
+        self.nb_idl.add_static_routes('lr0', routes).run_idl(self.txn)
+
+        self.txn.insert.assert_called_once_with(
+            self.nb_idl.idl.tables['Logical_Router_Static_Route'])
+        new_route = self.txn.insert.return_value
+        self.assertEqual('10.0.0.3', new_route.ip_prefix)
+        self.router.addvalue.assert_called_once_with('static_routes',
+                                                     new_route.uuid)
+
+    def test_add_static_route_exists(self):
+        self.nb_idl.add_static_route(
+            'lr0', ip_prefix='10.0.0.1', nexthop='172.24.4.1').run_idl(
+                self.txn)
+
+        self.txn.insert.assert_not_called()
+
+    def test_add_static_routes_no_router(self):
+        idlutils.row_by_value.side_effect = idlutils.RowNotFound
+        cmd = self.nb_idl.add_static_routes('lr0', [])
+
+        self.assertRaises(RuntimeError, cmd.run_idl, self.txn)
+
+    def test_delete_static_routes(self):
+        routes = [('10.0.0.1', '172.24.4.1'), ('10.0.0.3', '172.24.4.1')]
+
+        self.nb_idl.delete_static_routes('lr0', routes).run_idl(self.txn)
+
+        self.router.delvalue.assert_called_once_with('static_routes',
+                                                     self.route1)
+        self.route1.delete.assert_called_once_with()
+        self.route2.delete.assert_not_called()
+
+    def test_delete_static_route_no_router(self):
+        idlutils.row_by_value.side_effect = idlutils.RowNotFound
+
+        self.nb_idl.delete_static_route(
+            'lr0', '10.0.0.1', '172.24.4.1').run_idl(self.txn)
+
+        self.router.delvalue.assert_not_called()
+
+
+class TestOvnNbIdl(test_base.TestCase):
+
+    def setUp(self):
+        super(TestOvnNbIdl, self).setUp()
+        config.register_opts()
+        mock.patch.object(idlutils, 'get_schema_helper').start()
+        mock.patch.object(ovn_utils.OvnIdl, '__init__').start()
+        self.nb_idl = ovn_utils.OvnNbIdl('tcp:127.0.0.1:6641')
+
+    @mock.patch.object(ovn_utils.OvnIdl, 'cond_change', create=True)
+    def test___init___conditions(self, mock_cond_change):
+        ovn_utils.OvnNbIdl(
+            'tcp:127.0.0.1:6641', lrouters={'lr1', 'lr0'},
+            route_external_ids={'owner': 'fake-chassis'})
+
+        mock_cond_change.assert_has_calls([
+            mock.call('Logical_Router', [['name', '==', 'lr0'],
+                                         ['name', '==', 'lr1']]),
+            mock.call('Logical_Router_Static_Route', [
+                ['external_ids', 'includes',
+                 ['map', [['owner', 'fake-chassis']]]]])])
+
+    @mock.patch.object(ovn_utils.OvnIdl, 'cond_change', create=True)
+    def test___init___no_conditions(self, mock_cond_change):
+        ovn_utils.OvnNbIdl('tcp:127.0.0.1:6641')
+        mock_cond_change.assert_not_called()
+
+    @mock.patch.object(ovn_utils.OvnNbIdl, '_check_and_set_ssl_files')
+    def test___init___ssl_remote(self, mock_ssl_files):
+        ovn_utils.OvnNbIdl('tcp:127.0.0.1:6641')
+        mock_ssl_files.assert_not_called()
+
+        ovn_utils.OvnNbIdl('tcp:127.0.0.1:6641, ssl:127.0.0.2:6641')
+        mock_ssl_files.assert_called_once_with('OVN_Northbound')
+
+    @mock.patch.object(ovn_utils.OvnIdl, 'notify')
+    def test_notify(self, mock_notify):
+        route = _fake_route('route1', '10.0.0.1', '172.24.4.1')
+        router = _fake_router('router', [route])
+
+        self.nb_idl.notify('create', route)
+        self.nb_idl.notify('create', router)
+
+        self.assertEqual({'route1'}, self.nb_idl.static_route_index.get(
+            'router', '10.0.0.1', '172.24.4.1'))
+        mock_notify.assert_has_calls([mock.call('create', route, None),
+                                      mock.call('create', router, None)])
@@ -416,6 +416,18 @@ class TestOVS(test_base.TestCase):
     def test_del_device_from_ovs_bridge_specifying_bridge(self):
         self._test_del_device_from_ovs_bridge(bridge=True)
 
+    def test_del_devices_from_ovs_bridges(self):
+        ovs_utils.del_devices_from_ovs_bridges(['ethX', 'ethY'])
+
+        self.mock_ovs_vsctl.ovs_cmd.assert_called_once_with(
+            'ovs-vsctl', ['--if-exists', 'del-port', 'ethX', '--',
+                          '--if-exists', 'del-port', 'ethY'])
+
+    def test_del_devices_from_ovs_bridges_no_devices(self):
+        ovs_utils.del_devices_from_ovs_bridges([])
+
+        self.mock_ovs_vsctl.ovs_cmd.assert_not_called()
+
     def test_del_flow(self):
         flow = ('cookie=0x3e6, duration=11.647s, table=0, n_packets=0, '
                 'n_bytes=0, idle_age=3378, priority=1000,ip,dl_src=fa:16:3e'
@@ -16,6 +16,7 @@
 from unittest import mock
 
 from ovn_bgp_agent import constants
+from ovn_bgp_agent.drivers.openstack.utils import cr_lrp_store
 from ovn_bgp_agent.drivers.openstack.watchers import bgp_watcher
 from ovn_bgp_agent.tests import base as test_base
 from ovn_bgp_agent.tests import utils
@@ -816,10 +817,12 @@ class TestOVNLBMemberUpdateEvent(test_base.TestCase):
         super(TestOVNLBMemberUpdateEvent, self).setUp()
         self.chassis = '935f91fa-b8f8-47b9-8b1b-3a7a90ef7c26'
         self.agent = mock.Mock(chassis=self.chassis)
-        self.agent.ovn_local_cr_lrps = {
-            'cr-lrp1': {'provider_datapath': 'dp1',
-                        'subnets_datapath': {'lrp1': 's_dp1'},
-                        'ovn_lbs': 'ovn-lb1'}}
+        self.agent.ovn_local_cr_lrps = cr_lrp_store.CRLRPStore()
+        self.agent.ovn_local_cr_lrps['cr-lrp1'] = cr_lrp_store.CRLRPInfo(
+            'router-dp1', 'dp1', ['172.24.100.10/24'], 'fake-mac')
+        self.agent.ovn_local_cr_lrps.add_subnet('cr-lrp1', 'lrp1', 's_dp1',
+                                                '10.0.0.1/24')
+        self.agent.ovn_local_cr_lrps.add_ovn_lb('cr-lrp1', 'ovn-lb1')
         self.event = bgp_watcher.OVNLBMemberUpdateEvent(self.agent)
 
     def test_match_fn(self):
@@ -838,7 +841,7 @@ class TestOVNLBMemberUpdateEvent(test_base.TestCase):
         self.assertTrue(self.event.match_fn(mock.Mock(), row, old))
 
     def test_match_fn_no_cr_lrp(self):
-        self.agent.ovn_local_cr_lrps = {}
+        self.agent.ovn_local_cr_lrps = cr_lrp_store.CRLRPStore()
         row = utils.create_row(datapaths=['dp1'])
         old = utils.create_row(datapaths=['dp1', 'dp2'])
         self.assertFalse(self.event.match_fn(mock.Mock(), row, old))
@@ -901,7 +904,8 @@ class TestOVNLBMemberUpdateEvent(test_base.TestCase):
         dpg1 = utils.create_row(_uuid='fake_dp_group',
                                 datapaths=['s_dp2'])
         row = utils.create_row(name='ovn-lb1',
-                               datapath_group=[dpg1])
+                               datapath_group=[dpg1],
+                               vips={'172.24.100.66:80': '10.0.0.5:8080'})
         self.event.run(mock.Mock(), row, row)
         self.agent.expose_ovn_lb_on_provider.assert_not_called()
         self.agent.withdraw_ovn_lb_on_provider.assert_not_called()
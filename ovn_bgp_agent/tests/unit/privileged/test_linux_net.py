@@ -13,8 +13,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import errno
 import imp
 from pyroute2 import netlink as pyroute_netlink
+from pyroute2.netlink.rtnl import ndmsg
+from socket import AF_INET
 from socket import AF_INET6
 from unittest import mock
 
@@ -105,6 +108,72 @@ class TestPrivilegedLinuxNet(test_base.TestCase):
             kind='vxlan', ifname='fake-vxlan', vxlan_id=11, vxlan_port=7,
             vxlan_local=self.ip, vxlan_learning=False)
 
+    @mock.patch.object(priv_linux_net, 'set_device_status')
+    def test_ensure_vlan_bridge(self, mock_dev_status):
+        priv_linux_net.ensure_vlan_bridge('fake-bridge')
+        mock_dev_status.assert_called_once_with(
+            'fake-bridge', constants.LINK_UP, ndb=self.fake_ndb)
+        self.fake_ndb.interfaces.create.assert_not_called()
+
+    @mock.patch.object(priv_linux_net, 'set_device_status')
+    def test_ensure_vlan_bridge_keyerror(self, mock_dev_status):
+        mock_dev_status.side_effect = KeyError('Glass Onion')
+        priv_linux_net.ensure_vlan_bridge('fake-bridge')
+        self.fake_ndb.interfaces.create.assert_called_once_with(
+            kind='bridge', ifname='fake-bridge', br_stp_state=0,
+            br_vlan_filtering=1, br_vlan_default_pvid=0, br_mcast_snooping=0)
+
+    @mock.patch.object(priv_linux_net, 'set_device_status')
+    def test_ensure_vxlan_vnifilter(self, mock_dev_status):
+        priv_linux_net.ensure_vxlan_vnifilter(
+            'fake-vxlan', self.ip, 7, 'fake-bridge')
+        mock_dev_status.assert_called_once_with(
+            'fake-vxlan', constants.LINK_UP)
+        self.mock_exc.assert_not_called()
+
+    @mock.patch.object(priv_linux_net, 'set_device_status')
+    def test_ensure_vxlan_vnifilter_keyerror(self, mock_dev_status):
+        mock_dev_status.side_effect = KeyError('Ink')
+        priv_linux_net.ensure_vxlan_vnifilter(
+            'fake-vxlan', self.ip, 7, 'fake-bridge')
+        calls = [
+            mock.call('ip', 'link', 'add', 'fake-vxlan', 'type', 'vxlan',
+                      'dstport', '7', 'local', self.ip, 'nolearning',
+                      'external', 'vnifilter'),
+            mock.call('ip', 'link', 'set', 'fake-vxlan', 'master',
+                      'fake-bridge', 'addrgenmode', 'none'),
+            mock.call('bridge', 'link', 'set', 'dev', 'fake-vxlan',
+                      'vlan_tunnel', 'on', 'neigh_suppress', 'on',
+                      'learning', 'off'),
+            mock.call('ip', 'link', 'set', 'fake-vxlan', 'up')]
+        self.mock_exc.assert_has_calls(calls)
+
+    @mock.patch.object(priv_linux_net, 'set_device_status')
+    def test_ensure_vxlan_vnifilter_exception(self, mock_dev_status):
+        mock_dev_status.side_effect = KeyError('Ink')
+        self.mock_exc.side_effect = processutils.ProcessExecutionError(
+            stderr='Error: unknown command "vnifilter"')
+        self.assertRaises(processutils.ProcessExecutionError,
+                          priv_linux_net.ensure_vxlan_vnifilter,
+                          'fake-vxlan', self.ip, 7, 'fake-bridge')
+        self.assertEqual(1, self.mock_exc.call_count)
+
+    @mock.patch.object(priv_linux_net, 'set_device_status')
+    def test_ensure_vlan_device(self, mock_dev_status):
+        priv_linux_net.ensure_vlan_device('fake-svi', 'fake-bridge', 10)
+        mock_dev_status.assert_called_once_with(
+            'fake-svi', constants.LINK_UP, ndb=self.fake_ndb)
+        self.fake_ndb.interfaces.create.assert_not_called()
+
+    @mock.patch.object(priv_linux_net, 'set_device_status')
+    def test_ensure_vlan_device_keyerror(self, mock_dev_status):
+        mock_dev_status.side_effect = KeyError('Paper')
+        self.fake_ndb.interfaces = mock.MagicMock()
+        self.fake_ndb.interfaces.__getitem__.return_value = {'index': 3}
+        priv_linux_net.ensure_vlan_device('fake-svi', 'fake-bridge', 10)
+        self.fake_ndb.interfaces.create.assert_called_once_with(
+            kind='vlan', ifname='fake-svi', vlan_id=10, link=3)
+
     @mock.patch.object(priv_linux_net, 'set_device_status')
     def test_ensure_veth(self, mock_dev_status):
         priv_linux_net.ensure_veth('fake-veth', 'fake-veth-peer')
@@ -152,6 +221,15 @@ class TestPrivilegedLinuxNet(test_base.TestCase):
         priv_linux_net.delete_device('fake-dev-2')
         dev.remove.assert_not_called()
 
+    def test_delete_devices(self):
+        dev = mock.Mock()
+        self.fake_ndb.interfaces = {'fake-dev': dev}
+
+        priv_linux_net.delete_devices(['fake-dev-2', 'fake-dev'])
+
+        dev.remove.assert_called_once_with()
+        dev.remove.return_value.commit.assert_called_once_with()
+
     def test_route_create(self):
         fake_route = {'dst': 'default',
                       'oif': 1,
@@ -173,6 +251,30 @@ class TestPrivilegedLinuxNet(test_base.TestCase):
         priv_linux_net.route_delete(fake_route)
         fake_route.__enter__().remove.assert_not_called()
 
+    def test_routes_create(self):
+        route0 = {'dst': self.ip, 'dst_len': 32, 'oif': 1, 'table': 10}
+        route1 = {'dst': self.ipv6, 'dst_len': 128, 'oif': 1, 'table': 10,
+                  'family': AF_INET6}
+        priv_linux_net.routes_create([route0, route1])
+        self.fake_iproute.route.assert_has_calls([
+            mock.call('replace', **route0), mock.call('replace', **route1)])
+
+    def test_routes_delete(self):
+        route0 = {'dst': self.ip, 'dst_len': 32, 'oif': 1, 'table': 10}
+        route1 = {'dst': '10.10.1.17', 'dst_len': 32, 'oif': 1, 'table': 10}
+        self.fake_iproute.route.side_effect = (
+            pyroute_netlink.exceptions.NetlinkError(errno.ESRCH), None)
+        priv_linux_net.routes_delete([route0, route1])
+        self.fake_iproute.route.assert_has_calls([
+            mock.call('del', **route0), mock.call('del', **route1)])
+
+    def test_routes_delete_error(self):
+        route = {'dst': self.ip, 'dst_len': 32, 'oif': 1, 'table': 10}
+        self.fake_iproute.route.side_effect = (
+            pyroute_netlink.exceptions.NetlinkError(errno.EPERM))
+        self.assertRaises(pyroute_netlink.exceptions.NetlinkError,
+                          priv_linux_net.routes_delete, [route])
+
     @mock.patch.object(priv_linux_net, 'set_device_status')
     def test_ensure_vlan_device_for_network(self, mock_dev_status):
         priv_linux_net.ensure_vlan_device_for_network('fake-br', 10)
@@ -254,58 +356,279 @@ class TestPrivilegedLinuxNet(test_base.TestCase):
         # Assert remove() was not called due to the exceptions
         self.assertFalse(rule0.__enter__().remove.called)
 
-    def test_set_kernel_flag(self):
-        priv_linux_net.set_kernel_flag('net.ipv6.conf.fake', 1)
-        self.mock_exc.assert_called_once_with(
-            'sysctl', '-w', 'net.ipv6.conf.fake=1')
-
-    def test_set_kernel_flag_exception(self):
-        self.mock_exc.side_effect = FakeException()
+    @mock.patch('builtins.open', new_callable=mock.mock_open,
+                read_data='0\n')
+    def test_set_kernel_flag(self, mock_open):
+        ret = priv_linux_net.set_kernel_flag('net.ipv6.conf.fake', 1)
+
+        self.assertEqual(['net.ipv6.conf.fake'], ret)
+        path = '/proc/sys/net/ipv6/conf/fake'
+        mock_open.assert_has_calls([mock.call(path), mock.call(path, 'w')],
+                                   any_order=True)
+        mock_open().write.assert_called_once_with('1')
+        self.mock_exc.assert_not_called()
+
+    @mock.patch('builtins.open', new_callable=mock.mock_open,
+                read_data='1\n')
+    def test_set_kernel_flags_already_set(self, mock_open):
+        ret = priv_linux_net.set_kernel_flags(
+            {'net.ipv4.conf.br-ex/10.proxy_arp': 1})
+
+        self.assertEqual([], ret)
+        mock_open.assert_called_once_with(
+            '/proc/sys/net/ipv4/conf/br-ex.10/proxy_arp')
+        mock_open().write.assert_not_called()
+
+    @mock.patch('builtins.open', new_callable=mock.mock_open)
+    def test_set_kernel_flag_exception(self, mock_open):
+        mock_open.side_effect = OSError(errno.ENOENT, 'No such file')
         self.assertRaises(
-            FakeException,
+            OSError,
             priv_linux_net.set_kernel_flag, 'net.ipv6.conf.fake', 1)
 
     def test_add_ndp_proxy(self):
+        self.fake_iproute.link_lookup.return_value = [7]
+
         priv_linux_net.add_ndp_proxy(self.ipv6, self.dev)
-        self.mock_exc.assert_called_once_with(
-            'ip', '-6', 'nei', 'add', 'proxy', self.ipv6, 'dev', self.dev)
+
+        self.fake_iproute.link_lookup.assert_called_once_with(ifname=self.dev)
+        self.fake_iproute.neigh.assert_called_once_with(
+            'add', dst=self.ipv6, ifindex=7, family=AF_INET6,
+            flags=ndmsg.NTF_PROXY, state=ndmsg.states['permanent'])
+        self.mock_exc.assert_not_called()
 
     def test_add_ndp_proxy_vlan(self):
+        self.fake_iproute.link_lookup.return_value = [7]
+
         priv_linux_net.add_ndp_proxy(self.ipv6, self.dev, vlan=10)
-        self.mock_exc.assert_called_once_with(
-            'ip', '-6', 'nei', 'add', 'proxy', self.ipv6,
-            'dev', '%s.10' % self.dev)
+
+        self.fake_iproute.link_lookup.assert_called_once_with(
+            ifname='%s.10' % self.dev)
+
+    def test_add_ndp_proxies(self):
+        self.fake_iproute.link_lookup.side_effect = ([7], [8])
+
+        priv_linux_net.add_ndp_proxies([(self.ipv6, self.dev, None),
+                                        ('2001:db8::1/64', 'br-ex', 10)])
+
+        # all the entries are added through the same netlink socket
+        self.assertEqual(2, self.fake_iproute.neigh.call_count)
+        self.fake_iproute.neigh.assert_called_with(
+            'add', dst='2001:db8::', ifindex=8, family=AF_INET6,
+            flags=ndmsg.NTF_PROXY, state=ndmsg.states['permanent'])
+
+    def test_add_ndp_proxy_already_existing(self):
+        self.fake_iproute.link_lookup.return_value = [7]
+        self.fake_iproute.neigh.side_effect = (
+            pyroute_netlink.exceptions.NetlinkError(errno.EEXIST))
+
+        priv_linux_net.add_ndp_proxy(self.ipv6, self.dev)
 
     def test_add_ndp_proxy_exception(self):
-        self.mock_exc.side_effect = FakeException()
+        self.fake_iproute.link_lookup.return_value = [7]
+        self.fake_iproute.neigh.side_effect = (
+            pyroute_netlink.exceptions.NetlinkError(errno.EPERM))
+
         self.assertRaises(
-            FakeException,
+            pyroute_netlink.exceptions.NetlinkError,
             priv_linux_net.add_ndp_proxy, self.ipv6, self.dev)
 
+    def test_add_ndp_proxy_no_device(self):
+        self.fake_iproute.link_lookup.return_value = []
+
+        self.assertRaises(
+            KeyError, priv_linux_net.add_ndp_proxy, self.ipv6, self.dev)
+
     def test_del_ndp_proxy(self):
+        self.fake_iproute.link_lookup.return_value = [7]
+
         priv_linux_net.del_ndp_proxy(self.ipv6, self.dev)
-        self.mock_exc.assert_called_once_with(
-            'ip', '-6', 'nei', 'del', 'proxy', self.ipv6, 'dev',
-            self.dev, env_variables=mock.ANY)
+
+        self.fake_iproute.neigh.assert_called_once_with(
+            'del', dst=self.ipv6, ifindex=7, family=AF_INET6,
+            flags=ndmsg.NTF_PROXY)
+        self.mock_exc.assert_not_called()
 
     def test_del_ndp_proxy_vlan(self):
+        self.fake_iproute.link_lookup.return_value = [7]
+
         priv_linux_net.del_ndp_proxy(self.ipv6, self.dev, vlan=10)
-        self.mock_exc.assert_called_once_with(
-            'ip', '-6', 'nei', 'del', 'proxy', self.ipv6, 'dev',
-            '%s.10' % self.dev, env_variables=mock.ANY)
+
+        self.fake_iproute.link_lookup.assert_called_once_with(
+            ifname='%s.10' % self.dev)
+
+    def test_del_ndp_proxies(self):
+        self.fake_iproute.link_lookup.side_effect = ([], [8])
+
+        priv_linux_net.del_ndp_proxies([(self.ipv6, self.dev, None),
+                                        (self.ipv6, 'br-ex', None)])
+
+        # the device of the first one no longer exists
+        self.fake_iproute.neigh.assert_called_once_with(
+            'del', dst=self.ipv6, ifindex=8, family=AF_INET6,
+            flags=ndmsg.NTF_PROXY)
 
     def test_del_ndp_proxy_exception(self):
-        self.mock_exc.side_effect = FakeException()
+        self.fake_iproute.link_lookup.return_value = [7]
+        self.fake_iproute.neigh.side_effect = (
+            pyroute_netlink.exceptions.NetlinkError(errno.EPERM))
+
         self.assertRaises(
-            FakeException,
+            pyroute_netlink.exceptions.NetlinkError,
             priv_linux_net.del_ndp_proxy, self.ipv6, self.dev)
 
-    def test_del_ndp_proxy_exception_no_such_file(self):
-        exp = FakeException()
-        exp.stderr = 'No such file or directory'
-        self.mock_exc.side_effect = exp
+    def test_del_ndp_proxy_already_deleted(self):
+        self.fake_iproute.link_lookup.return_value = [7]
+        self.fake_iproute.neigh.side_effect = (
+            pyroute_netlink.exceptions.NetlinkError(errno.ENOENT))
+
         self.assertIsNone(priv_linux_net.del_ndp_proxy(self.ipv6, self.dev))
 
+    def test_nexthops_show(self):
+        self.mock_exc.return_value = (
+            '[{"id":1,"dev":"%s","protocol":"boot"}]' % self.dev, '')
+        ret = priv_linux_net.nexthops_show(AF_INET6)
+        self.assertEqual([{'id': 1, 'dev': self.dev, 'protocol': 'boot'}],
+                         ret)
+        self.mock_exc.assert_called_once_with(
+            'ip', '-6', '-j', 'nexthop', 'show')
+
+    def test_nexthops_show_empty(self):
+        self.mock_exc.return_value = ('', '')
+        self.assertEqual([], priv_linux_net.nexthops_show(AF_INET))
+
+    def test_nexthop_add(self):
+        ret = priv_linux_net.nexthop_add(5, AF_INET, self.dev, via=self.ip)
+        self.assertTrue(ret)
+        self.mock_exc.assert_called_once_with(
+            'ip', '-4', 'nexthop', 'add', 'id', '5', 'via', self.ip, 'dev',
+            self.dev, 'proto', '98', env_variables=mock.ANY)
+
+    def test_nexthop_add_no_gateway(self):
+        priv_linux_net.nexthop_add(5, AF_INET6, self.dev)
+        self.mock_exc.assert_called_once_with(
+            'ip', '-6', 'nexthop', 'add', 'id', '5', 'dev', self.dev,
+            'proto', '98', env_variables=mock.ANY)
+
+    def test_nexthop_add_id_in_use(self):
+        self.mock_exc.side_effect = processutils.ProcessExecutionError(
+            stderr='Error: File exists')
+        self.assertFalse(priv_linux_net.nexthop_add(5, AF_INET, self.dev))
+
+    def test_nexthop_add_exception(self):
+        self.mock_exc.side_effect = processutils.ProcessExecutionError(
+            stderr='Error: Device does not exist')
+        self.assertRaises(processutils.ProcessExecutionError,
+                          priv_linux_net.nexthop_add, 5, AF_INET, self.dev)
+
+    def test_nexthop_replace(self):
+        priv_linux_net.nexthop_replace(5, AF_INET, self.dev, via=self.ip)
+        self.mock_exc.assert_called_once_with(
+            'ip', '-4', 'nexthop', 'replace', 'id', '5', 'via', self.ip,
+            'dev', self.dev, 'proto', '98')
+
+    def test_nexthop_replace_exception(self):
+        self.mock_exc.side_effect = processutils.ProcessExecutionError(
+            stderr='Error: Device does not exist')
+        self.assertRaises(processutils.ProcessExecutionError,
+                          priv_linux_net.nexthop_replace, 5, AF_INET,
+                          self.dev)
+
+    def test_nexthop_delete(self):
+        priv_linux_net.nexthop_delete(5)
+        self.mock_exc.assert_called_once_with(
+            'ip', 'nexthop', 'del', 'id', '5', env_variables=mock.ANY)
+
+    def test_nexthop_delete_already_deleted(self):
+        self.mock_exc.side_effect = processutils.ProcessExecutionError(
+            stderr='RTNETLINK answers: No such file or directory')
+        self.assertIsNone(priv_linux_net.nexthop_delete(5))
+
+    def test_routes_replace_with_nexthop(self):
+        routes = [{'dst': self.ip, 'dst_len': 32, 'table': 10, 'nh_id': 1},
+                  {'dst': self.ipv6, 'dst_len': 128, 'table': 10,
+                   'nh_id': 2}]
+        priv_linux_net.routes_replace_with_nexthop(routes)
+        self.mock_exc.assert_called_once_with(
+            'ip', '-batch', '-', process_input=(
+                'route replace %s/32 table 10 nhid 1 proto 3\n'
+                'route replace %s/128 table 10 nhid 2 proto 3' % (
+                    self.ip, self.ipv6)))
+
+    def test_create_device(self):
+        priv_linux_net.create_device('fake-veth', 'veth', peer='fake-peer')
+        self.fake_ndb.interfaces.create.assert_called_once_with(
+            kind='veth', ifname='fake-veth', peer='fake-peer')
+        self.fake_ndb.interfaces.create.return_value.commit.\
+            assert_called_once_with()
+
+    def test_rename_device(self):
+        self.fake_iproute.link_lookup.side_effect = ([], [7])
+        self.assertTrue(priv_linux_net.rename_device('fake-dev', 'new-dev'))
+        self.fake_iproute.link.assert_called_once_with(
+            'set', index=7, ifname='new-dev')
+
+    def test_rename_device_already_exists(self):
+        self.fake_iproute.link_lookup.return_value = [8]
+        self.assertFalse(priv_linux_net.rename_device('fake-dev', 'new-dev'))
+        self.fake_iproute.link.assert_not_called()
+
+    def test_rename_device_not_found(self):
+        self.fake_iproute.link_lookup.return_value = []
+        self.assertRaises(KeyError, priv_linux_net.rename_device,
+                          'fake-dev', 'new-dev')
+
+    def test_vlan_tunnels_show(self):
+        self.mock_exc.return_value = (
+            '[{"ifname":"fake-vxlan","tunnels":[{"vlan":1,"tunid":77}]}]',
+            '')
+        ret = priv_linux_net.vlan_tunnels_show('fake-vxlan')
+        self.assertEqual(
+            [{'ifname': 'fake-vxlan', 'tunnels': [{'vlan': 1, 'tunid': 77}]}],
+            ret)
+        self.mock_exc.assert_called_once_with(
+            'bridge', '-j', 'vlan', 'tunnelshow', 'dev', 'fake-vxlan',
+            env_variables=mock.ANY)
+
+    def test_vlan_tunnels_show_no_device(self):
+        self.mock_exc.side_effect = processutils.ProcessExecutionError(
+            stderr='Cannot find device "fake-vxlan"')
+        self.assertEqual([], priv_linux_net.vlan_tunnels_show('fake-vxlan'))
+
+    def test_add_vni_vlan_mapping(self):
+        priv_linux_net.add_vni_vlan_mapping('fake-vxlan', 'fake-bridge', 77,
+                                            1)
+        self.mock_exc.assert_called_once_with(
+            'bridge', '-force', '-batch', '-', process_input=(
+                'vlan add dev fake-vxlan vid 1\n'
+                'vlan add dev fake-vxlan vid 1 tunnel_info id 77\n'
+                'vni add dev fake-vxlan vni 77\n'
+                'vlan add dev fake-bridge vid 1 self'),
+            env_variables=mock.ANY)
+
+    def test_add_vni_vlan_mapping_exception(self):
+        self.mock_exc.side_effect = processutils.ProcessExecutionError(
+            stderr='Error: Operation not supported')
+        self.assertRaises(processutils.ProcessExecutionError,
+                          priv_linux_net.add_vni_vlan_mapping, 'fake-vxlan',
+                          'fake-bridge', 77, 1)
+
+    def test_del_vni_vlan_mapping(self):
+        priv_linux_net.del_vni_vlan_mapping('fake-vxlan', 'fake-bridge', 77,
+                                            1)
+        self.mock_exc.assert_called_once_with(
+            'bridge', '-force', '-batch', '-', process_input=(
+                'vni del dev fake-vxlan vni 77\n'
+                'vlan del dev fake-vxlan vid 1\n'
+                'vlan del dev fake-bridge vid 1 self'),
+            env_variables=mock.ANY)
+
+    def test_del_vni_vlan_mapping_already_deleted(self):
+        self.mock_exc.side_effect = processutils.ProcessExecutionError(
+            stderr='RTNETLINK answers: No such file or directory')
+        self.assertIsNone(priv_linux_net.del_vni_vlan_mapping(
+            'fake-vxlan', 'fake-bridge', 77, 1))
+
     def test_add_ips_to_dev(self):
         iface = mock.MagicMock(index=7)
         self.fake_ndb.interfaces = {self.dev: iface}
@@ -368,27 +691,51 @@ class TestPrivilegedLinuxNet(test_base.TestCase):
         self.fake_iproute.link_lookup.assert_called_once_with(ifname=self.dev)
         self.fake_iproute.neigh.assert_not_called()
 
+    def _get_vrf_link(self, table):
+        link = mock.Mock()
+        link.get_nested.return_value = table
+        return [link]
+
     def test_add_unreachable_route(self):
+        self.fake_iproute.link.return_value = self._get_vrf_link(10)
+
         priv_linux_net.add_unreachable_route('fake-vrf')
-        calls = [mock.call('ip', -4, 'route', 'add', 'vrf', 'fake-vrf',
-                           'unreachable', 'default', 'metric', '4278198272',
-                           env_variables=mock.ANY),
-                 mock.call('ip', -6, 'route', 'add', 'vrf', 'fake-vrf',
-                           'unreachable', 'default', 'metric', '4278198272',
-                           env_variables=mock.ANY)]
-        self.mock_exc.assert_has_calls(calls)
+
+        self.fake_iproute.link.assert_called_once_with(
+            'get', ifname='fake-vrf')
+        calls = [mock.call('add', table=10, family=family, dst_len=0,
+                           type='unreachable', priority=4278198272)
+                 for family in (AF_INET, AF_INET6)]
+        self.assertEqual(calls, self.fake_iproute.route.call_args_list)
+        self.mock_exc.assert_not_called()
+
+    def test_add_unreachable_routes(self):
+        self.fake_iproute.link.side_effect = (self._get_vrf_link(10),
+                                              self._get_vrf_link(11))
+
+        priv_linux_net.add_unreachable_routes(['fake-vrf', 'fake-vrf2'])
+
+        self.assertEqual(4, self.fake_iproute.route.call_count)
+        self.fake_iproute.route.assert_called_with(
+            'add', table=11, family=AF_INET6, dst_len=0, type='unreachable',
+            priority=4278198272)
 
     def test_add_unreachable_route_exception(self):
-        self.mock_exc.side_effect = FakeException()
+        self.fake_iproute.link.return_value = self._get_vrf_link(10)
+        self.fake_iproute.route.side_effect = (
+            pyroute_netlink.exceptions.NetlinkError(errno.EPERM))
+
         self.assertRaises(
-            FakeException,
+            pyroute_netlink.exceptions.NetlinkError,
             priv_linux_net.add_unreachable_route, 'fake-vrf')
 
-    def test_add_unreachable_route_exception_file_exists(self):
-        exp = FakeException()
-        exp.stderr = 'RTNETLINK answers: File exists'
-        self.mock_exc.side_effect = exp
+    def test_add_unreachable_route_already_existing(self):
+        self.fake_iproute.link.return_value = self._get_vrf_link(10)
+        self.fake_iproute.route.side_effect = (
+            pyroute_netlink.exceptions.NetlinkError(errno.EEXIST))
+
         self.assertIsNone(priv_linux_net.add_unreachable_route('fake-vrf'))
+        self.assertEqual(2, self.fake_iproute.route.call_count)
 
     @mock.patch('builtins.open', new_callable=mock.mock_open())
     def test_create_routing_table_for_bridge(self, mock_o):
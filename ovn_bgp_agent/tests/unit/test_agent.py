@@ -36,3 +36,14 @@ class TestAgent(test_base.TestCase):
         m_agent.assert_called()
         m_oslo_launch.assert_called()
         m_launcher.wait.assert_called()
+
+    @mock.patch('oslo_service.service.Service.stop')
+    @mock.patch('ovn_bgp_agent.drivers.driver_api.AgentDriverBase.'
+                'get_instance')
+    def test_stop(self, m_get_instance, m_service_stop):
+        bgp_agent = agent.BGPAgent()
+
+        bgp_agent.stop()
+
+        m_get_instance.return_value.stop.assert_called_once_with()
+        m_service_stop.assert_called_once_with(False)
@@ -42,6 +42,10 @@ class TestLinuxNet(test_base.TestCase):
         self.table_id = 100
         self.network = ipaddress.IPv4Network("10.10.1.0/24")
         self.network_v6 = ipaddress.IPv6Network("2002:0:0:1234:0:0:0:0/64")
+        # ifindex of the interfaces
+        self.oif = 4
+        self.fake_ndb.interfaces.__getitem__.return_value = {
+            'index': self.oif}
 
     def test_get_ip_version_v4(self):
         self.assertEqual(4, linux_net.get_ip_version('%s/32' % self.ip))
@@ -80,6 +84,62 @@ class TestLinuxNet(test_base.TestCase):
         linux_net.ensure_vxlan('fake-vxlan', 11, self.ip, 7)
         mock_ensure_vxlan.assert_called_once_with('fake-vxlan', 11, self.ip, 7)
 
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.ensure_vlan_bridge')
+    def test_ensure_vlan_bridge(self, mock_ensure_bridge):
+        linux_net.ensure_vlan_bridge('fake-bridge')
+        mock_ensure_bridge.assert_called_once_with('fake-bridge')
+
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.ensure_vxlan_vnifilter')
+    def test_ensure_vxlan_vnifilter(self, mock_ensure_vxlan):
+        linux_net.ensure_vxlan_vnifilter('fake-vxlan', self.ip, 7,
+                                         'fake-bridge')
+        mock_ensure_vxlan.assert_called_once_with(
+            'fake-vxlan', self.ip, 7, 'fake-bridge')
+
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.ensure_vlan_device')
+    def test_ensure_vlan_device(self, mock_ensure_vlan):
+        linux_net.ensure_vlan_device('fake-svi', 'fake-bridge', 10)
+        mock_ensure_vlan.assert_called_once_with('fake-svi', 'fake-bridge',
+                                                 10)
+
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.create_device')
+    def test_create_device(self, mock_create):
+        linux_net.create_device('fake-bridge', 'bridge', br_stp_state=0)
+        mock_create.assert_called_once_with('fake-bridge', 'bridge',
+                                            br_stp_state=0)
+
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.rename_device')
+    def test_rename_device(self, mock_rename):
+        ret = linux_net.rename_device('fake-dev', 'new-dev')
+        self.assertEqual(mock_rename.return_value, ret)
+        mock_rename.assert_called_once_with('fake-dev', 'new-dev')
+
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.vlan_tunnels_show')
+    def test_get_vni_vlan_mappings(self, mock_show):
+        mock_show.return_value = [{
+            'ifname': 'fake-vxlan',
+            'tunnels': [{'vlan': 1, 'tunid': 77},
+                        {'vlan': 5, 'vlanEnd': 7, 'tunid': 100,
+                         'tunidEnd': 102}]}]
+        ret = linux_net.get_vni_vlan_mappings('fake-vxlan')
+        self.assertEqual({77: 1, 100: 5, 101: 6, 102: 7}, ret)
+        mock_show.assert_called_once_with('fake-vxlan')
+
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.vlan_tunnels_show')
+    def test_get_vni_vlan_mappings_no_tunnels(self, mock_show):
+        mock_show.return_value = [{'ifname': 'fake-vxlan'}]
+        self.assertEqual({}, linux_net.get_vni_vlan_mappings('fake-vxlan'))
+
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.add_vni_vlan_mapping')
+    def test_add_vni_vlan_mapping(self, mock_add):
+        linux_net.add_vni_vlan_mapping('fake-vxlan', 'fake-bridge', 77, 1)
+        mock_add.assert_called_once_with('fake-vxlan', 'fake-bridge', 77, 1)
+
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.del_vni_vlan_mapping')
+    def test_del_vni_vlan_mapping(self, mock_del):
+        linux_net.del_vni_vlan_mapping('fake-vxlan', 'fake-bridge', 77, 1)
+        mock_del.assert_called_once_with('fake-vxlan', 'fake-bridge', 77, 1)
+
     @mock.patch('ovn_bgp_agent.privileged.linux_net.ensure_veth')
     def test_ensure_veth(self, mock_ensure_veth):
         linux_net.ensure_veth('fake-veth', 'fake-veth-peer')
@@ -120,11 +180,16 @@ class TestLinuxNet(test_base.TestCase):
         linux_net.delete_device('fake-dev')
         mock_delete_device.assert_called_once_with('fake-dev')
 
-    @mock.patch.object(linux_net, 'enable_proxy_arp')
-    @mock.patch.object(linux_net, 'enable_proxy_ndp')
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.delete_devices')
+    def test_delete_devices(self, mock_delete_devices):
+        linux_net.delete_devices(['fake-dev', 'fake-dev-2'])
+        mock_delete_devices.assert_called_once_with(
+            ['fake-dev', 'fake-dev-2'])
+
+    @mock.patch.object(linux_net, 'enable_proxy_arp_ndp')
     @mock.patch('ovn_bgp_agent.privileged.linux_net.add_ip_to_dev')
     def test_ensure_arp_ndp_enabled_for_bridge(self, mock_add_ip_to_dev,
-                                               mock_ndp, mock_arp):
+                                               mock_arp_ndp):
         linux_net.ensure_arp_ndp_enabled_for_bridge('fake-bridge', 511)
         # NOTE(ltomasbo): hardoced starting ipv4 is 192.168.0.0, and ipv6 is
         # fd53:d91e:400:7f17::0
@@ -133,14 +198,12 @@ class TestLinuxNet(test_base.TestCase):
         calls = [mock.call(ipv4, 'fake-bridge'),
                  mock.call(ipv6, 'fake-bridge')]
         mock_add_ip_to_dev.assert_has_calls(calls)
-        mock_ndp.assert_called_once_with('fake-bridge')
-        mock_arp.assert_called_once_with('fake-bridge')
+        mock_arp_ndp.assert_called_once_with('fake-bridge')
 
-    @mock.patch.object(linux_net, 'enable_proxy_arp')
-    @mock.patch.object(linux_net, 'enable_proxy_ndp')
+    @mock.patch.object(linux_net, 'enable_proxy_arp_ndp')
     @mock.patch('ovn_bgp_agent.privileged.linux_net.add_ip_to_dev')
     def test_ensure_arp_ndp_enabled_for_bridge_vlan(self, mock_add_ip_to_dev,
-                                                    mock_ndp, mock_arp):
+                                                    mock_arp_ndp):
         linux_net.ensure_arp_ndp_enabled_for_bridge('fake-bridge', 511, 11)
         # NOTE(ltomasbo): hardoced starting ipv4 is 192.168.0.0, and ipv6 is
         # fd53:d91e:400:7f17::0
@@ -149,8 +212,7 @@ class TestLinuxNet(test_base.TestCase):
         calls = [mock.call(ipv4, 'fake-bridge'),
                  mock.call(ipv6, 'fake-bridge')]
         mock_add_ip_to_dev.assert_has_calls(calls)
-        mock_ndp.assert_not_called()
-        mock_arp.assert_not_called()
+        mock_arp_ndp.assert_not_called()
 
     def test_ensure_routing_table_for_bridge(self):
         # TODO(lucasagomes): This method is massive and complex, perhaps
@@ -158,18 +220,16 @@ class TestLinuxNet(test_base.TestCase):
         #  of it.
         pass
 
-    @mock.patch.object(linux_net, 'enable_proxy_arp')
-    @mock.patch.object(linux_net, 'enable_proxy_ndp')
+    @mock.patch.object(linux_net, 'enable_proxy_arp_ndp')
     @mock.patch(
         'ovn_bgp_agent.privileged.linux_net.ensure_vlan_device_for_network')
     def test_ensure_vlan_device_for_network(
-            self, mock_ensure_vlan_device_for_network, mock_ndp, mock_arp):
+            self, mock_ensure_vlan_device_for_network, mock_arp_ndp):
         linux_net.ensure_vlan_device_for_network('fake-br', 10)
         expected_dev = 'fake-br/10'
         mock_ensure_vlan_device_for_network.assert_called_once_with(
             'fake-br', 10)
-        mock_ndp.assert_called_once_with(expected_dev)
-        mock_arp.assert_called_once_with(expected_dev)
+        mock_arp_ndp.assert_called_once_with(expected_dev)
 
     @mock.patch.object(linux_net, 'delete_device')
     def test_delete_vlan_device_for_network(self, mock_del):
@@ -177,17 +237,88 @@ class TestLinuxNet(test_base.TestCase):
         vlan_name = 'fake-br.10'
         mock_del.assert_called_once_with(vlan_name)
 
-    @mock.patch('ovn_bgp_agent.privileged.linux_net.set_kernel_flag')
-    def test_enable_proxy_ndp(self, mock_flag):
+    @mock.patch.object(linux_net, 'set_device_kernel_flags')
+    def test_enable_proxy_ndp(self, mock_flags):
         linux_net.enable_proxy_ndp(self.dev)
         expected_flag = 'net.ipv6.conf.%s.proxy_ndp' % self.dev
-        mock_flag.assert_called_once_with(expected_flag, 1)
+        mock_flags.assert_called_once_with(self.dev, {expected_flag: 1})
 
-    @mock.patch('ovn_bgp_agent.privileged.linux_net.set_kernel_flag')
-    def test_enable_proxy_arp(self, mock_flag):
+    @mock.patch.object(linux_net, 'set_device_kernel_flags')
+    def test_enable_proxy_arp(self, mock_flags):
         linux_net.enable_proxy_arp(self.dev)
         expected_flag = 'net.ipv4.conf.%s.proxy_arp' % self.dev
-        mock_flag.assert_called_once_with(expected_flag, 1)
+        mock_flags.assert_called_once_with(self.dev, {expected_flag: 1})
+
+    @mock.patch.object(linux_net, 'set_device_kernel_flags')
+    def test_enable_proxy_arp_ndp(self, mock_flags):
+        linux_net.enable_proxy_arp_ndp(self.dev)
+        expected_flags = {
+            'net.ipv4.conf.%s.proxy_arp' % self.dev: 1,
+            'net.ipv6.conf.%s.proxy_ndp' % self.dev: 1}
+        mock_flags.assert_called_once_with(self.dev, expected_flags)
+
+    @mock.patch.object(linux_net, '_get_ifindex')
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.set_kernel_flags')
+    def test_set_device_kernel_flags(self, mock_flags, mock_ifindex):
+        self.addCleanup(linux_net._kernel_flags.clear)
+        mock_ifindex.return_value = 7
+        flag = 'net.ipv4.conf.br-ex/10.proxy_arp'
+
+        linux_net.set_device_kernel_flags('br-ex/10', {flag: 1})
+        linux_net.set_device_kernel_flags('br-ex/10', {flag: 1})
+
+        mock_ifindex.assert_called_with('br-ex.10')
+        mock_flags.assert_called_once_with({flag: 1})
+
+        # re-created device
+        mock_ifindex.return_value = 8
+        linux_net.set_device_kernel_flags('br-ex/10', {flag: 1})
+        self.assertEqual(2, mock_flags.call_count)
+
+    @mock.patch.object(linux_net, '_get_ifindex')
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.set_kernel_flags')
+    def test_set_device_kernel_flags_only_pending(self, mock_flags,
+                                                  mock_ifindex):
+        self.addCleanup(linux_net._kernel_flags.clear)
+        mock_ifindex.return_value = 7
+        arp_flag = 'net.ipv4.conf.%s.proxy_arp' % self.dev
+        ndp_flag = 'net.ipv6.conf.%s.proxy_ndp' % self.dev
+
+        linux_net.set_device_kernel_flags(self.dev, {arp_flag: 1})
+        linux_net.set_device_kernel_flags(self.dev,
+                                          {arp_flag: 1, ndp_flag: 1})
+
+        mock_flags.assert_has_calls([mock.call({arp_flag: 1}),
+                                     mock.call({ndp_flag: 1})])
+
+    @mock.patch.object(linux_net, '_get_ifindex')
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.set_kernel_flags')
+    def test_set_device_kernel_flags_no_device(self, mock_flags,
+                                               mock_ifindex):
+        self.addCleanup(linux_net._kernel_flags.clear)
+        mock_ifindex.return_value = None
+        flag = 'net.ipv4.conf.%s.proxy_arp' % self.dev
+
+        linux_net.set_device_kernel_flags(self.dev, {flag: 1})
+        linux_net.set_device_kernel_flags(self.dev, {flag: 1})
+
+        self.assertEqual(2, mock_flags.call_count)
+        self.assertNotIn(self.dev, linux_net._kernel_flags)
+
+    @mock.patch.object(linux_net, '_get_ifindex')
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.delete_device')
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.set_kernel_flags')
+    def test_set_device_kernel_flags_deleted_device(self, mock_flags,
+                                                    mock_del, mock_ifindex):
+        self.addCleanup(linux_net._kernel_flags.clear)
+        mock_ifindex.return_value = 7
+        flag = 'net.ipv4.conf.%s.proxy_arp' % self.dev
+
+        linux_net.set_device_kernel_flags(self.dev, {flag: 1})
+        linux_net.delete_device(self.dev)
+        linux_net.set_device_kernel_flags(self.dev, {flag: 1})
+
+        self.assertEqual(2, mock_flags.call_count)
 
     def test_get_exposed_ips(self):
         ip0 = mock.Mock(address=self.ip, prefixlen=32)
@@ -241,6 +372,103 @@ class TestLinuxNet(test_base.TestCase):
 
         self.assertEqual([self.ip, self.ipv6], ret)
 
+    def test_get_exposed_host_routes(self):
+        self.fake_ndb.interfaces = {self.dev: {'index': 7}}
+        route0 = mock.Mock(dst=self.ip, dst_len=32, oif=7, proto=3)
+        route1 = mock.Mock(dst=self.ipv6, dst_len=128, oif=7, proto=3)
+        # subnet route, should be ignored
+        route2 = mock.Mock(dst='10.10.1.0', dst_len=24, oif=7, proto=3)
+        # route on a different device, should be ignored
+        route3 = mock.Mock(dst='10.10.1.18', dst_len=32, oif=8, proto=3)
+        # bgp route, should be ignored
+        route4 = mock.Mock(dst='10.10.1.19', dst_len=32, oif=7, proto=186)
+        self.fake_ndb.routes.dump.return_value.filter.return_value = [
+            route0, route1, route2, route3, route4]
+
+        ret = linux_net.get_exposed_host_routes(self.dev, self.table_id)
+
+        self.assertEqual([self.ip, self.ipv6], ret)
+        self.fake_ndb.routes.dump.return_value.filter.assert_called_once_with(
+            table=self.table_id)
+
+    def test_get_exposed_host_routes_no_nic(self):
+        self.fake_ndb.interfaces = {}
+        ret = linux_net.get_exposed_host_routes(self.dev, self.table_id)
+        self.assertEqual([], ret)
+
+    def test_get_exposed_route_prefixes(self):
+        self.fake_ndb.interfaces = {self.dev: {'index': 7}}
+        route0 = mock.Mock(dst=self.ip, dst_len=32, oif=7, proto=3)
+        route1 = mock.Mock(dst='10.10.1.0', dst_len=28, oif=7, proto=3)
+        route2 = mock.Mock(dst='2001:db8::', dst_len=64, oif=7, proto=3)
+        # route on a different device, should be ignored
+        route3 = mock.Mock(dst='10.10.1.18', dst_len=32, oif=8, proto=3)
+        # bgp route, should be ignored
+        route4 = mock.Mock(dst='10.10.1.19', dst_len=32, oif=7, proto=186)
+        self.fake_ndb.routes.dump.return_value.filter.return_value = [
+            route0, route1, route2, route3, route4]
+
+        ret = linux_net.get_exposed_route_prefixes(self.dev, self.table_id)
+
+        self.assertEqual(['{}/32'.format(self.ip), '10.10.1.0/28',
+                          '2001:db8::/64'], ret)
+
+    def test_get_exposed_route_prefixes_no_nic(self):
+        self.fake_ndb.interfaces = {}
+        ret = linux_net.get_exposed_route_prefixes(self.dev, self.table_id)
+        self.assertEqual([], ret)
+
+    @mock.patch.object(linux_net, 'get_exposed_host_routes')
+    def test_get_exposed_host_routes_on_network(self, mock_routes):
+        mock_routes.return_value = [self.ip, '10.10.2.1', self.ipv6]
+        ret = linux_net.get_exposed_host_routes_on_network(
+            self.dev, self.table_id, self.network)
+        self.assertEqual([self.ip], ret)
+
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.routes_create')
+    def test_add_ip_host_routes(self, mock_routes_create):
+        self.fake_ndb.interfaces = {self.dev: {'index': 7}}
+        linux_net.add_ip_host_routes(self.dev, [self.ip, self.ipv6],
+                                     self.table_id)
+        expected_routes = [
+            {'dst': self.ip, 'dst_len': 32, 'oif': 7,
+             'table': self.table_id, 'proto': 3, 'scope': 253},
+            {'dst': self.ipv6, 'dst_len': 128, 'oif': 7,
+             'table': self.table_id, 'proto': 3, 'family': AF_INET6}]
+        mock_routes_create.assert_called_once_with(expected_routes)
+
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.routes_create')
+    def test_add_ip_host_routes_no_ips(self, mock_routes_create):
+        linux_net.add_ip_host_routes(self.dev, [], self.table_id)
+        mock_routes_create.assert_not_called()
+
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.routes_delete')
+    def test_del_ip_host_routes(self, mock_routes_delete):
+        self.fake_ndb.interfaces = {self.dev: {'index': 7}}
+        linux_net.del_ip_host_routes(self.dev, [self.ip], self.table_id)
+        expected_routes = [
+            {'dst': self.ip, 'dst_len': 32, 'oif': 7,
+             'table': self.table_id, 'proto': 3, 'scope': 253}]
+        mock_routes_delete.assert_called_once_with(expected_routes)
+
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.routes_create')
+    def test_add_ip_host_routes_prefix(self, mock_routes_create):
+        self.fake_ndb.interfaces = {self.dev: {'index': 7}}
+        linux_net.add_ip_host_routes(
+            self.dev, ['10.10.1.0/28', '2001:db8::/64'], self.table_id)
+        expected_routes = [
+            {'dst': '10.10.1.0', 'dst_len': 28, 'oif': 7,
+             'table': self.table_id, 'proto': 3, 'scope': 253},
+            {'dst': '2001:db8::', 'dst_len': 64, 'oif': 7,
+             'table': self.table_id, 'proto': 3, 'family': AF_INET6}]
+        mock_routes_create.assert_called_once_with(expected_routes)
+
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.routes_delete')
+    def test_del_ip_host_routes_no_nic(self, mock_routes_delete):
+        self.fake_ndb.interfaces = {}
+        linux_net.del_ip_host_routes(self.dev, [self.ip], self.table_id)
+        mock_routes_delete.assert_not_called()
+
     def test_get_exposed_routes_on_network_v4(self):
         route0 = mock.MagicMock(
             dst=mock.Mock(),
@@ -331,20 +559,12 @@ class TestLinuxNet(test_base.TestCase):
         gateway = '1.1.1.1'
         oif = 11
         vlan = 30 if is_vlan else None
-        vlan_dev = '%s.%s' % (self.bridge, vlan) if is_vlan else None
-        self.fake_ndb.interfaces = {self.bridge: {'index': oif}}
-        if is_vlan:
-            self.fake_ndb.interfaces.update({vlan_dev: {'index': oif}})
-
-        route = {'route': {'dst': self.ip,
-                           'dst_len': 32,
-                           'table': 20},
-                 'vlan': vlan}
-        if has_gateway:
-            route['route']['gateway'] = gateway
+        route = linux_net.RouteKey(
+            table=20, dst=self.ip, dst_len=32, family=AF_INET, oif=oif,
+            vlan=vlan, gateway=gateway if has_gateway else None)
 
         routing_tables = {self.bridge: 20}
-        routing_tables_routes = {self.bridge: [route]}
+        routing_tables_routes = {self.bridge: {route}}
         # extra_route0 matches with the route
         extra_route0 = {'dst': self.ip, 'dst_len': 32,
                         'family': AF_INET, 'oif': oif,
@@ -372,6 +592,24 @@ class TestLinuxNet(test_base.TestCase):
     def test_delete_bridge_ip_routes_gateway(self, mock_route_delete):
         self._test_delete_bridge_ip_routes(mock_route_delete, has_gateway=True)
 
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.routes_delete')
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.route_delete')
+    def test_delete_bridge_ip_routes_nexthops(self, mock_route_delete,
+                                              mock_routes_delete):
+        self.fake_ndb.interfaces = {self.bridge: {'index': 11}}
+        routing_tables = {self.bridge: 20}
+        extra_route = {'dst': self.ip, 'dst_len': 32, 'family': AF_INET,
+                       'oif': 11, 'gateway': None, 'table': 20}
+        extra_routes = {self.bridge: [extra_route]}
+
+        linux_net.delete_bridge_ip_routes(
+            routing_tables, {self.bridge: []}, extra_routes, nexthops={})
+
+        mock_route_delete.assert_not_called()
+        mock_routes_delete.assert_called_once_with([
+            {'dst': self.ip, 'dst_len': 32, 'family': AF_INET,
+             'table': 20}])
+
     @mock.patch('ovn_bgp_agent.utils.linux_net.delete_ip_routes')
     def test_delete_routes_from_table(self, mock_delete_ip_routes):
         route0 = mock.MagicMock(scope=1, proto=11)
@@ -403,20 +641,48 @@ class TestLinuxNet(test_base.TestCase):
 
         self.assertEqual([route0, route2], ret)
 
-    @mock.patch('ovn_bgp_agent.privileged.linux_net.route_delete')
-    def test_delete_ip_routes(self, mock_route_delete):
-        route0 = mock.MagicMock(
-            table=10, dst='10.10.10.10', proto=10, dst_len=128,
-            oif='ethout', family='fake', gateway='1.1.1.1')
-        route1 = mock.MagicMock(
-            table=11, dst='11.11.11.11', proto=11, dst_len=64,
-            oif='ethout', family='fake', gateway='2.2.2.2')
-        routes = [route0, route1]
-        self.fake_ndb.routes.__getitem__.side_effect = routes
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.routes_delete')
+    def test_delete_ip_routes(self, mock_routes_delete):
+        route0 = {'table': 10, 'dst': '10.10.10.10', 'proto': 10,
+                  'dst_len': 128, 'oif': 5, 'family': AF_INET6,
+                  'gateway': '1.1.1.1'}
+        route1 = {'table': 11, 'dst': '11.11.11.11', 'proto': 11,
+                  'dst_len': 32, 'oif': 6, 'family': AF_INET,
+                  'gateway': None}
+
+        linux_net.delete_ip_routes([route0, route1])
+
+        mock_routes_delete.assert_called_once_with([
+            {'table': 10, 'dst': '10.10.10.10', 'dst_len': 128, 'oif': 5,
+             'family': AF_INET6, 'gateway': '1.1.1.1'},
+            {'table': 11, 'dst': '11.11.11.11', 'dst_len': 32, 'oif': 6,
+             'family': AF_INET}])
+
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.routes_delete')
+    def test_delete_ip_routes_empty(self, mock_routes_delete):
+        linux_net.delete_ip_routes([])
+        mock_routes_delete.assert_not_called()
+
+    def test_get_links_and_routes(self):
+        iface0 = mock.MagicMock(ifname='vrf-10', index=3, kind='vrf',
+                                master=None)
+        iface1 = mock.MagicMock(ifname='lo-10', index=4, kind='dummy',
+                                master=3)
+        self.fake_ndb.interfaces = [iface0, iface1]
+        route0 = mock.MagicMock(table=10, dst='10.10.10.10', proto=10)
+        # bgp routes, default routes and other tables are ignored
+        route1 = mock.MagicMock(table=10, dst='11.11.11.11', proto=186)
+        route2 = mock.MagicMock(table=10, dst='', proto=10)
+        route3 = mock.MagicMock(table=99, dst='14.14.14.14', proto=14)
+        self.fake_ndb.routes.dump.return_value = [
+            route0, route1, route2, route3]
 
-        linux_net.delete_ip_routes(routes)
+        links, routes = linux_net.get_links_and_routes({10, 11})
 
-        mock_route_delete.has_calls([mock.call(route0), mock.call(route1)])
+        self.assertEqual(
+            {'vrf-10': {'index': 3, 'kind': 'vrf', 'master': None},
+             'lo-10': {'index': 4, 'kind': 'dummy', 'master': 3}}, links)
+        self.assertEqual({10: [route0]}, routes)
 
     @mock.patch('ovn_bgp_agent.privileged.linux_net.add_ndp_proxy')
     def test_add_ndp_proxy(self, mock_ndp_proxy):
@@ -428,6 +694,18 @@ class TestLinuxNet(test_base.TestCase):
         linux_net.del_ndp_proxy(self.ip, self.dev, vlan=10)
         mock_ndp_proxy.assert_called_once_with(self.ip, self.dev, 10)
 
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.add_ndp_proxies')
+    def test_add_ndp_proxies(self, mock_ndp_proxies):
+        linux_net.add_ndp_proxies([(self.ip, self.dev, 10)])
+        linux_net.add_ndp_proxies([])
+        mock_ndp_proxies.assert_called_once_with([(self.ip, self.dev, 10)])
+
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.del_ndp_proxies')
+    def test_del_ndp_proxies(self, mock_ndp_proxies):
+        linux_net.del_ndp_proxies([(self.ip, self.dev, 10)])
+        linux_net.del_ndp_proxies([])
+        mock_ndp_proxies.assert_called_once_with([(self.ip, self.dev, 10)])
+
     @mock.patch('ovn_bgp_agent.privileged.linux_net.route_delete')
     @mock.patch('ovn_bgp_agent.privileged.linux_net.add_ip_to_dev')
     def test_add_ips_to_dev(self, mock_add_ip_to_dev, mock_route_delete):
@@ -539,34 +817,196 @@ class TestLinuxNet(test_base.TestCase):
         linux_net.add_unreachable_route('fake-vrf')
         mock_add_route.assert_called_once_with('fake-vrf')
 
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.add_unreachable_routes')
+    def test_add_unreachable_routes(self, mock_add_routes):
+        linux_net.add_unreachable_routes(['fake-vrf', 'fake-vrf2'])
+        linux_net.add_unreachable_routes([])
+        mock_add_routes.assert_called_once_with(['fake-vrf', 'fake-vrf2'])
+
     @mock.patch('ovn_bgp_agent.privileged.linux_net.route_create')
     def test_add_ip_route(self, mock_route_create):
         routes = {}
         linux_net.add_ip_route(routes, self.ip, 7, self.dev)
         expected_routes = {
-            self.dev: [{'route': {'dst': self.ip,
-                                  'dst_len': 32,
-                                  'oif': mock.ANY,
-                                  'proto': 3,
-                                  'scope': 253,
-                                  'table': 7},
-                        'vlan': None}]}
+            self.dev: {linux_net.RouteKey(
+                table=7, dst=self.ip, dst_len=32, family=AF_INET,
+                oif=self.oif)}}
         self.assertEqual(expected_routes, routes)
         self.assertFalse(self.fake_ndb.routes.create.called)
         mock_route_create.assert_not_called()
 
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.route_create')
+    def test_add_ip_route_oif(self, mock_route_create):
+        self.fake_ndb.interfaces = {}
+        routes = {}
+
+        linux_net.add_ip_route(routes, self.ip, 7, self.dev, oif=5)
+
+        self.assertEqual(5, routes[self.dev].pop().oif)
+
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.nexthops_show')
+    def test_get_nexthops(self, mock_nexthops_show):
+        mock_nexthops_show.side_effect = (
+            [{'id': 1, 'dev': self.dev, 'protocol': '98'},
+             {'id': 2, 'gateway': '1.1.1.1', 'dev': self.dev,
+              'protocol': 98},
+             # nexthops not created by the agent, should be ignored
+             {'id': 3, 'dev': self.dev, 'protocol': 'zebra'},
+             {'id': 5, 'dev': self.dev, 'protocol': 'boot'}],
+            [{'id': 4, 'dev': self.dev, 'protocol': '98'}])
+
+        ret = linux_net.get_nexthops()
+
+        expected = {
+            (AF_INET, self.dev, None): {'id': 1, 'routes': set()},
+            (AF_INET, self.dev, '1.1.1.1'): {'id': 2, 'routes': set()},
+            (AF_INET6, self.dev, None): {'id': 4, 'routes': set()}}
+        self.assertEqual(expected, ret)
+        mock_nexthops_show.assert_has_calls([mock.call(AF_INET),
+                                             mock.call(AF_INET6)])
+
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.nexthop_delete')
+    def test_delete_unused_nexthops(self, mock_nexthop_delete):
+        nexthops = {(AF_INET, self.dev, None): {'id': 1, 'routes': set()},
+                    (AF_INET6, self.dev, None): {
+                        'id': 2, 'routes': {(7, self.ipv6, 128)}}}
+
+        linux_net.delete_unused_nexthops(nexthops)
+
+        mock_nexthop_delete.assert_called_once_with(1)
+        self.assertEqual([(AF_INET6, self.dev, None)], list(nexthops))
+
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.route_create')
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.'
+                'routes_replace_with_nexthop')
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.nexthop_add')
+    def test_add_ip_route_nexthops(self, mock_nexthop_add,
+                                   mock_routes_replace, mock_route_create):
+        # nexthop id 2 is in use by somebody else
+        mock_nexthop_add.side_effect = (False, True)
+        nexthops = {
+            (AF_INET, 'other-dev', None): {'id': 1, 'routes': set()}}
+        routes = {}
+
+        linux_net.add_ip_route(routes, self.ip, 7, self.dev, via='1.1.1.1',
+                               nexthops=nexthops)
+        linux_net.add_ip_route(routes, '10.10.1.17', 7, self.dev,
+                               via='1.1.1.1', nexthops=nexthops)
+
+        expected_calls = [
+            mock.call(2, AF_INET, self.dev, via='1.1.1.1'),
+            mock.call(3, AF_INET, self.dev, via='1.1.1.1')]
+        mock_nexthop_add.assert_has_calls(expected_calls)
+        self.assertEqual(2, mock_nexthop_add.call_count)
+        self.assertEqual(
+            {'id': 3, 'routes': {(7, self.ip, 32), (7, '10.10.1.17', 32)}},
+            nexthops[(AF_INET, self.dev, '1.1.1.1')])
+        expected_calls = [
+            mock.call([{'dst': self.ip, 'dst_len': 32, 'table': 7,
+                        'nh_id': 3}]),
+            mock.call([{'dst': '10.10.1.17', 'dst_len': 32, 'table': 7,
+                        'nh_id': 3}])]
+        mock_routes_replace.assert_has_calls(expected_calls)
+        mock_route_create.assert_not_called()
+        self.assertEqual(2, len(routes[self.dev]))
+
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.'
+                'routes_replace_with_nexthop')
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.nexthop_add')
+    def test_add_ip_route_nexthops_batch(self, mock_nexthop_add,
+                                         mock_routes_replace):
+        nexthops = {}
+        routes = {}
+        batch = []
+
+        linux_net.add_ip_route(routes, self.ip, 7, self.dev,
+                               nexthops=nexthops, batch=batch)
+        linux_net.add_ip_route(routes, self.ipv6, 7, self.dev,
+                               nexthops=nexthops, batch=batch)
+
+        mock_routes_replace.assert_not_called()
+        expected = [
+            {'dst': self.ip, 'dst_len': 32, 'table': 7, 'nh_id': 1},
+            {'dst': self.ipv6, 'dst_len': 128, 'table': 7, 'nh_id': 2}]
+        self.assertEqual(expected, batch)
+
+        linux_net.replace_ip_routes_with_nexthop(batch)
+        mock_routes_replace.assert_called_once_with(expected)
+
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.'
+                'routes_replace_with_nexthop')
+    def test_replace_ip_routes_with_nexthop_empty(self, mock_routes_replace):
+        linux_net.replace_ip_routes_with_nexthop([])
+        mock_routes_replace.assert_not_called()
+
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.'
+                'routes_replace_with_nexthop')
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.nexthop_add')
+    def test_add_ip_route_nexthops_existing(self, mock_nexthop_add,
+                                            mock_routes_replace):
+        nexthops = {(AF_INET, self.dev, None): {
+            'id': 1, 'routes': {(7, self.ip, 32)}}}
+        routes = {}
+
+        linux_net.add_ip_route(routes, self.ip, 7, self.dev,
+                               nexthops=nexthops)
+
+        mock_nexthop_add.assert_not_called()
+        mock_routes_replace.assert_not_called()
+        self.assertEqual({}, routes)
+
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.nexthop_replace')
+    @mock.patch.object(linux_net, 'ensure_vlan_device_for_network')
+    def test_replace_nexthop(self, mock_ensure_vlan, mock_nexthop_replace):
+        self.fake_ndb.interfaces.__getitem__.return_value = {'index': 5}
+        nexthops = {(AF_INET, self.dev, '1.1.1.1'): {
+            'id': 3, 'routes': {(7, '10.0.0.0', 24)}}}
+        route = linux_net.RouteKey(
+            table=7, dst='10.0.0.0', dst_len=24, family=AF_INET, oif=4,
+            gateway='1.1.1.1')
+        other_route = linux_net.RouteKey(
+            table=7, dst=self.ip, dst_len=32, family=AF_INET, oif=4)
+        routes = {self.dev: {route, other_route}}
+
+        ret = linux_net.replace_nexthop(
+            routes, nexthops, AF_INET, self.dev, new_vlan=10, via='1.1.1.1',
+            new_via='1.1.1.2')
+
+        self.assertTrue(ret)
+        mock_ensure_vlan.assert_called_once_with(self.dev, 10)
+        mock_nexthop_replace.assert_called_once_with(
+            3, AF_INET, '{}.10'.format(self.dev), via='1.1.1.2')
+        self.assertEqual(
+            {(AF_INET, '{}.10'.format(self.dev), '1.1.1.2'): {
+                'id': 3, 'routes': {(7, '10.0.0.0', 24)}}}, nexthops)
+        expected_route = linux_net.RouteKey(
+            table=7, dst='10.0.0.0', dst_len=24, family=AF_INET, oif=5,
+            vlan=10, gateway='1.1.1.2')
+        self.assertEqual({self.dev: {expected_route, other_route}}, routes)
+
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.nexthop_replace')
+    def test_replace_nexthop_not_found(self, mock_nexthop_replace):
+        nexthops = {(AF_INET, self.dev, '1.1.1.1'): {'id': 3,
+                                                     'routes': set()},
+                    (AF_INET, self.dev, '1.1.1.2'): {'id': 4,
+                                                     'routes': set()}}
+        self.assertFalse(linux_net.replace_nexthop(
+            {}, nexthops, AF_INET, self.dev, via='1.1.1.3',
+            new_via='1.1.1.4'))
+        # there is already a nexthop for the new gateway
+        self.assertFalse(linux_net.replace_nexthop(
+            {}, nexthops, AF_INET, self.dev, via='1.1.1.1',
+            new_via='1.1.1.2'))
+        mock_nexthop_replace.assert_not_called()
+
     @mock.patch('ovn_bgp_agent.privileged.linux_net.route_create')
     def test_add_ip_route_ipv6(self, mock_route_create):
         routes = {}
         linux_net.add_ip_route(routes, self.ipv6, 7, self.dev)
         expected_routes = {
-            self.dev: [{'route': {'dst': self.ipv6,
-                                  'dst_len': 128,
-                                  'family': AF_INET6,
-                                  'oif': mock.ANY,
-                                  'proto': 3,
-                                  'table': 7},
-                        'vlan': None}]}
+            self.dev: {linux_net.RouteKey(
+                table=7, dst=self.ipv6, dst_len=128, family=AF_INET6,
+                oif=self.oif)}}
         self.assertEqual(expected_routes, routes)
         mock_route_create.assert_not_called()
 
@@ -575,14 +1015,9 @@ class TestLinuxNet(test_base.TestCase):
         routes = {}
         linux_net.add_ip_route(routes, self.ip, 7, self.dev, via='1.1.1.1')
         expected_routes = {
-            self.dev: [{'route': {'dst': self.ip,
-                                  'dst_len': 32,
-                                  'gateway': '1.1.1.1',
-                                  'oif': mock.ANY,
-                                  'proto': 3,
-                                  'scope': 0,
-                                  'table': 7},
-                        'vlan': None}]}
+            self.dev: {linux_net.RouteKey(
+                table=7, dst=self.ip, dst_len=32, family=AF_INET,
+                oif=self.oif, gateway='1.1.1.1')}}
         self.assertEqual(expected_routes, routes)
         mock_route_create.assert_not_called()
 
@@ -591,13 +1026,9 @@ class TestLinuxNet(test_base.TestCase):
         routes = {}
         linux_net.add_ip_route(routes, self.ip, 7, self.dev, vlan=10)
         expected_routes = {
-            self.dev: [{'route': {'dst': self.ip,
-                                  'dst_len': 32,
-                                  'oif': mock.ANY,
-                                  'proto': 3,
-                                  'scope': 253,
-                                  'table': 7},
-                        'vlan': 10}]}
+            self.dev: {linux_net.RouteKey(
+                table=7, dst=self.ip, dst_len=32, family=AF_INET,
+                oif=self.oif, vlan=10)}}
         self.assertEqual(expected_routes, routes)
         mock_route_create.assert_not_called()
 
@@ -611,13 +1042,9 @@ class TestLinuxNet(test_base.TestCase):
             KeyError('No index'), {'index': oif})
         linux_net.add_ip_route(routes, self.ip, 7, self.dev, vlan=10)
         expected_routes = {
-            self.dev: [{'route': {'dst': self.ip,
-                                  'dst_len': 32,
-                                  'oif': oif,
-                                  'proto': 3,
-                                  'scope': 253,
-                                  'table': 7},
-                        'vlan': 10}]}
+            self.dev: {linux_net.RouteKey(
+                table=7, dst=self.ip, dst_len=32, family=AF_INET,
+                oif=oif, vlan=10)}}
         self.assertEqual(expected_routes, routes)
         mock_ensure_vlan_device.assert_called_once_with(self.dev, 10)
         mock_route_create.assert_not_called()
@@ -627,13 +1054,9 @@ class TestLinuxNet(test_base.TestCase):
         routes = {}
         linux_net.add_ip_route(routes, self.ip, 7, self.dev, mask=30)
         expected_routes = {
-            self.dev: [{'route': {'dst': self.ip,
-                                  'dst_len': 30,
-                                  'oif': mock.ANY,
-                                  'proto': 3,
-                                  'scope': 253,
-                                  'table': 7},
-                        'vlan': None}]}
+            self.dev: {linux_net.RouteKey(
+                table=7, dst=self.ip, dst_len=30, family=AF_INET,
+                oif=self.oif)}}
         self.assertEqual(expected_routes, routes)
         mock_route_create.assert_not_called()
 
@@ -643,99 +1066,134 @@ class TestLinuxNet(test_base.TestCase):
         routes = {}
         linux_net.add_ip_route(routes, self.ip, 7, self.dev)
         expected_routes = {
-            self.dev: [{'route': {'dst': self.ip,
-                                  'dst_len': 32,
-                                  'oif': mock.ANY,
-                                  'proto': 3,
-                                  'scope': 253,
-                                  'table': 7},
-                        'vlan': None}]}
+            self.dev: {linux_net.RouteKey(
+                table=7, dst=self.ip, dst_len=32, family=AF_INET,
+                oif=self.oif)}}
         self.assertEqual(expected_routes, routes)
         mock_route_create.assert_called_once_with(
-            expected_routes[self.dev][0]['route'])
+            {'dst': self.ip, 'dst_len': 32, 'oif': self.oif, 'proto': 3,
+             'scope': 253, 'table': 7})
 
     @mock.patch('ovn_bgp_agent.privileged.linux_net.route_delete')
     def test_del_ip_route(self, mock_route_delete):
+        route = {'dst': self.ip,
+                 'dst_len': 32,
+                 'oif': self.oif,
+                 'proto': 3,
+                 'scope': 253,
+                 'table': 7}
         routes = {
-            self.dev: [{'route': {'dst': self.ip,
-                                  'dst_len': 32,
-                                  'oif': mock.ANY,
-                                  'proto': 3,
-                                  'scope': 253,
-                                  'table': 7},
-                        'vlan': None}]}
-        route = copy.deepcopy(routes[self.dev][0]['route'])
+            self.dev: {linux_net.RouteKey(
+                table=7, dst=self.ip, dst_len=32, family=AF_INET,
+                oif=self.oif)}}
 
         linux_net.del_ip_route(routes, self.ip, 7, self.dev)
 
-        self.assertEqual({self.dev: []}, routes)
+        self.assertEqual({self.dev: set()}, routes)
         mock_route_delete.assert_called_once_with(route)
 
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.nexthop_delete')
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.routes_delete')
+    @mock.patch('ovn_bgp_agent.privileged.linux_net.route_delete')
+    def test_del_ip_route_nexthops(self, mock_route_delete,
+                                   mock_routes_delete, mock_nexthop_delete):
+        self.fake_ndb.interfaces = {self.dev: {'index': 7}}
+        nexthops = {(AF_INET6, self.dev, None): {
+            'id': 1, 'routes': {(7, self.ipv6, 128), (7, '2002::1', 128)}}}
+
+        linux_net.del_ip_route({}, self.ipv6, 7, self.dev, nexthops=nexthops)
+
+        mock_route_delete.assert_not_called()
+        mock_routes_delete.assert_called_once_with([
+            {'dst': self.ipv6, 'dst_len': 128, 'family': AF_INET6,
+             'proto': 3, 'table': 7}])
+        # still used by other route
+        mock_nexthop_delete.assert_not_called()
+
+        linux_net.del_ip_route({}, '2002::1', 7, self.dev, nexthops=nexthops)
+
+        mock_nexthop_delete.assert_called_once_with(1)
+        self.assertEqual({}, nexthops)
+
+    def test_del_ip_route_nexthops_no_device(self):
+        self.fake_ndb.interfaces = {}
+        nexthops = {
+            (AF_INET, self.dev, None): {'id': 1, 'routes': set()},
+            (AF_INET, 'other-dev', None): {'id': 2, 'routes': set()}}
+
+        linux_net.del_ip_route({}, self.ip, 7, self.dev, nexthops=nexthops)
+
+        self.assertEqual([(AF_INET, 'other-dev', None)], list(nexthops))
+
     @mock.patch('ovn_bgp_agent.privileged.linux_net.route_delete')
     def test_del_ip_route_ipv6(self, mock_route_delete):
+        route = {'dst': self.ipv6,
+                 'dst_len': 128,
+                 'family': AF_INET6,
+                 'oif': self.oif,
+                 'proto': 3,
+                 'table': 7}
         routes = {
-            self.dev: [{'route': {'dst': self.ipv6,
-                                  'dst_len': 128,
-                                  'family': AF_INET6,
-                                  'oif': mock.ANY,
-                                  'proto': 3,
-                                  'table': 7},
-                        'vlan': None}]}
-        route = copy.deepcopy(routes[self.dev][0]['route'])
+            self.dev: {linux_net.RouteKey(
+                table=7, dst=self.ipv6, dst_len=128, family=AF_INET6,
+                oif=self.oif)}}
 
         linux_net.del_ip_route(routes, self.ipv6, 7, self.dev)
 
-        self.assertEqual({self.dev: []}, routes)
+        self.assertEqual({self.dev: set()}, routes)
         mock_route_delete.assert_called_once_with(route)
 
     @mock.patch('ovn_bgp_agent.privileged.linux_net.route_delete')
     def test_del_ip_route_via(self, mock_route_delete):
+        route = {'dst': self.ip,
+                 'dst_len': 32,
+                 'oif': self.oif,
+                 'gateway': '1.1.1.1',
+                 'proto': 3,
+                 'scope': 0,
+                 'table': 7}
         routes = {
-            self.dev: [{'route': {'dst': self.ip,
-                                  'dst_len': 32,
-                                  'oif': mock.ANY,
-                                  'gateway': '1.1.1.1',
-                                  'proto': 3,
-                                  'scope': 0,
-                                  'table': 7},
-                        'vlan': None}]}
-        route = copy.deepcopy(routes[self.dev][0]['route'])
+            self.dev: {linux_net.RouteKey(
+                table=7, dst=self.ip, dst_len=32, family=AF_INET,
+                oif=self.oif, gateway='1.1.1.1')}}
 
         linux_net.del_ip_route(routes, self.ip, 7, self.dev, via='1.1.1.1')
 
-        self.assertEqual({self.dev: []}, routes)
+        self.assertEqual({self.dev: set()}, routes)
         mock_route_delete.assert_called_once_with(route)
 
     @mock.patch('ovn_bgp_agent.privileged.linux_net.route_delete')
     def test_del_ip_route_vlan(self, mock_route_delete):
+        route = {'dst': self.ip,
+                 'dst_len': 32,
+                 'oif': self.oif,
+                 'proto': 3,
+                 'scope': 253,
+                 'table': 7}
         routes = {
-            self.dev: [{'route': {'dst': self.ip,
-                                  'dst_len': 32,
-                                  'oif': mock.ANY,
-                                  'proto': 3,
-                                  'scope': 253,
-                                  'table': 7},
-                        'vlan': 10}]}
-        route = copy.deepcopy(routes[self.dev][0]['route'])
+            self.dev: {linux_net.RouteKey(
+                table=7, dst=self.ip, dst_len=32, family=AF_INET,
+                oif=self.oif, vlan=10)}}
 
         linux_net.del_ip_route(routes, self.ip, 7, self.dev, vlan=10)
 
-        self.assertEqual({self.dev: []}, routes)
+        self.assertEqual({self.dev: set()}, routes)
         mock_route_delete.assert_called_once_with(route)
 
     @mock.patch('ovn_bgp_agent.privileged.linux_net.route_delete')
     def test_del_ip_route_mask(self, mock_route_delete):
+        route = {'dst': self.ip,
+                 'dst_len': 30,
+                 'oif': self.oif,
+                 'proto': 3,
+                 'scope': 253,
+                 'table': 7}
         routes = {
-            self.dev: [{'route': {'dst': self.ip,
-                                  'dst_len': 30,
-                                  'oif': mock.ANY,
-                                  'proto': 3,
-                                  'scope': 253,
-                                  'table': 7},
-                        'vlan': None}]}
-        route = copy.deepcopy(routes[self.dev][0]['route'])
+            self.dev: {linux_net.RouteKey(
+                table=7, dst=self.ip, dst_len=30, family=AF_INET,
+                oif=self.oif)}}
 
         linux_net.del_ip_route(routes, self.ip, 7, self.dev, mask=30)
 
-        self.assertEqual({self.dev: []}, routes)
+        self.assertEqual({self.dev: set()}, routes)
         mock_route_delete.assert_called_once_with(route)
@@ -0,0 +1,161 @@
+# Copyright 2022 Red Hat, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import ipaddress
+
+from ovn_bgp_agent.tests import base as test_base
+from ovn_bgp_agent.utils import prefix_tree
+
+
+class TestPrefixTree(test_base.TestCase):
+
+    def setUp(self):
+        super(TestPrefixTree, self).setUp()
+        self.ips = ['10.0.0.{}'.format(i) for i in range(4)]
+        self.ipv6 = '2001:db8::1'
+        self.tree = prefix_tree.PrefixTree(self.ips + [self.ipv6])
+
+    def test_add(self):
+        self.assertTrue(self.tree.add('10.0.1.1'))
+        self.assertIn('10.0.1.1', self.tree)
+        self.assertEqual(6, len(self.tree))
+
+    def test_add_existing(self):
+        self.assertFalse(self.tree.add(self.ips[0]))
+        self.assertEqual(5, len(self.tree))
+
+    def test_remove(self):
+        self.assertTrue(self.tree.remove(self.ips[0]))
+        self.assertNotIn(self.ips[0], self.tree)
+        self.assertIn(self.ips[1], self.tree)
+        self.assertEqual(4, len(self.tree))
+
+    def test_remove_not_found(self):
+        self.assertFalse(self.tree.remove('10.0.1.1'))
+        self.assertEqual(5, len(self.tree))
+
+    def test_iter(self):
+        expected = [ipaddress.ip_address(ip)
+                    for ip in self.ips + [self.ipv6]]
+        self.assertEqual(expected, list(self.tree))
+
+    def test_get_addresses_on_network(self):
+        self.tree.add('10.0.1.1')
+        ret = self.tree.get_addresses_on_network('10.0.0.2/31')
+        self.assertEqual([ipaddress.ip_address(ip) for ip in self.ips[2:]],
+                         ret)
+
+    def test_get_addresses_on_network_empty(self):
+        self.assertEqual([], self.tree.get_addresses_on_network(
+            '10.0.1.0/24'))
+
+    def test_get_full_prefix(self):
+        self.tree.add('10.0.0.5')
+        self.assertEqual(ipaddress.ip_network('10.0.0.0/30'),
+                         self.tree.get_full_prefix(self.ips[1]))
+        self.assertEqual(ipaddress.ip_network('10.0.0.5/32'),
+                         self.tree.get_full_prefix('10.0.0.5'))
+        self.assertEqual(ipaddress.ip_network('{}/128'.format(self.ipv6)),
+                         self.tree.get_full_prefix(self.ipv6))
+
+    def test_get_full_prefix_not_found(self):
+        self.assertIsNone(self.tree.get_full_prefix('10.0.0.5'))
+
+    def test_get_full_prefixes(self):
+        self.tree.remove(self.ips[0])
+        expected = [ipaddress.ip_network(p) for p in (
+            '10.0.0.1/32', '10.0.0.2/31', '{}/128'.format(self.ipv6))]
+        self.assertEqual(sorted(expected, key=str),
+                         sorted(self.tree.get_full_prefixes(), key=str))
+
+
+class TestPrefixMap(test_base.TestCase):
+
+    def setUp(self):
+        super(TestPrefixMap, self).setUp()
+        self.prefixes = ['10.0.0.0/8', '10.0.0.0/24', '10.0.0.1',
+                         '10.0.1.0/24', '2001:db8::/64', '2001:db8::1']
+        self.map = prefix_tree.PrefixMap((p, p) for p in self.prefixes)
+
+    def _get_values(self, items):
+        return [value for _, value in items]
+
+    def test_setitem(self):
+        self.map['10.0.0.128/25'] = 'new'
+        self.map['10.0.0.1/32'] = 'updated'
+        self.assertEqual(7, len(self.map))
+        self.assertEqual('new', self.map['10.0.0.128/25'])
+        self.assertEqual('updated', self.map['10.0.0.1'])
+
+    def test_contains(self):
+        self.assertIn('10.0.0.1', self.map)
+        self.assertIn(ipaddress.ip_network('10.0.0.0/24'), self.map)
+        # the branching nodes are not stored prefixes
+        self.assertNotIn('10.0.0.0/23', self.map)
+        self.assertNotIn('10.0.0.2', self.map)
+
+    def test_delitem(self):
+        del self.map['10.0.0.0/24']
+        self.assertNotIn('10.0.0.0/24', self.map)
+        self.assertEqual(5, len(self.map))
+        self.assertEqual(['10.0.0.0/8', '10.0.0.1', '10.0.1.0/24'],
+                         self._get_values(self.map.get_within('10.0.0.0/8')))
+
+    def test_delitem_not_found(self):
+        self.assertRaises(KeyError, self.map.__delitem__, '10.0.0.0/23')
+        self.assertRaises(KeyError, self.map.__delitem__, '10.0.0.2')
+        self.assertEqual(6, len(self.map))
+
+    def test_get_pop_setdefault(self):
+        self.assertIsNone(self.map.get('10.0.0.2'))
+        self.assertEqual('10.0.0.1', self.map.pop('10.0.0.1'))
+        self.assertIsNone(self.map.pop('10.0.0.1', None))
+        self.assertRaises(KeyError, self.map.pop, '10.0.0.1')
+        self.assertEqual([], self.map.setdefault('10.0.0.1', []))
+        self.assertEqual('10.0.1.0/24',
+                         self.map.setdefault('10.0.1.0/24', []))
+
+    def test_items(self):
+        self.assertEqual(self.prefixes, self._get_values(self.map.items()))
+        self.assertEqual([ipaddress.ip_network(p) for p in self.prefixes],
+                         list(self.map))
+
+    def test_get_within(self):
+        self.assertEqual(['10.0.0.0/24', '10.0.0.1'],
+                         self._get_values(self.map.get_within('10.0.0.0/24')))
+        self.assertEqual(['10.0.0.1'],
+                         self._get_values(self.map.get_within('10.0.0.0/31')))
+        self.assertEqual(['2001:db8::/64', '2001:db8::1'],
+                         self._get_values(self.map.get_within('2001::/16')))
+
+    def test_get_within_empty(self):
+        self.assertEqual([], self.map.get_within('10.0.2.0/24'))
+        self.assertEqual([], self.map.get_within('11.0.0.0/8'))
+        self.assertEqual([], prefix_tree.PrefixMap().get_within('0.0.0.0/0'))
+
+    def test_get_covering(self):
+        self.assertEqual(
+            ['10.0.0.0/8', '10.0.0.0/24', '10.0.0.1'],
+            self._get_values(self.map.get_covering('10.0.0.1')))
+        self.assertEqual(
+            ['10.0.0.0/8', '10.0.1.0/24'],
+            self._get_values(self.map.get_covering('10.0.1.128/25')))
+        self.assertEqual([], self.map.get_covering('2001:db9::1'))
+
+    def test_remove_all(self):
+        for prefix in self.prefixes:
+            del self.map[prefix]
+        self.assertEqual(0, len(self.map))
+        self.assertEqual([], self.map.items())
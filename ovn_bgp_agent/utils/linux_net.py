@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+import dataclasses
 import ipaddress
 import pyroute2
 import random
@@ -29,6 +31,33 @@ import ovn_bgp_agent.privileged.linux_net
 
 LOG = logging.getLogger(__name__)
 
+# {ifname: (ifindex, {flag: value})} of the kernel flags set on the devices,
+# see set_device_kernel_flags
+_kernel_flags = {}
+
+
+@dataclasses.dataclass(frozen=True, eq=True)
+class RouteKey:
+    """Route added to the routing table of a bridge by add_ip_route
+
+    The routes are tracked in {bridge: set(RouteKey)} dicts, so that
+    finding and removing them does not require going through all of them.
+    """
+    table: int
+    dst: str
+    dst_len: int
+    family: int
+    oif: int
+    vlan: int = None
+    gateway: str = None
+
+
+def _get_route_key(route, vlan):
+    return RouteKey(table=route['table'], dst=route['dst'],
+                    dst_len=route['dst_len'],
+                    family=route.get('family', AF_INET), oif=route['oif'],
+                    vlan=vlan, gateway=route.get('gateway'))
+
 
 def get_ip_version(ip):
     return ipaddress.ip_address(ip.split('/')[0]).version
@@ -58,6 +87,47 @@ def ensure_vxlan(vxlan_name, vni, local_ip, dstport):
                                                     dstport)
 
 
+def ensure_vlan_bridge(bridge_name):
+    ovn_bgp_agent.privileged.linux_net.ensure_vlan_bridge(bridge_name)
+
+
+def ensure_vxlan_vnifilter(vxlan_name, local_ip, dstport, bridge_name):
+    ovn_bgp_agent.privileged.linux_net.ensure_vxlan_vnifilter(
+        vxlan_name, local_ip, dstport, bridge_name)
+
+
+def ensure_vlan_device(vlan_name, link, vlan_id):
+    ovn_bgp_agent.privileged.linux_net.ensure_vlan_device(vlan_name, link,
+                                                          vlan_id)
+
+
+def get_vni_vlan_mappings(vxlan_name):
+    """Return the VNI to VLAN mappings of a VXLAN bridge port
+
+    :returns: a dict with the VLAN mapped to each VNI, {vni: vlan}
+    """
+    mappings = {}
+    for device in ovn_bgp_agent.privileged.linux_net.vlan_tunnels_show(
+            vxlan_name):
+        for tunnel in device.get('tunnels', []):
+            vlan = tunnel['vlan']
+            vni = tunnel['tunid']
+            # consecutive mappings are shown as ranges
+            for offset in range(tunnel.get('vlanEnd', vlan) - vlan + 1):
+                mappings[vni + offset] = vlan + offset
+    return mappings
+
+
+def add_vni_vlan_mapping(vxlan_name, bridge_name, vni, vlan):
+    ovn_bgp_agent.privileged.linux_net.add_vni_vlan_mapping(
+        vxlan_name, bridge_name, vni, vlan)
+
+
+def del_vni_vlan_mapping(vxlan_name, bridge_name, vni, vlan):
+    ovn_bgp_agent.privileged.linux_net.del_vni_vlan_mapping(
+        vxlan_name, bridge_name, vni, vlan)
+
+
 def ensure_veth(veth_name, veth_peer):
     ovn_bgp_agent.privileged.linux_net.ensure_veth(veth_name, veth_peer)
 
@@ -77,6 +147,21 @@ def ensure_ovn_device(ovn_ifname, vrf_name):
 
 def delete_device(device):
     ovn_bgp_agent.privileged.linux_net.delete_device(device)
+    _kernel_flags.pop(device, None)
+
+
+def delete_devices(devices):
+    ovn_bgp_agent.privileged.linux_net.delete_devices(devices)
+    for device in devices:
+        _kernel_flags.pop(device, None)
+
+
+def create_device(device, kind, **attrs):
+    ovn_bgp_agent.privileged.linux_net.create_device(device, kind, **attrs)
+
+
+def rename_device(device, new_name):
+    return ovn_bgp_agent.privileged.linux_net.rename_device(device, new_name)
 
 
 def ensure_arp_ndp_enabled_for_bridge(bridge, offset, vlan_tag=None):
@@ -98,8 +183,7 @@ def ensure_arp_ndp_enabled_for_bridge(bridge, offset, vlan_tag=None):
             raise
 
     if not vlan_tag:
-        enable_proxy_arp(bridge)
-        enable_proxy_ndp(bridge)
+        enable_proxy_arp_ndp(bridge)
 
 
 def ensure_routing_table_for_bridge(ovn_routing_tables, bridge):
@@ -225,8 +309,7 @@ def ensure_vlan_device_for_network(bridge, vlan_tag):
     ovn_bgp_agent.privileged.linux_net.ensure_vlan_device_for_network(bridge,
                                                                       vlan_tag)
     device = "{}/{}".format(bridge, vlan_tag)
-    enable_proxy_arp(device)
-    enable_proxy_ndp(device)
+    enable_proxy_arp_ndp(device)
 
 
 def delete_vlan_device_for_network(bridge, vlan_tag):
@@ -234,14 +317,50 @@ def delete_vlan_device_for_network(bridge, vlan_tag):
     delete_device(vlan_device_name)
 
 
+def _get_ifindex(ifname):
+    with pyroute2.IPRoute() as ipr:
+        index = ipr.link_lookup(ifname=ifname)
+    return index[0] if index else None
+
+
+def set_device_kernel_flags(device, flags):
+    """Set the {flag: value} kernel flags of a device
+
+    The flags set are remembered, and not set again, until the device is
+    deleted or re-created (i.e., its ifindex changes).
+
+    :param device: device name, as on the flags, i.e., with a '/' instead of
+                   the '.' on the vlan devices names.
+    """
+    ifname = device.replace('/', '.')
+    ifindex = _get_ifindex(ifname)
+    cached = _kernel_flags.get(ifname)
+    if not cached or cached[0] != ifindex:
+        cached = (ifindex, {})
+    pending = {flag: value for flag, value in flags.items()
+               if cached[1].get(flag) != value}
+    if not pending:
+        return
+    ovn_bgp_agent.privileged.linux_net.set_kernel_flags(pending)
+    if ifindex is not None:
+        cached[1].update(pending)
+        _kernel_flags[ifname] = cached
+
+
 def enable_proxy_ndp(device):
     flag = "net.ipv6.conf.{}.proxy_ndp".format(device)
-    ovn_bgp_agent.privileged.linux_net.set_kernel_flag(flag, 1)
+    set_device_kernel_flags(device, {flag: 1})
 
 
 def enable_proxy_arp(device):
     flag = "net.ipv4.conf.{}.proxy_arp".format(device)
-    ovn_bgp_agent.privileged.linux_net.set_kernel_flag(flag, 1)
+    set_device_kernel_flags(device, {flag: 1})
+
+
+def enable_proxy_arp_ndp(device):
+    set_device_kernel_flags(device, {
+        "net.ipv4.conf.{}.proxy_arp".format(device): 1,
+        "net.ipv6.conf.{}.proxy_ndp".format(device): 1})
 
 
 def get_exposed_ips(nic):
@@ -296,6 +415,77 @@ def get_exposed_routes_on_network(table_ids, network):
         ]
 
 
+def _get_host_route(ip, oif, table):
+    # NOTE: ip can also be a prefix (ip/prefixlen) when routes are aggregated
+    ip, _, prefixlen = ip.partition('/')
+    route = {'dst': ip, 'dst_len': int(prefixlen or 32), 'oif': oif,
+             'table': int(table), 'proto': 3, 'scope': 253}
+    if get_ip_version(ip) == constants.IP_VERSION_6:
+        route['dst_len'] = int(prefixlen or 128)
+        route['family'] = AF_INET6
+        del route['scope']
+    return route
+
+
+def get_exposed_host_routes(nic, table):
+    with pyroute2.NDB() as ndb:
+        try:
+            oif = ndb.interfaces[nic]['index']
+        except KeyError:
+            LOG.debug("Nic %s does not yet exists, so it does not have "
+                      "exposed routes", nic)
+            return []
+        # NOTE: skip bgp routes (proto 186)
+        return [r.dst for r in ndb.routes.dump().filter(table=table)
+                if (r.oif == oif and r.proto != 186 and
+                    (r.dst_len == 32 or r.dst_len == 128))]
+
+
+def get_exposed_route_prefixes(nic, table):
+    """Return the prefixes (ip/prefixlen) of the routes through nic"""
+    with pyroute2.NDB() as ndb:
+        try:
+            oif = ndb.interfaces[nic]['index']
+        except KeyError:
+            LOG.debug("Nic %s does not yet exists, so it does not have "
+                      "exposed routes", nic)
+            return []
+        # NOTE: skip bgp routes (proto 186)
+        return [str(ipaddress.ip_network("{}/{}".format(r.dst, r.dst_len)))
+                for r in ndb.routes.dump().filter(table=table)
+                if r.oif == oif and r.proto != 186 and r.dst]
+
+
+def get_exposed_host_routes_on_network(nic, table, network):
+    return [ip for ip in get_exposed_host_routes(nic, table)
+            if ipaddress.ip_address(ip) in network]
+
+
+def add_ip_host_routes(nic, ips, table):
+    """Add a host (/32 or /128) route through nic for each ip
+
+    All the routes are created at the given routing table in one go.
+    """
+    if not ips:
+        return
+    oif = get_interface_index(nic)
+    routes = [_get_host_route(ip, oif, table) for ip in ips]
+    ovn_bgp_agent.privileged.linux_net.routes_create(routes)
+
+
+def del_ip_host_routes(nic, ips, table):
+    if not ips:
+        return
+    try:
+        oif = get_interface_index(nic)
+    except KeyError:
+        LOG.debug("Device %s does not exists, so the associated "
+                  "routes should have been automatically deleted.", nic)
+        return
+    routes = [_get_host_route(ip, oif, table) for ip in ips]
+    ovn_bgp_agent.privileged.linux_net.routes_delete(routes)
+
+
 def get_ovn_ip_rules(routing_table):
     # get the rules pointing to ovn bridges
     ovn_ip_rules = {}
@@ -318,31 +508,23 @@ def delete_ip_rules(ip_rules):
 
 
 def delete_bridge_ip_routes(routing_tables, routing_tables_routes,
-                            extra_routes):
-    with pyroute2.NDB() as ndb:
-        for device, routes_info in routing_tables_routes.items():
-            if not extra_routes.get(device):
-                continue
-            for route_info in routes_info:
-                oif = ndb.interfaces[device]['index']
-                if route_info['vlan']:
-                    vlan_device_name = '{}.{}'.format(device,
-                                                      route_info['vlan'])
-                    oif = ndb.interfaces[vlan_device_name]['index']
-                if 'gateway' in route_info['route'].keys():  # subnet route
-                    possible_matchings = [
-                        r for r in extra_routes[device]
-                        if (r['dst'] == route_info['route']['dst'] and
-                            r['dst_len'] == route_info['route']['dst_len'] and
-                            r['gateway'] == route_info['route']['gateway'])]
-                else:  # cr-lrp
-                    possible_matchings = [
-                        r for r in extra_routes[device]
-                        if (r['dst'] == route_info['route']['dst'] and
-                            r['dst_len'] == route_info['route']['dst_len'] and
-                            r['oif'] == oif)]
-                for r in possible_matchings:
-                    extra_routes[device].remove(r)
+                            extra_routes, nexthops=None):
+    for device, routes in routing_tables_routes.items():
+        if not extra_routes.get(device):
+            continue
+        # routes that should be kept, subnet routes are matched by gateway
+        # and cr-lrp ones by output interface
+        keep = set()
+        for route in routes:
+            if route.gateway:  # subnet route
+                keep.add((route.dst, route.dst_len, 'gateway', route.gateway))
+            else:  # cr-lrp
+                keep.add((route.dst, route.dst_len, 'oif', route.oif))
+        extra_routes[device] = [
+            r for r in extra_routes[device]
+            if ((r['dst'], r['dst_len'], 'gateway', r['gateway']) not in
+                keep and
+                (r['dst'], r['dst_len'], 'oif', r['oif']) not in keep)]
 
     for bridge, routes in extra_routes.items():
         for route in routes:
@@ -352,7 +534,14 @@ def delete_bridge_ip_routes(routing_tables, routing_tables_routes,
                       'oif': route['oif'],
                       'gateway': route['gateway'],
                       'table': routing_tables[bridge]}
-            ovn_bgp_agent.privileged.linux_net.route_delete(r_info)
+            if nexthops is not None:
+                # NOTE: the kernel does not match routes using nexthop
+                # objects if the oif or the gateway are given
+                del r_info['oif']
+                del r_info['gateway']
+                ovn_bgp_agent.privileged.linux_net.routes_delete([r_info])
+            else:
+                ovn_bgp_agent.privileged.linux_net.route_delete(r_info)
 
 
 def delete_routes_from_table(table):
@@ -363,6 +552,30 @@ def delete_routes_from_table(table):
     delete_ip_routes(table_routes)
 
 
+def get_links_and_routes(table_ids):
+    """Take a snapshot of the links and of the routes on the given tables
+
+    Both are retrieved from the same NDB instance. As in
+    get_routes_on_tables, the default and the BGP (proto 186) routes are
+    skipped.
+
+    :returns: a tuple with a dict with the links info, {ifname: {'index':
+              index, 'kind': kind, 'master': master index}}, and a dict with
+              the routes on each table, {table: [routes]}.
+    """
+    links = {}
+    routes = collections.defaultdict(list)
+    with pyroute2.NDB() as ndb:
+        for iface in ndb.interfaces:
+            links[iface.ifname] = {'index': iface.index,
+                                   'kind': iface.kind,
+                                   'master': iface.master}
+        for r in ndb.routes.dump():
+            if r.table in table_ids and r.dst != '' and r.proto != 186:
+                routes[r.table].append(r)
+    return links, routes
+
+
 def get_routes_on_tables(table_ids):
     with pyroute2.NDB() as ndb:
         # NOTE: skip bgp routes (proto 186)
@@ -371,6 +584,9 @@ def get_routes_on_tables(table_ids):
 
 
 def delete_ip_routes(routes):
+    if not routes:
+        return
+    routes_info = []
     for route in routes:
         r_info = {'dst': route['dst'],
                   'dst_len': route['dst_len'],
@@ -378,17 +594,31 @@ def delete_ip_routes(routes):
                   'oif': route['oif'],
                   'gateway': route['gateway'],
                   'table': route['table']}
-        ovn_bgp_agent.privileged.linux_net.route_delete(r_info)
+        routes_info.append({k: v for k, v in r_info.items() if v})
+    # all the routes are removed through the same netlink socket
+    ovn_bgp_agent.privileged.linux_net.routes_delete(routes_info)
 
 
 def add_ndp_proxy(ip, dev, vlan=None):
     ovn_bgp_agent.privileged.linux_net.add_ndp_proxy(ip, dev, vlan)
 
 
+def add_ndp_proxies(ndp_proxies):
+    """Add the NDP proxy entries of the (ip, dev, vlan) tuples at once"""
+    if ndp_proxies:
+        ovn_bgp_agent.privileged.linux_net.add_ndp_proxies(ndp_proxies)
+
+
 def del_ndp_proxy(ip, dev, vlan=None):
     ovn_bgp_agent.privileged.linux_net.del_ndp_proxy(ip, dev, vlan)
 
 
+def del_ndp_proxies(ndp_proxies):
+    """Delete the NDP proxy entries of the (ip, dev, vlan) tuples at once"""
+    if ndp_proxies:
+        ovn_bgp_agent.privileged.linux_net.del_ndp_proxies(ndp_proxies)
+
+
 def add_ips_to_dev(nic, ips, clear_local_route_at_table=False):
     already_added_ips = []
     for ip in ips:
@@ -491,8 +721,133 @@ def add_unreachable_route(vrf_name):
     ovn_bgp_agent.privileged.linux_net.add_unreachable_route(vrf_name)
 
 
+def add_unreachable_routes(vrf_names):
+    if vrf_names:
+        ovn_bgp_agent.privileged.linux_net.add_unreachable_routes(vrf_names)
+
+
+def get_nexthops():
+    """Return the nexthop objects created by the agent
+
+    :returns: a dict with the nexthops by (family, device, gateway), each one
+              with its id and the (table, dst, dst_len) of the routes using
+              it, to be filled while the routes are added.
+    """
+    nexthops = {}
+    for family in (AF_INET, AF_INET6):
+        for nexthop in ovn_bgp_agent.privileged.linux_net.nexthops_show(
+                family):
+            # NOTE: skip the nexthops not created by the agent, e.g., the
+            # ones from zebra. The protocol is only named by ip if it is
+            # listed on rt_protos
+            if str(nexthop.get('protocol')) != str(
+                    constants.NEXTHOP_PROTO):
+                continue
+            key = (family, nexthop.get('dev'), nexthop.get('gateway'))
+            nexthops[key] = {'id': nexthop['id'], 'routes': set()}
+    return nexthops
+
+
+def _ensure_nexthop(nexthops, family, dev, via=None):
+    key = (family, dev, via)
+    nexthop = nexthops.get(key)
+    if nexthop:
+        return nexthop
+    nh_id = max([nh['id'] for nh in nexthops.values()], default=0) + 1
+    # the id may be in use by a nexthop from somebody else
+    while not ovn_bgp_agent.privileged.linux_net.nexthop_add(
+            nh_id, family, dev, via=via):
+        nh_id += 1
+    LOG.debug("Created nexthop %s through %s (gateway %s)", nh_id, dev, via)
+    nexthops[key] = {'id': nh_id, 'routes': set()}
+    return nexthops[key]
+
+
+def _release_nexthop(nexthops, family, dev, route_key, via=None):
+    nexthop = nexthops.get((family, dev, via))
+    if not nexthop:
+        return
+    nexthop['routes'].discard(route_key)
+    if not nexthop['routes']:
+        ovn_bgp_agent.privileged.linux_net.nexthop_delete(nexthop['id'])
+        del nexthops[(family, dev, via)]
+
+
+def replace_nexthop(ovn_routing_tables_routes, nexthops, family, dev,
+                    vlan=None, new_vlan=None, via=None, new_via=None):
+    """Move the routes through a VLAN device and gateway to new ones
+
+    The nexthop object used by the routes is updated in place, so that all
+    of them are moved at once instead of deleting and adding each one. The
+    routes stay on the routing table of the bridge, dev.
+
+    :returns: True if the routes were moved, False if there is no nexthop
+              for the given device and gateway, or there is already one
+              for the new ones.
+    """
+    oif_name = '{}.{}'.format(dev, vlan) if vlan else dev
+    new_oif_name = '{}.{}'.format(dev, new_vlan) if new_vlan else dev
+    key = (family, oif_name, via)
+    new_key = (family, new_oif_name, new_via)
+    nexthop = nexthops.get(key)
+    if not nexthop or new_key in nexthops:
+        return False
+
+    if new_vlan:
+        ensure_vlan_device_for_network(dev, new_vlan)
+    with pyroute2.NDB() as ndb:
+        new_oif = ndb.interfaces[new_oif_name]['index']
+    LOG.debug("Replacing nexthop %s through %s (gateway %s) by %s "
+              "(gateway %s)", nexthop['id'], oif_name, via, new_oif_name,
+              new_via)
+    ovn_bgp_agent.privileged.linux_net.nexthop_replace(
+        nexthop['id'], family, new_oif_name, via=new_via)
+    nexthops[new_key] = nexthops.pop(key)
+
+    routes = ovn_routing_tables_routes.get(dev, set())
+    moved = [route for route in routes
+             if route.vlan == vlan and route.gateway == via and
+             (route.table, route.dst, route.dst_len) in nexthop['routes']]
+    for route in moved:
+        routes.discard(route)
+        routes.add(dataclasses.replace(route, oif=new_oif, vlan=new_vlan,
+                                       gateway=new_via or None))
+    return True
+
+
+def delete_unused_nexthops(nexthops):
+    """Delete the nexthop objects not used by any route
+
+    Note the kernel also deletes the routes still using them.
+    """
+    for key, nexthop in list(nexthops.items()):
+        if nexthop['routes']:
+            continue
+        LOG.debug("Deleting unused nexthop %s", nexthop['id'])
+        ovn_bgp_agent.privileged.linux_net.nexthop_delete(nexthop['id'])
+        del nexthops[key]
+
+
+def replace_ip_routes_with_nexthop(routes):
+    """Replace the routes batched by add_ip_route in one go"""
+    if not routes:
+        return
+    LOG.debug("Replacing %d routes using nexthop objects", len(routes))
+    ovn_bgp_agent.privileged.linux_net.routes_replace_with_nexthop(routes)
+
+
 def add_ip_route(ovn_routing_tables_routes, ip_address, route_table, dev,
-                 vlan=None, mask=None, via=None):
+                 vlan=None, mask=None, via=None, nexthops=None, batch=None,
+                 oif=None):
+    """Add a route to the routing table of a provider bridge
+
+    If nexthops is given (see get_nexthops) the route references a nexthop
+    object shared by all the routes through the same device and gateway,
+    instead of embedding them. Such routes are appended to the batch list,
+    if given, to be replaced later on with replace_ip_routes_with_nexthop.
+    If oif, the ifindex of the output device (dev, or its vlan device), is
+    given, it is not looked up.
+    """
     net_ip = ip_address
     if not mask:  # default /32 or /128
         if get_ip_version(ip_address) == constants.IP_VERSION_6:
@@ -508,20 +863,21 @@ def add_ip_route(ovn_routing_tables_routes, ip_address, route_table, dev,
             net_ip = '{}'.format(ipaddress.IPv4Network(
                 ip, strict=False).network_address)
 
-    with pyroute2.NDB() as ndb:
-        if vlan:
-            oif_name = '{}.{}'.format(dev, vlan)
-            try:
-                oif = ndb.interfaces[oif_name]['index']
-            except KeyError:
-                # Most provider network was recently created an
-                # there has not been a sync since then, therefore
-                # the vlan device has not yet been created
-                # Trying to create the device and retrying
-                ensure_vlan_device_for_network(dev, vlan)
-                oif = ndb.interfaces[oif_name]['index']
-        else:
-            oif = ndb.interfaces[dev]['index']
+    oif_name = '{}.{}'.format(dev, vlan) if vlan else dev
+    if oif is None:
+        with pyroute2.NDB() as ndb:
+            if vlan:
+                try:
+                    oif = ndb.interfaces[oif_name]['index']
+                except KeyError:
+                    # Most provider network was recently created an
+                    # there has not been a sync since then, therefore
+                    # the vlan device has not yet been created
+                    # Trying to create the device and retrying
+                    ensure_vlan_device_for_network(dev, vlan)
+                    oif = ndb.interfaces[oif_name]['index']
+            else:
+                oif = ndb.interfaces[dev]['index']
 
     route = {'dst': net_ip, 'dst_len': int(mask), 'oif': oif,
              'table': int(route_table), 'proto': 3}
@@ -534,20 +890,40 @@ def add_ip_route(ovn_routing_tables_routes, ip_address, route_table, dev,
         route['family'] = AF_INET6
         del route['scope']
 
-    with pyroute2.NDB() as ndb:
-        try:
-            with ndb.routes[route]:
-                LOG.debug("Route already existing: %s", route)
-        except KeyError:
-            LOG.debug("Creating route at table %s: %s", route_table, route)
-            ovn_bgp_agent.privileged.linux_net.route_create(route)
-            LOG.debug("Route created at table %s: %s", route_table, route)
-    route_info = {'vlan': vlan, 'route': route}
-    ovn_routing_tables_routes.setdefault(dev, []).append(route_info)
+    if nexthops is not None:
+        nexthop = _ensure_nexthop(nexthops, route.get('family', AF_INET),
+                                  oif_name, via=via)
+        route_key = (route['table'], net_ip, route['dst_len'])
+        if route_key in nexthop['routes']:
+            LOG.debug("Route already existing: %s (nexthop id %s)", route,
+                      nexthop['id'])
+            return
+        nexthop['routes'].add(route_key)
+        nh_route = {'dst': net_ip, 'dst_len': route['dst_len'],
+                    'table': route['table'], 'nh_id': nexthop['id']}
+        if batch is not None:
+            batch.append(nh_route)
+        else:
+            LOG.debug("Replacing route at table %s: %s (nexthop id %s)",
+                      route_table, route, nexthop['id'])
+            replace_ip_routes_with_nexthop([nh_route])
+    else:
+        with pyroute2.NDB() as ndb:
+            try:
+                with ndb.routes[route]:
+                    LOG.debug("Route already existing: %s", route)
+            except KeyError:
+                LOG.debug("Creating route at table %s: %s", route_table,
+                          route)
+                ovn_bgp_agent.privileged.linux_net.route_create(route)
+                LOG.debug("Route created at table %s: %s", route_table,
+                          route)
+    ovn_routing_tables_routes.setdefault(dev, set()).add(
+        _get_route_key(route, vlan))
 
 
 def del_ip_route(ovn_routing_tables_routes, ip_address, route_table, dev,
-                 vlan=None, mask=None, via=None):
+                 vlan=None, mask=None, via=None, nexthops=None):
     net_ip = ip_address
     if not mask:  # default /32 or /128
         if get_ip_version(ip_address) == constants.IP_VERSION_6:
@@ -567,13 +943,17 @@ def del_ip_route(ovn_routing_tables_routes, ip_address, route_table, dev,
         try:
             if vlan:
                 oif_name = '{}.{}'.format(dev, vlan)
-                oif = ndb.interfaces[oif_name]['index']
             else:
-                oif = ndb.interfaces[dev]['index']
+                oif_name = dev
+            oif = ndb.interfaces[oif_name]['index']
         except KeyError:
             LOG.debug("Device %s does not exists, so the associated "
                       "routes should have been automatically deleted.", dev)
             ovn_routing_tables_routes.pop(dev, None)
+            if nexthops is not None:
+                # so are the nexthop objects through it
+                for key in [k for k in nexthops if k[1] == oif_name]:
+                    del nexthops[key]
             return
 
     route = {'dst': net_ip, 'dst_len': int(mask), 'oif': oif,
@@ -588,11 +968,18 @@ def del_ip_route(ovn_routing_tables_routes, ip_address, route_table, dev,
         del route['scope']
 
     LOG.debug("Deleting route at table %s: %s", route_table, route)
-    ovn_bgp_agent.privileged.linux_net.route_delete(route)
+    if nexthops is not None:
+        # NOTE: the kernel does not match routes using nexthop objects if
+        # the oif or the gateway are given
+        ovn_bgp_agent.privileged.linux_net.routes_delete([
+            {k: v for k, v in route.items() if k not in ('oif', 'gateway')}])
+        _release_nexthop(nexthops, route.get('family', AF_INET), oif_name,
+                         (route['table'], net_ip, route['dst_len']), via=via)
+    else:
+        ovn_bgp_agent.privileged.linux_net.route_delete(route)
     LOG.debug("Route deleted at table %s: %s", route_table, route)
-    route_info = {'vlan': vlan, 'route': route}
-    if route_info in ovn_routing_tables_routes.get(dev, []):
-        ovn_routing_tables_routes[dev].remove(route_info)
+    ovn_routing_tables_routes.get(dev, set()).discard(
+        _get_route_key(route, vlan))
 
 
 def set_device_status(device, status, ndb=None):
@@ -0,0 +1,387 @@
+# Copyright 2022 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import ipaddress
+
+_ADDRESS_CLASS = {4: ipaddress.IPv4Address, 6: ipaddress.IPv6Address}
+_NETWORK_CLASS = {4: ipaddress.IPv4Network, 6: ipaddress.IPv6Network}
+_MAX_PREFIXLEN = {4: 32, 6: 128}
+
+
+class _Node(object):
+    __slots__ = ('count', 'children')
+
+    def __init__(self):
+        # number of addresses stored below this node
+        self.count = 0
+        self.children = [None, None]
+
+
+class PrefixTree(object):
+    """Binary radix tree of IP addresses.
+
+    Each node represents a prefix and keeps the number of addresses stored
+    below it, so checking if a prefix is fully populated, or collecting the
+    addresses within a network, only walks the affected branch of the tree.
+    IPv4 and IPv6 addresses are kept in separate trees.
+    """
+
+    def __init__(self, addresses=None):
+        self._roots = {4: _Node(), 6: _Node()}
+        for address in addresses or []:
+            self.add(address)
+
+    def __len__(self):
+        return self._roots[4].count + self._roots[6].count
+
+    def __contains__(self, address):
+        address = ipaddress.ip_address(address)
+        node = self._roots[address.version]
+        for bit in self._bits(address):
+            node = node.children[bit]
+            if node is None:
+                return False
+        return True
+
+    def __iter__(self):
+        for version, root in self._roots.items():
+            yield from self._walk(root, 0, 0, version)
+
+    @staticmethod
+    def _bits(address):
+        value = int(address)
+        for shift in range(address.max_prefixlen - 1, -1, -1):
+            yield (value >> shift) & 1
+
+    def _walk(self, node, value, depth, version):
+        if depth == _MAX_PREFIXLEN[version]:
+            yield _ADDRESS_CLASS[version](value)
+            return
+        for bit, child in enumerate(node.children):
+            if child is not None:
+                yield from self._walk(child, (value << 1) | bit, depth + 1,
+                                      version)
+
+    def add(self, address):
+        """Add an address to the tree.
+
+        :returns: True if the address was added, False if already there.
+        """
+        address = ipaddress.ip_address(address)
+        if address in self:
+            return False
+        node = self._roots[address.version]
+        node.count += 1
+        for bit in self._bits(address):
+            if node.children[bit] is None:
+                node.children[bit] = _Node()
+            node = node.children[bit]
+            node.count += 1
+        return True
+
+    def remove(self, address):
+        """Remove an address from the tree.
+
+        :returns: True if the address was removed, False if not there.
+        """
+        address = ipaddress.ip_address(address)
+        if address not in self:
+            return False
+        node = self._roots[address.version]
+        node.count -= 1
+        for bit in self._bits(address):
+            child = node.children[bit]
+            child.count -= 1
+            if not child.count:
+                # prune the now empty branch
+                node.children[bit] = None
+                break
+            node = child
+        return True
+
+    def _get_node(self, network):
+        node = self._roots[network.version]
+        address = network.network_address
+        for depth, bit in enumerate(self._bits(address)):
+            if depth == network.prefixlen or node is None:
+                break
+            node = node.children[bit]
+        return node
+
+    def get_addresses_on_network(self, network):
+        """Return the addresses of the tree within the given network."""
+        network = ipaddress.ip_network(network, strict=False)
+        node = self._get_node(network)
+        if node is None:
+            return []
+        network_value = int(network.network_address) >> (
+            network.max_prefixlen - network.prefixlen)
+        return list(self._walk(node, network_value, network.prefixlen,
+                               network.version))
+
+    def get_full_prefix(self, address):
+        """Return the shortest prefix containing address that is full.
+
+        A prefix is full when all its addresses are in the tree.
+
+        :returns: an ipaddress network object, or None if the address is
+                  not in the tree.
+        """
+        address = ipaddress.ip_address(address)
+        if address not in self:
+            return None
+        max_prefixlen = address.max_prefixlen
+        node = self._roots[address.version]
+        for depth, bit in enumerate(self._bits(address)):
+            if node.count == 1 << (max_prefixlen - depth):
+                break
+            node = node.children[bit]
+        else:
+            depth = max_prefixlen
+        return ipaddress.ip_network((address, depth), strict=False)
+
+    def get_full_prefixes(self):
+        """Return the minimal set of full prefixes covering the tree."""
+        prefixes = []
+        for version, root in self._roots.items():
+            max_prefixlen = _MAX_PREFIXLEN[version]
+            pending = [(root, 0, 0)]
+            while pending:
+                node, value, depth = pending.pop()
+                if node.count == 1 << (max_prefixlen - depth):
+                    prefixes.append(_NETWORK_CLASS[version](
+                        (value << (max_prefixlen - depth), depth)))
+                    continue
+                for bit, child in enumerate(node.children):
+                    if child is not None:
+                        pending.append((child, (value << 1) | bit,
+                                        depth + 1))
+        return prefixes
+
+
+def _to_network(prefix):
+    # an address is stored as its host prefix
+    if isinstance(prefix, (ipaddress.IPv4Network, ipaddress.IPv6Network)):
+        return prefix
+    return ipaddress.ip_network(prefix, strict=False)
+
+
+def _get_bit(value, position, max_prefixlen):
+    # the bit after the first position bits of value
+    return (value >> (max_prefixlen - position - 1)) & 1
+
+
+def _get_common_prefixlen(value1, value2, max_prefixlen, limit):
+    diff = value1 ^ value2
+    if not diff:
+        return limit
+    return min(limit, max_prefixlen - diff.bit_length())
+
+
+class _PatriciaNode(object):
+    __slots__ = ('value', 'prefixlen', 'item', 'children')
+
+    def __init__(self, value, prefixlen, item=None):
+        # network address of the node prefix, as an integer
+        self.value = value
+        self.prefixlen = prefixlen
+        # (prefix, value) stored at the node, None on the branching nodes
+        self.item = item
+        self.children = [None, None]
+
+
+class PrefixMap(object):
+    """Patricia (path compressed radix) tree mapping IP prefixes to values.
+
+    Only the prefixes stored, and the nodes where their paths branch, are
+    kept on the tree, so getting the prefixes within a network, or the ones
+    covering it, walks at most one node per bit of the network plus one per
+    prefix returned. Addresses are stored as their host (/32 or /128)
+    prefixes. IPv4 and IPv6 prefixes are kept in separate trees.
+    """
+
+    def __init__(self, items=None):
+        self._roots = {4: _PatriciaNode(0, 0), 6: _PatriciaNode(0, 0)}
+        self._len = 0
+        for prefix, value in items or []:
+            self[prefix] = value
+
+    def __len__(self):
+        return self._len
+
+    def __contains__(self, prefix):
+        return self._find(_to_network(prefix)) is not None
+
+    def __iter__(self):
+        for prefix, _ in self.items():
+            yield prefix
+
+    def __getitem__(self, prefix):
+        node = self._find(_to_network(prefix))
+        if node is None:
+            raise KeyError(prefix)
+        return node.item[1]
+
+    def __setitem__(self, prefix, value):
+        network = _to_network(prefix)
+        max_prefixlen = network.max_prefixlen
+        prefixlen = network.prefixlen
+        key = int(network.network_address)
+        item = (network, value)
+        node = self._roots[network.version]
+        while node.prefixlen != prefixlen:
+            bit = _get_bit(key, node.prefixlen, max_prefixlen)
+            child = node.children[bit]
+            if child is None:
+                node.children[bit] = _PatriciaNode(key, prefixlen, item)
+                self._len += 1
+                return
+            common = _get_common_prefixlen(
+                key, child.value, max_prefixlen,
+                min(prefixlen, child.prefixlen))
+            if common == child.prefixlen:
+                node = child
+                continue
+            # the new prefix, or a new branching node, goes between node
+            # and child
+            if common == prefixlen:
+                new = _PatriciaNode(key, prefixlen, item)
+            else:
+                shift = max_prefixlen - common
+                new = _PatriciaNode(key >> shift << shift, common)
+                new.children[_get_bit(key, common, max_prefixlen)] = (
+                    _PatriciaNode(key, prefixlen, item))
+            new.children[_get_bit(child.value, common, max_prefixlen)] = (
+                child)
+            node.children[bit] = new
+            self._len += 1
+            return
+        if node.item is None:
+            self._len += 1
+        node.item = item
+
+    def __delitem__(self, prefix):
+        network = _to_network(prefix)
+        path = self._get_path(network)
+        node = path[-1] if path else None
+        if (node is None or node.prefixlen != network.prefixlen or
+                node.item is None):
+            raise KeyError(prefix)
+        node.item = None
+        self._len -= 1
+        # remove the nodes that no longer store nor branch anything, the
+        # roots are always kept
+        for node, parent in zip(reversed(path[1:]), reversed(path[:-1])):
+            if node.item is not None:
+                break
+            children = [c for c in node.children if c is not None]
+            if len(children) > 1:
+                break
+            bit = parent.children.index(node)
+            parent.children[bit] = children[0] if children else None
+            if children:
+                break
+
+    def _get_path(self, network):
+        # the nodes from the root down to the one of the prefix, or the
+        # deepest one containing it
+        max_prefixlen = network.max_prefixlen
+        prefixlen = network.prefixlen
+        key = int(network.network_address)
+        node = self._roots[network.version]
+        path = [node]
+        while node.prefixlen < prefixlen:
+            node = node.children[_get_bit(key, node.prefixlen,
+                                          max_prefixlen)]
+            if node is None or node.prefixlen > prefixlen:
+                break
+            shift = max_prefixlen - node.prefixlen
+            if key >> shift != node.value >> shift:
+                break
+            path.append(node)
+        return path
+
+    def _find(self, network):
+        node = self._get_path(network)[-1]
+        if node.prefixlen == network.prefixlen and node.item is not None:
+            return node
+        return None
+
+    def get(self, prefix, default=None):
+        node = self._find(_to_network(prefix))
+        return node.item[1] if node is not None else default
+
+    def setdefault(self, prefix, default=None):
+        node = self._find(_to_network(prefix))
+        if node is not None:
+            return node.item[1]
+        self[prefix] = default
+        return default
+
+    def pop(self, prefix, *default):
+        node = self._find(_to_network(prefix))
+        if node is None:
+            if default:
+                return default[0]
+            raise KeyError(prefix)
+        value = node.item[1]
+        del self[prefix]
+        return value
+
+    def items(self):
+        """Return the (prefix, value) pairs, sorted by prefix."""
+        items = []
+        for root in self._roots.values():
+            items.extend(self._walk(root))
+        return items
+
+    @staticmethod
+    def _walk(node):
+        items = []
+        pending = [node]
+        while pending:
+            node = pending.pop()
+            if node.item is not None:
+                items.append(node.item)
+            pending.extend(c for c in reversed(node.children)
+                           if c is not None)
+        return items
+
+    def get_within(self, network):
+        """Return the (prefix, value) pairs of the prefixes in network."""
+        network = _to_network(network)
+        max_prefixlen = network.max_prefixlen
+        prefixlen = network.prefixlen
+        key = int(network.network_address)
+        node = self._roots[network.version]
+        while node.prefixlen < prefixlen:
+            node = node.children[_get_bit(key, node.prefixlen,
+                                          max_prefixlen)]
+            if node is None:
+                return []
+            # compare up to the shortest of both prefixes
+            shift = max_prefixlen - min(node.prefixlen, prefixlen)
+            if key >> shift != node.value >> shift:
+                return []
+        return self._walk(node)
+
+    def get_covering(self, network):
+        """Return the (prefix, value) pairs of the prefixes covering network
+
+        The network can also be an address. The pairs are returned from the
+        shortest to the longest prefix.
+        """
+        network = _to_network(network)
+        return [node.item for node in self._get_path(network)
+                if node.item is not None]
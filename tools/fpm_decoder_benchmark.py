@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# Copyright 2022 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measure the throughput of the FPM route decoder, in messages per second.
+
+The FPM netlink route messages are decoded with the ovn-bgp-agent decoder
+and, for comparison, with the pyroute2 rtmsg one previously used.
+
+Usage: python tools/fpm_decoder_benchmark.py [--routes N] [--nexthops N]
+"""
+
+import argparse
+import ipaddress
+import socket
+import time
+
+from pyroute2.netlink.rtnl.rtmsg import rtmsg
+
+from ovn_bgp_agent.drivers.openstack.utils import fpm
+
+RTPROT_BGP = 186
+
+
+def build_payloads(routes, nexthops):
+    payloads = []
+    network = ipaddress.ip_network('10.0.0.0/8')
+    for i in range(routes):
+        msg = rtmsg()
+        msg['header']['type'] = fpm.RTM_NEWROUTE
+        msg['family'] = socket.AF_INET
+        msg['dst_len'] = 32
+        msg['proto'] = RTPROT_BGP
+        msg['attrs'] = [('RTA_DST', str(network[i + 1])),
+                        ('RTA_TABLE', 254)]
+        if nexthops == 1:
+            msg['attrs'].append(('RTA_GATEWAY', '172.24.4.1'))
+        else:
+            msg['attrs'].append(('RTA_MULTIPATH', [
+                {'attrs': [('RTA_GATEWAY', '172.24.4.{}'.format(n + 1))],
+                 'oif': n + 1} for n in range(nexthops)]))
+        msg.encode()
+        payloads.append(bytes(msg.data))
+    return payloads
+
+
+def decode_pyroute2(payload):
+    offset = 0
+    while offset < len(payload):
+        msg = rtmsg(payload[offset:])
+        msg.decode()
+        offset += msg['header']['length']
+        for attr in msg['attrs']:
+            attr[0]
+
+
+def decode_fpm(payload):
+    for route in fpm.decode_routes(payload):
+        route.nexthops
+
+
+def measure(name, decode, payloads, batch):
+    # zebra sends one message per FPM frame, but frames can also carry
+    # several messages: measure both cases
+    if batch > 1:
+        payloads = [b''.join(payloads[i:i + batch])
+                    for i in range(0, len(payloads), batch)]
+    start = time.perf_counter()
+    for payload in payloads:
+        decode(payload)
+    elapsed = time.perf_counter() - start
+    messages = len(payloads) * batch
+    print("{:<10} {:>6} msgs/frame {:>12,.0f} msgs/sec".format(
+        name, batch, messages / elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--routes', type=int, default=50000)
+    parser.add_argument('--nexthops', type=int, default=1)
+    args = parser.parse_args()
+
+    payloads = build_payloads(args.routes, args.nexthops)
+    print("{} routes, {} nexthops per route".format(
+        args.routes, args.nexthops))
+    for batch in (1, 100):
+        measure('pyroute2', decode_pyroute2, payloads, batch)
+        measure('fpm', decode_fpm, payloads, batch)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# Copyright 2022 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measure the time to find the leftover exposed IPs of a BGP driver sync.
+
+The IPs seen on the OVN DB are removed one by one from the list of exposed
+IPs, as the sync previously did, and, for comparison, the exposed IPs are
+filtered against the set of seen IPs.
+
+Usage: python tools/sync_leftovers_benchmark.py [--leftovers PERCENT]
+"""
+
+import argparse
+import ipaddress
+import time
+
+
+def build_ips(count, leftovers):
+    network = ipaddress.ip_network('10.0.0.0/8')
+    exposed_ips = [str(network[i + 1]) for i in range(count)]
+    # the kernel dumps the IPs in its own order, not the OVN DB one
+    seen = exposed_ips[::-1][:count - count * leftovers // 100]
+    return exposed_ips, seen
+
+
+def leftovers_list_remove(exposed_ips, seen):
+    exposed_ips = list(exposed_ips)
+    for ip in seen:
+        if ip in exposed_ips:
+            exposed_ips.remove(ip)
+    return exposed_ips
+
+
+def leftovers_set(exposed_ips, seen):
+    seen_ips = {ipaddress.ip_address(ip) for ip in seen}
+    return [ip for ip in exposed_ips
+            if ipaddress.ip_address(ip) not in seen_ips]
+
+
+def measure(name, leftovers, exposed_ips, seen):
+    start = time.perf_counter()
+    result = leftovers(exposed_ips, seen)
+    elapsed = time.perf_counter() - start
+    print("{:<12} {:>7} IPs {:>7} leftovers {:>10.3f} secs".format(
+        name, len(exposed_ips), len(result), elapsed))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--leftovers', type=int, default=1)
+    args = parser.parse_args()
+
+    for count in (10000, 50000, 100000):
+        exposed_ips, seen = build_ips(count, args.leftovers)
+        expected = measure('list.remove', leftovers_list_remove,
+                           exposed_ips, seen)
+        result = measure('set', leftovers_set, exposed_ips, seen)
+        assert result == expected
+
+
+if __name__ == '__main__':
+    main()